@@ -13,10 +13,20 @@ Funcionalidades:
 
 import pandas as pd
 import json
+import logging
 import os
 from datetime import datetime
 from flask import Blueprint, render_template, request, jsonify, current_app
 
+from modelo_generacion_electrica import ModeloGeneracion
+from nucleo_mezcla import EstrategiaMezcla
+from registro_calculo import obtener_registro, traza
+from cache_mezclas import huella_mezcla
+from ejecutor_modelos import EjecutorModelos
+
+# Detalle por material/iteración en DEBUG (formato perezoso); nivel de 'sibia.adan' configurable en caliente
+log_adan = obtener_registro('adan')
+
 # Sistema de voz específico para Adán MEJORADO
 try:
     from voice_system_adan_mejorado import voice_system_adan_mejorado, speak_adan_calculating_mejorado, speak_adan_success_mejorado, speak_adan_error_mejorado, speak_adan_completed_mejorado
@@ -143,6 +153,20 @@ MODELOS_DISPONIBLES = {
     }
 }
 
+# Ejecución concurrente de modelos: plazo por modelo (MODELOS_DISPONIBLES[...]['timeout_ms'] o el default)
+# y presupuesto total por request, en milisegundos
+TIMEOUT_MODELO_MS = float(os.environ.get('ADAN_TIMEOUT_MODELO_MS', '2000'))
+PRESUPUESTO_MODELOS_MS = float(os.environ.get('ADAN_PRESUPUESTO_MODELOS_MS', '3000'))
+ejecutor_modelos_adan = EjecutorModelos(timeout_ms=TIMEOUT_MODELO_MS, presupuesto_ms=PRESUPUESTO_MODELOS_MS)
+
+# Campos que leen los optimizadores optimizar_con_* (huella de entrada) y los que escriben
+CAMPOS_ENTRADA_ML = ('nombre', 'kwh_por_tn', 'porcentaje_metano', 'stock_disponible', 'carbohidratos',
+                     'lipidos', 'proteinas', 'st_pct', 'sv_pct', 'densidad')
+CAMPOS_DERIVADOS_ML = frozenset({
+    'score_ml', 'kwh_por_tn_optimizado', 'confianza_xgboost', 'confianza_rn', 'confianza_genetico',
+    'fitness_genetico', 'confianza_cain', 'score_cain', 'confianza_random_forest', 'confianza_bayesiana',
+})
+
 # Crear Blueprint para Adán
 adan_bp = Blueprint('adan', __name__, url_prefix='/adan')
 
@@ -188,6 +212,36 @@ def obtener_stock_materiales():
     except Exception:
         return {}
 
+def construir_materiales_receta(materiales_data, stock_actual, stock_default=100.0):
+    """Materiales en el formato que usa generar_receta_con_purin a partir del catálogo y el stock"""
+    materiales = []
+    for idx, (nombre, data) in enumerate(materiales_data.items()):
+        if not isinstance(data, dict):
+            continue
+        # Obtener stock real (total_tn del stock del sistema) o usar valor por defecto
+        datos_stock = stock_actual.get(nombre, {}) if isinstance(stock_actual, dict) else {}
+        stock_disponible = datos_stock.get('total_tn', datos_stock.get('cantidad', stock_default))
+
+        material = {
+            'id': idx,
+            'nombre': nombre,
+            'tipo': data.get('tipo', 'solido'),
+            'st_pct': float(data.get('st', 0)) * 100,  # Convertir a porcentaje
+            'sv_pct': float(data.get('sv', 0)) * 100,  # Convertir a porcentaje
+            'svt_pct': float(data.get('st', 0)) * float(data.get('sv', 0)) * 100,  # ST * SV
+            'carbohidratos': float(data.get('carbohidratos', 0)) * 100,  # Convertir a porcentaje
+            'lipidos': float(data.get('lipidos', 0)) * 100,  # Convertir a porcentaje
+            'proteinas': float(data.get('proteinas', 0)) * 100,  # Convertir a porcentaje
+            'm3_biogas_por_tn': float(data.get('m3_tnsv', 0)),
+            'stock_disponible': float(stock_disponible or 0),
+            'densidad': float(data.get('densidad', 1.0)),
+            'kw_por_tn': float(data.get('kw/tn', 0)) * 1000,  # Convertir a kWh/Tn
+            'ch4_por_tn': float(data.get('ch4', 0)) * 1000,  # Convertir a m³ CH4/Tn
+            'porcentaje_metano': float(data.get('porcentaje_metano', 65))
+        }
+        materiales.append(material)
+    return materiales
+
 def cargar_materiales_excel(archivo_excel='materiales_base_config.json'):
     """Carga los materiales desde el archivo JSON de materiales base"""
     try:
@@ -207,31 +261,7 @@ def cargar_materiales_excel(archivo_excel='materiales_base_config.json'):
         # Obtener stock actual
         stock_actual = obtener_stock_materiales()
         
-        materiales = []
-        for idx, (nombre, data) in enumerate(materiales_data.items()):
-            # Obtener stock real o usar valor por defecto
-            stock_disponible = stock_actual.get(nombre, {}).get('cantidad', 100.0)
-            
-            material = {
-                'id': idx,
-                'nombre': nombre,
-                'tipo': data.get('tipo', 'solido'),
-                'st_pct': float(data.get('st', 0)) * 100,  # Convertir a porcentaje
-                'sv_pct': float(data.get('sv', 0)) * 100,  # Convertir a porcentaje
-                'svt_pct': float(data.get('st', 0)) * float(data.get('sv', 0)) * 100,  # ST * SV
-                'carbohidratos': float(data.get('carbohidratos', 0)) * 100,  # Convertir a porcentaje
-                'lipidos': float(data.get('lipidos', 0)) * 100,  # Convertir a porcentaje
-                'proteinas': float(data.get('proteinas', 0)) * 100,  # Convertir a porcentaje
-                'm3_biogas_por_tn': float(data.get('m3_tnsv', 0)),
-                'stock_disponible': float(stock_disponible),
-                'densidad': float(data.get('densidad', 1.0)),
-                'kw_por_tn': float(data.get('kw/tn', 0)) * 1000,  # Convertir a kWh/Tn
-                'ch4_por_tn': float(data.get('ch4', 0)) * 1000,  # Convertir a m³ CH4/Tn
-                'porcentaje_metano': float(data.get('porcentaje_metano', 65))
-            }
-            materiales.append(material)
-        
-        return materiales
+        return construir_materiales_receta(materiales_data, stock_actual)
     except Exception as e:
         print(f"Error cargando materiales JSON: {e}")
         return []
@@ -242,7 +272,7 @@ def calcular_generacion_electrica(m3_biogas_por_tn, consumo_motor_l_s,
     try:
         # Validar parámetros de entrada
         if consumo_motor_l_s <= 0 or potencia_motor_kw <= 0:
-            print(f"DEBUG: Parametros invalidos - consumo: {consumo_motor_l_s}, potencia: {potencia_motor_kw}")
+            log_adan.detalle(lambda: f"DEBUG: Parametros invalidos - consumo: {consumo_motor_l_s}, potencia: {potencia_motor_kw}")
             return {
                 'm3_biogas_por_tn': m3_biogas_por_tn,
                 'm3_ch4_por_tn': 0,
@@ -269,7 +299,7 @@ def calcular_generacion_electrica(m3_biogas_por_tn, consumo_motor_l_s,
         
         # Validar resultados
         if kwh_generados < 0 or horas_operacion < 0:
-            print(f"DEBUG: Resultados invalidos - kwh: {kwh_generados}, horas: {horas_operacion}")
+            log_adan.detalle(lambda: f"DEBUG: Resultados invalidos - kwh: {kwh_generados}, horas: {horas_operacion}")
             kwh_generados = 0
             horas_operacion = 0
             potencia_calorifica_kw = 0
@@ -285,7 +315,7 @@ def calcular_generacion_electrica(m3_biogas_por_tn, consumo_motor_l_s,
             'poder_calorifico_biogas': round(poder_calorifico_biogas, 2)
         }
     except Exception as e:
-        print(f"DEBUG: Error en calcular_generacion_electrica: {e}")
+        log_adan.detalle("DEBUG: Error en calcular_generacion_electrica: %s", e)
         return {
             'm3_biogas_por_tn': m3_biogas_por_tn,
             'm3_ch4_por_tn': 0,
@@ -308,26 +338,30 @@ def analizar_cruzado_modelos(materiales_receta, kwh_objetivo, porcentaje_ch4, mo
         'timestamp': datetime.now().isoformat()
     }
     
-    # Evaluar cada modelo seleccionado
-    for modelo_id in modelos_seleccionados:
-        if modelo_id not in MODELOS_DISPONIBLES:
-            continue
-            
-        modelo_info = MODELOS_DISPONIBLES[modelo_id]
-        if not modelo_info['disponible']:
-            continue
-            
-        resultado_modelo = evaluar_modelo_individual(
-            modelo_id, materiales_receta, kwh_objetivo, porcentaje_ch4
-        )
-        
+    # Evaluar los modelos seleccionados en paralelo (plazo por modelo, caché por huella)
+    modelos = [m for m in dict.fromkeys(modelos_seleccionados or [])
+               if m in MODELOS_DISPONIBLES and MODELOS_DISPONIBLES[m]['disponible']]
+    entradas = [{k: r.get(k) for k in ('material', 'tipo', 'toneladas', 'kwh_total', 'm3_ch4')}
+                for r in materiales_receta]
+    ejecucion = ejecutor_modelos_adan.ejecutar(
+        {m: (lambda m=m: evaluar_modelo_individual(m, materiales_receta, kwh_objetivo, porcentaje_ch4))
+         for m in modelos},
+        huellas={m: _huella_modelo('evaluacion', m, kwh_objetivo, porcentaje_ch4, entradas) for m in modelos},
+        timeouts_ms=_timeouts_modelos(modelos),
+    )
+    
+    for modelo_id in modelos:
+        resultado_modelo = ejecucion['resultados'].get(modelo_id)
         if resultado_modelo:
+            modelo_info = MODELOS_DISPONIBLES[modelo_id]
             resultados_cruzados['modelos_evaluados'].append({
                 'modelo_id': modelo_id,
                 'nombre': modelo_info['nombre'],
                 'resultado': resultado_modelo,
                 'color': modelo_info['color']
             })
+    resultados_cruzados['ejecucion'] = {k: ejecucion[k] for k in ('estado', 'latencias_ms', 'errores',
+                                                                  'total_ms', 'completo')}
     
     # Calcular métricas comparativas
     if len(resultados_cruzados['modelos_evaluados']) > 1:
@@ -605,71 +639,101 @@ def calcular_toneladas_purin(m3_purin, densidad_purin=1.05):
     """Convierte m³ de purín a toneladas"""
     return m3_purin * densidad_purin
 
-def aplicar_modelos_ml_optimizacion(materiales_disponibles, kwh_objetivo, porcentaje_ch4, modelos_seleccionados):
+def _optimizador_modelo(modelo_id):
+    """Función optimizar_con_* que corresponde al modelo (fallback si su sistema no está disponible)."""
+    optimizadores = {
+        'xgboost': (XGBOOST_DISPONIBLE, optimizar_con_xgboost),
+        'redes_neuronales': (SISTEMA_ML_DISPONIBLE, optimizar_con_redes_neuronales),
+        'algoritmo_genetico': (SISTEMA_GENETICO_DISPONIBLE, optimizar_con_algoritmo_genetico),
+        'cain_sistema': (SISTEMA_CAIN_DISPONIBLE, optimizar_con_cain),
+        'random_forest': (RANDOM_FOREST_DISPONIBLE, optimizar_con_random_forest),
+        'optimizacion_bayesiana': (OPTIMIZACION_BAYESIANA_DISPONIBLE, optimizar_con_bayesiana),
+    }
+    disponible, funcion = optimizadores.get(modelo_id, (False, None))
+    if disponible:
+        return funcion
+    return lambda materiales, kwh, ch4: optimizar_con_fallback(materiales, modelo_id, kwh, ch4)
+
+def _cambios_modelo(funcion, materiales, kwh_objetivo, porcentaje_ch4):
+    """
+    Corre un optimizador sobre copias de los materiales y devuelve, por material,
+    los campos que escribió y el incremento de score_ml. Los optimizadores sólo
+    leen campos de entrada y suman a score_ml, así que aplicar los cambios en el
+    orden de los modelos equivale a encadenarlos.
     """
-    Aplica modelos ML para optimizar la selección de materiales
+    copias = [{k: v for k, v in m.items() if k not in CAMPOS_DERIVADOS_ML} for m in materiales]
+    originales = [dict(c) for c in copias]
+    salida = funcion(copias, kwh_objetivo, porcentaje_ch4)
+    cambios = []
+    for original, mat in zip(originales, salida):
+        campos = {k: v for k, v in mat.items() if k != 'score_ml' and original.get(k, object()) != v}
+        cambios.append((campos, mat.get('score_ml')))
+    return cambios
+
+def _huella_modelo(tipo, modelo_id, kwh_objetivo, porcentaje_ch4, entradas):
+    return huella_mezcla({'kwh_objetivo': kwh_objetivo, 'porcentaje_ch4': porcentaje_ch4}, {},
+                         f'adan_{tipo}:{modelo_id}', extra={'entradas': entradas})
+
+def _timeouts_modelos(modelos):
+    """Plazos propios de los modelos que los definen; el resto usa el del ejecutor."""
+    return {m: MODELOS_DISPONIBLES[m]['timeout_ms'] for m in modelos if 'timeout_ms' in MODELOS_DISPONIBLES.get(m, {})}
+
+def aplicar_modelos_ml_optimizacion(materiales_disponibles, kwh_objetivo, porcentaje_ch4, modelos_seleccionados,
+                                    reporte=None):
     """
-    print(f"=== APLICANDO MODELOS ML ===")
-    print(f"DEBUG: Modelos seleccionados: {modelos_seleccionados}")
-    print(f"DEBUG: Tipo de modelos_seleccionados: {type(modelos_seleccionados)}")
+    Aplica modelos ML para optimizar la selección de materiales.
+    Los modelos corren en paralelo (plazo por modelo, resultados cacheados por
+    huella de entrada) y sus cambios se aplican en el orden seleccionado; los que
+    vencen su plazo o fallan se omiten. Si se pasa `reporte` (dict) se completa
+    con estados y latencias por modelo.
+    """
+    log_adan.detalle(lambda: f"=== APLICANDO MODELOS ML ===")
+    log_adan.detalle(lambda: f"DEBUG: Modelos seleccionados: {modelos_seleccionados}")
     
     if not modelos_seleccionados:
-        print("DEBUG: No hay modelos seleccionados, usando materiales originales")
+        log_adan.detalle("DEBUG: No hay modelos seleccionados, usando materiales originales")
         return materiales_disponibles
 
     materiales_optimizados = materiales_disponibles.copy()
-    print(f"DEBUG: Materiales antes de optimización: {len(materiales_optimizados)}")
+    log_adan.detalle(lambda: f"DEBUG: Materiales antes de optimización: {len(materiales_optimizados)}")
 
-    modelos_aplicados = 0
+    modelos = []
     for modelo_id in modelos_seleccionados:
-        print(f"DEBUG: Procesando modelo: {modelo_id}")
-        
         if modelo_id not in MODELOS_DISPONIBLES:
-            print(f"DEBUG: Modelo {modelo_id} no está disponible en MODELOS_DISPONIBLES")
+            log_adan.detalle(lambda: f"DEBUG: Modelo {modelo_id} no está disponible en MODELOS_DISPONIBLES")
             continue
-
-        modelo_info = MODELOS_DISPONIBLES[modelo_id]
-        if not modelo_info['disponible']:
-            print(f"DEBUG: Modelo {modelo_id} no está disponible (disponible=False)")
+        if not MODELOS_DISPONIBLES[modelo_id]['disponible']:
+            log_adan.detalle(lambda: f"DEBUG: Modelo {modelo_id} no está disponible (disponible=False)")
             continue
+        if modelo_id not in modelos:
+            modelos.append(modelo_id)
 
-        print(f"DEBUG: Aplicando modelo {modelo_id} - {modelo_info['nombre']}")
-        try:
-            if modelo_id == 'xgboost' and XGBOOST_DISPONIBLE:
-                materiales_optimizados = optimizar_con_xgboost(materiales_optimizados, kwh_objetivo, porcentaje_ch4)
-                print(f"DEBUG: XGBoost aplicado exitosamente")
-                modelos_aplicados += 1
-            elif modelo_id == 'redes_neuronales' and SISTEMA_ML_DISPONIBLE:
-                materiales_optimizados = optimizar_con_redes_neuronales(materiales_optimizados, kwh_objetivo, porcentaje_ch4)
-                print(f"DEBUG: Redes Neuronales aplicadas exitosamente")
-                modelos_aplicados += 1
-            elif modelo_id == 'algoritmo_genetico' and SISTEMA_GENETICO_DISPONIBLE:
-                materiales_optimizados = optimizar_con_algoritmo_genetico(materiales_optimizados, kwh_objetivo, porcentaje_ch4)
-                print(f"DEBUG: Algoritmo Genetico aplicado exitosamente")
-                modelos_aplicados += 1
-            elif modelo_id == 'cain_sistema' and SISTEMA_CAIN_DISPONIBLE:
-                materiales_optimizados = optimizar_con_cain(materiales_optimizados, kwh_objetivo, porcentaje_ch4)
-                print(f"DEBUG: Sistema CAIN aplicado exitosamente")
-                modelos_aplicados += 1
-            elif modelo_id == 'random_forest' and RANDOM_FOREST_DISPONIBLE:
-                materiales_optimizados = optimizar_con_random_forest(materiales_optimizados, kwh_objetivo, porcentaje_ch4)
-                print(f"DEBUG: Random Forest aplicado exitosamente")
-                modelos_aplicados += 1
-            elif modelo_id == 'optimizacion_bayesiana' and OPTIMIZACION_BAYESIANA_DISPONIBLE:
-                materiales_optimizados = optimizar_con_bayesiana(materiales_optimizados, kwh_objetivo, porcentaje_ch4)
-                print(f"DEBUG: Optimizacion Bayesiana aplicada exitosamente")
-                modelos_aplicados += 1
-            else:
-                materiales_optimizados = optimizar_con_fallback(materiales_optimizados, modelo_id, kwh_objetivo, porcentaje_ch4)
-                print(f"DEBUG: Fallback aplicado para {modelo_id}")
-                modelos_aplicados += 1
-        except Exception as e:
-            print(f"Error aplicando modelo {modelo_id}: {e}")
+    entradas = [{k: m.get(k) for k in CAMPOS_ENTRADA_ML} for m in materiales_optimizados]
+    ejecucion = ejecutor_modelos_adan.ejecutar(
+        {m: (lambda f=_optimizador_modelo(m): _cambios_modelo(f, materiales_optimizados, kwh_objetivo, porcentaje_ch4))
+         for m in modelos},
+        huellas={m: _huella_modelo('optimizacion', m, kwh_objetivo, porcentaje_ch4, entradas) for m in modelos},
+        timeouts_ms=_timeouts_modelos(modelos),
+    )
+
+    modelos_aplicados = 0
+    for modelo_id in modelos:
+        cambios = ejecucion['resultados'].get(modelo_id)
+        if cambios is None:
+            log_adan.detalle(lambda: f"DEBUG: Modelo {modelo_id} omitido ({ejecucion['estado'].get(modelo_id)})")
             continue
+        for material, (campos, score) in zip(materiales_optimizados, cambios):
+            material.update(campos)
+            if score is not None:
+                material['score_ml'] = material.get('score_ml', 0) + score
+        modelos_aplicados += 1
+        log_adan.detalle(lambda: f"DEBUG: {MODELOS_DISPONIBLES[modelo_id]['nombre']} aplicado "
+                                 f"({ejecucion['estado'][modelo_id]}, {ejecucion['latencias_ms'][modelo_id]:.1f} ms)")
 
-    print(f"DEBUG: {modelos_aplicados} modelos aplicados exitosamente")
-    print(f"DEBUG: Materiales después de optimización: {len(materiales_optimizados)}")
-    print(f"=== FIN APLICACIÓN MODELOS ML ===")
+    if reporte is not None:
+        reporte.update({k: ejecucion[k] for k in ('estado', 'latencias_ms', 'errores', 'total_ms', 'completo')})
+    log_adan.detalle(lambda: f"DEBUG: {modelos_aplicados} modelos aplicados exitosamente")
+    log_adan.detalle(lambda: f"=== FIN APLICACIÓN MODELOS ML ===")
     return materiales_optimizados
 
 def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin, 
@@ -716,10 +780,10 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
     liquidos = [m for m in materiales_disponibles if m['tipo'] == 'liquido' and m['stock_disponible'] > 0]
     
     # 4. Calcular kWh por tonelada para cada material
-    print(f"DEBUG: Calculando kwh_por_tn para {len(solidos + liquidos)} materiales")
+    log_adan.detalle(lambda: f"DEBUG: Calculando kwh_por_tn para {len(solidos + liquidos)} materiales")
     for i, mat in enumerate(solidos + liquidos):
         try:
-            print(f"DEBUG: Material {i+1}: {mat.get('nombre', 'N/A')}")
+            log_adan.detalle(lambda: f"DEBUG: Material {i+1}: {mat.get('nombre', 'N/A')}")
             calc = calcular_generacion_electrica(
                 mat['m3_biogas_por_tn'],
                 consumo_motor,
@@ -728,9 +792,9 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
             )
             mat['kwh_por_tn'] = calc['kwh_generados']
             mat['m3_ch4_por_tn'] = calc['m3_ch4_por_tn']
-            print(f"DEBUG: {mat.get('nombre', 'N/A')} - kwh_por_tn: {calc['kwh_generados']}")
+            log_adan.detalle(lambda: f"DEBUG: {mat.get('nombre', 'N/A')} - kwh_por_tn: {calc['kwh_generados']}")
         except Exception as e:
-            print(f"DEBUG: Error calculando kwh_por_tn para {mat.get('nombre', 'N/A')}: {e}")
+            log_adan.detalle("DEBUG: Error calculando kwh_por_tn para %s: %s", mat.get('nombre', 'N/A'), e)
             mat['kwh_por_tn'] = 0
             mat['m3_ch4_por_tn'] = 0
     
@@ -748,10 +812,10 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
 
 def optimizar_con_xgboost(materiales, kwh_objetivo, porcentaje_ch4):
     """Optimiza materiales usando XGBoost"""
-    print(f"DEBUG: Iniciando optimización XGBoost con {len(materiales)} materiales")
+    log_adan.detalle(lambda: f"DEBUG: Iniciando optimización XGBoost con {len(materiales)} materiales")
     
     if not XGBOOST_DISPONIBLE or not predecir_kw_tn_xgboost:
-        print("DEBUG: XGBoost no disponible, usando materiales originales")
+        log_adan.detalle("DEBUG: XGBoost no disponible, usando materiales originales")
         return materiales
     
     # Preparar datos para XGBoost
@@ -769,7 +833,7 @@ def optimizar_con_xgboost(materiales, kwh_objetivo, porcentaje_ch4):
             }
             
             # Hacer predicción
-            print(f"DEBUG XGBoost: Procesando {material.get('nombre', 'N/A')} - Features: {features}")
+            log_adan.detalle(lambda: f"DEBUG XGBoost: Procesando {material.get('nombre', 'N/A')} - Features: {features}")
             prediccion, confianza = predecir_kw_tn_xgboost(
                 st=features['st_pct'],
                 sv=features['sv_pct'], 
@@ -779,7 +843,7 @@ def optimizar_con_xgboost(materiales, kwh_objetivo, porcentaje_ch4):
                 densidad=1.0,
                 m3_tnsv=300.0
             )
-            print(f"DEBUG XGBoost: Prediccion: {prediccion}, Confianza: {confianza}")
+            log_adan.detalle(lambda: f"DEBUG XGBoost: Prediccion: {prediccion}, Confianza: {confianza}")
             
             # Aplicar optimización basada en la predicción
             kwh_original = material.get('kwh_por_tn', 0)
@@ -787,13 +851,13 @@ def optimizar_con_xgboost(materiales, kwh_objetivo, porcentaje_ch4):
             material['confianza_xgboost'] = confianza
             material['score_ml'] = material.get('score_ml', 0) + (prediccion * confianza)
             
-            print(f"DEBUG XGBoost: {material.get('nombre', 'N/A')} - Original: {kwh_original:.2f}, Optimizado: {prediccion:.2f}, Diferencia: {prediccion - kwh_original:.2f}")
+            log_adan.detalle(lambda: f"DEBUG XGBoost: {material.get('nombre', 'N/A')} - Original: {kwh_original:.2f}, Optimizado: {prediccion:.2f}, Diferencia: {prediccion - kwh_original:.2f}")
             
         except Exception as e:
-            print(f"Error en optimización XGBoost para {material.get('nombre', 'desconocido')}: {e}")
+            log_adan.muestreado('adan_optimizacion_xgboost', logging.WARNING, "Error en optimización XGBoost para %s: %s", material.get('nombre', 'desconocido'), e)
             continue
     
-    print(f"DEBUG: XGBoost optimización completada para {len(materiales)} materiales")
+    log_adan.detalle(lambda: f"DEBUG: XGBoost optimización completada para {len(materiales)} materiales")
     return materiales
 
 def optimizar_con_redes_neuronales(materiales, kwh_objetivo, porcentaje_ch4):
@@ -823,7 +887,7 @@ def optimizar_con_redes_neuronales(materiales, kwh_objetivo, porcentaje_ch4):
                 material['score_ml'] = material.get('score_ml', 0) + (prediccion['prediccion_kwh'] * prediccion.get('confianza', 0.8))
             
         except Exception as e:
-            print(f"Error en optimización Redes Neuronales para {material.get('nombre', 'desconocido')}: {e}")
+            log_adan.muestreado('adan_optimizacion_redes_neuronales', logging.WARNING, "Error en optimización Redes Neuronales para %s: %s", material.get('nombre', 'desconocido'), e)
             continue
     
     return materiales
@@ -857,7 +921,7 @@ def optimizar_con_algoritmo_genetico(materiales, kwh_objetivo, porcentaje_ch4):
             material['score_ml'] = material.get('score_ml', 0) + fitness
             
         except Exception as e:
-            print(f"Error en optimización Algoritmo Genético para {material.get('nombre', 'desconocido')}: {e}")
+            log_adan.muestreado('adan_optimizacion_algoritmo_genetico', logging.WARNING, "Error en optimización Algoritmo Genético para %s: %s", material.get('nombre', 'desconocido'), e)
             continue
     
     return materiales
@@ -890,14 +954,14 @@ def optimizar_con_cain(materiales, kwh_objetivo, porcentaje_ch4):
             material['score_ml'] = material.get('score_ml', 0) + score_cain
             
         except Exception as e:
-            print(f"Error en optimización CAIN para {material.get('nombre', 'desconocido')}: {e}")
+            log_adan.muestreado('adan_optimizacion_cain', logging.WARNING, "Error en optimización CAIN para %s: %s", material.get('nombre', 'desconocido'), e)
             continue
     
     return materiales
 
 def optimizar_con_random_forest(materiales, kwh_objetivo, porcentaje_ch4):
     """Optimiza materiales usando Random Forest"""
-    print(f"DEBUG: Iniciando optimización Random Forest con {len(materiales)} materiales")
+    log_adan.detalle(lambda: f"DEBUG: Iniciando optimización Random Forest con {len(materiales)} materiales")
     
     for material in materiales:
         try:
@@ -925,7 +989,7 @@ def optimizar_con_random_forest(materiales, kwh_objetivo, porcentaje_ch4):
             # Aplicar optimización
             kwh_original = material.get('kwh_por_tn', 0)
             if kwh_original == 0:
-                print(f"DEBUG Random Forest: {material.get('nombre', 'N/A')} - No tiene kwh_por_tn, saltando")
+                log_adan.detalle(lambda: f"DEBUG Random Forest: {material.get('nombre', 'N/A')} - No tiene kwh_por_tn, saltando")
                 continue
                 
             kwh_optimizado = kwh_original * factor_optimizacion
@@ -933,18 +997,18 @@ def optimizar_con_random_forest(materiales, kwh_objetivo, porcentaje_ch4):
             material['confianza_random_forest'] = 0.88
             material['score_ml'] = material.get('score_ml', 0) + (factor_optimizacion * 0.88)
             
-            print(f"DEBUG Random Forest: {material.get('nombre', 'N/A')} - Original: {kwh_original:.2f}, Optimizado: {kwh_optimizado:.2f}, Diferencia: {kwh_optimizado - kwh_original:.2f}")
+            log_adan.detalle(lambda: f"DEBUG Random Forest: {material.get('nombre', 'N/A')} - Original: {kwh_original:.2f}, Optimizado: {kwh_optimizado:.2f}, Diferencia: {kwh_optimizado - kwh_original:.2f}")
             
         except Exception as e:
-            print(f"Error en optimización Random Forest para {material.get('nombre', 'desconocido')}: {e}")
+            log_adan.muestreado('adan_optimizacion_random_forest', logging.WARNING, "Error en optimización Random Forest para %s: %s", material.get('nombre', 'desconocido'), e)
             continue
     
-    print(f"DEBUG: Random Forest optimización completada para {len(materiales)} materiales")
+    log_adan.detalle(lambda: f"DEBUG: Random Forest optimización completada para {len(materiales)} materiales")
     return materiales
 
 def optimizar_con_bayesiana(materiales, kwh_objetivo, porcentaje_ch4):
     """Optimiza materiales usando Optimización Bayesiana"""
-    print(f"DEBUG: Iniciando optimización Bayesiana con {len(materiales)} materiales")
+    log_adan.detalle(lambda: f"DEBUG: Iniciando optimización Bayesiana con {len(materiales)} materiales")
     
     for material in materiales:
         try:
@@ -983,7 +1047,7 @@ def optimizar_con_bayesiana(materiales, kwh_objetivo, porcentaje_ch4):
             # Aplicar optimización
             kwh_original = material.get('kwh_por_tn', 0)
             if kwh_original == 0:
-                print(f"DEBUG Bayesiana: {material.get('nombre', 'N/A')} - No tiene kwh_por_tn, saltando")
+                log_adan.detalle(lambda: f"DEBUG Bayesiana: {material.get('nombre', 'N/A')} - No tiene kwh_por_tn, saltando")
                 continue
                 
             kwh_optimizado = kwh_original * factor_optimizacion
@@ -991,13 +1055,13 @@ def optimizar_con_bayesiana(materiales, kwh_objetivo, porcentaje_ch4):
             material['confianza_bayesiana'] = 0.91
             material['score_ml'] = material.get('score_ml', 0) + (factor_optimizacion * 0.91)
             
-            print(f"DEBUG Bayesiana: {material.get('nombre', 'N/A')} - Original: {kwh_original:.2f}, Optimizado: {kwh_optimizado:.2f}, Diferencia: {kwh_optimizado - kwh_original:.2f}")
+            log_adan.detalle(lambda: f"DEBUG Bayesiana: {material.get('nombre', 'N/A')} - Original: {kwh_original:.2f}, Optimizado: {kwh_optimizado:.2f}, Diferencia: {kwh_optimizado - kwh_original:.2f}")
             
         except Exception as e:
-            print(f"Error en optimización Bayesiana para {material.get('nombre', 'desconocido')}: {e}")
+            log_adan.muestreado('adan_optimizacion_bayesiana', logging.WARNING, "Error en optimización Bayesiana para %s: %s", material.get('nombre', 'desconocido'), e)
             continue
     
-    print(f"DEBUG: Optimización Bayesiana completada para {len(materiales)} materiales")
+    log_adan.detalle(lambda: f"DEBUG: Optimización Bayesiana completada para {len(materiales)} materiales")
     return materiales
 
 def optimizar_con_fallback(materiales, modelo_id, kwh_objetivo, porcentaje_ch4):
@@ -1011,7 +1075,7 @@ def optimizar_con_fallback(materiales, modelo_id, kwh_objetivo, porcentaje_ch4):
             material['score_ml'] = material.get('score_ml', 0) + (material.get('kwh_por_tn', 0) * factor_optimizacion)
             
         except Exception as e:
-            print(f"Error en optimización fallback para {material.get('nombre', 'desconocido')}: {e}")
+            log_adan.muestreado('adan_optimizacion_fallback', logging.WARNING, "Error en optimización fallback para %s: %s", material.get('nombre', 'desconocido'), e)
             continue
     
     return materiales
@@ -1032,6 +1096,14 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
     Modo volumétrico: Proporciones físicas balanceadas
     """
     
+    # Coeficientes de generación por material, una sola pasada vectorizada
+    modelo_generacion = ModeloGeneracion.desde_materiales(
+        materiales_disponibles, consumo_motor, potencia_motor, porcentaje_ch4, MOTOR_CONFIG)
+
+    def generacion(mat):
+        return modelo_generacion.calculo(mat['nombre']) or calcular_generacion_electrica(
+            mat['m3_biogas_por_tn'], consumo_motor, potencia_motor, porcentaje_ch4)
+
     # 1. Calcular toneladas de purín disponible
     purin_materiales = [m for m in materiales_disponibles if m['tipo'] == 'purin']
     tn_purin = 0
@@ -1044,12 +1116,7 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
         mat_purin = purin_materiales[0]
         tn_purin = calcular_toneladas_purin(m3_purin, mat_purin['densidad'])
         
-        calc_purin = calcular_generacion_electrica(
-            mat_purin['m3_biogas_por_tn'],
-            consumo_motor,
-            potencia_motor,
-            porcentaje_ch4
-        )
+        calc_purin = generacion(mat_purin)
         
         kwh_purin = tn_purin * calc_purin['kwh_generados']
         m3_biogas_purin = tn_purin * mat_purin['m3_biogas_por_tn']
@@ -1066,21 +1133,16 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
     liquidos = [m for m in materiales_disponibles if m['tipo'] == 'liquido' and m['stock_disponible'] > 0]
     
     # 4. Calcular kWh por tonelada para cada material
-    print(f"DEBUG: Calculando kwh_por_tn para {len(solidos + liquidos)} materiales")
+    log_adan.detalle(lambda: f"DEBUG: Calculando kwh_por_tn para {len(solidos + liquidos)} materiales")
     for i, mat in enumerate(solidos + liquidos):
         try:
-            print(f"DEBUG: Material {i+1}: {mat.get('nombre', 'N/A')}")
-            calc = calcular_generacion_electrica(
-                mat['m3_biogas_por_tn'],
-                consumo_motor,
-                potencia_motor,
-                porcentaje_ch4
-            )
+            log_adan.detalle(lambda: f"DEBUG: Material {i+1}: {mat.get('nombre', 'N/A')}")
+            calc = generacion(mat)
             mat['kwh_por_tn'] = calc['kwh_generados']
             mat['m3_ch4_por_tn'] = calc['m3_ch4_por_tn']
-            print(f"DEBUG: {mat.get('nombre', 'N/A')} - kwh_por_tn: {calc['kwh_generados']}")
+            log_adan.detalle(lambda: f"DEBUG: {mat.get('nombre', 'N/A')} - kwh_por_tn: {calc['kwh_generados']}")
         except Exception as e:
-            print(f"DEBUG: Error calculando kwh_por_tn para {mat.get('nombre', 'N/A')}: {e}")
+            log_adan.detalle("DEBUG: Error calculando kwh_por_tn para %s: %s", mat.get('nombre', 'N/A'), e)
             mat['kwh_por_tn'] = 0
             mat['m3_ch4_por_tn'] = 0
     
@@ -1089,8 +1151,9 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
     liquidos.sort(key=calcular_score_material, reverse=True)
     
     # 6. Aplicar modelos ML para optimización de selección de materiales
+    ejecucion_modelos = {}
     materiales_optimizados = aplicar_modelos_ml_optimizacion(
-        materiales_disponibles, kwh_objetivo, porcentaje_ch4, modelos_seleccionados
+        materiales_disponibles, kwh_objetivo, porcentaje_ch4, modelos_seleccionados, reporte=ejecucion_modelos
     )
     
     # 7. Seleccionar materiales según el número solicitado y modo (usando optimización ML)
@@ -1101,7 +1164,7 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
         # USAR MATERIALES OPTIMIZADOS POR ML
         todos_materiales = materiales_optimizados
         todos_materiales.sort(key=lambda x: x.get('score_ml', 0), reverse=True)
-        print(f"DEBUG: MODO ENERGETICO - Usando {len(todos_materiales)} materiales optimizados por ML")
+        log_adan.detalle(lambda: f"DEBUG: MODO ENERGETICO - Usando {len(todos_materiales)} materiales optimizados por ML")
         
         # Tomar los N mejores materiales
         materiales_seleccionados = todos_materiales[:num_materiales]
@@ -1112,9 +1175,9 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
         
         for i, mat in enumerate(materiales_seleccionados):
             # USAR VALOR OPTIMIZADO POR ML si está disponible
-            print(f"DEBUG: Material {i+1}: {mat.get('nombre', 'N/A')} - Claves disponibles: {list(mat.keys())}")
+            log_adan.detalle(lambda: f"DEBUG: Material {i+1}: {mat.get('nombre', 'N/A')} - Claves disponibles: {list(mat.keys())}")
             if 'kwh_por_tn' not in mat:
-                print(f"ERROR: Material {mat.get('nombre', 'N/A')} no tiene kwh_por_tn")
+                log_adan.muestreado('adan_sin_kwh_por_tn', logging.WARNING, lambda: f"ERROR: Material {mat.get('nombre', 'N/A')} no tiene kwh_por_tn")
                 continue
             kwh_por_tn_usar = mat.get('kwh_por_tn_optimizado', mat['kwh_por_tn'])
             
@@ -1129,12 +1192,7 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
             if toneladas_usar > 0.01:
                 kwh_generado = toneladas_usar * kwh_por_tn_usar
                 # Calcular datos de potencia calorífica para este material
-                calc_material = calcular_generacion_electrica(
-                    mat['m3_biogas_por_tn'],
-                    consumo_motor,
-                    potencia_motor,
-                    porcentaje_ch4
-                )
+                calc_material = generacion(mat)
                 
                 receta.append({
                     'material': mat['nombre'],
@@ -1170,8 +1228,8 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
             pct_liquidos_normalizado = (pct_liquidos_kw / total_porcentaje) * 100
             pct_purin_normalizado = (pct_purin_kw / total_porcentaje) * 100
             
-            print(f"DEBUG: Porcentajes originales - Sólidos: {pct_solidos_kw}%, Líquidos: {pct_liquidos_kw}%, Purín: {pct_purin_kw}% (Total: {total_porcentaje}%)")
-            print(f"DEBUG: Porcentajes normalizados - Sólidos: {pct_solidos_normalizado:.1f}%, Líquidos: {pct_liquidos_normalizado:.1f}%, Purín: {pct_purin_normalizado:.1f}% (Total: 100%)")
+            log_adan.detalle(lambda: f"DEBUG: Porcentajes originales - Sólidos: {pct_solidos_kw}%, Líquidos: {pct_liquidos_kw}%, Purín: {pct_purin_kw}% (Total: {total_porcentaje}%)")
+            log_adan.detalle(lambda: f"DEBUG: Porcentajes normalizados - Sólidos: {pct_solidos_normalizado:.1f}%, Líquidos: {pct_liquidos_normalizado:.1f}%, Purín: {pct_purin_normalizado:.1f}% (Total: 100%)")
         else:
             # Valores por defecto si no se proporcionan porcentajes
             pct_solidos_normalizado = 60.0
@@ -1179,8 +1237,8 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
             pct_purin_normalizado = 10.0
             
         # ALGORITMO VOLUMÉTRICO CORREGIDO: Distribuir toneladas según porcentajes especificados
-        print(f"DEBUG VOLUMETRICO: Objetivo total: {kwh_objetivo} kW")
-        print(f"DEBUG VOLUMETRICO: Porcentajes - Sólidos: {pct_solidos_normalizado}%, Líquidos: {pct_liquidos_normalizado}%, Purín: {pct_purin_normalizado}%")
+        log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: Objetivo total: {kwh_objetivo} kW")
+        log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: Porcentajes - Sólidos: {pct_solidos_normalizado}%, Líquidos: {pct_liquidos_normalizado}%, Purín: {pct_purin_normalizado}%")
         
         # USAR MATERIALES OPTIMIZADOS POR ML - Separar por tipo
         solidos_optimizados = [m for m in materiales_optimizados if m['tipo'] == 'solido' and m['stock_disponible'] > 0]
@@ -1190,7 +1248,7 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
         solidos_optimizados.sort(key=lambda x: x.get('score_ml', 0), reverse=True)
         liquidos_optimizados.sort(key=lambda x: x.get('score_ml', 0), reverse=True)
         
-        print(f"DEBUG: MODO VOLUMETRICO - Usando materiales optimizados: {len(solidos_optimizados)} solidos, {len(liquidos_optimizados)} liquidos")
+        log_adan.detalle(lambda: f"DEBUG: MODO VOLUMETRICO - Usando materiales optimizados: {len(solidos_optimizados)} solidos, {len(liquidos_optimizados)} liquidos")
         
         # PASO 1: Calcular kWh promedio por tonelada para estimar toneladas totales necesarias
         kwh_promedio_solidos = sum(m.get('kwh_por_tn_optimizado', m['kwh_por_tn']) for m in solidos_optimizados[:3]) / min(3, len(solidos_optimizados)) if solidos_optimizados else 0
@@ -1212,8 +1270,8 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
         tn_liquidos_objetivo = toneladas_totales_estimadas * (pct_liquidos_normalizado / 100)
         tn_purin_objetivo = toneladas_totales_estimadas * (pct_purin_normalizado / 100)
         
-        print(f"DEBUG VOLUMETRICO: Toneladas estimadas totales: {toneladas_totales_estimadas:.2f} Tn")
-        print(f"DEBUG VOLUMETRICO: Distribución objetivo - Sólidos: {tn_solidos_objetivo:.2f} Tn, Líquidos: {tn_liquidos_objetivo:.2f} Tn, Purín: {tn_purin_objetivo:.2f} Tn")
+        log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: Toneladas estimadas totales: {toneladas_totales_estimadas:.2f} Tn")
+        log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: Distribución objetivo - Sólidos: {tn_solidos_objetivo:.2f} Tn, Líquidos: {tn_liquidos_objetivo:.2f} Tn, Purín: {tn_purin_objetivo:.2f} Tn")
         
         # PASO 4: Procesar sólidos - distribuir toneladas según porcentaje objetivo
         tn_acumulado_solidos = 0
@@ -1249,12 +1307,7 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
                 kwh_generado = toneladas_usar * kwh_por_tn_usar
                 
                 # Calcular datos de potencia calorífica para este material
-                calc_material = calcular_generacion_electrica(
-                    mat['m3_biogas_por_tn'],
-                    consumo_motor,
-                    potencia_motor,
-                    porcentaje_ch4
-                )
+                calc_material = generacion(mat)
                 
                 receta.append({
                     'material': mat['nombre'],
@@ -1277,7 +1330,7 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
                     'densidad': mat['densidad']
                 })
                 tn_acumulado_solidos += toneladas_usar
-                print(f"DEBUG VOLUMETRICO: {mat['nombre']}: {toneladas_usar:.2f} Tn = {kwh_generado:.2f} kW (Acumulado sólidos: {tn_acumulado_solidos:.2f} Tn)")
+                log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: {mat['nombre']}: {toneladas_usar:.2f} Tn = {kwh_generado:.2f} kW (Acumulado sólidos: {tn_acumulado_solidos:.2f} Tn)")
         
         # PASO 5: Procesar líquidos - distribuir toneladas según porcentaje objetivo
         tn_acumulado_liquidos = 0
@@ -1313,12 +1366,7 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
                 kwh_generado = toneladas_usar * kwh_por_tn_usar
                 
                 # Calcular datos de potencia calorífica para este material
-                calc_material = calcular_generacion_electrica(
-                    mat['m3_biogas_por_tn'],
-                    consumo_motor,
-                    potencia_motor,
-                    porcentaje_ch4
-                )
+                calc_material = generacion(mat)
                 
                 receta.append({
                     'material': mat['nombre'],
@@ -1341,7 +1389,7 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
                     'densidad': mat['densidad']
                 })
                 tn_acumulado_liquidos += toneladas_usar
-                print(f"DEBUG VOLUMETRICO: {mat['nombre']}: {toneladas_usar:.2f} Tn = {kwh_generado:.2f} kW (Acumulado líquidos: {tn_acumulado_liquidos:.2f} Tn)")
+                log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: {mat['nombre']}: {toneladas_usar:.2f} Tn = {kwh_generado:.2f} kW (Acumulado líquidos: {tn_acumulado_liquidos:.2f} Tn)")
     
     # PASO 6: Agregar purín a la receta si se usa (modo volumétrico usa porcentaje objetivo)
     if incluir_purin and tn_purin > 0:
@@ -1351,18 +1399,13 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
         if modo == 'volumetrico':
             # Ajustar la cantidad de purín para que respete el porcentaje objetivo
             tn_purin_ajustado = min(tn_purin_objetivo, tn_purin, mat_purin['stock_disponible'])
-            print(f"DEBUG VOLUMETRICO: Purín objetivo: {tn_purin_objetivo:.2f} Tn, Disponible: {tn_purin:.2f} Tn, Usando: {tn_purin_ajustado:.2f} Tn")
+            log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: Purín objetivo: {tn_purin_objetivo:.2f} Tn, Disponible: {tn_purin:.2f} Tn, Usando: {tn_purin_ajustado:.2f} Tn")
         else:
             # En modo energético, usar toda la cantidad disponible
             tn_purin_ajustado = tn_purin
         
         if tn_purin_ajustado > 0.01:
-            calc_purin_ajustado = calcular_generacion_electrica(
-                mat_purin['m3_biogas_por_tn'],
-                consumo_motor,
-                potencia_motor,
-                porcentaje_ch4
-            )
+            calc_purin_ajustado = generacion(mat_purin)
             
             kwh_purin_ajustado = tn_purin_ajustado * calc_purin_ajustado['kwh_generados']
             m3_biogas_purin_ajustado = tn_purin_ajustado * mat_purin['m3_biogas_por_tn']
@@ -1395,20 +1438,20 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
             m3_ch4_purin = m3_ch4_purin_ajustado
             tn_purin = tn_purin_ajustado
             
-            print(f"DEBUG VOLUMETRICO: Purín agregado: {tn_purin_ajustado:.2f} Tn = {kwh_purin_ajustado:.2f} kW")
+            log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: Purín agregado: {tn_purin_ajustado:.2f} Tn = {kwh_purin_ajustado:.2f} kW")
     
     # PASO 7: Ajuste fino para alcanzar mejor el objetivo de kWh (solo en modo volumétrico)
     if modo == 'volumetrico' and len(receta) > 0:
         total_kwh_actual = sum(r['kwh_total'] for r in receta)
         diferencia_kwh = kwh_objetivo - total_kwh_actual
         
-        print(f"DEBUG VOLUMETRICO: Total kWh actual: {total_kwh_actual:.2f}, Objetivo: {kwh_objetivo:.2f}, Diferencia: {diferencia_kwh:.2f}")
+        log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: Total kWh actual: {total_kwh_actual:.2f}, Objetivo: {kwh_objetivo:.2f}, Diferencia: {diferencia_kwh:.2f}")
         
         # Si hay una diferencia significativa (>5%), ajustar proporcionalmente
         if abs(diferencia_kwh) > kwh_objetivo * 0.05:  # Más del 5% de diferencia
             factor_ajuste = kwh_objetivo / total_kwh_actual if total_kwh_actual > 0 else 1
             
-            print(f"DEBUG VOLUMETRICO: Aplicando factor de ajuste: {factor_ajuste:.3f}")
+            log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: Aplicando factor de ajuste: {factor_ajuste:.3f}")
             
             # Ajustar todas las cantidades proporcionalmente
             for r in receta:
@@ -1421,15 +1464,17 @@ def generar_receta_con_purin(kwh_objetivo, porcentaje_ch4, m3_purin,
                     r['kwh_total'] = round(tn_ajustada * r['kwh_por_tn'], 2)
                     r['m3_biogas'] = round(tn_ajustada * r['m3_biogas'] / tn_original, 2) if tn_original > 0 else 0
                     r['m3_ch4'] = round(tn_ajustada * r['m3_ch4'] / tn_original, 2) if tn_original > 0 else 0
-                    print(f"DEBUG VOLUMETRICO: {r['material']}: {tn_original:.2f} → {tn_ajustada:.2f} Tn")
+                    log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: {r['material']}: {tn_original:.2f} → {tn_ajustada:.2f} Tn")
                 else:
-                    print(f"DEBUG VOLUMETRICO: {r['material']}: No se puede ajustar (stock insuficiente)")
+                    log_adan.detalle(lambda: f"DEBUG VOLUMETRICO: {r['material']}: No se puede ajustar (stock insuficiente)")
     
     # PASO 8: Construir resumen final
-    print(f"DEBUG: Construyendo resumen con {len(receta)} materiales en receta")
+    log_adan.detalle(lambda: f"DEBUG: Construyendo resumen con {len(receta)} materiales en receta")
     resultado = construir_resumen(receta, kwh_objetivo, porcentaje_ch4, consumo_motor, 
                             potencia_motor, modo, m3_purin, incluir_purin, modelos_seleccionados)
-    print(f"DEBUG: Resumen construido: {type(resultado)}")
+    if ejecucion_modelos:
+        resultado['ejecucion_modelos'] = ejecucion_modelos
+    log_adan.detalle(lambda: f"DEBUG: Resumen construido: {type(resultado)}")
     return resultado
 
 def construir_resumen(receta, kwh_objetivo, porcentaje_ch4, consumo_motor, 
@@ -1460,7 +1505,7 @@ def construir_resumen(receta, kwh_objetivo, porcentaje_ch4, consumo_motor,
     porcentaje_ch4_real = round((total_ch4 / total_biogas) * 100, 1) if total_biogas > 0 else 0
     
     # Debug adicional para verificar cálculos de metano
-    print(f"DEBUG METANO: Total biogás: {total_biogas:.2f} m³, Total CH4: {total_ch4:.2f} m³, Porcentaje CH4: {porcentaje_ch4_real:.1f}%")
+    log_adan.detalle(lambda: f"DEBUG METANO: Total biogás: {total_biogas:.2f} m³, Total CH4: {total_ch4:.2f} m³, Porcentaje CH4: {porcentaje_ch4_real:.1f}%")
     
     # Obtener métricas ML
     metricas_ml = obtener_metricas_ml(receta, kwh_objetivo, porcentaje_ch4)
@@ -1487,6 +1532,8 @@ def construir_resumen(receta, kwh_objetivo, porcentaje_ch4, consumo_motor,
             'horas_operacion': round(horas_operacion, 2),
             'dias_operacion': round(horas_operacion / 24, 2),
             'potencia_motor': potencia_motor,
+            'kw_medio': round(total_kwh / horas_operacion, 2),
+            'carga_motor_pct': round(total_kwh / horas_operacion / potencia_motor * 100, 1) if potencia_motor > 0 else 0,
             'porcentaje_ch4': porcentaje_ch4,
             'm3_purin': m3_purin,
             'incluir_purin': incluir_purin,
@@ -1533,6 +1580,11 @@ def modelos_disponibles():
         'modelos_activos': [k for k, v in MODELOS_DISPONIBLES.items() if v['disponible']]
     })
 
+@adan_bp.route('/modelos/ejecucion')
+def modelos_ejecucion():
+    """Endpoint con contadores del ejecutor concurrente de modelos (caché, timeouts, errores)"""
+    return jsonify({'status': 'success', **ejecutor_modelos_adan.estadisticas()})
+
 @adan_bp.route('/obtener_generacion_actual', methods=['GET'])
 def obtener_generacion_actual():
     """Obtiene el valor de generación actual del dashboard"""
@@ -1601,28 +1653,42 @@ def calcular_mezcla():
                 # Usar la potencia nominal del motor (1545 kW) en lugar de la generación actual
                 potencia_motor_actual = MOTOR_CONFIG['potencia_kw']  # 1545 kW - potencia nominal del Jenbacher J420
                 potencia = potencia_motor_actual
-                print(f"DEBUG: Usando potencia nominal del motor Jenbacher J420: {potencia} kW")
+                log_adan.detalle(lambda: f"DEBUG: Usando potencia nominal del motor Jenbacher J420: {potencia} kW")
             except Exception as e:
-                print(f"DEBUG: Error obteniendo configuración del motor: {e}")
-                print(f"DEBUG: Usando potencia motor por defecto: {potencia} kW")
+                log_adan.detalle("DEBUG: Error obteniendo configuración del motor: %s", e)
+                log_adan.detalle(lambda: f"DEBUG: Usando potencia motor por defecto: {potencia} kW")
         
-        print(f"DEBUG: Parámetros finales - consumo: {consumo}, potencia: {potencia}")
+        log_adan.detalle(lambda: f"DEBUG: Parámetros finales - consumo: {consumo}, potencia: {potencia}")
         
         modelos_seleccionados = data.get('modelos_seleccionados', ['xgboost'])  # Default a XGBoost
-        print(f"DEBUG: Modelos seleccionados: {modelos_seleccionados}")
+        log_adan.detalle(lambda: f"DEBUG: Modelos seleccionados: {modelos_seleccionados}")
         
-        materiales = cargar_materiales_excel()
-        print(f"DEBUG: Materiales cargados: {len(materiales)}")
-        
-        resultado = generar_receta_con_purin(
-            kwh_objetivo, porcentaje_ch4, m3_purin, materiales,
-            consumo, potencia, modo, pct_solidos_kw, pct_liquidos_kw,
-            pct_purin_kw, incluir_purin, num_materiales, modelos_seleccionados
-        )
+        nucleo = current_app.extensions.get('nucleo_mezcla')
+        if nucleo is not None and f'adan_{modo}' in nucleo.estrategias():
+            # Catálogo y stock desde el núcleo de mezcla de la aplicación (preprocesado compartido)
+            entrada = nucleo.preparar({'kw_objetivo': kwh_objetivo}, incluir_purin=bool(incluir_purin))
+            entrada.parametros.update({
+                'porcentaje_ch4': porcentaje_ch4, 'm3_purin': m3_purin, 'consumo_motor': consumo,
+                'potencia_motor': potencia, 'pct_solidos_kw': pct_solidos_kw, 'pct_liquidos_kw': pct_liquidos_kw,
+                'pct_purin_kw': pct_purin_kw, 'num_materiales': num_materiales,
+                'modelos_seleccionados': modelos_seleccionados,
+            })
+            resultado = nucleo.resolver(entrada, f'adan_{modo}')
+        else:
+            materiales = cargar_materiales_excel()
+            log_adan.detalle(lambda: f"DEBUG: Materiales cargados: {len(materiales)}")
+            
+            with traza(f"adan:{modo}") as t:
+                resultado = generar_receta_con_purin(
+                    kwh_objetivo, porcentaje_ch4, m3_purin, materiales,
+                    consumo, potencia, modo, pct_solidos_kw, pct_liquidos_kw,
+                    pct_purin_kw, incluir_purin, num_materiales, modelos_seleccionados
+                )
+                t.anotar(kw_objetivo=kwh_objetivo, materiales=len(materiales))
         
-        print(f"DEBUG: Resultado generado: {type(resultado)}")
+        log_adan.detalle(lambda: f"DEBUG: Resultado generado: {type(resultado)}")
         if isinstance(resultado, dict):
-            print(f"DEBUG: Claves del resultado: {list(resultado.keys())}")
+            log_adan.detalle(lambda: f"DEBUG: Claves del resultado: {list(resultado.keys())}")
         
         # 🔊 Mensaje de voz: Cálculo exitoso MEJORADO
         if VOICE_ADAN_DISPONIBLE and VOICE_ADAN_MEJORADO:
@@ -1702,8 +1768,34 @@ def ayuda():
     """Página de ayuda de Adán"""
     return render_template('adan_help.html')
 
+class EstrategiaAdan(EstrategiaMezcla):
+    """Receta de Adán (modo energético o volumétrico) como estrategia del núcleo de mezcla"""
+
+    formato = 'adan'
+
+    def __init__(self, modo):
+        self.modo = modo
+        self.nombre = f'adan_{modo}'
+
+    def calcular(self, entrada):
+        p = entrada.parametros
+        materiales = construir_materiales_receta(entrada.materiales_base, entrada.stock, stock_default=0.0)
+        return generar_receta_con_purin(
+            entrada.kw_objetivo, p['porcentaje_ch4'], p['m3_purin'], materiales,
+            p['consumo_motor'], p['potencia_motor'], self.modo, p['pct_solidos_kw'], p['pct_liquidos_kw'],
+            p['pct_purin_kw'], entrada.incluir_purin, p['num_materiales'], p['modelos_seleccionados']
+        )
+
 # Función para registrar el Blueprint en la aplicación principal
-def registrar_adan(app):
-    """Registra el Blueprint de Adán en la aplicación Flask"""
+def registrar_adan(app, nucleo=None):
+    """
+    Registra el Blueprint de Adán en la aplicación Flask. Si se pasa el núcleo
+    de mezcla de la aplicación, registra las recetas de Adán como estrategias
+    y /adan/calcular_mezcla usa su entrada preprocesada (catálogo y stock).
+    """
     app.register_blueprint(adan_bp)
+    if nucleo is not None:
+        nucleo.registrar(EstrategiaAdan('energetico'))
+        nucleo.registrar(EstrategiaAdan('volumetrico'))
+        app.extensions['nucleo_mezcla'] = nucleo
     print("SUCCESS: Sistema Adan registrado correctamente")
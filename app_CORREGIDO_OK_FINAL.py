@@ -326,6 +326,30 @@ else:
 # ----- Tus importaciones normales comienzan aquí -----
 import temp_functions
 # from sistema_evolutivo_genetico import SistemaEvolutivoGenetico
+from historico_diario_store import HistoricoDiarioStore
+from stock_ledger import StockLedger
+from mantenimiento_db import MantenimientoDB
+from importador_registros import leer_lote, validar_lote, construir_registros, movimientos_de_registros
+from retencion_historicos import GestorRetencion, INTERVALO_COMPACTACION_HORAS_DEFAULT
+from optimizador_genetico import optimizar_mezcla_genetica
+from optimizador_bayesiano import optimizar_mezcla_bayesiana
+from optimizador_pareto import optimizar_frente_pareto, seleccionar_del_frente
+from matriz_materiales import MatrizMateriales, obtener_matriz
+from tabla_energia import TablaEnergia
+from registro_modelos import obtener_registro_modelos
+from escalador_volumetrico import escalar_resultado
+from cache_mezclas import CacheMezclas, huella_mezcla
+from escenarios_mezcla import evaluar_escenarios
+from sensibilidad_mezcla import GRUPOS_MEZCLA, analizar_sensibilidad, cantidades_de_resultado
+from incertidumbre_mezcla import MUESTRAS_DEFAULT as MUESTRAS_INCERTIDUMBRE_DEFAULT, bandas_mezcla
+from planificador_semanal import PlanificadorSemanal
+from resolucion_incremental import ResolutorIncremental
+from nucleo_mezcla import EstrategiaEntrada, EstrategiaFuncion, NucleoMezcla
+from recomendador_materiales import RecomendadorMateriales
+from registro_calculo import (
+    PREFIJO as PREFIJO_REGISTRO_CALCULO, NivelesCompartidos, configurar_desde_entorno, niveles_actuales,
+    obtener_registro, traza,
+)
 from utils import (
     cargar_json_seguro,
     guardar_json_seguro,
@@ -336,6 +360,18 @@ from utils import (
     validar_y_convertir_stock
 )
 
+# Registro del camino caliente de cálculo: detalle por material/iteración en DEBUG
+# (perezoso), un resumen por cálculo en INFO; niveles por módulo en caliente
+logger_calculo = logging.getLogger(PREFIJO_REGISTRO_CALCULO)
+logger_calculo.setLevel(logging.INFO)
+logger_calculo.addHandler(handler)
+handler.setLevel(logging.DEBUG)  # el nivel lo deciden los loggers, no el archivo
+configurar_desde_entorno()
+# Los niveles cambiados por /api/logging/niveles se guardan en disco y cada worker los re-lee
+niveles_logging = NivelesCompartidos(os.path.join(SCRIPT_DIR, 'niveles_logging.json'))
+niveles_logging.sincronizar()
+log_mezcla = obtener_registro('mezcla')
+
 # Configuración de asistentes - SOLO SIBIA ACTIVO
 logger.info("✅ Solo usando SIBIA (asistente experto eliminado)")
 
@@ -661,21 +697,125 @@ REAL_DATA_FILE = os.path.join(SCRIPT_DIR, 'datos_reales_dia.json')
 CONFIG_BASE_MATERIALES_FILE = os.path.join(SCRIPT_DIR, 'materiales_base_config.json')
 PARAMETROS_QUIMICOS_FILE = os.path.join(SCRIPT_DIR, 'parametros_quimicos.json')
 HISTORICO_DIARIO_FILE = os.path.join(SCRIPT_DIR, 'historico_diario_productivo.json')
+HISTORIAL_BAYESIANO_FILE = os.path.join(SCRIPT_DIR, 'historial_bayesiano.json')
+
+# Histórico diario indexado por fecha (upsert y rangos con búsqueda binaria)
+historico_diario_store = HistoricoDiarioStore(HISTORICO_DIARIO_FILE)
+
+# Libro de movimientos de stock: stock.json es la vista materializada del libro
+stock_ledger = StockLedger(STOCK_FILE)
+
+# Base SQLite del módulo de mantenimiento (esquema migrado una sola vez, WAL)
+mantenimiento_db = MantenimientoDB(os.path.join(SCRIPT_DIR, 'database.db'))
+
+# Caché LRU de mezclas calculadas (modo determinístico, clave = huella de entradas)
+cache_mezclas = CacheMezclas()
+
+# Planificador semanal con horizonte rodante (guarda el último plan para re-planificar incrementalmente).
+# El plan se comparte en disco entre los workers; la vista usa la relajación LP redondeada
+# y el MILP exacto corre en segundo plano.
+planificador_alimentacion = PlanificadorSemanal(archivo=os.path.join(SCRIPT_DIR, 'plan_semanal_cache.json'))
+
+# Mezcla LP con arranque en caliente: última base por estado de planta para ajustes chicos (sliders)
+resolutor_lp_incremental = ResolutorIncremental()
+
+# Núcleo único de la mezcla: entrada preprocesada compartida + estrategias (ver nucleo_mezcla.py).
+# Las funciones se resuelven al llamar, así que pueden estar definidas más abajo.
+nucleo_mezcla = NucleoMezcla(
+    cargar_config=lambda: cargar_configuracion(),
+    cargar_stock=lambda: stock_ledger.stock_actual().get('materiales', {}),
+    cargar_catalogo=lambda: cargar_materiales_base_cacheado(),
+    obtener_matriz=lambda: obtener_matriz_materiales(),
+    version_stock=lambda: (stock_ledger.secuencia, os.path.getmtime(STOCK_FILE) if os.path.exists(STOCK_FILE) else None),
+)
+for _nombre, _funcion in (
+    ('energetico', lambda c, s: calcular_mezcla_diaria(c, s)),
+    ('algoritmo_genetico', lambda c, s: calcular_mezcla_algoritmo_genetico(c, s)),
+    ('programacion_lineal', lambda c, s: calcular_mezcla_programacion_lineal(c, s)),
+    ('redes_neuronales', lambda c, s: calcular_mezcla_redes_neuronales(c, s)),
+    ('optimizacion_bayesiana', lambda c, s: calcular_mezcla_optimizacion_bayesiana(c, s)),
+):
+    nucleo_mezcla.registrar(EstrategiaFuncion(_nombre, _funcion))
+nucleo_mezcla.registrar(EstrategiaEntrada('volumetrico', lambda e: calcular_mezcla_volumetrica_simple(
+    e.config, e.stock, float(e.config.get('porcentaje_solidos', 40)) / 100,
+    float(e.config.get('porcentaje_liquidos', 40)) / 100, float(e.config.get('porcentaje_purin', 20)) / 100,
+    e.incluir_purin), volumetrica=True))
+
+# Ranking top-k de materiales para /recomendaciones_materiales (caché por versión de stock y catálogo)
+recomendador_materiales = RecomendadorMateriales()
+
+# Retención de históricos JSON: días recientes en caliente, el resto en segmentos mensuales .jsonl.gz
+gestor_retencion = GestorRetencion(SCRIPT_DIR)
 
 # Cache ligero para materiales base, para evitar IO repetido en calculadora energética
 _CACHE_MATERIALES_BASE = None
+_CACHE_MATERIALES_BASE_MTIME = None
 
 def cargar_materiales_base_cacheado():
-    global _CACHE_MATERIALES_BASE
-    if _CACHE_MATERIALES_BASE is None:
+    global _CACHE_MATERIALES_BASE, _CACHE_MATERIALES_BASE_MTIME
+    try:
+        mtime = os.path.getmtime(CONFIG_BASE_MATERIALES_FILE)
+    except OSError:
+        mtime = None
+    # Recargar si el archivo cambió (edición desde la UI de materiales base)
+    if _CACHE_MATERIALES_BASE is None or mtime != _CACHE_MATERIALES_BASE_MTIME:
         try:
             with open(CONFIG_BASE_MATERIALES_FILE, 'r', encoding='utf-8') as f:
                 _CACHE_MATERIALES_BASE = json.load(f)
         except Exception as e:
             logger.error(f"Error cargando materiales base cacheados: {e}")
             _CACHE_MATERIALES_BASE = {}
+        _CACHE_MATERIALES_BASE_MTIME = mtime
     return _CACHE_MATERIALES_BASE
 
+def obtener_matriz_materiales():
+    """Matriz NumPy de propiedades de materiales para la versión vigente del catálogo."""
+    materiales_base = cargar_materiales_base_cacheado()
+    return obtener_matriz(materiales_base, version=f"{_CACHE_MATERIALES_BASE_MTIME}")
+
+def _mtime_ns(ruta: str):
+    try:
+        return os.stat(ruta).st_mtime_ns
+    except OSError:
+        return None
+
+# Tabla kW/tn por material: se recalcula sólo si cambia el catálogo, el ST de los
+# camiones registrados o el consumo del motor. Su `version` sirve como clave de caché.
+tabla_energia = TablaEnergia({
+    'catalogo': (lambda: _mtime_ns(CONFIG_BASE_MATERIALES_FILE), lambda: cargar_materiales_base_cacheado()),
+    'registros': (lambda: _mtime_ns(REGISTROS_FILE), lambda: cargar_json_seguro(REGISTROS_FILE) or []),
+    'motor': (lambda: _mtime_ns(PARAMETROS_FILE),
+              lambda: cargar_configuracion().get('consumo_chp_global', CONSUMO_CHP_DEFAULT_M3_KWS)),
+})
+
+def stock_con_kw_tn_tabla(stock_actual: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copia del stock con el kW/tn de cada material tomado de la tabla de energía
+    (el valor guardado en el stock sólo se usa para materiales fuera del catálogo).
+    La tabla está en la escala del catálogo; si el stock guarda kW/tn ×1000 se
+    conserva esa escala (ver EnergiaMateriales.kw_tn_en_escala).
+    """
+    energia = tabla_energia.obtener()
+    return {
+        mat: {**datos, 'kw_tn': energia.kw_tn_en_escala(mat, float(datos.get('kw_tn', 0) or 0))} if isinstance(datos, dict) else datos
+        for mat, datos in stock_actual.items()
+    }
+
+def bandas_incertidumbre_mezcla(entrada, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bandas P10/P50/P90 de kW y metano de una mezcla calculada: Monte Carlo sobre
+    el ST de los últimos camiones (tabla de energía) con las propiedades del stock.
+    """
+    totales = resultado.get('totales', {})
+    return bandas_mezcla(
+        entrada.matriz, cantidades_de_resultado(resultado), tabla_energia.obtener().muestras_por_nombre(),
+        kw_tn=entrada.kw_tn, st=entrada.st,
+        n_muestras=int(entrada.config.get('muestras_incertidumbre', MUESTRAS_INCERTIDUMBRE_DEFAULT)),
+        semilla=int(entrada.config.get('semilla_mezcla', 0)),
+        punto={'kw_total': float(totales.get('kw_total_generado', 0) or 0),
+               'porcentaje_metano': float(totales.get('porcentaje_metano', 0) or 0)},
+    )
+
 # Variables globales - CORREGIDO: Inicializar correctamente
 SEGUIMIENTO_HORARIO_ALIMENTACION = {}
 
@@ -832,7 +972,7 @@ def cargar_seguimiento_horario() -> Dict[str, Any]:
         
         # Si no hay datos válidos, inicializar nuevos
         config_actual = cargar_configuracion()
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
+        stock_data = stock_ledger.stock_actual()
         stock_actual = stock_data.get('materiales', {})
         
         mezcla_calculada = calcular_mezcla_diaria(config_actual, stock_actual)
@@ -907,15 +1047,26 @@ app.register_blueprint(analisis_quimico_bp)
 # Inicializar sistema de análisis químico
 sistema_analisis_quimico = AnalisisQuimicoBiodigestores()
 modelo_ml_inhibicion = ModeloMLInhibicionBiodigestores()
+registro_modelos = obtener_registro_modelos()
 
-# Entrenar modelo ML al inicializar
+# Cargar modelo ML del registro (sólo se entrena si cambiaron datos, parámetros o versiones)
 try:
     logger.info("Inicializando modelo ML de inhibición...")
-    modelo_ml_inhibicion.entrenar_modelo()
-    logger.info("Modelo ML de inhibición inicializado correctamente")
+    resultado_inhibicion = modelo_ml_inhibicion.cargar_o_entrenar(registro_modelos)
+    logger.info(f"Modelo ML de inhibición inicializado correctamente ({resultado_inhibicion.get('origen')}, "
+                f"v{resultado_inhibicion.get('version')})")
 except Exception as e:
     logger.error(f"Error inicializando modelo ML de inhibición: {e}")
 
+# Compactación de históricos: se arranca al crear la app (también bajo gunicorn);
+# el bloqueo de archivo deja un solo worker a cargo
+try:
+    intervalo_retencion = float(os.environ.get('RETENCION_INTERVALO_HORAS', INTERVALO_COMPACTACION_HORAS_DEFAULT))
+    if intervalo_retencion > 0:
+        gestor_retencion.iniciar_en_segundo_plano(intervalo_retencion)
+except Exception as e:
+    logger.warning(f"Error iniciando compactación de históricos: {e}")
+
 # =============================================================================
 # INTEGRACIÓN SISTEMA ADÁN - CALCULADORA AVANZADA
 # =============================================================================
@@ -926,7 +1077,7 @@ try:
     # Pasar el consumo CHP global a Adán
     import os
     os.environ['CONSUMO_CHP_DEFAULT'] = str(CONSUMO_CHP_DEFAULT_M3_KWS)
-    registrar_adan(app)
+    registrar_adan(app, nucleo=nucleo_mezcla)
     print("SUCCESS: Sistema Adán integrado correctamente")
 except ImportError as e:
     print(f"WARNING: Sistema Adán no disponible: {e}")
@@ -950,6 +1101,11 @@ except Exception as e:
     print(f"ERROR: Error integrando Asistente SIBIA Avanzado: {e}")
     SIBIA_AVANZADO_DISPONIBLE = False
 
+@app.before_request
+def sincronizar_niveles_logging():
+    """Aplica los niveles de logging que otro worker haya cambiado (un stat si no cambiaron)"""
+    niveles_logging.sincronizar()
+
 # DESHABILITAR CACHÉ COMPLETAMENTE
 @app.after_request
 def after_request(response):
@@ -1227,7 +1383,7 @@ def ordenar_materiales_por_metano_y_kw(materiales_dict: Dict[str, Any], stock_ac
     return [(mat, datos) for mat, datos, _, _, _ in materiales_ordenados]
 
 
-def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any]) -> Dict[str, Any]:
+def _calcular_mezcla_diaria_sin_cache(config: Dict[str, Any], stock_actual: Dict[str, Any]) -> Dict[str, Any]:
     """
     Calcula la mezcla diaria automática para alcanzar el objetivo de KW.
     VERSIÓN EVOLUTIVA con algoritmo genético que aprende y mejora con cada cálculo.
@@ -1243,25 +1399,31 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
     }
     
     try:
-        # APRENDIZAJE: Agregar variabilidad basada en timestamp para que cada cálculo sea diferente
-        import time
-        timestamp = int(time.time())
-        variabilidad = (timestamp % 100) / 100.0  # 0.0 a 0.99
+        # APRENDIZAJE: Variabilidad de parámetros. En modo determinístico (por defecto) sale de
+        # la semilla explícita para que entradas iguales den la misma mezcla; si no, del reloj.
+        if config.get('modo_deterministico', True):
+            variabilidad = (int(config.get('semilla_mezcla', 0)) % 100) / 100.0
+        else:
+            import time
+            timestamp = int(time.time())
+            variabilidad = (timestamp % 100) / 100.0  # 0.0 a 0.99
         
         # Ajustar parámetros ligeramente para crear variabilidad
         parametros_evolutivos['factor_agresividad'] += variabilidad * 0.5
         parametros_evolutivos['porcentaje_iteracion'] += variabilidad * 0.1
         parametros_evolutivos['prioridad_solidos'] += variabilidad * 0.1
         
-        logger.info(f"🧠 Aprendizaje activo: Variabilidad {variabilidad:.2f} aplicada")
+        log_mezcla.detalle(lambda: f"🧠 Aprendizaje activo: Variabilidad {variabilidad:.2f} aplicada")
         
     except Exception as e:
         logger.error(f"Error en parámetros evolutivos: {e}", exc_info=True)
-        logger.info("⚡ Usando parámetros optimizados para velocidad")
+        log_mezcla.detalle("⚡ Usando parámetros optimizados para velocidad")
     
     # Validar entradas
     if not isinstance(config, dict) or not isinstance(stock_actual, dict):
         raise ValueError("Configuración o stock inválidos")
+    # kW/tn de la tabla materializada (el mismo que ven la calculadora y el asistente)
+    stock_actual = stock_con_kw_tn_tabla(stock_actual)
         
     kw_objetivo = float(config.get('kw_objetivo', 28800.0))
     # En modo energético, el reparto de objetivo KW se guía SOLO por % sólidos/líquidos del usuario.
@@ -1278,13 +1440,13 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
     # NUEVO: Manejar 3 porcentajes independientes (Sólidos, Líquidos, Purín)
     # Normalizar porcentajes para que sumen 100%
     suma_original = porcentaje_solidos + porcentaje_liquidos + porcentaje_purin
-    logger.info(f"📊 Porcentajes originales: Sólidos={porcentaje_solidos*100:.1f}%, Líquidos={porcentaje_liquidos*100:.1f}%, Purín={porcentaje_purin*100:.1f}% (Suma={suma_original*100:.1f}%)")
+    log_mezcla.detalle(lambda: f"📊 Porcentajes originales: Sólidos={porcentaje_solidos*100:.1f}%, Líquidos={porcentaje_liquidos*100:.1f}%, Purín={porcentaje_purin*100:.1f}% (Suma={suma_original*100:.1f}%)")
     
     if suma_original != 1.0 and suma_original > 0:
         porcentaje_solidos /= suma_original
         porcentaje_liquidos /= suma_original
         porcentaje_purin /= suma_original
-        logger.info(f"📊 Porcentajes normalizados: Sólidos={porcentaje_solidos*100:.1f}%, Líquidos={porcentaje_liquidos*100:.1f}%, Purín={porcentaje_purin*100:.1f}% (Suma={porcentaje_solidos + porcentaje_liquidos + porcentaje_purin:.1f})")
+        log_mezcla.detalle(lambda: f"📊 Porcentajes normalizados: Sólidos={porcentaje_solidos*100:.1f}%, Líquidos={porcentaje_liquidos*100:.1f}%, Purín={porcentaje_purin*100:.1f}% (Suma={porcentaje_solidos + porcentaje_liquidos + porcentaje_purin:.1f})")
         
     kw_solidos_obj = kw_objetivo * porcentaje_solidos
     kw_liquidos_obj = kw_objetivo * porcentaje_liquidos
@@ -1368,7 +1530,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
     # CORREGIDO: Usar estrategia híbrida de ordenamiento (metano + KW)
     liquidos_ordenados = ordenar_materiales_por_metano_y_kw(materiales_liquidos, stock_actual, objetivo_metano)
     
-    logger.info(f"📊 Materiales líquidos ordenados por estrategia híbrida: {[(mat, get_kw_tn(mat)) for mat, _ in liquidos_ordenados[:3]]}")
+    log_mezcla.detalle(lambda: f"📊 Materiales líquidos ordenados por estrategia híbrida: {[(mat, get_kw_tn(mat)) for mat, _ in liquidos_ordenados[:3]]}")
     
     # CORREGIDO: Respetar cantidad total de materiales seleccionados por el usuario
     cantidad_materiales = config.get('cantidad_materiales', '5')
@@ -1391,11 +1553,11 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
             max_liquidos_cfg = 2  # Por defecto 2 líquidos
             max_solidos_cfg = 2   # Por defecto 2 sólidos
     
-    logger.info(f"📊 Modo energético: líquidos≤{max_liquidos_cfg}, sólidos≤{max_solidos_cfg} (total={max_liquidos_cfg + max_solidos_cfg})")
+    log_mezcla.detalle(lambda: f"📊 Modo energético: líquidos≤{max_liquidos_cfg}, sólidos≤{max_solidos_cfg} (total={max_liquidos_cfg + max_solidos_cfg})")
     
     # CORREGIDO: Si no hay suficientes materiales líquidos, usar sólidos menos eficientes como líquidos
     if len(materiales_liquidos) < max_liquidos_cfg:
-        logger.info(f"⚠️ Solo hay {len(materiales_liquidos)} materiales líquidos, necesitamos {max_liquidos_cfg}")
+        log_mezcla.detalle(lambda: f"⚠️ Solo hay {len(materiales_liquidos)} materiales líquidos, necesitamos {max_liquidos_cfg}")
         # Ordenar sólidos por eficiencia (menos eficientes primero) para usar como líquidos
         solidos_para_liquidos = sorted(materiales_solidos.items(), 
                                     key=lambda x: float(stock_actual[x[0]].get('ch4_porcentaje', 0) or 0))
@@ -1404,7 +1566,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
         materiales_faltantes = max_liquidos_cfg - len(materiales_liquidos)
         for i, (mat, datos) in enumerate(solidos_para_liquidos[:materiales_faltantes]):
             materiales_liquidos[mat] = datos
-            logger.info(f"📊 Usando sólido '{mat}' como líquido (eficiencia: {float(stock_actual[mat].get('kw_tn', 0) or 0):.3f} KW/TN)")
+            log_mezcla.detalle(lambda: f"📊 Usando sólido '{mat}' como líquido (eficiencia: {float(stock_actual[mat].get('kw_tn', 0) or 0):.3f} KW/TN)")
     
     liquidos_seleccionados = 0
     total_tn_liquidos = 0.0
@@ -1454,7 +1616,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                 kw_necesarios = usar_tn * kw_tn
             usar_kw = kw_necesarios
             
-            logger.info(f"📊 Material líquido seleccionado: {mat} - Eficiencia: {kw_tn:.3f} KW/TN, Factor: {factor_eficiencia:.2f}, Usar: {usar_tn:.2f} TN, KW: {usar_kw:.2f}")
+            log_mezcla.detalle(lambda: f"📊 Material líquido seleccionado: {mat} - Eficiencia: {kw_tn:.3f} KW/TN, Factor: {factor_eficiencia:.2f}, Usar: {usar_tn:.2f} TN, KW: {usar_kw:.2f}")
             
         # Actualizar datos del material
         datos_mat['cantidad_tn'] = usar_tn
@@ -1493,8 +1655,8 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                            key=lambda x: float(stock_actual[x[0]].get('ch4_porcentaje', 0) or 0), 
                            reverse=True)
     
-    logger.info(f"📊 Materiales purín ordenados por eficiencia: {[(mat, float(stock_actual[mat].get('kw_tn', 0) or 0)) for mat, _ in purin_ordenados[:3]]}")
-    logger.info(f"📊 Modo energético: purín≤{max_purin_cfg}")
+    log_mezcla.detalle(lambda: f"📊 Materiales purín ordenados por eficiencia: {[(mat, float(stock_actual[mat].get('kw_tn', 0) or 0)) for mat, _ in purin_ordenados[:3]]}")
+    log_mezcla.detalle(lambda: f"📊 Modo energético: purín≤{max_purin_cfg}")
     
     purin_seleccionados = 0
     total_tn_purin = 0.0
@@ -1522,7 +1684,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
             usar_kw = min(kw_restante_purin, stock * kw_tn)
             usar_tn = usar_kw / kw_tn
             
-            logger.info(f"📊 Material purín seleccionado: {mat} - Eficiencia: {kw_tn:.3f} KW/TN, Usar: {usar_tn:.2f} TN, KW: {usar_kw:.2f}")
+            log_mezcla.detalle(lambda: f"📊 Material purín seleccionado: {mat} - Eficiencia: {kw_tn:.3f} KW/TN, Usar: {usar_tn:.2f} TN, KW: {usar_kw:.2f}")
             
         # Actualizar datos del material
         datos_mat['cantidad_tn'] = usar_tn
@@ -1558,7 +1720,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
         solidos_hibridos = ordenar_materiales_por_metano_y_kw(dict(solidos_a_usar), stock_actual, objetivo_metano)
         solidos_a_usar = [(mat, datos) for mat, datos in solidos_hibridos]
         
-        logger.info(f"📊 Materiales sólidos ordenados por eficiencia: {[(mat, stock_actual[mat].get('kw_tn', 0)) for mat, _ in solidos_a_usar[:5]]}")
+        log_mezcla.detalle(lambda: f"📊 Materiales sólidos ordenados por eficiencia: {[(mat, stock_actual[mat].get('kw_tn', 0)) for mat, _ in solidos_a_usar[:5]]}")
         
         # MEJORADO: Distribuir KW entre múltiples materiales sólidos de manera más equilibrada
         kw_restante_solidos = kw_solidos_obj
@@ -1571,15 +1733,15 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
         # AJUSTE FINAL: Asegurar que use al menos 4 materiales sólidos
         if len(solidos_a_usar) >= 4:
             num_materiales_a_usar = max(4, num_materiales_a_usar)
-            logger.info(f"🎯 FORZANDO uso de {num_materiales_a_usar} materiales sólidos (disponibles: {len(solidos_a_usar)})")
+            log_mezcla.detalle(lambda: f"🎯 FORZANDO uso de {num_materiales_a_usar} materiales sólidos (disponibles: {len(solidos_a_usar)})")
         elif len(solidos_a_usar) >= 2:
             # Si hay al menos 2 sólidos disponibles, usar al menos 2
             num_materiales_a_usar = max(2, num_materiales_a_usar)
-            logger.info(f"🎯 FORZANDO uso de {num_materiales_a_usar} materiales sólidos (disponibles: {len(solidos_a_usar)})")
+            log_mezcla.detalle(lambda: f"🎯 FORZANDO uso de {num_materiales_a_usar} materiales sólidos (disponibles: {len(solidos_a_usar)})")
         
         kw_por_material = kw_restante_solidos / num_materiales_a_usar if num_materiales_a_usar > 0 else 0
         
-        logger.info(f"📊 Distribuyendo {kw_restante_solidos:.0f} KW entre {num_materiales_a_usar} materiales sólidos ({kw_por_material:.0f} KW por material)")
+        log_mezcla.detalle(lambda: f"📊 Distribuyendo {kw_restante_solidos:.0f} KW entre {num_materiales_a_usar} materiales sólidos ({kw_por_material:.0f} KW por material)")
         
         solidos_seleccionados = 0
         for mat, datos_mat in solidos_a_usar:
@@ -1622,7 +1784,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                     solidos_seleccionados += 1
                     tn_usadas_solidos_dia += tn_a_usar
                     
-                    logger.info(f"📊 Material sólido seleccionado: {mat} - Eficiencia: {kw_tn:.3f} KW/TN, Factor: {factor_eficiencia:.2f}, Usar: {tn_a_usar:.2f} TN, KW: {kw_asignados:.2f}")
+                    log_mezcla.detalle(lambda: f"📊 Material sólido seleccionado: {mat} - Eficiencia: {kw_tn:.3f} KW/TN, Factor: {factor_eficiencia:.2f}, Usar: {tn_a_usar:.2f} TN, KW: {kw_asignados:.2f}")
             
             # Calcular KW por material para distribución restante (método anterior como fallback)
             kw_por_material = kw_restante_solidos / max(1, materiales_usados) if materiales_usados > 0 else 0
@@ -1686,7 +1848,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                       (kw_solidos_obj - kw_generados_solidos) + \
                       (kw_purin_obj - kw_generados_purin)
         
-        logger.info(f"📊 Remanente KW a redistribuir: {remanente_kw:.2f} KW")
+        log_mezcla.detalle(lambda: f"📊 Remanente KW a redistribuir: {remanente_kw:.2f} KW")
         
         if remanente_kw > 1e-3:
             # CORREGIDO: Redistribuir de manera más agresiva priorizando eficiencia
@@ -1754,7 +1916,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
             advertencias.append(f"⚠️ No se alcanzó el objetivo completo. Generados: {kw_total_final:.0f} KW de {kw_objetivo:.0f} KW objetivo. Diferencia: {diferencia_objetivo:.0f} KW")
             logger.warning(f"⚠️ Objetivo no alcanzado: {kw_total_final:.0f} KW de {kw_objetivo:.0f} KW (diferencia: {diferencia_objetivo:.0f} KW)")
         else:
-            logger.info(f"✅ Objetivo alcanzado: {kw_total_final:.0f} KW de {kw_objetivo:.0f} KW objetivo")
+            log_mezcla.detalle(lambda: f"✅ Objetivo alcanzado: {kw_total_final:.0f} KW de {kw_objetivo:.0f} KW objetivo")
 
         # CALCULAR PROMEDIOS ST
         st_promedio_liquidos = suma_st_liquidos / n_liquidos if n_liquidos > 0 else 0.0
@@ -1782,9 +1944,9 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
             porcentaje_metano = 0.0
 
         # OPTIMIZADOR DE METANO SIMPLIFICADO
-        logger.info(f"🔧 Optimizador de metano: Activado={usar_optimizador_metano}, Actual={porcentaje_metano:.1f}%, Objetivo={objetivo_metano:.1f}%")
+        log_mezcla.detalle(lambda: f"🔧 Optimizador de metano: Activado={usar_optimizador_metano}, Actual={porcentaje_metano:.1f}%, Objetivo={objetivo_metano:.1f}%")
         if usar_optimizador_metano and porcentaje_metano < objetivo_metano:
-            logger.info(f"🔧 Iniciando optimización SIMPLE de metano...")
+            log_mezcla.detalle(lambda: f"🔧 Iniciando optimización SIMPLE de metano...")
             
             # Estrategia simple: Aumentar purín y Expeller, reducir lactosa
             cambios_aplicados = 0
@@ -1804,7 +1966,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                     total_tn_liquidos += (nuevos_tn_purin - purin_actual)
                     kw_generados_liquidos += (nuevos_kw_purin - materiales_liquidos['Purin']['kw_aportados'])
                     cambios_aplicados += 1
-                    logger.info(f"🔧 Purín duplicado: {purin_actual:.1f} → {nuevos_tn_purin:.1f} TN")
+                    log_mezcla.detalle(lambda: f"🔧 Purín duplicado: {purin_actual:.1f} → {nuevos_tn_purin:.1f} TN")
             
             # 2. Aumentar Expeller (excelente para metano)
             if 'Expeller' in materiales_solidos:
@@ -1827,7 +1989,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                     materiales_solidos['Expeller']['tn_usadas'] = nuevos_tn_expeller
                     materiales_solidos['Expeller']['kw_aportados'] = nuevos_kw_expeller
                     cambios_aplicados += 1
-                    logger.info(f"🔧 Expeller aumentado: {expeller_actual:.1f} → {nuevos_tn_expeller:.1f} TN")
+                    log_mezcla.detalle(lambda: f"🔧 Expeller aumentado: {expeller_actual:.1f} → {nuevos_tn_expeller:.1f} TN")
             
             # 3. Reducir lactosa (pobre para metano)
             if 'lactosa' in materiales_liquidos:
@@ -1845,7 +2007,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                 materiales_liquidos['lactosa']['tn_usadas'] = nuevos_tn_lactosa
                 materiales_liquidos['lactosa']['kw_aportados'] = nuevos_kw_lactosa
                 cambios_aplicados += 1
-                logger.info(f"🔧 Lactosa reducida: {lactosa_actual:.1f} → {nuevos_tn_lactosa:.1f} TN")
+                log_mezcla.detalle(lambda: f"🔧 Lactosa reducida: {lactosa_actual:.1f} → {nuevos_tn_lactosa:.1f} TN")
             
             # Recalcular totales
             if cambios_aplicados > 0:
@@ -1858,9 +2020,9 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                 total_tn_solidos = sum(mat['tn_usadas'] for mat in materiales_solidos.values())
                 total_tn_purin = sum(mat['tn_usadas'] for mat in materiales_purin.values())
                 
-                logger.info(f"🔧 Cambios aplicados: {cambios_aplicados}")
-                logger.info(f"🔧 KW total: {kw_total_actual:.0f}")
-                logger.info(f"🔧 TN: Líquidos={total_tn_liquidos:.1f}, Sólidos={total_tn_solidos:.1f}, Purín={total_tn_purin:.1f}")
+                log_mezcla.detalle(lambda: f"🔧 Cambios aplicados: {cambios_aplicados}")
+                log_mezcla.detalle(lambda: f"🔧 KW total: {kw_total_actual:.0f}")
+                log_mezcla.detalle(lambda: f"🔧 TN: Líquidos={total_tn_liquidos:.1f}, Sólidos={total_tn_solidos:.1f}, Purín={total_tn_purin:.1f}")
                 
                 # Recalcular metano
                 try:
@@ -1871,27 +2033,27 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                         'totales': {'kw_total_generado': kw_total_actual}
                     }
                     porcentaje_metano_nuevo = temp_functions.calcular_porcentaje_metano(resultado_temp, consumo_chp)
-                    logger.info(f"🔧 Metano: {porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%")
+                    log_mezcla.detalle(lambda: f"🔧 Metano: {porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%")
                     porcentaje_metano = porcentaje_metano_nuevo
                 except Exception as e:
-                    logger.warning(f"Error recalculando metano: {e}")
+                    log_mezcla.muestreado('recalculo_metano', logging.WARNING, "Error recalculando metano: %s", e)
             
         # OPTIMIZADOR DE METANO CON MODELO ML (XGBoost)
-        logger.info(f"🔧 Optimizador de metano ML: Activado={usar_optimizador_metano}, Actual={porcentaje_metano:.1f}%, Objetivo={objetivo_metano:.1f}%")
-        logger.info(f"🔧 Configuración completa: {config}")
-        logger.info(f"🔧 CONDICIÓN: usar_optimizador_metano={usar_optimizador_metano}, porcentaje_metano={porcentaje_metano:.1f}%, objetivo_metano={objetivo_metano:.1f}%")
-        logger.info(f"🔧 EVALUANDO CONDICIÓN: {usar_optimizador_metano} and {porcentaje_metano:.1f} < {objetivo_metano:.1f} = {usar_optimizador_metano and porcentaje_metano < objetivo_metano}")
-        logger.info(f"🔧 ANTES DEL IF: usar_optimizador_metano={usar_optimizador_metano}, porcentaje_metano={porcentaje_metano:.1f}%, objetivo_metano={objetivo_metano:.1f}%")
-        logger.info(f"🔧 DEBUG: porcentaje_metano={porcentaje_metano}, objetivo_metano={objetivo_metano}, usar_optimizador_metano={usar_optimizador_metano}")
-        logger.info(f"🔧 TIPO DEBUG: porcentaje_metano={type(porcentaje_metano)}, objetivo_metano={type(objetivo_metano)}, usar_optimizador_metano={type(usar_optimizador_metano)}")
-        logger.info(f"🔧 FORZANDO EJECUCIÓN DEL OPTIMIZADOR")
-        logger.info(f"🔧 EJECUTANDO ESTRATEGIA ULTRA AGRESIVA DIRECTAMENTE")
+        log_mezcla.detalle(lambda: f"🔧 Optimizador de metano ML: Activado={usar_optimizador_metano}, Actual={porcentaje_metano:.1f}%, Objetivo={objetivo_metano:.1f}%")
+        log_mezcla.detalle(lambda: f"🔧 Configuración completa: {config}")
+        log_mezcla.detalle(lambda: f"🔧 CONDICIÓN: usar_optimizador_metano={usar_optimizador_metano}, porcentaje_metano={porcentaje_metano:.1f}%, objetivo_metano={objetivo_metano:.1f}%")
+        log_mezcla.detalle(lambda: f"🔧 EVALUANDO CONDICIÓN: {usar_optimizador_metano} and {porcentaje_metano:.1f} < {objetivo_metano:.1f} = {usar_optimizador_metano and porcentaje_metano < objetivo_metano}")
+        log_mezcla.detalle(lambda: f"🔧 ANTES DEL IF: usar_optimizador_metano={usar_optimizador_metano}, porcentaje_metano={porcentaje_metano:.1f}%, objetivo_metano={objetivo_metano:.1f}%")
+        log_mezcla.detalle(lambda: f"🔧 DEBUG: porcentaje_metano={porcentaje_metano}, objetivo_metano={objetivo_metano}, usar_optimizador_metano={usar_optimizador_metano}")
+        log_mezcla.detalle(lambda: f"🔧 TIPO DEBUG: porcentaje_metano={type(porcentaje_metano)}, objetivo_metano={type(objetivo_metano)}, usar_optimizador_metano={type(usar_optimizador_metano)}")
+        log_mezcla.detalle(lambda: f"🔧 FORZANDO EJECUCIÓN DEL OPTIMIZADOR")
+        log_mezcla.detalle(lambda: f"🔧 EJECUTANDO ESTRATEGIA ULTRA AGRESIVA DIRECTAMENTE")
         
         # EJECUTAR ESTRATEGIA ULTRA AGRESIVA DIRECTAMENTE
         diferencia_metano = objetivo_metano - porcentaje_metano
         cambios_aplicados = 0
         
-        logger.info(f"🔧 Diferencia de metano: {diferencia_metano:.1f}% - Aplicando estrategia ULTRA AGRESIVA")
+        log_mezcla.detalle(lambda: f"🔧 Diferencia de metano: {diferencia_metano:.1f}% - Aplicando estrategia ULTRA AGRESIVA")
         
         # Priorizar materiales con mayor CH4% usando datos reales del stock
         materiales_ordenados_ch4 = []
@@ -1904,7 +2066,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
         # Ordenar por CH4% descendente, luego por lípidos
         materiales_ordenados_ch4.sort(key=lambda x: (x[1], x[3]), reverse=True)
         
-        logger.info(f"🔧 Materiales ordenados por CH4% + Lípidos: {[(mat, f'CH4:{ch4:.1f}%, Lip:{lip:.1f}%') for mat, ch4, _, lip in materiales_ordenados_ch4[:5]]}")
+        log_mezcla.detalle(lambda: f"🔧 Materiales ordenados por CH4% + Lípidos: {[(mat, f'CH4:{ch4:.1f}%, Lip:{lip:.1f}%') for mat, ch4, _, lip in materiales_ordenados_ch4[:5]]}")
         
         # ESTRATEGIA ULTRA AGRESIVA: Aumentar materiales con alto CH4% y lípidos
         for mat, ch4_pct, kw_tn, lipidos_lab in materiales_ordenados_ch4[:5]:  # Top 5 materiales
@@ -1927,7 +2089,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                     datos_mat['tn_usadas'] = nuevos_tn
                     datos_mat['kw_aportados'] = nuevos_tn * kw_tn
                     cambios_aplicados += 1
-                    logger.info(f"🔧 {mat} ULTRA AUMENTADO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_pct:.1f}%, Lip: {lipidos_lab:.1f}%, Factor: {factor_aumento:.2f})")
+                    log_mezcla.detalle(lambda: f"🔧 {mat} ULTRA AUMENTADO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_pct:.1f}%, Lip: {lipidos_lab:.1f}%, Factor: {factor_aumento:.2f})")
             
             elif mat in materiales_liquidos:
                 datos_mat = materiales_liquidos[mat]
@@ -1940,19 +2102,19 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                     datos_mat['tn_usadas'] = nuevos_tn
                     datos_mat['kw_aportados'] = nuevos_tn * kw_tn
                     cambios_aplicados += 1
-                    logger.info(f"🔧 {mat} ULTRA AUMENTADO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_pct:.1f}%, Lip: {lipidos_lab:.1f}%, Factor: {factor_aumento:.2f})")
+                    log_mezcla.detalle(lambda: f"🔧 {mat} ULTRA AUMENTADO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_pct:.1f}%, Lip: {lipidos_lab:.1f}%, Factor: {factor_aumento:.2f})")
         
-        # Recalcular totales después de los cambios
+        # Recalcular totales (siempre: las etapas siguientes los usan aunque no haya habido cambios)
+        kw_generados_liquidos = sum(mat['kw_aportados'] for mat in materiales_liquidos.values())
+        kw_generados_solidos = sum(mat['kw_aportados'] for mat in materiales_solidos.values())
+        kw_generados_purin = sum(mat['kw_aportados'] for mat in materiales_purin.values())
+        kw_total_actual = kw_generados_liquidos + kw_generados_solidos + kw_generados_purin
+
+        total_tn_liquidos = sum(mat['tn_usadas'] for mat in materiales_liquidos.values())
+        total_tn_solidos = sum(mat['tn_usadas'] for mat in materiales_solidos.values())
+        total_tn_purin = sum(mat['tn_usadas'] for mat in materiales_purin.values())
+
         if cambios_aplicados > 0:
-            kw_generados_liquidos = sum(mat['kw_aportados'] for mat in materiales_liquidos.values())
-            kw_generados_solidos = sum(mat['kw_aportados'] for mat in materiales_solidos.values())
-            kw_generados_purin = sum(mat['kw_aportados'] for mat in materiales_purin.values())
-            kw_total_actual = kw_generados_liquidos + kw_generados_solidos + kw_generados_purin
-            
-            total_tn_liquidos = sum(mat['tn_usadas'] for mat in materiales_liquidos.values())
-            total_tn_solidos = sum(mat['tn_usadas'] for mat in materiales_solidos.values())
-            total_tn_purin = sum(mat['tn_usadas'] for mat in materiales_purin.values())
-            
             # Recalcular metano
             try:
                 resultado_temp = {
@@ -1963,48 +2125,48 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                 }
                 consumo_chp = float(config.get('consumo_chp_global', 505.0))
                 porcentaje_metano_nuevo = temp_functions.calcular_porcentaje_metano(resultado_temp, consumo_chp)
-                logger.info(f"🔧 Metano optimizado ULTRA AGRESIVO: {porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%")
+                log_mezcla.detalle(lambda: f"🔧 Metano optimizado ULTRA AGRESIVO: {porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%")
                 porcentaje_metano = porcentaje_metano_nuevo
             except Exception as e:
-                logger.warning(f"Error recalculando metano: {e}")
+                log_mezcla.muestreado('recalculo_metano', logging.WARNING, "Error recalculando metano: %s", e)
         
-        logger.info(f"🔧 FINALIZANDO OPTIMIZADOR ULTRA AGRESIVO")
+        log_mezcla.detalle(lambda: f"🔧 FINALIZANDO OPTIMIZADOR ULTRA AGRESIVO")
         
-        logger.info(f"🔧 RESULTADO FINAL: Metano={porcentaje_metano:.1f}%, KW={kw_total_actual:.0f}")
+        log_mezcla.detalle(lambda: f"🔧 RESULTADO FINAL: Metano={porcentaje_metano:.1f}%, KW={kw_total_actual:.0f}")
         
-        logger.info(f"🔧 OPTIMIZADOR COMPLETADO EXITOSAMENTE")
+        log_mezcla.detalle(lambda: f"🔧 OPTIMIZADOR COMPLETADO EXITOSAMENTE")
         
         # DEBUG: Verificar condiciones del optimizador ML
-        logger.info(f"🔧 DEBUG OPTIMIZADOR ML:")
-        logger.info(f"🔧 - usar_optimizador_metano: {usar_optimizador_metano}")
-        logger.info(f"🔧 - porcentaje_metano: {porcentaje_metano:.2f}%")
-        logger.info(f"🔧 - objetivo_metano: {objetivo_metano:.2f}%")
-        logger.info(f"🔧 - Condición: {usar_optimizador_metano} and {porcentaje_metano:.2f} < {objetivo_metano:.2f} = {usar_optimizador_metano and porcentaje_metano < objetivo_metano}")
+        log_mezcla.detalle(lambda: f"🔧 DEBUG OPTIMIZADOR ML:")
+        log_mezcla.detalle(lambda: f"🔧 - usar_optimizador_metano: {usar_optimizador_metano}")
+        log_mezcla.detalle(lambda: f"🔧 - porcentaje_metano: {porcentaje_metano:.2f}%")
+        log_mezcla.detalle(lambda: f"🔧 - objetivo_metano: {objetivo_metano:.2f}%")
+        log_mezcla.detalle(lambda: f"🔧 - Condición: {usar_optimizador_metano} and {porcentaje_metano:.2f} < {objetivo_metano:.2f} = {usar_optimizador_metano and porcentaje_metano < objetivo_metano}")
         
         # 🧠 ESTRATEGIA ML HÍBRIDA INTELIGENTE - FORZAR EJECUCIÓN
         if True:  # FORZAR EJECUCIÓN DEL OPTIMIZADOR ML
-            logger.info(f"🧠 INICIANDO ESTRATEGIA ML HÍBRIDA INTELIGENTE")
+            log_mezcla.detalle(lambda: f"🧠 INICIANDO ESTRATEGIA ML HÍBRIDA INTELIGENTE")
             
             # Obtener configuración ML del dashboard
             config_ml = obtener_configuracion_ml_dashboard_interna()
             
             # Modelo 1: Optimizador de Metano (Optimización Bayesiana)
-            logger.info(f"🧠 MODELO 1: Optimizador de Metano (Optimización Bayesiana)")
+            log_mezcla.detalle(lambda: f"🧠 MODELO 1: Optimizador de Metano (Optimización Bayesiana)")
             config_metano = config_ml.get('optimizacion_metano', {})
             modelo_metano = config_metano.get('modelo_principal', 'optimizacion_bayesiana')
             
             # Modelo 2: Optimizador de KW (XGBoost)
-            logger.info(f"🧠 MODELO 2: Optimizador de KW (XGBoost)")
+            log_mezcla.detalle(lambda: f"🧠 MODELO 2: Optimizador de KW (XGBoost)")
             config_energia = config_ml.get('calculadora_energia', {})
             modelo_energia = config_energia.get('modelo_principal', 'xgboost_calculadora')
             
-            logger.info(f"🧠 CONFIGURACIÓN ML: Metano={modelo_metano}, Energía={modelo_energia}")
+            log_mezcla.detalle(lambda: f"🧠 CONFIGURACIÓN ML: Metano={modelo_metano}, Energía={modelo_energia}")
             
             # ESTRATEGIA HÍBRIDA: Combinar ambos objetivos
             diferencia_metano = objetivo_metano - porcentaje_metano
             diferencia_kw = kw_objetivo - kw_total_actual
             
-            logger.info(f"🧠 DIFERENCIAS: Metano={diferencia_metano:.1f}%, KW={diferencia_kw:.0f}")
+            log_mezcla.detalle(lambda: f"🧠 DIFERENCIAS: Metano={diferencia_metano:.1f}%, KW={diferencia_kw:.0f}")
             
             # Priorizar materiales según objetivos
             materiales_priorizados = []
@@ -2026,7 +2188,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
             # Ordenar por score híbrido
             materiales_priorizados.sort(key=lambda x: x[1], reverse=True)
             
-            logger.info(f"🧠 TOP 5 MATERIALES HÍBRIDOS: {[(mat, f'Score:{score:.2f}') for mat, score, _, _, _ in materiales_priorizados[:5]]}")
+            log_mezcla.detalle(lambda: f"🧠 TOP 5 MATERIALES HÍBRIDOS: {[(mat, f'Score:{score:.2f}') for mat, score, _, _, _ in materiales_priorizados[:5]]}")
             
             # Aplicar optimización híbrida
             cambios_híbridos = 0
@@ -2056,7 +2218,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                         datos_mat['tn_usadas'] = nuevos_tn
                         datos_mat['kw_aportados'] = nuevos_tn * kw_tn
                         cambios_híbridos += 1
-                        logger.info(f"🧠 {mat} HÍBRIDO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (Score:{score_total:.2f}, Factor:{factor_material:.2f})")
+                        log_mezcla.detalle(lambda: f"🧠 {mat} HÍBRIDO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (Score:{score_total:.2f}, Factor:{factor_material:.2f})")
                 
                 elif mat in materiales_liquidos:
                     datos_mat = materiales_liquidos[mat]
@@ -2069,7 +2231,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                         datos_mat['tn_usadas'] = nuevos_tn
                         datos_mat['kw_aportados'] = nuevos_tn * kw_tn
                         cambios_híbridos += 1
-                        logger.info(f"🧠 {mat} HÍBRIDO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (Score:{score_total:.2f}, Factor:{factor_material:.2f})")
+                        log_mezcla.detalle(lambda: f"🧠 {mat} HÍBRIDO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (Score:{score_total:.2f}, Factor:{factor_material:.2f})")
             
             # Recalcular totales después de cambios híbridos
             if cambios_híbridos > 0:
@@ -2088,19 +2250,19 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                     }
                     consumo_chp = float(config.get('consumo_chp_global', 505.0))
                     porcentaje_metano_nuevo = temp_functions.calcular_porcentaje_metano(resultado_temp, consumo_chp)
-                    logger.info(f"🧠 RESULTADO HÍBRIDO: Metano={porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%, KW={kw_total_actual:.0f}")
+                    log_mezcla.detalle(lambda: f"🧠 RESULTADO HÍBRIDO: Metano={porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%, KW={kw_total_actual:.0f}")
                     porcentaje_metano = porcentaje_metano_nuevo
                 except Exception as e:
-                    logger.warning(f"Error recalculando metano híbrido: {e}")
+                    log_mezcla.muestreado('recalculo_metano', logging.WARNING, "Error recalculando metano híbrido: %s", e)
             
-            logger.info(f"🧠 ESTRATEGIA ML HÍBRIDA COMPLETADA: {cambios_híbridos} cambios aplicados")
+            log_mezcla.detalle(lambda: f"🧠 ESTRATEGIA ML HÍBRIDA COMPLETADA: {cambios_híbridos} cambios aplicados")
         
         # 🧠 SISTEMA DE APRENDIZAJE AUTOMÁTICO ML - APLICAR AJUSTES INMEDIATAMENTE
-        logger.info(f"🧠 INICIANDO APRENDIZAJE AUTOMÁTICO ML")
-        logger.info(f"🧠 DEBUG: objetivo_metano = {objetivo_metano}")
-        logger.info(f"🧠 DEBUG: porcentaje_metano = {porcentaje_metano}")
-        logger.info(f"🧠 DEBUG: diferencia_metano = {objetivo_metano - porcentaje_metano}")
-        logger.info(f"🧠 DEBUG: usar_optimizador_metano = {usar_optimizador_metano}")
+        log_mezcla.detalle(lambda: f"🧠 INICIANDO APRENDIZAJE AUTOMÁTICO ML")
+        log_mezcla.detalle(lambda: f"🧠 DEBUG: objetivo_metano = {objetivo_metano}")
+        log_mezcla.detalle(lambda: f"🧠 DEBUG: porcentaje_metano = {porcentaje_metano}")
+        log_mezcla.detalle(lambda: f"🧠 DEBUG: diferencia_metano = {objetivo_metano - porcentaje_metano}")
+        log_mezcla.detalle(lambda: f"🧠 DEBUG: usar_optimizador_metano = {usar_optimizador_metano}")
         
         # Guardar resultado actual para aprendizaje
         resultado_actual = {
@@ -2141,13 +2303,13 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
         try:
             with open(historial_file, 'w', encoding='utf-8') as f:
                 json.dump(historial, f, indent=2, ensure_ascii=False)
-            logger.info(f"🧠 Historial ML actualizado: {len(historial)} cálculos guardados")
+            log_mezcla.detalle(lambda: f"🧠 Historial ML actualizado: {len(historial)} cálculos guardados")
         except Exception as e:
             logger.warning(f"Error guardando historial ML: {e}")
         
         # 🧠 ANÁLISIS AUTOMÁTICO DE PATRONES - FORZAR EJECUCIÓN
         if True:  # FORZAR EJECUCIÓN DEL APRENDIZAJE AUTOMÁTICO
-            logger.info(f"🧠 ANALIZANDO PATRONES DE APRENDIZAJE")
+            log_mezcla.detalle(lambda: f"🧠 ANALIZANDO PATRONES DE APRENDIZAJE")
             
             # Calcular tendencias
             ultimos_5 = historial[-5:] if len(historial) >= 5 else historial
@@ -2160,14 +2322,14 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
             kws = [r['kw_obtenido'] for r in ultimos_5]
             tendencia_kw = (kws[-1] - kws[0]) / len(kws) if len(kws) > 1 else 0
             
-            logger.info(f"🧠 TENDENCIAS: Metano={tendencia_metano:+.2f}%/calc, KW={tendencia_kw:+.0f}/calc")
+            log_mezcla.detalle(lambda: f"🧠 TENDENCIAS: Metano={tendencia_metano:+.2f}%/calc, KW={tendencia_kw:+.0f}/calc")
             
             # 🧠 AJUSTE AUTOMÁTICO DE ESTRATEGIA BASADO EN OBJETIVO - APLICAR INMEDIATAMENTE
             diferencia_metano_objetivo = objetivo_metano - porcentaje_metano
-            logger.info(f"🧠 DIFERENCIA CON OBJETIVO: {diferencia_metano_objetivo:.1f}% (Objetivo: {objetivo_metano}%, Actual: {porcentaje_metano:.1f}%)")
+            log_mezcla.detalle(lambda: f"🧠 DIFERENCIA CON OBJETIVO: {diferencia_metano_objetivo:.1f}% (Objetivo: {objetivo_metano}%, Actual: {porcentaje_metano:.1f}%)")
             
             if diferencia_metano_objetivo > 1.0:  # Si hay diferencia con el objetivo (más sensible)
-                logger.info(f"🧠 APLICANDO AJUSTE AUTOMÁTICO INMEDIATO PARA OBJETIVO {objetivo_metano}%")
+                log_mezcla.detalle(lambda: f"🧠 APLICANDO AJUSTE AUTOMÁTICO INMEDIATO PARA OBJETIVO {objetivo_metano}%")
                 
                 # Calcular agresividad basada en la diferencia con el objetivo
                 factor_ajuste_metano = 1.0 + (diferencia_metano_objetivo / 5.0)  # Más agresivo para objetivos más altos
@@ -2195,7 +2357,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                             datos_mat['tn_usadas'] = nuevos_tn
                             datos_mat['kw_aportados'] = nuevos_tn * float(datos_stock.get('kw/tn', 0) or 0)
                             cambios_automaticos += 1
-                            logger.info(f"🧠 AUTO-AJUSTE: {mat} {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (Factor: {factor_ajuste_metano:.2f})")
+                            log_mezcla.detalle(lambda: f"🧠 AUTO-AJUSTE: {mat} {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (Factor: {factor_ajuste_metano:.2f})")
                 
                 # Ajustar materiales líquidos con alto metano/lípidos
                 for mat, datos_mat in materiales_liquidos.items():
@@ -2213,7 +2375,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                             datos_mat['tn_usadas'] = nuevos_tn
                             datos_mat['kw_aportados'] = nuevos_tn * float(datos_stock.get('kw/tn', 0) or 0)
                             cambios_automaticos += 1
-                            logger.info(f"🧠 AUTO-AJUSTE: {mat} {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (Factor: {factor_ajuste_metano:.2f})")
+                            log_mezcla.detalle(lambda: f"🧠 AUTO-AJUSTE: {mat} {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (Factor: {factor_ajuste_metano:.2f})")
                 
                 # Recalcular totales después de ajustes automáticos
                 if cambios_automaticos > 0:
@@ -2232,43 +2394,43 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                         }
                         consumo_chp = float(config.get('consumo_chp_global', 505.0))
                         porcentaje_metano_nuevo = temp_functions.calcular_porcentaje_metano(resultado_temp, consumo_chp)
-                        logger.info(f"🧠 RESULTADO AUTO-AJUSTE: Metano={porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%, KW={kw_total_actual:.0f}")
+                        log_mezcla.detalle(lambda: f"🧠 RESULTADO AUTO-AJUSTE: Metano={porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%, KW={kw_total_actual:.0f}")
                         porcentaje_metano = porcentaje_metano_nuevo
                     except Exception as e:
-                        logger.warning(f"Error recalculando metano auto-ajuste: {e}")
+                        log_mezcla.muestreado('recalculo_metano', logging.WARNING, "Error recalculando metano auto-ajuste: %s", e)
                 
-                logger.info(f"🧠 AJUSTE AUTOMÁTICO COMPLETADO: {cambios_automaticos} cambios aplicados")
+                log_mezcla.detalle(lambda: f"🧠 AJUSTE AUTOMÁTICO COMPLETADO: {cambios_automaticos} cambios aplicados")
                 
-                logger.info(f"🧠 APRENDIZAJE AUTOMÁTICO COMPLETADO")
+                log_mezcla.detalle(lambda: f"🧠 APRENDIZAJE AUTOMÁTICO COMPLETADO")
         
-        logger.info(f"🧠 SISTEMA ML APRENDIENDO AUTOMÁTICAMENTE")
+        log_mezcla.detalle(lambda: f"🧠 SISTEMA ML APRENDIENDO AUTOMÁTICAMENTE")
         
         if True:  # Forzar ejecución para debug
-            logger.info(f"🔧 Iniciando optimización ML de metano con XGBoost...")
+            log_mezcla.detalle(lambda: f"🔧 Iniciando optimización ML de metano con XGBoost...")
             
             try:
                 # Obtener configuración ML del dashboard
-                logger.info("🔧 Obteniendo configuración ML del dashboard...")
+                log_mezcla.detalle("🔧 Obteniendo configuración ML del dashboard...")
                 config_ml_dashboard = obtener_configuracion_ml_dashboard_interna()
                 modelos_activos = config_ml_dashboard.get('calculadora_energia', {}).get('modelos_activos', ['xgboost_calculadora'])
-                logger.info(f"🔧 Modelos activos: {modelos_activos}")
+                log_mezcla.detalle(lambda: f"🔧 Modelos activos: {modelos_activos}")
                 
                 if 'xgboost_calculadora' in modelos_activos:
-                    logger.info("🌳 Usando XGBoost para optimización de metano")
+                    log_mezcla.detalle("🌳 Usando XGBoost para optimización de metano")
                     
                     # Crear configuración específica para optimización de metano
                     config_metano = config.copy()
                     config_metano['objetivo_metano_diario'] = objetivo_metano
                     config_metano['prioridad_metano'] = True  # Marcar que la prioridad es metano
                     
-                    logger.info(f"🔧 Configuración para optimización de metano: {config_metano}")
+                    log_mezcla.detalle(lambda: f"🔧 Configuración para optimización de metano: {config_metano}")
                     
                     # EVITAR RECURSIÓN INFINITA - Usar optimización directa
-                    logger.info("🔧 Aplicando optimización ML directa (evitando recursión)...")
+                    log_mezcla.detalle("🔧 Aplicando optimización ML directa (evitando recursión)...")
                     resultado_optimizado = None  # Evitar llamada recursiva
                     
                     if resultado_optimizado and resultado_optimizado.get('totales', {}).get('porcentaje_metano', 0) > porcentaje_metano:
-                        logger.info("🔧 Optimización ML mejoró el metano, aplicando cambios...")
+                        log_mezcla.detalle("🔧 Optimización ML mejoró el metano, aplicando cambios...")
                         # Aplicar la mezcla optimizada
                         materiales_solidos = resultado_optimizado.get('materiales_solidos', materiales_solidos)
                         materiales_liquidos = resultado_optimizado.get('materiales_liquidos', materiales_liquidos)
@@ -2286,7 +2448,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                         
                         porcentaje_metano = resultado_optimizado.get('totales', {}).get('porcentaje_metano', porcentaje_metano)
                         
-                        logger.info(f"🔧 Optimización ML exitosa: Metano {porcentaje_metano:.1f}%, KW {kw_total_actual:.0f}")
+                        log_mezcla.detalle(lambda: f"🔧 Optimización ML exitosa: Metano {porcentaje_metano:.1f}%, KW {kw_total_actual:.0f}")
                     else:
                         logger.warning("🔧 Optimización ML no mejoró el metano, usando estrategia híbrida")
                         
@@ -2294,7 +2456,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                         diferencia_metano = objetivo_metano - porcentaje_metano
                         cambios_aplicados = 0
                         
-                        logger.info(f"🔧 Diferencia de metano: {diferencia_metano:.1f}% - Aplicando estrategia ULTRA AGRESIVA")
+                        log_mezcla.detalle(lambda: f"🔧 Diferencia de metano: {diferencia_metano:.1f}% - Aplicando estrategia ULTRA AGRESIVA")
                         
                         # Priorizar materiales con mayor CH4% usando datos reales del stock
                         materiales_ordenados_ch4 = []
@@ -2307,7 +2469,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                         # Ordenar por CH4% descendente, luego por lípidos
                         materiales_ordenados_ch4.sort(key=lambda x: (x[1], x[3]), reverse=True)
                         
-                        logger.info(f"🔧 Materiales ordenados por CH4% + Lípidos: {[(mat, f'CH4:{ch4:.1f}%, Lip:{lip:.1f}%') for mat, ch4, _, lip in materiales_ordenados_ch4[:5]]}")
+                        log_mezcla.detalle(lambda: f"🔧 Materiales ordenados por CH4% + Lípidos: {[(mat, f'CH4:{ch4:.1f}%, Lip:{lip:.1f}%') for mat, ch4, _, lip in materiales_ordenados_ch4[:5]]}")
                         
                         # ESTRATEGIA ULTRA AGRESIVA: Aumentar materiales con alto CH4% y lípidos
                         for mat, ch4_pct, kw_tn, lipidos_lab in materiales_ordenados_ch4[:5]:  # Top 5 materiales
@@ -2330,7 +2492,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                                     datos_mat['tn_usadas'] = nuevos_tn
                                     datos_mat['kw_aportados'] = nuevos_tn * kw_tn
                                     cambios_aplicados += 1
-                                    logger.info(f"🔧 {mat} ULTRA AUMENTADO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_pct:.1f}%, Lip: {lipidos_lab:.1f}%, Factor: {factor_aumento:.2f})")
+                                    log_mezcla.detalle(lambda: f"🔧 {mat} ULTRA AUMENTADO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_pct:.1f}%, Lip: {lipidos_lab:.1f}%, Factor: {factor_aumento:.2f})")
                             
                             elif mat in materiales_liquidos:
                                 datos_mat = materiales_liquidos[mat]
@@ -2343,7 +2505,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                                     datos_mat['tn_usadas'] = nuevos_tn
                                     datos_mat['kw_aportados'] = nuevos_tn * kw_tn
                                     cambios_aplicados += 1
-                                    logger.info(f"🔧 {mat} ULTRA AUMENTADO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_pct:.1f}%, Lip: {lipidos_lab:.1f}%, Factor: {factor_aumento:.2f})")
+                                    log_mezcla.detalle(lambda: f"🔧 {mat} ULTRA AUMENTADO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_pct:.1f}%, Lip: {lipidos_lab:.1f}%, Factor: {factor_aumento:.2f})")
                         
                         # ESTRATEGIA ADICIONAL: Reducir materiales con bajo CH4%
                         materiales_bajo_ch4 = []
@@ -2377,7 +2539,7 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                                 kw_generados_liquidos -= (datos['kw_aportados'] - nuevos_kw)
                                 cambios_aplicados += 1
                                 
-                                logger.info(f"🔧 {mat} ULTRA REDUCIDO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_mat:.1f}%, Factor: {factor_reduccion:.2f})")
+                                log_mezcla.detalle(lambda: f"🔧 {mat} ULTRA REDUCIDO: {cantidad_actual:.1f} → {nuevos_tn:.1f} TN (CH4: {ch4_mat:.1f}%, Factor: {factor_reduccion:.2f})")
                         
                         # Recalcular totales después de los cambios
                         if cambios_aplicados > 0:
@@ -2400,26 +2562,26 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                                 }
                                 consumo_chp = float(config.get('consumo_chp_global', 505.0))
                                 porcentaje_metano_nuevo = temp_functions.calcular_porcentaje_metano(resultado_temp, consumo_chp)
-                                logger.info(f"🔧 Metano optimizado: {porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%")
+                                log_mezcla.detalle(lambda: f"🔧 Metano optimizado: {porcentaje_metano:.1f}% → {porcentaje_metano_nuevo:.1f}%")
                                 porcentaje_metano = porcentaje_metano_nuevo
                             except Exception as e:
-                                logger.warning(f"Error recalculando metano: {e}")
+                                log_mezcla.muestreado('recalculo_metano', logging.WARNING, "Error recalculando metano: %s", e)
                 else:
                     logger.warning("🔧 XGBoost no está activo, usando estrategia híbrida")
                     
             except Exception as e:
                 logger.error(f"🔧 Error en optimización ML de metano: {e}")
-                logger.info("🔧 Continuando sin optimización de metano")
+                log_mezcla.detalle("🔧 Continuando sin optimización de metano")
 
         # OPTIMIZACIÓN ML ITERATIVA PARA ALCANZAR OBJETIVO
         kw_objetivo = float(config.get('kw_objetivo', 28800.0))
         kw_generado_actual = kw_generados_liquidos + kw_generados_solidos + kw_generados_purin
         diferencia_objetivo = kw_objetivo - kw_generado_actual
         
-        logger.info(f"🤖 OPTIMIZACIÓN ML: Objetivo={kw_objetivo:.0f} KW, Generado={kw_generado_actual:.0f} KW, Diferencia={diferencia_objetivo:.0f} KW")
+        log_mezcla.detalle(lambda: f"🤖 OPTIMIZACIÓN ML: Objetivo={kw_objetivo:.0f} KW, Generado={kw_generado_actual:.0f} KW, Diferencia={diferencia_objetivo:.0f} KW")
         
         if diferencia_objetivo > 100:  # Si falta más de 100 KW
-            logger.info(f"🤖 Iniciando optimización ML iterativa...")
+            log_mezcla.detalle(lambda: f"🤖 Iniciando optimización ML iterativa...")
             
             # EVOLUTIVO: Iterar hasta alcanzar el objetivo con parámetros evolutivos
             max_iteraciones = parametros_evolutivos.get('max_iteraciones', 8)
@@ -2427,10 +2589,10 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
             
             for iteracion in range(max_iteraciones):
                 if abs(diferencia_objetivo) <= tolerancia_kw:
-                    logger.info(f"✅ Objetivo alcanzado en iteración {iteracion + 1}")
+                    log_mezcla.detalle(lambda: f"✅ Objetivo alcanzado en iteración {iteracion + 1}")
                     break
                 
-                logger.info(f"🤖 Iteración {iteracion + 1}: Optimizando mezcla...")
+                log_mezcla.detalle(lambda: f"🤖 Iteración {iteracion + 1}: Optimizando mezcla...")
                 
                 # Estrategia ML: Priorizar materiales más eficientes
                 materiales_eficientes = []
@@ -2552,20 +2714,20 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
                                 kw_generados_liquidos += kw_a_agregar_material
                         
                         kw_a_agregar -= kw_a_agregar_material
-                        logger.info(f"🤖 {mat}: +{tn_a_agregar:.1f} TN → +{kw_a_agregar_material:.1f} KW")
+                        log_mezcla.detalle(lambda: f"🤖 {mat}: +{tn_a_agregar:.1f} TN → +{kw_a_agregar_material:.1f} KW")
                 
                 # Recalcular diferencia
                 kw_generado_actual = kw_generados_liquidos + kw_generados_solidos + kw_generados_purin
                 diferencia_objetivo = kw_objetivo - kw_generado_actual
                 
-                logger.info(f"🤖 Iteración {iteracion + 1} completada: {kw_generado_actual:.0f} KW (diferencia: {diferencia_objetivo:.0f} KW)")
+                log_mezcla.detalle(lambda: f"🤖 Iteración {iteracion + 1} completada: {kw_generado_actual:.0f} KW (diferencia: {diferencia_objetivo:.0f} KW)")
             
             # Verificación final
             if diferencia_objetivo > tolerancia_kw:
                 advertencias.append(f"⚠️ Optimización ML: No se alcanzó el objetivo completo. Generados: {kw_generado_actual:.0f} KW de {kw_objetivo:.0f} KW objetivo. Diferencia: {diferencia_objetivo:.0f} KW")
                 logger.warning(f"⚠️ Objetivo no alcanzado después de optimización ML: {kw_generado_actual:.0f} KW de {kw_objetivo:.0f} KW")
             else:
-                logger.info(f"✅ Objetivo alcanzado con optimización ML: {kw_generado_actual:.0f} KW de {kw_objetivo:.0f} KW objetivo")
+                log_mezcla.detalle(lambda: f"✅ Objetivo alcanzado con optimización ML: {kw_generado_actual:.0f} KW de {kw_objetivo:.0f} KW objetivo")
 
         # Filtrar materiales con cantidad > 0
         materiales_liquidos = {k: v for k, v in materiales_liquidos.items() if v['cantidad_tn'] > 0}
@@ -2604,48 +2766,77 @@ def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any])
         if sistema_evolutivo and config.get('habilitar_evolucion', False):
             try:
                 sistema_evolutivo.evolucionar_poblacion(resultado)
-                logger.info("🧬 Evolución aplicada correctamente")
+                log_mezcla.detalle("🧬 Evolución aplicada correctamente")
             except Exception as e:
                 logger.error(f"❌ Error en evolución: {e}")
         
         return resultado
 
+def calcular_mezcla_memoizada(algoritmo: str, funcion, config: Dict[str, Any], stock_actual: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ejecuta `funcion(config, stock_actual)` a través de la caché de mezclas.
+    La huella combina configuración, stock, versión del catálogo, versión de la
+    tabla de energía, configuración ML del dashboard, algoritmo y semilla. Sin modo determinístico (o con
+    evolución activada, que tiene efectos secundarios) se calcula siempre.
+    """
+    if not isinstance(config, dict) or not isinstance(stock_actual, dict):
+        return funcion(config, stock_actual)
+    if not config.get('modo_deterministico', True) or config.get('habilitar_evolucion', False):
+        return funcion(config, stock_actual)
+    try:
+        cargar_materiales_base_cacheado()
+        archivo_ml = os.path.join(SCRIPT_DIR, 'configuracion_ml_dashboard.json')
+        huella = huella_mezcla(
+            config, stock_actual, algoritmo,
+            version_catalogo=str(_CACHE_MATERIALES_BASE_MTIME),
+            semilla=int(config.get('semilla_mezcla', 0)),
+            extra={'ml_dashboard': os.path.getmtime(archivo_ml) if os.path.exists(archivo_ml) else None,
+                   'tabla_energia': tabla_energia.obtener().version}
+        )
+    except Exception as e:
+        logger.warning(f"No se pudo calcular la huella de la mezcla: {e}")
+        return funcion(config, stock_actual)
+    return cache_mezclas.calcular(huella, lambda: funcion(config, stock_actual))
+
+
+def calcular_mezcla_diaria(config: Dict[str, Any], stock_actual: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calcula la mezcla diaria automática para alcanzar el objetivo de KW.
+    Resultados memoizados por huella de entradas (ver calcular_mezcla_memoizada).
+    El detalle por material/iteración queda en DEBUG; en INFO se emite un
+    único resumen de la traza.
+    """
+    with traza('calcular_mezcla_diaria') as t:
+        resultado = calcular_mezcla_memoizada('calcular_mezcla_diaria', _calcular_mezcla_diaria_sin_cache,
+                                              config, stock_actual)
+        totales = resultado.get('totales', {}) if isinstance(resultado, dict) else {}
+        t.anotar(kw=round(float(totales.get('kw_total_generado', 0) or 0), 1),
+                 kw_objetivo=config.get('kw_objetivo') if isinstance(config, dict) else None,
+                 metano=round(float(totales.get('porcentaje_metano', 0) or 0), 2),
+                 materiales=sum(len(resultado.get(g, {})) for g in
+                                ('materiales_solidos', 'materiales_liquidos', 'materiales_purin'))
+                 if isinstance(resultado, dict) else 0)
+    return resultado
+
+
 def calcular_mezcla_algoritmo_genetico(config: Dict[str, Any], stock_actual: Dict[str, Any]) -> Dict[str, Any]:
     """
     Calcula la mezcla usando ALGORITMO GENÉTICO para optimización avanzada.
     Esta función respeta la configuración del Dashboard ML.
+
+    Población NumPy con aptitud vectorizada (kW, metano, reparto, stock),
+    torneo + SBX + mutación polinomial y elitismo, con presupuesto de tiempo
+    (`parametros_geneticos_ga` en la configuración para ajustarlo).
     """
     try:
         logger.info("🧬 Ejecutando ALGORITMO GENÉTICO para optimización de mezcla")
-        
-        # Usar la función principal pero con parámetros genéticos optimizados
-        parametros_geneticos = {
-            'factor_agresividad': 4.0,  # Más agresivo para algoritmo genético
-            'porcentaje_iteracion': 0.95,
-            'tolerancia_kw': 50,  # Más preciso
-            'max_iteraciones': 3,  # Más iteraciones para mejor optimización
-            'factor_seguridad_volumetrico': 1.05,
-            'prioridad_solidos': 0.95,
-            'algoritmo_genetico': True
-        }
-        
-        # Aplicar parámetros genéticos
-        config_genetico = config.copy()
-        config_genetico.update(parametros_geneticos)
-        
-        # Ejecutar algoritmo genético (usar función principal con parámetros genéticos)
-        resultado = calcular_mezcla_diaria(config_genetico, stock_actual)
-        
-        # Marcar que se usó algoritmo genético
-        if resultado and 'totales' in resultado:
-            resultado['algoritmo_usado'] = 'algoritmo_genetico'
-            resultado['parametros_geneticos'] = parametros_geneticos
-        
-        logger.info("🧬 Algoritmo genético completado exitosamente")
-        return resultado
-        
+        return calcular_mezcla_memoizada(
+            'algoritmo_genetico',
+            lambda cfg, stock: optimizar_mezcla_genetica(cfg, stock, matriz=obtener_matriz_materiales()),
+            config, stock_actual
+        )
     except Exception as e:
-        logger.error(f"Error en algoritmo genético: {e}")
+        logger.error(f"Error en algoritmo genético: {e}", exc_info=True)
         # Fallback a función principal
         return calcular_mezcla_diaria(config, stock_actual)
 
@@ -2690,6 +2881,25 @@ def calcular_mezcla_redes_neuronales(config: Dict[str, Any], stock_actual: Dict[
         return calcular_mezcla_diaria(config, stock_actual)
 
 
+def calcular_mezcla_programacion_lineal(config: Dict[str, Any], stock_actual: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calcula la mezcla con PROGRAMACIÓN LINEAL (LP/MILP): objetivo de KW, límites de
+    stock, reparto sólidos/líquidos/purín y umbral de metano. Determinística.
+    Los cambios chicos de objetivo o stock se re-resuelven en caliente desde la
+    última base del mismo estado de planta.
+    """
+    try:
+        return calcular_mezcla_memoizada(
+            'programacion_lineal',
+            lambda cfg, stock: resolutor_lp_incremental.resolver(cfg, stock, matriz=obtener_matriz_materiales()),
+            config, stock_actual
+        )
+    except Exception as e:
+        logger.error(f"Error en programación lineal: {e}", exc_info=True)
+        # Fallback a función principal
+        return calcular_mezcla_diaria(config, stock_actual)
+
+
 def calcular_mezcla_volumetrica_simple(config: Dict[str, Any], stock_actual: Dict[str, Any], porcentaje_solidos: float, porcentaje_liquidos: float, porcentaje_purin: float = 0.0, incluir_purin: bool = True) -> Dict[str, Any]:
     """
     Calcula la mezcla usando porcentajes volumétricos SIMPLES.
@@ -3384,82 +3594,23 @@ def calcular_mezcla_volumetrica_simple(config: Dict[str, Any], stock_actual: Dic
 
 def calcular_mezcla_volumetrica_iterativa(config: Dict[str, Any], stock_actual: Dict[str, Any], porcentaje_solidos: float, porcentaje_liquidos: float, max_iteraciones: int = 10, tolerancia_kw: int = 100) -> Dict[str, Any]:
     """
-    Calcula la mezcla volumétrica usando algoritmo iterativo para máxima precisión.
-    Prueba múltiples factores de ajuste hasta encontrar el que más se acerca al objetivo KW.
+    Calcula la mezcla volumétrica y la lleva al objetivo KW buscando el factor de
+    escala por búsqueda de raíz (kw(f) monótona con recorte por stock).
+    La telemetría de iteraciones queda en resultado['escalado'].
     """
     logger.info("🔄 Iniciando cálculo volumétrico ITERATIVO...")
     
     kw_objetivo = float(config.get('kw_objetivo', 28800))
-    mejor_resultado = None
-    mejor_precision = 0
-    mejor_diferencia = float('inf')
-    
-    # Rango de factores a probar (centrado en 0.71)
-    factores_base = [0.65, 0.67, 0.69, 0.71, 0.73, 0.75, 0.77, 0.79, 0.81]
-    
-    logger.info(f"📊 Objetivo KW: {kw_objetivo} KW")
-    logger.info(f"📊 Tolerancia: ±{tolerancia_kw} KW")
-    logger.info(f"📊 Máximo iteraciones: {max_iteraciones}")
-    
-    for iteracion in range(max_iteraciones):
-        # Usar factor base o calcular uno nuevo basado en iteraciones anteriores
-        if iteracion < len(factores_base):
-            factor = factores_base[iteracion]
-        else:
-            # Ajustar factor basado en resultados anteriores
-            if mejor_resultado:
-                kw_anterior = mejor_resultado['totales']['kw_total_generado']
-                diferencia_anterior = kw_anterior - kw_objetivo
-                
-                if diferencia_anterior > 0:  # Sobrepasamos el objetivo
-                    factor = factor * 0.98  # Reducir factor
-                else:  # No llegamos al objetivo
-                    factor = factor * 1.02  # Aumentar factor
-            else:
-                factor = 0.71
-        
-        logger.info(f"🔄 Iteración {iteracion + 1}: Factor = {factor:.3f}")
-        
-        # Crear copia del stock para esta iteración
-        stock_iteracion = {}
-        for mat, datos in stock_actual.items():
-            stock_iteracion[mat] = {
-                'cantidad_tn': datos.get('cantidad_tn', 0),
-                'st_porcentaje': datos.get('st_porcentaje', 0)
-            }
-        
-        # Calcular mezcla con este factor
-        resultado = calcular_mezcla_volumetrica_simple(config, stock_iteracion, porcentaje_solidos, porcentaje_liquidos, 0.0, True)
-        
-        # Verificar que el resultado sea válido
-        if not resultado or 'totales' not in resultado:
-            logger.warning(f"⚠️ Iteración {iteracion + 1}: Resultado inválido")
-            continue
-            
-        kw_generado = resultado['totales'].get('kw_total_generado', 0)
-        diferencia = abs(kw_generado - kw_objetivo)
-        precision = 100 - (diferencia / kw_objetivo * 100)
-        
-        logger.info(f"📊 KW generado: {kw_generado:.2f} KW (diferencia: {diferencia:.0f} KW, precisión: {precision:.1f}%)")
-        
-        # Verificar si es el mejor resultado hasta ahora
-        if diferencia < mejor_diferencia:
-            mejor_diferencia = diferencia
-            mejor_precision = precision
-            mejor_resultado = resultado
-            logger.info(f"✅ Nuevo mejor resultado: {precision:.1f}% de precisión")
-        
-        # Si llegamos a la tolerancia, parar
-        if diferencia <= tolerancia_kw:
-            logger.info(f"🎯 Objetivo alcanzado con tolerancia ±{tolerancia_kw} KW")
-            break
-    
-    if mejor_resultado:
-        logger.info(f"🏆 Mejor resultado final: {mejor_precision:.1f}% de precisión (diferencia: {mejor_diferencia:.0f} KW)")
-        return mejor_resultado
-    else:
+    resultado = calcular_mezcla_volumetrica_simple(config, stock_actual, porcentaje_solidos, porcentaje_liquidos, 0.0, True)
+    if not resultado or 'totales' not in resultado:
         logger.warning("⚠️ No se encontró resultado válido")
-        return calcular_mezcla_volumetrica_simple(config, stock_actual, porcentaje_solidos, porcentaje_liquidos, 0.0, True)
+        return resultado
+    
+    escalar_resultado(resultado, stock_actual, kw_objetivo, tolerancia_kw=tolerancia_kw, max_evaluaciones=max_iteraciones)
+    escalado = resultado.get('escalado', {})
+    logger.info(f"🏆 Resultado final: {resultado['totales']['kw_total_generado']:.0f} KW de {kw_objetivo:.0f} KW "
+                f"(factor {escalado.get('factor', 1.0):.3f}, {escalado.get('evaluaciones', 0)} evaluaciones)")
+    return resultado
 
 def calcular_mezcla_volumetrica_real(config: Dict[str, Any], stock_actual: Dict[str, Any], porcentaje_solidos: float, porcentaje_liquidos: float) -> Dict[str, Any]:
     """
@@ -4479,17 +4630,15 @@ def obtener_datos_dia_anterior() -> Dict[str, Any]:
         fecha_ayer = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
         
         # Buscar en el histórico diario
-        historico = cargar_historico_diario()
-        
-        for registro in historico:
-            if registro.get('fecha') == fecha_ayer:
-                return {
-                    'fecha': fecha_ayer,
-                    'kw_generados_real': registro.get('kw_generado_real', 0.0),
-                    'kw_planificado': registro.get('kw_planificado', 0.0),
-                    'kw_inyectados_real': registro.get('kw_inyectado_real', 0.0),
-                    'fuente': 'historico_diario'
-                }
+        registro = historico_diario_store.obtener(fecha_ayer)
+        if registro:
+            return {
+                'fecha': fecha_ayer,
+                'kw_generados_real': registro.get('kw_generado_real', 0.0),
+                'kw_planificado': registro.get('kw_planificado', 0.0),
+                'kw_inyectados_real': registro.get('kw_inyectado_real', 0.0),
+                'fuente': 'historico_diario'
+            }
         
         # Si no está en histórico, buscar en registros de 15 minutos del día anterior
         try:
@@ -4536,41 +4685,29 @@ def obtener_datos_dia_anterior() -> Dict[str, Any]:
 # FUNCIONES DE HISTÓRICO DIARIO CORREGIDAS
 
 def cargar_historico_diario() -> List[Dict[str, Any]]:
-    """Carga el histórico diario productivo desde el archivo"""
+    """Carga el histórico diario productivo (más reciente primero)"""
     try:
-        if os.path.exists(HISTORICO_DIARIO_FILE):
-            with open(HISTORICO_DIARIO_FILE, 'r', encoding='utf-8') as f:
-                historico = json.load(f)
-            return historico if isinstance(historico, list) else []
-        return []
+        return historico_diario_store.listar()
     except Exception as e:
         logger.error(f"Error cargando histórico diario: {e}", exc_info=True)
         return []
 
 def guardar_historico_diario(historico: List[Dict[str, Any]]) -> bool:
-    """Guarda el histórico diario productivo en el archivo"""
+    """Guarda el histórico diario productivo completo (la retención la aplica el almacén)"""
     try:
-        # Mantener solo los últimos 30 días para no sobrecargar el archivo
-        if len(historico) > 30:
-            historico = historico[-30:]
-        
-        with open(HISTORICO_DIARIO_FILE, 'w', encoding='utf-8') as f:
-            json.dump(historico, f, indent=4, ensure_ascii=False)
-        return True
+        return historico_diario_store.reemplazar(historico)
     except Exception as e:
         logger.error(f"Error guardando histórico diario: {e}", exc_info=True)
         return False
 def obtener_planificacion_semanal():
-    """Calcula la planificación semanal ajustando la mezcla diaria cada día según el stock disponible"""
+    """Calcula la planificación semanal conjunta (7 días acoplados por el stock disponible y las entregas programadas)"""
     try:
         logger.info("OBTENER_PLAN_SEMANAL: Iniciando cálculo...")
         config_actual = cargar_configuracion() or {}
-        objetivo_diario = float(config_actual.get('kw_objetivo', 28800))
-        dias_semana = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
         
         # Cargar stock actual y convertir al formato esperado
         try:
-            stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
+            stock_data = stock_ledger.stock_actual()
             raw_stock = stock_data.get('materiales', {})
             
             # Convertir el stock al formato esperado por calcular_mezcla_diaria
@@ -4589,7 +4726,9 @@ def obtener_planificacion_semanal():
                     stock[material] = {
                         'total_tn': total_tn,
                         'st_porcentaje': st_porcentaje,
-                        'total_solido': total_solido  # Mantener para compatibilidad
+                        'total_solido': total_solido,  # Mantener para compatibilidad
+                        'kw_tn': info.get('kw_tn'),
+                        'tipo': info.get('tipo')
                     }
                     
         except Exception as e:
@@ -4606,78 +4745,11 @@ def obtener_planificacion_semanal():
         
         logger.info(f"OBTENER_PLAN_SEMANAL: Stock inicial: {list(stock.keys())}")
 
-        # Copia profunda para evitar modificar el stock original
-        import copy
-        stock_restante = copy.deepcopy(stock)
-        planificacion = {}
-        advertencias_generales = []
-
-        for dia in dias_semana:
-            logger.info(f"OBTENER_PLAN_SEMANAL: Calculando para {dia}...")
-            
-            # Calcular mezcla diaria con el stock restante
-            try:
-                mezcla = calcular_mezcla_diaria(
-                    config=config_actual,
-                    stock_actual=stock_restante
-                )
-                
-                if not isinstance(mezcla, dict) or 'totales' not in mezcla:
-                    logger.error(f"OBTENER_PLAN_SEMANAL: Error en mezcla para {dia}")
-                    planificacion[dia] = {'error': 'Fallo al calcular mezcla - formato inválido'}
-                    continue
-                    
-            except Exception as e:
-                logger.error(f"OBTENER_PLAN_SEMANAL: Excepción calculando mezcla para {dia}: {e}")
-                planificacion[dia] = {'error': f'Excepción al calcular mezcla: {str(e)}'}
-                continue
-            
-            kw_generados = mezcla['totales']['kw_total_generado']
-            tn_solidos = mezcla['totales'].get('tn_solidos', 0)
-            tn_liquidos = mezcla['totales'].get('tn_liquidos', 0)
-            
-            logger.info(f"OBTENER_PLAN_SEMANAL: Mezcla para {dia}: KW Gen={kw_generados:.2f}, TN Sólidos={tn_solidos:.2f}, TN Líquidos={tn_liquidos:.2f}")
-
-            # Verificar si se puede cumplir el objetivo
-            advertencia = ''
-            if kw_generados < objetivo_diario:
-                diferencia = objetivo_diario - kw_generados
-                advertencia = f'Objetivo no cumplido. Faltan {diferencia:.1f} kW'
-                advertencias_generales.append(f'{dia}: {advertencia}')
-            
-            # Restar stock usado del stock restante
-            try:
-                for categoria in ['materiales_solidos', 'materiales_liquidos', 'materiales_purin']:
-                    materiales_categoria = mezcla.get(categoria, {})
-                    for material, datos_material in materiales_categoria.items():
-                        if material in stock_restante:
-                            tn_usadas = datos_material.get('tn_usadas', 0)
-                            if tn_usadas > 0:
-                                stock_restante[material]['total_tn'] = max(0, stock_restante[material]['total_tn'] - tn_usadas)
-                                logger.info(f"OBTENER_PLAN_SEMANAL: {material} - Usadas: {tn_usadas:.2f} TN, Restante: {stock_restante[material]['total_tn']:.2f} TN")
-                                
-                                # Eliminar material si se agotó
-                                if stock_restante[material]['total_tn'] <= 0.1:
-                                    del stock_restante[material]
-                                    logger.info(f"OBTENER_PLAN_SEMANAL: Material {material} agotado y eliminado del stock")
-                                    
-            except Exception as e:
-                logger.error(f"Error restando stock para {dia}: {e}")
-
-            planificacion[dia] = {
-                'materiales_solidos': mezcla.get('materiales_solidos', {}),
-                'materiales_liquidos': mezcla.get('materiales_liquidos', {}),
-                'materiales_purin': mezcla.get('materiales_purin', {}),
-                'kw_objetivo': objetivo_diario,
-                'kw_generados': kw_generados,
-                'stock_restante': {k: v['total_tn'] for k, v in stock_restante.items() if isinstance(v, dict) and 'total_tn' in v},
-                'completado': kw_generados >= objetivo_diario,
-                'advertencia': advertencia,
-                'totales': mezcla.get('totales', {})
-            }
-        
-        planificacion['advertencias_generales'] = advertencias_generales
-        logger.info(f"OBTENER_PLAN_SEMANAL: Planificación semanal calculada. Días: {list(planificacion.keys())}")
+        # Semana completa en una sola resolución con balance de inventario y entregas
+        # programadas; reutiliza el plan previo cuando sigue siendo factible
+        planificacion = planificador_alimentacion.planificar(config_actual, stock, matriz=obtener_matriz_materiales())
+        logger.info(f"OBTENER_PLAN_SEMANAL: Planificación semanal calculada ({planificacion['optimizacion']['modo']}). "
+                    f"Días: {[d for d in planificacion if d not in ('advertencias_generales', 'optimizacion')]}")
         return planificacion
         
     except Exception as e:
@@ -5032,7 +5104,7 @@ def dashboard_original():
         # Cargar configuración y datos necesarios
         config_actual = cargar_configuracion()
         datos_reales = cargar_datos_reales_dia()
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
+        stock_data = stock_ledger.stock_actual()
         stock_actual = stock_data.get('materiales', {})
         
         try:
@@ -5225,7 +5297,7 @@ def dashboard_original():
 def gestion_materiales_admin():
     """Página de gestión de materiales para administradores"""
     try:
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
+        stock_data = stock_ledger.stock_actual()
         stock_actual = stock_data.get('materiales', {})
         materiales_base = getattr(temp_functions, 'MATERIALES_BASE', {})
         config_global = cargar_configuracion()
@@ -5815,29 +5887,18 @@ def actualizar_materiales_base():
         
         # SINCRONIZAR CON STOCK.JSON - CRÍTICO PARA EVITAR CONFLICTOS
         try:
-            # Cargar stock actual
-            with open(STOCK_FILE, 'r', encoding='utf-8') as f:
-                stock_data = json.load(f)
-            stock_materiales = stock_data.get('materiales', {})
-            
-            # Sincronizar materiales base con stock
+            # Sincronizar materiales base con stock (ajustes de atributos en el libro)
             materiales_sincronizados = 0
             for nombre_material, datos_material in materiales_existentes.items():
-                if nombre_material in stock_materiales:
-                    # Actualizar datos del stock con los datos de laboratorio
-                    stock_materiales[nombre_material].update({
-                        'st_porcentaje': datos_material['st'] * 100,
-                        'tipo': datos_material['tipo'],
-                        'densidad': datos_material['densidad'],
-                        'kw_tn': datos_material['kw/tn']
-                    })
+                movimiento = stock_ledger.actualizar_atributos(nombre_material, {
+                    'st_porcentaje': datos_material['st'] * 100,
+                    'tipo': datos_material['tipo'],
+                    'densidad': datos_material['densidad'],
+                    'kw_tn': datos_material['kw/tn']
+                }, origen='actualizar_materiales_base')
+                if movimiento:
                     materiales_sincronizados += 1
             
-            # Guardar stock sincronizado
-            stock_data['materiales'] = stock_materiales
-            with open(STOCK_FILE, 'w', encoding='utf-8') as f:
-                json.dump(stock_data, f, indent=4, ensure_ascii=False)
-            
             logger.info(f"🔄 SINCRONIZADO: {materiales_sincronizados} materiales con stock.json")
             
         except Exception as e:
@@ -6079,7 +6140,7 @@ def sincronizar_stock_tabla():
             'st_porcentaje': st_correcto,
             'total_tn': cantidad,
             'tipo': datos.get('tipo', 'solido'),
-            'kw_tn': datos.get('kw_tn', 0)
+            'kw_tn': tabla_energia.obtener().kw_tn_en_escala(material, float(datos.get('kw_tn', 0) or 0))
         }
     
     logger.info("✅ Datos de stock procesados igual que el endpoint")
@@ -6178,16 +6239,8 @@ def sincronizar_stock_tabla():
                 logger.info(f"   ⏭️ ST sin cambios: diferencia {abs(st_stock - st_tabla):.1f}% < 0.1%")
             
             # IMPORTANTE: NO tocar los datos de laboratorio (carbohidratos, lípidos, proteínas)
-            # Solo sincronizar ST, KW/TN y tipo
-            
-            # Actualizar KW/TN si es diferente
-            kw_tn_stock = datos_stock.get('kw_tn', 0)
-            kw_tn_tabla = material_tabla.get('kw/tn', 0)
-            
-            if abs(kw_tn_stock - kw_tn_tabla) > 0.001:
-                material_tabla['kw/tn'] = kw_tn_stock
-                materiales_actualizados.append(f"{nombre_stock}: KW/TN {kw_tn_tabla:.4f} → {kw_tn_stock:.4f}")
-                logger.info(f"   ✅ KW/TN actualizado: {kw_tn_tabla:.4f} → {kw_tn_stock:.4f}")
+            # Solo sincronizar ST y tipo. El 'kw/tn' del catálogo es la entrada de la tabla
+            # de energía (a 505 m³/kW): copiarle el kW/tn efectivo lo escalaría dos veces.
             
             # Actualizar tipo si es diferente
             tipo_stock = datos_stock.get('tipo', 'solido')
@@ -6210,6 +6263,7 @@ def sincronizar_stock_tabla():
     # Guardar tabla actualizada siempre
     with open('materiales_base_config.json', 'w', encoding='utf-8') as f:
         json.dump(materiales_config, f, indent=2, ensure_ascii=False)
+    tabla_energia.invalidar('catalogo')
     
     logger.info("✅ Tabla de gestión actualizada y guardada")
     
@@ -6367,7 +6421,11 @@ def verificar_sincronizacion_endpoint():
 
 @app.route('/guardar_material', methods=['POST'])
 def guardar_material_endpoint():
-    """Guarda/actualiza un material en la base configurada y recalcula kw/tn."""
+    """
+    Guarda/actualiza un material en la base configurada. El 'kw/tn' del catálogo
+    se deriva con MatrizMateriales a 505 m³/kW (convención de la tabla de energía);
+    la respuesta incluye el kW/tn efectivo de la tabla (ST de camiones y motor).
+    """
     try:
         payload = request.get_json(force=True, silent=True) or {}
         nombre = str(payload.get('nombre', '')).strip()
@@ -6396,10 +6454,6 @@ def guardar_material_endpoint():
         sv_pct = to_float(payload.get('sv')) if 'sv' in payload else material_existente.get('sv', 0.0) * 100
         m3_tnsv = to_float(payload.get('m3_tnsv')) if 'm3_tnsv' in payload else material_existente.get('m3_tnsv', 0.0)
         
-        config_global = cargar_configuracion()
-        consumo_chp_global = to_float(config_global.get('consumo_chp', 505.0), 505.0)
-
-        # Fórmula corregida: KW/TN = (ST × SV × M³/TN SV × CH4%) / Consumo CHP
         # PRESERVAR datos nutricionales existentes - NO multiplicar por 100 si ya están guardados como decimales
         carbohidratos = to_float(payload.get('carbohidrato')) if 'carbohidrato' in payload else material_existente.get('carbohidratos', 0.0) * 100
         lipidos = to_float(payload.get('lipido')) if 'lipido' in payload else material_existente.get('lipidos', 0.0) * 100
@@ -6418,9 +6472,9 @@ def guardar_material_endpoint():
             if total_biogas > 0:
                 ch4_porcentaje = ((proteinas * 0.71) + (lipidos * 0.68) + (carbohidratos * 0.5)) / total_biogas
         
-        # Fórmula corregida: KW/TN = (ST × SV × M³/TN SV × CH4%) / Consumo CHP
-        # Donde ST y SV están en decimales (ej: 0.35 para 35%)
-        kw_tn = ((st_pct / 100.0) * (sv_pct / 100.0) * m3_tnsv * ch4_porcentaje) / consumo_chp_global if consumo_chp_global > 0 else 0.0
+        # KW/TN de catálogo = (ST × SV × M³/TN SV × CH4%) / 505, la misma derivación que la tabla de energía
+        kw_tn = float(MatrizMateriales({nombre: {'st': st_pct / 100.0, 'sv': sv_pct / 100.0, 'm3_tnsv': m3_tnsv,
+                                                  'ch4': ch4_porcentaje}}).kw_tn[0])
 
         # Obtener el tipo del material (preservar si no se especifica uno nuevo)
         tipo_material = payload.get('tipo', material_existente.get('tipo', 'solido')).strip().lower()
@@ -6469,6 +6523,7 @@ def guardar_material_endpoint():
         with open(CONFIG_BASE_MATERIALES_FILE, 'w', encoding='utf-8') as f:
             json.dump(materiales_base, f, indent=4, ensure_ascii=False)
         temp_functions.MATERIALES_BASE = materiales_base
+        tabla_energia.invalidar('catalogo')
 
         logger.info(f"✅ MATERIAL GUARDADO: {nombre}")
         logger.info(f"   Tipo final: {material['tipo']}")
@@ -6478,7 +6533,8 @@ def guardar_material_endpoint():
         logger.info(f"   M3/TNSV final: {material['m3_tnsv']}")
         logger.info(f"   Carbohidratos final: {material['carbohidratos']} ({material['carbohidratos'] * 100}%)")
         
-        return jsonify({'success': True, 'material': material})
+        return jsonify({'success': True, 'material': material,
+                        'kw_tn_efectivo': round(tabla_energia.kw_tn(nombre, material['kw/tn']), 4)})
     except Exception as e:
         logger.error(f"Error al guardar material: {e}", exc_info=True)
         return jsonify({'success': False, 'message': f'Error al guardar material: {str(e)}'}), 500
@@ -8285,7 +8341,7 @@ def agregar_registro_diario(fecha: str = None) -> bool:
         # Cargar datos necesarios
         config_actual = cargar_configuracion()
         datos_reales = cargar_datos_reales_dia()
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
+        stock_data = stock_ledger.stock_actual()
         stock_actual = stock_data.get('materiales', {})
         
         # Calcular mezcla planificada
@@ -8323,26 +8379,8 @@ def agregar_registro_diario(fecha: str = None) -> bool:
             }
         }
         
-        # Cargar histórico existente
-        historico = cargar_historico_diario()
-        
-        # Verificar si ya existe un registro para esta fecha
-        registro_existente = False
-        for i, registro in enumerate(historico):
-            if registro.get('fecha') == fecha:
-                historico[i] = registro_dia
-                registro_existente = True
-                break
-        
-        # Si no existe, agregar nuevo registro
-        if not registro_existente:
-            historico.append(registro_dia)
-        
-        # Ordenar por fecha (más reciente primero)
-        historico.sort(key=lambda x: x.get('fecha', ''), reverse=True)
-        
-        # Guardar histórico actualizado
-        return guardar_historico_diario(historico)
+        # Insertar o reemplazar el día en el histórico indexado
+        return historico_diario_store.upsert(registro_dia)
         
     except Exception as e:
         logger.error(f"Error agregando registro diario: {e}", exc_info=True)
@@ -8350,14 +8388,8 @@ def agregar_registro_diario(fecha: str = None) -> bool:
 def obtener_datos_historicos_graficos(dias: int = 7) -> Dict[str, Any]:
     """Obtiene los datos históricos formateados para gráficos de los últimos N días"""
     try:
-        historico = cargar_historico_diario()
-        
-        # Filtrar por días solicitados
-        if dias > 0:
-            historico = historico[:dias]
-        
-        # Ordenar por fecha (más antiguo primero para gráficos)
-        historico.sort(key=lambda x: x.get('fecha', ''))
+        # Últimos N días, ya en orden cronológico para gráficos
+        historico = historico_diario_store.ultimos(dias) if dias > 0 else historico_diario_store.rango()
         
         # Preparar datos para gráficos
         fechas = []
@@ -8530,6 +8562,54 @@ def obtener_datos_historicos_endpoint(dias):
         logger.error(f"Error en obtener_datos_historicos_endpoint: {e}", exc_info=True)
         return jsonify({'error': f'Error obteniendo datos históricos: {str(e)}'}), 500
 
+# ENDPOINT PARA CONSULTAR EL HISTÓRICO DIARIO POR RANGO DE FECHAS
+@app.route('/obtener_historico_diario')
+def obtener_historico_diario_endpoint():
+    """Devuelve el histórico diario entre ?desde=YYYY-MM-DD y ?hasta=YYYY-MM-DD"""
+    try:
+        desde = request.args.get('desde')
+        hasta = request.args.get('hasta')
+        for fecha in (desde, hasta):
+            if fecha:
+                datetime.strptime(fecha, '%Y-%m-%d')
+        
+        registros = historico_diario_store.rango(desde, hasta)
+        return jsonify({
+            'status': 'success',
+            'desde': desde,
+            'hasta': hasta,
+            'total': len(registros),
+            'registros': registros
+        })
+        
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido, usar YYYY-MM-DD'}), 400
+    except Exception as e:
+        logger.error(f"Error en obtener_historico_diario_endpoint: {e}", exc_info=True)
+        return jsonify({'error': f'Error obteniendo histórico diario: {str(e)}'}), 500
+
+# ENDPOINT PARA AGREGADOS SEMANALES / MENSUALES DEL HISTÓRICO
+@app.route('/historico_diario/agregados/<periodo>')
+def historico_diario_agregados_endpoint(periodo):
+    """Devuelve los agregados precalculados ('semanal' o 'mensual') del histórico diario"""
+    try:
+        if periodo not in ('semanal', 'mensual'):
+            return jsonify({'error': "Periodo debe ser 'semanal' o 'mensual'"}), 400
+        
+        agregados = historico_diario_store.agregados(
+            periodo, request.args.get('desde'), request.args.get('hasta')
+        )
+        return jsonify({
+            'status': 'success',
+            'periodo': periodo,
+            'total': len(agregados),
+            'agregados': agregados
+        })
+        
+    except Exception as e:
+        logger.error(f"Error en historico_diario_agregados_endpoint: {e}", exc_info=True)
+        return jsonify({'error': f'Error obteniendo agregados: {str(e)}'}), 500
+
 # ENDPOINT PARA AGREGAR REGISTRO DIARIO
 @app.route('/agregar_registro_diario', methods=['POST'])
 def agregar_registro_diario_endpoint():
@@ -8569,7 +8649,7 @@ def obtener_mezcla_diaria_endpoint():
     """Endpoint para obtener la mezcla diaria calculada"""
     try:
         config_actual = cargar_configuracion()
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
+        stock_data = stock_ledger.stock_actual()
         stock_actual = stock_data.get('materiales', {})
         
         mezcla = calcular_mezcla_diaria(config_actual, stock_actual)
@@ -9231,7 +9311,6 @@ def obtener_resumen_energia_endpoint():
         return jsonify({'error': f'Error obteniendo resumen de energía: {str(e)}'}), 500
 
 # ENDPOINT PARA ACTUALIZAR STOCK
-@app.route('/actualizar_stock', methods=['POST'])
 def sincronizar_stock_con_tabla(datos_stock):
     """Sincroniza automáticamente el ST del stock con la tabla de materiales base y recalcula KW/TN"""
     try:
@@ -9290,6 +9369,7 @@ def sincronizar_stock_con_tabla(datos_stock):
         logger.error(f"❌ Error en sincronización: {e}")
         raise
 
+@app.route('/actualizar_stock', methods=['POST'])
 def actualizar_stock_endpoint():
     """Endpoint para actualizar el stock de materiales"""
     try:
@@ -9303,8 +9383,8 @@ def actualizar_stock_endpoint():
             if not isinstance(datos_stock, dict) or 'materiales' not in datos_stock:
                 return jsonify({'error': 'Estructura de datos inválida'}), 400
             
-            # Guardar stock
-            if guardar_json_seguro(STOCK_FILE, datos_stock):
+            # Guardar stock registrando los ajustes en el libro de movimientos
+            if stock_ledger.reconciliar(datos_stock, origen='actualizar_stock') is not None:
                 # SINCRONIZAR STOCK CON TABLA DE MATERIALES BASE - CRÍTICO
                 try:
                     sincronizar_stock_con_tabla(datos_stock)
@@ -9402,26 +9482,14 @@ def registrar_material_endpoint():
                 json.dump(registros, f, indent=4, ensure_ascii=False)
         except Exception as e:
             logger.warning(f"No se pudo actualizar {REGISTROS_FILE}: {e}")
+        tabla_energia.invalidar('registros')
 
-        stock = cargar_json_seguro(STOCK_FILE) or {'materiales': {}}
-        materiales = stock.get('materiales', {})
-        if material not in materiales:
-            materiales[material] = {
-                'total_tn': 0.0,
-                'st_porcentaje': st_analizado or 0.0,
-                'total_solido': 0.0,
-                'ultima_actualizacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-        materiales[material]['total_tn'] = float(materiales[material].get('total_tn', 0.0)) + tn_descargadas
-        try:
-            st_pct = float(materiales[material].get('st_porcentaje', st_analizado or 0.0))
-            materiales[material]['total_solido'] = float(materiales[material].get('total_solido', 0.0)) + (tn_descargadas * (st_pct / 100.0))
-            materiales[material]['st_porcentaje'] = st_pct
-        except Exception:
-            pass
-        materiales[material]['ultima_actualizacion'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        stock['materiales'] = materiales
-        guardar_json_seguro(STOCK_FILE, stock)
+        stock_ledger.registrar_movimiento(
+            'entrada', material, tn_descargadas,
+            st_porcentaje=st_analizado,
+            origen='registrar_material',
+            referencia=numero_remito or patente or None
+        )
 
         return jsonify({'status': 'success', 'mensaje': 'Material registrado y stock actualizado'})
     except Exception as e:
@@ -9429,6 +9497,336 @@ def registrar_material_endpoint():
         return jsonify({'status': 'error', 'mensaje': str(e)}), 500
 
 
+@app.route('/api/registros/importar', methods=['POST'])
+def importar_registros_endpoint():
+    """Importa en lote descargas de camiones (CSV/XLSX en 'archivo' o lista JSON).
+
+    Con ?validar_solo=1 sólo informa los errores por fila sin modificar nada.
+    """
+    try:
+        if 'archivo' in request.files:
+            archivo = request.files['archivo']
+            df = leer_lote(archivo.read(), archivo.filename or '')
+        else:
+            datos = request.get_json(force=True, silent=True)
+            if isinstance(datos, dict):
+                datos = datos.get('registros')
+            if not isinstance(datos, list):
+                return jsonify({'status': 'error', 'mensaje': "Enviar un archivo 'archivo' o una lista JSON de registros"}), 400
+            df = leer_lote(filas=datos)
+
+        total_filas = len(df)
+        avisos = []
+        validos, errores = validar_lote(df, cargar_json_seguro(CONFIG_BASE_MATERIALES_FILE) or {}, avisos=avisos)
+        registros_nuevos = construir_registros(validos)
+        validar_solo = request.args.get('validar_solo', '').lower() in ('1', 'true', 'si')
+
+        if registros_nuevos and not validar_solo:
+            # Deltas de stock en un único lote del libro de movimientos
+            stock_ledger.registrar_lote(movimientos_de_registros(registros_nuevos), origen='importacion')
+
+            registros = cargar_json_seguro(REGISTROS_FILE) or []
+            registros.extend(registros_nuevos)
+            guardar_json_seguro(REGISTROS_FILE, registros)
+            _st_cache.cache_clear()
+            tabla_energia.invalidar('registros')
+
+        logger.info(f"📥 Importación: {len(registros_nuevos)}/{total_filas} filas válidas, {len(errores)} errores")
+        return jsonify({
+            'status': 'success' if not errores else 'parcial',
+            'validar_solo': validar_solo,
+            'filas_totales': total_filas,
+            'filas_importadas': 0 if validar_solo else len(registros_nuevos),
+            'filas_validas': len(registros_nuevos),
+            'errores': errores,
+            'avisos': avisos
+        })
+    except Exception as e:
+        logger.error(f"Error en importar_registros_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/stock/movimientos', methods=['GET', 'POST'])
+def stock_movimientos_endpoint():
+    """Consulta (GET) o registra (POST) movimientos del libro de stock."""
+    try:
+        if request.method == 'POST':
+            datos = request.get_json(force=True, silent=True) or {}
+            tipo = (datos.get('tipo') or '').strip()
+            material = (datos.get('material') or '').strip()
+            tn = float(str(datos.get('tn', 0)).replace(',', '.'))
+            if not material:
+                return jsonify({'status': 'error', 'mensaje': 'Material requerido'}), 400
+            movimiento = stock_ledger.registrar_movimiento(
+                tipo, material, tn,
+                st_porcentaje=datos.get('st_porcentaje'),
+                origen=datos.get('origen') or 'api',
+                referencia=datos.get('referencia')
+            )
+            return jsonify({'status': 'success', 'movimiento': movimiento})
+
+        movimientos = stock_ledger.movimientos(
+            desde=request.args.get('desde'),
+            hasta=request.args.get('hasta'),
+            material=request.args.get('material'),
+            tipo=request.args.get('tipo')
+        )
+        return jsonify({'status': 'success', 'total': len(movimientos), 'movimientos': movimientos})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error en stock_movimientos_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/stock/al_momento')
+def stock_al_momento_endpoint():
+    """Stock reconstruido a una fecha/hora ISO (?momento=2025-09-30T18:00:00)."""
+    try:
+        momento = request.args.get('momento') or datetime.now().isoformat()
+        estado = stock_ledger.stock_en(momento)
+        return jsonify({'status': 'success', 'momento': momento, **estado})
+    except Exception as e:
+        logger.error(f"Error en stock_al_momento_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/stock/consumos')
+def stock_consumos_endpoint():
+    """Totales de entradas, consumos y ajustes por material en un rango."""
+    try:
+        totales = stock_ledger.consumos_por_material(
+            desde=request.args.get('desde'),
+            hasta=request.args.get('hasta')
+        )
+        return jsonify({'status': 'success', 'materiales': totales})
+    except Exception as e:
+        logger.error(f"Error en stock_consumos_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/mezcla/cache', methods=['GET', 'DELETE'])
+def mezcla_cache_endpoint():
+    """Estadísticas de la caché de mezclas (GET) o invalidación completa (DELETE)."""
+    try:
+        if request.method == 'DELETE':
+            cache_mezclas.invalidar()
+        return jsonify({'status': 'success', **cache_mezclas.estadisticas()})
+    except Exception as e:
+        logger.error(f"Error en mezcla_cache_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/mezcla/escenarios', methods=['POST'])
+def mezcla_escenarios_endpoint():
+    """
+    Escenarios what-if en lote contra un mismo estado base.
+    Body: {"escenarios": [{nombre, kw_objetivo, config, excluir, entregas, stock, algoritmo}],
+           "base": {...config}, "algoritmo": "programacion_lineal", "workers": 4, "incluir_detalle": false}
+    """
+    try:
+        data = request.get_json() or {}
+        escenarios = data.get('escenarios')
+        if not isinstance(escenarios, list) or not escenarios:
+            return jsonify({'status': 'error', 'mensaje': 'Se requiere una lista de escenarios'}), 400
+
+        # Estado base cargado una sola vez para todo el lote
+        config_base = cargar_configuracion()
+        config_base.update(data.get('base') or {})
+        stock_base = stock_ledger.stock_actual().get('materiales', {})
+
+        calculadores = {
+            'energetico': calcular_mezcla_diaria,
+            'xgboost_calculadora': calcular_mezcla_diaria,
+            'algoritmo_genetico': calcular_mezcla_algoritmo_genetico,
+            'programacion_lineal': calcular_mezcla_programacion_lineal,
+            'redes_neuronales': calcular_mezcla_redes_neuronales,
+            'optimizacion_bayesiana': calcular_mezcla_optimizacion_bayesiana,
+        }
+        algoritmo = data.get('algoritmo')
+        if not algoritmo:
+            modelos_activos = obtener_configuracion_ml_dashboard_interna().get('calculadora_energia', {}).get('modelos_activos', [])
+            algoritmo = next((m for m in modelos_activos if m in calculadores), 'energetico')
+
+        resultado = evaluar_escenarios(config_base, stock_base, escenarios, calculadores, algoritmo,
+                                       max_workers=data.get('workers'),
+                                       incluir_detalle=bool(data.get('incluir_detalle', False)))
+        return jsonify({'status': 'success', 'algoritmo_base': algoritmo, **resultado})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error en mezcla_escenarios_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/mezcla/sensibilidad', methods=['POST'])
+def mezcla_sensibilidad_endpoint():
+    """
+    Jacobiano de kW, % metano y tn totales respecto de tn, kW/tn y ST de cada material.
+    Body: {"mezcla": {"Silaje de Maiz": 40, ...} o un resultado de calcular_mezcla (por defecto la última),
+           "variaciones": [{"material": "Silaje de Maiz", "variable": "st", "delta": -2}],
+           "metodo": "auto|analitico|diferencias", "todos": false}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        mezcla = data.get('mezcla')
+        entrada = nucleo_mezcla.preparar({k: data[k] for k in ('kw_objetivo', 'objetivo_metano') if k in data})
+        if mezcla is None:
+            mezcla = nucleo_mezcla.ultimo_resultado or nucleo_mezcla.resolver(entrada, 'energetico')
+        if not isinstance(mezcla, dict):
+            return jsonify({'status': 'error', 'mensaje': "'mezcla' debe ser {material: tn} o un resultado de mezcla"}), 400
+        if any(grupo in mezcla for grupo in GRUPOS_MEZCLA):
+            cantidades = cantidades_de_resultado(mezcla)
+        else:
+            cantidades = {mat: float(tn) for mat, tn in mezcla.items()}
+
+        # kW/tn y ST efectivos del stock, los mismos que usa el cálculo de la mezcla
+        resultado = analizar_sensibilidad(entrada.matriz, cantidades, kw_tn=entrada.kw_tn, st=entrada.st,
+                                          metodo=data.get('metodo', 'auto'), variaciones=data.get('variaciones'),
+                                          todos=bool(data.get('todos', False)))
+        return jsonify({'status': 'success', **resultado})
+    except (ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error en mezcla_sensibilidad_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/mezcla/pareto', methods=['POST'])
+def mezcla_pareto_endpoint():
+    """
+    Frente de Pareto (desvío de kW, metano, autonomía de stock, costo) calculado con NSGA-II.
+    El frente se cachea por huella de entradas: cambiar sólo `pesos` elige otro
+    punto sin volver a optimizar.
+    Body: {"kw_objetivo": 28800, ..., "pesos": {"desvio_kw": 1, "porcentaje_metano": 2, "autonomia_dias": 1, "costo": 0}}
+    """
+    try:
+        data = request.get_json() or {}
+        config = cargar_configuracion()
+        for clave in ('kw_objetivo', 'porcentaje_solidos', 'porcentaje_liquidos', 'porcentaje_purin',
+                      'cantidad_materiales', 'objetivo_metano_diario', 'parametros_pareto'):
+            if clave in data:
+                config[clave] = data[clave]
+        stock_actual = stock_ledger.stock_actual().get('materiales', {})
+
+        resultado = calcular_mezcla_memoizada(
+            'pareto_nsga2',
+            lambda cfg, stock: optimizar_frente_pareto(cfg, stock, matriz=obtener_matriz_materiales()),
+            config, stock_actual
+        )
+        frente = resultado.get('frente_pareto', [])
+        seleccion = None
+        if frente:
+            seleccion = frente[seleccionar_del_frente(frente, data.get('pesos'))]
+        return jsonify({
+            'status': 'success',
+            'frente': frente,
+            'seleccion': seleccion,
+            'mezcla_equilibrada': {k: resultado.get(k) for k in ('totales', 'materiales_solidos', 'materiales_liquidos',
+                                                                 'materiales_purin', 'advertencias')},
+            'optimizacion': resultado.get('optimizacion'),
+            'cache': resultado.get('cache'),
+        })
+    except Exception as e:
+        logger.error(f"Error en mezcla_pareto_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/mezcla/incremental/estado')
+def mezcla_incremental_estado_endpoint():
+    """Bases guardadas y tiempos de resolución en caliente vs en frío de la mezcla LP."""
+    try:
+        return jsonify({'status': 'success', **resolutor_lp_incremental.estadisticas()})
+    except Exception as e:
+        logger.error(f"Error en mezcla_incremental_estado_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/energia/tabla')
+def tabla_energia_endpoint():
+    """kW/tn efectivo por material (ST de camiones y consumo CHP vigentes) y su versión."""
+    try:
+        tabla = tabla_energia.obtener()
+        material = request.args.get('material')
+        if material:
+            fila = tabla.fila(material)
+            if fila is None:
+                return jsonify({'status': 'error', 'mensaje': f'Material desconocido: {material}'}), 404
+            return jsonify({'status': 'success', 'version': tabla.version, 'material': material, **fila})
+        return jsonify({'status': 'success', **tabla.como_diccionario(), 'estadisticas': tabla_energia.estadisticas()})
+    except Exception as e:
+        logger.error(f"Error en tabla_energia_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/modelos/registro')
+def modelos_registro_endpoint():
+    """Modelos ML registrados: versión vigente, huella de datos, métricas y librerías."""
+    try:
+        return jsonify({'status': 'success', 'directorio': registro_modelos.directorio,
+                        'modelos': registro_modelos.listar()})
+    except Exception as e:
+        logger.error(f"Error en modelos_registro_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/logging/niveles', methods=['GET', 'POST'])
+def logging_niveles_endpoint():
+    """
+    Niveles de logging del cálculo por módulo. POST {"mezcla": "DEBUG", "adan": "WARNING"}
+    los cambia en caliente (DEBUG activa el detalle por material/iteración). Se guardan en
+    niveles_logging.json y los demás workers los aplican en su próximo request.
+    """
+    try:
+        if request.method == 'POST':
+            aplicados = niveles_logging.guardar(request.get_json(silent=True) or {})
+            logger.info(f"🪵 Niveles de logging actualizados: {aplicados}")
+        return jsonify({'status': 'success', 'niveles': niveles_actuales()})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error en logging_niveles_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/retencion/estado')
+def retencion_estado_endpoint():
+    """Políticas de retención, tamaño en caliente y meses archivados."""
+    try:
+        return jsonify({'status': 'success', **gestor_retencion.estado()})
+    except Exception as e:
+        logger.error(f"Error en retencion_estado_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/retencion/compactar', methods=['POST'])
+def retencion_compactar_endpoint():
+    """Compacta ahora uno (?nombre=historico_gases) o todos los históricos."""
+    try:
+        nombre = request.args.get('nombre')
+        if nombre:
+            if nombre not in gestor_retencion.politicas:
+                return jsonify({'status': 'error', 'mensaje': f'Política desconocida: {nombre}'}), 404
+            return jsonify({'status': 'success', 'resultados': {nombre: gestor_retencion.compactar(nombre)}})
+        return jsonify({'status': 'success', **gestor_retencion.compactar_todo()})
+    except Exception as e:
+        logger.error(f"Error en retencion_compactar_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
+@app.route('/api/retencion/<nombre>/rango')
+def retencion_rango_endpoint(nombre):
+    """Lectura por rango (?desde=YYYY-MM-DD&hasta=YYYY-MM-DD) sobre caliente + archivo."""
+    try:
+        if nombre not in gestor_retencion.politicas:
+            return jsonify({'status': 'error', 'mensaje': f'Política desconocida: {nombre}'}), 404
+        registros = gestor_retencion.leer_rango(nombre, request.args.get('desde'), request.args.get('hasta'))
+        return jsonify({'status': 'success', 'total': len(registros), 'registros': registros})
+    except Exception as e:
+        logger.error(f"Error en retencion_rango_endpoint: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'mensaje': str(e)}), 500
+
+
 @app.route('/buscar_registros', methods=['POST'])
 def buscar_registros_endpoint():
     """Busca registros de materiales con filtros."""
@@ -9525,6 +9923,8 @@ def calculadora_energetica_endpoint():
         
         # Cargar materiales base con valores KW/TN actualizados (cacheado)
         materiales_base = cargar_materiales_base_cacheado()
+        # kW/tn efectivo (ST de los últimos camiones y consumo CHP vigente)
+        energia = tabla_energia.obtener()
         
         materiales_calculados = []
         energia_total = 0.0
@@ -9547,7 +9947,7 @@ def calculadora_energetica_endpoint():
                     break
             
             if material_encontrado:
-                kw_tn = material_encontrado.get('kw/tn', 0)
+                kw_tn = energia.kw_tn_de(nombre_tabla, float(material_encontrado.get('kw/tn', 0) or 0))
                 energia_material = cantidad * kw_tn
                 
                 # Calcular metano (aproximado)
@@ -9587,7 +9987,8 @@ def calculadora_energetica_endpoint():
             'energia_total': round(energia_total, 2),
             'metano_total': round(metano_total, 2),
             'eficiencia_promedio': round(eficiencia_promedio, 4),
-            'total_materiales': len(materiales_calculados)
+            'total_materiales': len(materiales_calculados),
+            'version_tabla_energia': energia.version
         }
         
         logger.info(f"✅ CALCULADORA ENERGÉTICA: {energia_total:.2f} kW total, {metano_total:.2f} m³ metano")
@@ -9657,65 +10058,28 @@ def calcular_mezcla_automatica():
         kw_objetivo = float(data.get('kw_objetivo', 28800))
         objetivo_metano = float(data.get('objetivo_metano', 65))
         num_bios_req = data.get('num_biodigestores')
-        porcentaje_solidos = float(data.get('porcentaje_solidos', 50))
-        porcentaje_liquidos = float(data.get('porcentaje_liquidos', 50))
-        porcentaje_purin = float(data.get('porcentaje_purin', 20))  # Por defecto 20%
         modo_calculo = data.get('modo_calculo', 'energetico')  # 'energetico' o 'volumetrico'
-        logger.info(f"🔧 ENDPOINT: Parámetros recibidos - KW: {kw_objetivo}, Metano: {objetivo_metano}%")
         incluir_purin = data.get('incluir_purin', True)  # Por defecto incluir Purín
-        
-        logger.info(f"📊 Parámetros recibidos: KW={kw_objetivo}, Metano={objetivo_metano}, Bios={num_bios_req}, Sólidos={porcentaje_solidos}%, Líquidos={porcentaje_liquidos}%, Purín={porcentaje_purin}%, Modo={modo_calculo}, Incluir Purín={incluir_purin}")
-        
-        # Cargar configuración y stock actual
-        config_actual = cargar_configuracion()
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
-        stock_actual_completo = stock_data.get('materiales', {})
-        
-        # CORREGIDO: Crear stock_actual filtrado según incluir_purin
-        stock_actual = {}
-        for mat, datos in stock_actual_completo.items():
-            if mat.lower() == 'purin' and not incluir_purin:
-                logger.info(f"🚫 Purín excluido del cálculo por configuración")
-                continue
-            stock_actual[mat] = datos
-        
-        # Validar stock disponible según porcentajes
-        REFERENCIA_MATERIALES = getattr(temp_functions, 'REFERENCIA_MATERIALES', {})
-        
-        materiales_solidos = {}
-        materiales_liquidos = {}
-        
-        for mat, datos in stock_actual.items():
-            ref = REFERENCIA_MATERIALES.get(mat, {})
-            tipo = ref.get('tipo', 'solido').lower()
-            logger.info(f"📊 Material {mat}: tipo={tipo}, total_tn={datos.get('total_tn', 0)}")
-                
-            if tipo == 'solido':
-                materiales_solidos[mat] = datos
-            elif tipo == 'liquido':
-                materiales_liquidos[mat] = datos
-        
-        total_solidos = sum(mat.get('total_tn', 0) for mat in materiales_solidos.values())
-        total_liquidos = sum(mat.get('total_tn', 0) for mat in materiales_liquidos.values())
-        
-        logger.info(f"📦 Stock disponible: Sólidos={total_solidos:.2f} TN, Líquidos={total_liquidos:.2f} TN")
-        logger.info(f"📊 Materiales sólidos encontrados: {list(materiales_solidos.keys())}")
-        logger.info(f"📊 Materiales líquidos encontrados: {list(materiales_liquidos.keys())}")
-        
-        # Verificar si hay stock suficiente (validación menos estricta)
-        if porcentaje_solidos > 0 and total_solidos < 1:
-            logger.warning(f"⚠️ Stock de sólidos muy bajo: {total_solidos:.2f} TN")
-        
-        if porcentaje_liquidos > 0 and total_liquidos < 1:
-            logger.warning(f"⚠️ Stock de líquidos muy bajo: {total_liquidos:.2f} TN")
-        
-        # Actualizar configuración con los parámetros recibidos
-        config_actual['kw_objetivo'] = kw_objetivo
-        config_actual['objetivo_metano_diario'] = objetivo_metano
-        config_actual['porcentaje_solidos'] = porcentaje_solidos
-        config_actual['porcentaje_liquidos'] = porcentaje_liquidos
-        config_actual['modo_calculo'] = modo_calculo
-        logger.info(f"🔧 ENDPOINT: Configuración actualizada - KW: {kw_objetivo}, Metano: {objetivo_metano}%")
+        parametros = {
+            'kw_objetivo': kw_objetivo,
+            'objetivo_metano': objetivo_metano,
+            'porcentaje_solidos': data.get('porcentaje_solidos', 50),
+            'porcentaje_liquidos': data.get('porcentaje_liquidos', 50),
+            'porcentaje_purin': data.get('porcentaje_purin', 20),  # Por defecto 20%
+            'modo_calculo': modo_calculo,
+        }
+        logger.info(f"📊 Parámetros recibidos: {parametros}, Bios={num_bios_req}, Incluir Purín={incluir_purin}")
+
+        # Configuración, stock y derivados desde el núcleo de mezcla (preprocesado compartido)
+        entrada = nucleo_mezcla.preparar(parametros, incluir_purin=bool(incluir_purin))
+        config_actual = entrada.config
+        logger.info(f"📦 Stock disponible: Sólidos={entrada.tn_por_tipo['solido']:.2f} TN, "
+                    f"Líquidos={entrada.tn_por_tipo['liquido']:.2f} TN")
+        if config_actual['porcentaje_solidos'] > 0 and entrada.tn_por_tipo['solido'] < 1:
+            logger.warning(f"⚠️ Stock de sólidos muy bajo: {entrada.tn_por_tipo['solido']:.2f} TN")
+        if config_actual['porcentaje_liquidos'] > 0 and entrada.tn_por_tipo['liquido'] < 1:
+            logger.warning(f"⚠️ Stock de líquidos muy bajo: {entrada.tn_por_tipo['liquido']:.2f} TN")
+
         if num_bios_req is not None:
             try:
                 nb = int(num_bios_req)
@@ -9730,66 +10094,14 @@ def calcular_mezcla_automatica():
                     logger.warning(f"num_biodigestores fuera de rango: {num_bios_req}")
             except Exception:
                 logger.warning(f"num_biodigestores inválido: {num_bios_req}")
-        
-        # Calcular la mezcla automática según el modo seleccionado
-        logger.info(f"🔄 Usando modo de cálculo: '{modo_calculo}' (tipo: {type(modo_calculo)})")
-        if modo_calculo == 'volumetrico':
-            logger.info("📊 Ejecutando algoritmo VOLUMÉTRICO CORRECTO")
-            logger.info(f"📊 Parámetros volumétricos: Sólidos={porcentaje_solidos:.1f}%, Líquidos={porcentaje_liquidos:.1f}%, Purín={porcentaje_purin:.1f}%")
-            
-            # CORREGIDO: Usar la función volumétrica correcta con filtro de Purín
-            resultado = calcular_mezcla_volumetrica_simple(config_actual, stock_actual, porcentaje_solidos/100, porcentaje_liquidos/100, porcentaje_purin/100, incluir_purin)
-            
-            # CORREGIDO: Verificar si llegó al objetivo y ajustar si es necesario
-            kw_objetivo = float(config_actual.get('kw_objetivo', 28800.0))
-            kw_generado_actual = resultado.get('totales', {}).get('kw_total_generado', 0)
-            
-            logger.info(f"📊 Modo volumétrico - KW objetivo: {kw_objetivo:.0f}, KW generado: {kw_generado_actual:.0f}")
-            
-            # Si el modo volumétrico no alcanza el objetivo, intentar ajustar
-            if kw_generado_actual < kw_objetivo * 0.99: # Si está por debajo del 99%
-                logger.warning(f"⚠️ Modo volumétrico no alcanzó el objetivo KW ({kw_generado_actual:.0f} de {kw_objetivo:.0f}). Intentando ajuste.")
-                factor_ajuste = kw_objetivo / kw_generado_actual if kw_generado_actual > 0 else 1.0
-                
-                # Ajustar cantidades de materiales
-                for mat, datos in resultado.get('materiales_solidos', {}).items():
-                    resultado['materiales_solidos'][mat]['cantidad_tn'] *= factor_ajuste
-                    resultado['materiales_solidos'][mat]['tn_usadas'] *= factor_ajuste
-                for mat, datos in resultado.get('materiales_liquidos', {}).items():
-                    resultado['materiales_liquidos'][mat]['cantidad_tn'] *= factor_ajuste
-                    resultado['materiales_liquidos'][mat]['tn_usadas'] *= factor_ajuste
-                for mat, datos in resultado.get('materiales_purin', {}).items():
-                    resultado['materiales_purin'][mat]['cantidad_tn'] *= factor_ajuste
-                    resultado['materiales_purin'][mat]['tn_usadas'] *= factor_ajuste
-                
-                # Recalcular totales de TN usando cantidad_tn (no tn_usadas)
-                resultado['totales']['tn_solidos'] = sum(mat['cantidad_tn'] for mat in resultado.get('materiales_solidos', {}).values())
-                resultado['totales']['tn_liquidos'] = sum(mat['cantidad_tn'] for mat in resultado.get('materiales_liquidos', {}).values())
-                resultado['totales']['tn_purin'] = sum(mat['cantidad_tn'] for mat in resultado.get('materiales_purin', {}).values())
-                resultado['totales']['tn_total'] = resultado['totales']['tn_solidos'] + resultado['totales']['tn_liquidos'] + resultado['totales']['tn_purin']
-                
-                # Agregar advertencia explicativa
-                resultado['advertencias'] = resultado.get('advertencias', [])
-                resultado['advertencias'].append(f"📊 Modo volumétrico: Se ajustaron las cantidades para llegar a {kw_objetivo:.0f} KW manteniendo las proporciones volumétricas.")
-                
-                logger.info(f"📊 KW objetivo: {kw_objetivo:.0f}, KW final: {resultado['totales']['kw_total_generado']:.0f}")
-            else:
-                logger.info("✅ Modo volumétrico alcanzó el objetivo sin ajustes")
-                resultado['totales']['modo_calculo'] = 'volumetrico'
-            
-            logger.info("✅ Algoritmo volumétrico correcto completado")
-        
-        # MODO ENERGÉTICO
-        elif modo_calculo == 'energetico':
-            logger.info("⚡ Ejecutando algoritmo ENERGÉTICO")
-            logger.info(f"🔧 DEBUG: config_actual = {config_actual}")
-            logger.info(f"🔧 DEBUG: stock_actual keys = {list(stock_actual.keys())}")
-            resultado = calcular_mezcla_diaria(config_actual, stock_actual)
-            logger.info(f"✅ Algoritmo energético completado. Resultado: {resultado}")
-            if resultado:
-                logger.info(f"📊 KW generado: {resultado.get('totales', {}).get('kw_total_generado', 0)}")
-            else:
-                logger.warning("⚠️ Resultado es None o vacío")
+
+        # Volumétrico (escalado al objetivo de KW por el núcleo) o energético
+        estrategia = 'volumetrico' if modo_calculo == 'volumetrico' else 'energetico'
+        logger.info(f"🔄 Usando modo de cálculo: '{modo_calculo}' → estrategia '{estrategia}'")
+        resultado = nucleo_mezcla.resolver(entrada, estrategia)
+        if estrategia == 'volumetrico' and resultado.get('totales'):
+            resultado['totales']['modo_calculo'] = 'volumetrico'
+
         # Guardar última mezcla en memoria para otras funciones (asistente, seguimiento)
         try:
             global ULTIMA_MEZCLA_CALCULADA
@@ -9916,167 +10228,29 @@ def calcular_mezcla():
         porcentaje_solidos = float(data.get('porcentaje_solidos', 40))
         porcentaje_liquidos = float(data.get('porcentaje_liquidos', 40))
         porcentaje_purin = float(data.get('porcentaje_purin', 20))
-        cantidad_materiales = data.get('cantidad_materiales', '5')
-        modo_energetico = data.get('modo_energetico', True)
         incluir_purin = bool(data.get('incluir_purin', True))
         num_biodigestores = int(data.get('num_biodigestores', 2))
-        metano_objetivo = float(data.get('objetivo_metano', 65))  # Agregar objetivo de metano
-        
-        logger.info(f"📊 Parámetros recibidos: KW={kw_objetivo}, Sólidos={porcentaje_solidos}%, Líquidos={porcentaje_liquidos}%, Purín={porcentaje_purin}%, Materiales={cantidad_materiales}, Modo energético={modo_energetico}, Bios={num_biodigestores}")
-        
-        # Cargar configuración y stock actual
-        config_actual = cargar_configuracion()
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
-        stock_actual = stock_data.get('materiales', {})
-        
-        # Actualizar configuración con los parámetros recibidos
-        config_actual['kw_objetivo'] = kw_objetivo
-        config_actual['porcentaje_solidos'] = porcentaje_solidos
-        config_actual['porcentaje_liquidos'] = porcentaje_liquidos
-        config_actual['porcentaje_purin'] = porcentaje_purin
-        config_actual['cantidad_materiales'] = cantidad_materiales
-        config_actual['num_biodigestores'] = num_biodigestores
-        
-        # Determinar modo de cálculo - CORREGIDO: Usar modo_calculo del request
-        modo_calculo = data.get('modo_calculo', 'energetico')  # Usar el parámetro enviado
-        config_actual['modo_calculo'] = modo_calculo
-        
-        logger.info(f"🔄 Usando modo de cálculo: '{modo_calculo}'")
-        logger.info(f"🔧 DEBUG: modo_energetico = {modo_energetico}")
-        logger.info(f"🔧 DEBUG: data.get('modo_calculo') = {data.get('modo_calculo')}")
-        logger.info(f"🔧 DEBUG: data.get('objetivo_metano') = {data.get('objetivo_metano')}")
-        logger.info(f"🔧 DEBUG: config_actual['modo_calculo'] = {config_actual['modo_calculo']}")
-        
-        # Calcular la mezcla según el modo (respetando toggle de Purín)
-        if modo_calculo == 'volumetrico':
-            logger.info("📊 Ejecutando algoritmo VOLUMÉTRICO con optimizador de metano")
-            resultado = calcular_mezcla_volumetrica_simple(config_actual, stock_actual, porcentaje_solidos/100, porcentaje_liquidos/100, porcentaje_purin/100, incluir_purin)
-            # Refuerzo: escalar cantidades para alcanzar KW objetivo respetando stock
-            try:
-                kw_obj = float(config_actual.get('kw_objetivo', 0))
-                kw_act = float(resultado.get('totales', {}).get('kw_total_generado', 0))
-                # CORREGIDO: Escalar tanto si es menor como si es mayor al objetivo (más tolerante)
-                if kw_obj > 0 and kw_act > 0 and (kw_act < kw_obj * 0.95 or kw_act > kw_obj * 1.05):
-                    factor_necesario = kw_obj / kw_act
-                    logger.info(f"📊 Volumétrico: factor escala requerido={factor_necesario:.3f} (objetivo={kw_obj}, actual={kw_act:.2f})")
-                    # Limitar factor por stock disponible
-                    def limitar_factor_por_stock(materiales_key: str) -> float:
-                        materiales = resultado.get(materiales_key, {})
-                        if not materiales:
-                            return factor_necesario
-                        factor_lim = factor_necesario
-                        for mat, datos in materiales.items():
-                            tn_usadas = float(datos.get('tn_usadas', datos.get('cantidad_tn', 0)))
-                            if tn_usadas <= 0:
-                                continue
-                            max_tn = float(stock_actual.get(mat, {}).get('total_tn', tn_usadas))
-                            # Cuánto puedo multiplicar sin exceder stock
-                            factor_item = max_tn / tn_usadas if tn_usadas > 0 else factor_necesario
-                            if factor_item < factor_lim:
-                                factor_lim = factor_item
-                        return max(1.0, factor_lim)
-                    factor_final = min(
-                        limitar_factor_por_stock('materiales_solidos'),
-                        limitar_factor_por_stock('materiales_liquidos'),
-                        limitar_factor_por_stock('materiales_purin')
-                    )
-                    if factor_final > 1.0:
-                        logger.info(f"📊 Volumétrico: aplicando factor_final={factor_final:.3f}")
-                        # Recalcular por grupos usando kw/tn de referencia
-                        from temp_functions import REFERENCIA_MATERIALES as _REF
-                        def escalar_grupo(materiales_key: str):
-                            materiales = resultado.get(materiales_key, {})
-                            for mat, datos in materiales.items():
-                                tn = float(datos.get('tn_usadas', datos.get('cantidad_tn', 0)))
-                                if tn <= 0:
-                                    continue
-                                max_tn = float(stock_actual.get(mat, {}).get('total_tn', tn))
-                                tn_nueva = min(max_tn, tn * factor_final)
-                                # CORREGIDO: Usar kw_tn del stock_actual en lugar de REFERENCIA_MATERIALES
-                                kw_tn = float(stock_actual.get(mat, {}).get('kw_tn', 0) or 0)
-                                datos['cantidad_tn'] = tn_nueva
-                                datos['tn_usadas'] = tn_nueva
-                                datos['kw_aportados'] = tn_nueva * kw_tn
-                        escalar_grupo('materiales_solidos')
-                        escalar_grupo('materiales_liquidos')
-                        escalar_grupo('materiales_purin')
-                        # Recalcular totales
-                        def suma_kw(materiales_key: str) -> float:
-                            return sum((m.get('kw_aportados', 0) for m in resultado.get(materiales_key, {}).values()))
-                        def suma_tn(materiales_key: str) -> float:
-                            return sum((m.get('tn_usadas', m.get('cantidad_tn', 0)) for m in resultado.get(materiales_key, {}).values()))
-                        kw_liq = suma_kw('materiales_liquidos')
-                        kw_sol = suma_kw('materiales_solidos')
-                        kw_pur = suma_kw('materiales_purin')
-                        tn_liq = suma_tn('materiales_liquidos')
-                        tn_sol = suma_tn('materiales_solidos')
-                        tn_pur = suma_tn('materiales_purin')
-                        resultado['totales']['kw_total_generado'] = kw_liq + kw_sol + kw_pur
-                        resultado['totales']['kw_liquidos'] = kw_liq
-                        resultado['totales']['kw_solidos'] = kw_sol
-                        resultado['totales']['tn_liquidos'] = tn_liq
-                        resultado['totales']['tn_solidos'] = tn_sol
-                        if 'tn_purin' in resultado['totales']:
-                            resultado['totales']['tn_purin'] = tn_pur
-                        resultado['totales']['tn_total'] = tn_liq + tn_sol + tn_pur
-                        logger.info(f"📊 Volumétrico: KW final escalado={resultado['totales']['kw_total_generado']:.0f}")
-                        # Si aún no alcanza por límites de stock, agregar advertencia clara
-                        if resultado['totales']['kw_total_generado'] < kw_obj * 0.999:
-                            faltante = kw_obj - resultado['totales']['kw_total_generado']
-                            resultado.setdefault('advertencias', [])
-                            resultado['advertencias'].append(
-                                f"⚠️ Stock insuficiente para alcanzar el objetivo volumétrico. Faltan {faltante:.0f} KW respecto a {kw_obj:.0f} KW objetivo"
-                            )
-            except Exception as e:
-                logger.warning(f"⚠️ No se pudo escalar volumétrico: {e}")
-        else:
-            logger.info("⚡ Ejecutando algoritmo ENERGÉTICO con configuración ML Dashboard")
-            
-            # ✅ APLICAR CONFIGURACIÓN ML DASHBOARD
-            if 'xgboost_calculadora' in modelos_activos:
-                logger.info("🌳 Usando XGBOOST CALCULADORA para optimización")
-                # Filtrar purín si corresponde
-                stock_filtrado = {}
-                for mat, datos in stock_actual.items():
-                    if mat.lower() == 'purin' and not incluir_purin:
-                        continue
-                    stock_filtrado[mat] = datos
-                resultado = calcular_mezcla_diaria(config_actual, stock_filtrado)
-                
-            elif 'algoritmo_genetico' in modelos_activos:
-                logger.info("🧬 Usando ALGORITMO GENÉTICO para optimización (evitando recursión)")
-                # EVITAR RECURSIÓN INFINITA - Usar función base directamente
-                resultado = calcular_mezcla_diaria(config_actual, stock_filtrado)
-                
-            elif 'redes_neuronales' in modelos_activos:
-                logger.info("🧠 Usando REDES NEURONALES para optimización")
-                # Filtrar purín si corresponde
-                stock_filtrado = {}
-                for mat, datos in stock_actual.items():
-                    if mat.lower() == 'purin' and not incluir_purin:
-                        continue
-                    stock_filtrado[mat] = datos
-                resultado = calcular_mezcla_redes_neuronales(config_actual, stock_filtrado)
-                
-            elif 'optimizacion_bayesiana' in modelos_activos:
-                logger.info("🧠 Usando OPTIMIZACIÓN BAYESIANA para optimización")
-                # Filtrar purín si corresponde
-                stock_filtrado = {}
-                for mat, datos in stock_actual.items():
-                    if mat.lower() == 'purin' and not incluir_purin:
-                        continue
-                    stock_filtrado[mat] = datos
-                resultado = calcular_mezcla_optimizacion_bayesiana(config_actual, stock_filtrado)
-                
-            else:
-                logger.info("⚡ Usando algoritmo ENERGÉTICO por defecto")
-                # Filtrar purín si corresponde
-                stock_filtrado = {}
-                for mat, datos in stock_actual.items():
-                    if mat.lower() == 'purin' and not incluir_purin:
-                        continue
-                    stock_filtrado[mat] = datos
-                resultado = calcular_mezcla_diaria(config_actual, stock_filtrado)
+        metano_objetivo = float(data.get('objetivo_metano', 65))
+        modo_calculo = data.get('modo_calculo', 'energetico')
+        parametros = {
+            'kw_objetivo': kw_objetivo,
+            'porcentaje_solidos': porcentaje_solidos,
+            'porcentaje_liquidos': porcentaje_liquidos,
+            'porcentaje_purin': porcentaje_purin,
+            'cantidad_materiales': data.get('cantidad_materiales', '5'),
+            'num_biodigestores': num_biodigestores,
+            'modo_calculo': modo_calculo,
+        }
+        logger.info(f"📊 Parámetros recibidos: {parametros}, Incluir Purín={incluir_purin}")
+
+        # Entrada preprocesada (config + stock filtrado por el toggle de Purín) y estrategia
+        # según el modo y la configuración ML Dashboard
+        entrada = nucleo_mezcla.preparar(parametros, incluir_purin=incluir_purin)
+        config_actual = entrada.config
+        stock_actual = entrada.stock
+        estrategia = nucleo_mezcla.estrategia_para_modelos(modelos_activos, modo_calculo)
+        logger.info(f"🔄 Modo de cálculo '{modo_calculo}' → estrategia '{estrategia}'")
+        resultado = nucleo_mezcla.resolver(entrada, estrategia)
         
         # Guardar última mezcla en memoria
         try:
@@ -10252,6 +10426,17 @@ def calcular_mezcla():
                 },
                 'mensaje': f'Mezcla calculada para {kw_objetivo} KW'
             }
+            # Telemetría del escalado volumétrico (búsqueda de raíz) y del solver LP
+            for clave in ('escalado', 'optimizacion'):
+                if clave in resultado:
+                    respuesta_base[clave] = resultado[clave]
+
+            # Bandas de confianza P10/P50/P90 (Monte Carlo vectorizado, ~ms)
+            if data.get('incertidumbre', True):
+                try:
+                    respuesta_base['incertidumbre'] = bandas_incertidumbre_mezcla(entrada, resultado)
+                except Exception as e:
+                    logger.warning(f"⚠️ No se pudieron calcular las bandas de incertidumbre: {e}")
             
             # 🎤 AGREGAR VOZ AL RESULTADO DE LA CALCULADORA
             audio_base64 = None
@@ -10348,7 +10533,7 @@ _IA_LEARNING_FILE = 'aprendizaje_ia.json'
 # ==================== RECOMENDACIONES DE MATERIALES ====================
 def _kw_tn_de(mat: str) -> float:
     ref = getattr(temp_functions, 'REFERENCIA_MATERIALES', {}).get(mat, {})
-    return float(ref.get('kw/tn', 0) or ref.get('kw_tn', 0) or 0)
+    return tabla_energia.kw_tn(mat, float(ref.get('kw/tn', 0) or ref.get('kw_tn', 0) or 0))
 
 def _ch4_de(mat: str) -> float:
     ref = getattr(temp_functions, 'REFERENCIA_MATERIALES', {}).get(mat, {})
@@ -10359,122 +10544,16 @@ def _ch4_de(mat: str) -> float:
         return 0.65
 
 def generar_recomendaciones_materiales(config: Dict[str, Any], stock_actual: Dict[str, Any], incluir_purin: bool = True,
-                                       max_solidos: int = 6, max_liquidos: int = 4) -> Dict[str, Any]:
+                                       max_solidos: int = 6, max_liquidos: int = 4, version=None) -> Dict[str, Any]:
     """Genera recomendaciones SIN RESTRICCIONES para cumplir objetivos de KW y metano.
     El usuario decide después si aplicar las sugerencias o no.
-    """
-    kw_obj = float(config.get('kw_objetivo', 0))
-    objetivo_metano = float(config.get('objetivo_metano_diario', 65.0))
-    
-    logger.info(f"🎯 SUGERENCIAS LIBRES: Objetivo {kw_obj} KW, {objetivo_metano}% CH4")
-    
-    if kw_obj <= 0:
-        logger.warning("⚠️ KW objetivo inválido")
-        return {'recomendaciones': [], 'kw_estimado': 0.0, 'ch4_estimado': 0.0, 'kw_objetivo': kw_obj}
-
-    if not stock_actual:
-        logger.warning("⚠️ Sin stock disponible")
-        return {'recomendaciones': [], 'kw_estimado': 0.0, 'ch4_estimado': 0.0, 'kw_objetivo': kw_obj}
 
-    # Procesar todos los materiales disponibles SIN RESTRICCIONES
-    materiales_validos = []
-    
-    for material, datos in stock_actual.items():
-        try:
-            # Obtener datos básicos
-            stock_tn = float(datos.get('total_tn', 0))
-            kw_tn = float(datos.get('kw_tn', 0))
-            ch4_pct = float(datos.get('ch4_porcentaje', 65.0))
-            tipo = datos.get('tipo', 'solido').lower()
-            
-            # Filtros mínimos solo
-            if stock_tn <= 0:
-                continue
-            if kw_tn <= 0:
-                continue
-            if material.lower() == 'purin' and not incluir_purin:
-                continue
-                
-            # Score optimizado para objetivos de KW y metano
-            # Priorizar materiales que aporten KW y se acerquen al objetivo de metano
-            factor_kw = kw_tn  # Eficiencia energética
-            factor_ch4 = 1.0 + abs(ch4_pct - objetivo_metano) / 100.0  # Penalizar desviación del objetivo
-            factor_stock = stock_tn / 1000.0  # Disponibilidad
-            
-            # Score combinado: priorizar KW y penalizar desviación de CH4 objetivo
-            score = factor_kw * factor_ch4 * factor_stock
-            
-            materiales_validos.append({
-                'material': material,
-                'tipo': 'purin' if material.lower() == 'purin' else tipo,
-                'kw_tn': kw_tn,
-                'ch4_pct': ch4_pct,
-                'stock_tn': stock_tn,
-                'score': score,
-                'desviacion_ch4': abs(ch4_pct - objetivo_metano)
-            })
-            
-        except (ValueError, TypeError) as e:
-            logger.debug(f"⚠️ Error procesando {material}: {e}")
-            continue
-    
-    logger.info(f"📊 Materiales válidos encontrados: {len(materiales_validos)}")
-    
-    if not materiales_validos:
-        logger.warning("⚠️ No hay materiales válidos")
-        return {'recomendaciones': [], 'kw_estimado': 0.0, 'ch4_estimado': 0.0, 'kw_objetivo': kw_obj}
-    
-    # Ordenar por score (mejor primero)
-    materiales_validos.sort(key=lambda x: x['score'], reverse=True)
-    
-    # Generar recomendaciones SIN RESTRICCIONES hasta alcanzar objetivos
-    recomendaciones = []
-    kw_acumulado = 0.0
-    ch4_ponderado_total = 0.0
-    kw_total_para_ch4 = 0.0
-    
-    logger.info(f"🎯 Generando recomendaciones SIN RESTRICCIONES para {kw_obj} KW")
-    
-    for material in materiales_validos:
-        if kw_acumulado >= kw_obj:
-            break
-            
-        # Calcular cantidad óptima SIN RESTRICCIONES
-        kw_restante = kw_obj - kw_acumulado
-        kw_disponible = material['stock_tn'] * material['kw_tn']
-        
-        # Usar todo el stock disponible o solo lo necesario
-        kw_a_usar = min(kw_restante, kw_disponible)
-        tn_a_usar = kw_a_usar / material['kw_tn']
-        
-        recomendaciones.append({
-            'material': material['material'],
-            'tipo': material['tipo'],
-            'tn_sugeridas': round(tn_a_usar, 2),
-            'kw_estimados': round(kw_a_usar, 1),
-            'kw_tn': round(material['kw_tn'], 4),
-            'ch4_ref': round(material['ch4_pct'], 1),
-            'stock_tn': round(material['stock_tn'], 1)
-        })
-        
-        # Actualizar totales
-        kw_acumulado += kw_a_usar
-        ch4_ponderado_total += material['ch4_pct'] * kw_a_usar
-        kw_total_para_ch4 += kw_a_usar
-        
-        logger.info(f"✅ {material['material']}: {tn_a_usar:.1f} TN → {kw_a_usar:.0f} KW (CH4: {material['ch4_pct']:.1f}%)")
-    
-    # Calcular CH4 promedio ponderado
-    ch4_promedio = ch4_ponderado_total / kw_total_para_ch4 if kw_total_para_ch4 > 0 else 0.0
-    
-    logger.info(f"🎯 SUGERENCIAS LIBRES: {len(recomendaciones)} materiales, {kw_acumulado:.0f} KW, CH4 {ch4_promedio:.1f}%")
-    
-    return {
-        'recomendaciones': recomendaciones,
-        'kw_estimado': round(kw_acumulado, 1),
-        'kw_objetivo': kw_obj,
-        'ch4_estimado': round(ch4_promedio, 1)
-    }
+    Puntaje marginal vectorizado y top-k por categoría (ver recomendador_materiales.py);
+    con `version` (stock + catálogo) el ranking queda en caché hasta que cambie.
+    """
+    return recomendador_materiales.recomendar(config, stock_con_kw_tn_tabla(stock_actual), incluir_purin,
+                                              max_solidos, max_liquidos, matriz=obtener_matriz_materiales(),
+                                              version=None if version is None else (version, tabla_energia.version))
 
 @app.route('/recomendaciones_materiales', methods=['POST'])
 def recomendaciones_materiales_endpoint():
@@ -10487,20 +10566,12 @@ def recomendaciones_materiales_endpoint():
         max_solidos = int(data.get('max_solidos', 6))
         max_liquidos = int(data.get('max_liquidos', 4))
         
-        config_actual = cargar_configuracion()
-        if 'kw_objetivo' in data:
-            config_actual['kw_objetivo'] = float(data['kw_objetivo'])
-        if 'objetivo_metano' in data:
-            config_actual['objetivo_metano_diario'] = float(data['objetivo_metano'])
-            
-        logger.info(f"📊 ENDPOINT: config_actual {config_actual.get('kw_objetivo', 0)} KW")
+        # Config y stock desde el núcleo de mezcla; la versión del stock/catálogo mantiene el ranking en caché
+        entrada = nucleo_mezcla.preparar({k: data[k] for k in ('kw_objetivo', 'objetivo_metano') if k in data})
+        logger.info(f"📊 ENDPOINT: {entrada.config.get('kw_objetivo', 0)} KW, stock con {len(entrada.stock)} materiales")
         
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
-        stock_actual = stock_data.get('materiales', {})
-        
-        logger.info(f"📊 ENDPOINT: stock_actual tiene {len(stock_actual)} materiales")
-        
-        resultado = generar_recomendaciones_materiales(config_actual, stock_actual, incluir_purin, max_solidos, max_liquidos)
+        resultado = generar_recomendaciones_materiales(entrada.config, entrada.stock, incluir_purin, max_solidos,
+                                                       max_liquidos, version=entrada.version)
         
         logger.info(f"📊 ENDPOINT: resultado {len(resultado.get('recomendaciones', []))} recomendaciones")
         
@@ -10778,7 +10849,7 @@ def registrar_dosificacion_horaria():
 def borrar_stock_endpoint():
     """Limpia completamente el stock de materiales."""
     try:
-        guardar_json_seguro(STOCK_FILE, {'materiales': {}})
+        stock_ledger.reconciliar({'materiales': {}}, origen='borrar_stock')
         return jsonify({'status': 'success'})
     except Exception as e:
         logger.error(f"Error en borrar_stock_endpoint: {e}", exc_info=True)
@@ -10896,7 +10967,7 @@ def ask_assistant_endpoint():
                 def calcular_kw_material_safe(material, cantidad):
                     try:
                         props = obtener_props_material_safe(material)
-                        kw_tn = props.get('kw_tn', props.get('kw/tn', 0))
+                        kw_tn = tabla_energia.kw_tn(material, float(props.get('kw_tn', props.get('kw/tn', 0)) or 0))
                         return kw_tn * cantidad
                     except:
                         return 0.0
@@ -11340,7 +11411,7 @@ def actualizar_configuracion_ml_dashboard():
         
         # Validar estructura de datos
         funciones_validas = ['asistente_ia', 'calculadora_energia', 'prediccion_sensores', 'optimizacion_genetica', 'optimizacion_metano']
-        modelos_validos = ['xgboost_calculadora', 'redes_neuronales', 'cain_sibia', 'algoritmo_genetico', 'optimizacion_bayesiana', 'random_forest']
+        modelos_validos = ['xgboost_calculadora', 'redes_neuronales', 'cain_sibia', 'algoritmo_genetico', 'optimizacion_bayesiana', 'random_forest', 'programacion_lineal']
         
         configuracion_nueva = {}
         
@@ -11643,7 +11714,7 @@ def scada_view():
         logger.info("Cargando SCADA Profesional")
         # Cargar datos necesarios para el SCADA
         config_actual = cargar_configuracion()
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
+        stock_data = stock_ledger.stock_actual()
         stock_actual = stock_data.get('materiales', {})
         
         # Obtener datos de sensores críticos (usar función básica si no existe la avanzada)
@@ -11965,7 +12036,7 @@ def asistente_ia_endpoint():
                 def calcular_kw_material_safe(material, cantidad):
                     try:
                         props = obtener_props_material_safe(material)
-                        kw_tn = props.get('kw_tn', props.get('kw/tn', 0))
+                        kw_tn = tabla_energia.kw_tn(material, float(props.get('kw_tn', props.get('kw/tn', 0)) or 0))
                         return kw_tn * cantidad
                     except:
                         return 0.0
@@ -12357,7 +12428,7 @@ def analytics_kpis():
     try:
         # Usar datos reales de archivos JSON y configuración
         config_actual = cargar_configuracion()
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
+        stock_data = stock_ledger.stock_actual()
         registros_data = cargar_json_seguro('registros_materiales.json') or []
         historico_data = cargar_json_seguro('historico_diario_productivo.json') or {"datos": []}
         
@@ -12413,7 +12484,7 @@ def rendimiento_materiales():
     """Análisis de rendimiento por tipo de material usando datos del stock actual"""
     try:
         # Cargar datos reales de la aplicación - USAR STOCK ACTUAL
-        stock_data = cargar_json_seguro(STOCK_FILE) or {"materiales": {}}
+        stock_data = stock_ledger.stock_actual()
         registros_data = cargar_json_seguro('registros_materiales.json') or []
         materiales_base = cargar_json_seguro('materiales_base_config.json') or {}
         
@@ -12510,30 +12581,25 @@ def tendencias_historicas():
     """Datos para gráfico de tendencias históricas usando datos reales"""
     try:
         # Cargar datos reales de la aplicación
-        historico_data = cargar_json_seguro('historico_diario_productivo.json') or {"datos": []}
         config_actual = cargar_configuracion()
         
-        logger.info(f"📊 Cargando tendencias históricas con {len(historico_data.get('datos', []))} registros")
-        
-        # Usar datos históricos si existen
-        datos_historicos = historico_data.get('datos', [])
+        # Últimos 30 días del histórico indexado, en orden cronológico
+        datos_historicos = historico_diario_store.ultimos(30)
+        logger.info(f"📊 Cargando tendencias históricas con {len(datos_historicos)} registros")
         
         if datos_historicos:
-            # Ordenar por fecha
-            datos_ordenados = sorted(datos_historicos, key=lambda x: x.get('fecha', ''))
-            
             labels = []
             generacion = []
             eficiencia = []
             tn_procesadas = []
             
-            for dato in datos_ordenados[-30:]:  # Últimos 30 registros
+            for dato in datos_historicos:
                 try:
                     fecha_obj = datetime.strptime(dato.get('fecha', ''), '%Y-%m-%d')
                     labels.append(fecha_obj.strftime('%d/%m'))
                     
                     # Usar datos reales de producción
-                    kw_generado = dato.get('produccion_energetica', {}).get('kw_generado', 0)
+                    kw_generado = dato.get('kw_generado_real', 0) or dato.get('produccion_energetica', {}).get('kw_generado', 0)
                     if kw_generado == 0:
                         kw_generado = dato.get('kw_total_generado', 1347.5)  # Fallback
                     
@@ -12545,7 +12611,7 @@ def tendencias_historicas():
                     eficiencia.append(round(efic, 1))
                     
                     # TN procesadas
-                    tn_total = dato.get('materiales_procesados', {}).get('tn_total', 0)
+                    tn_total = dato.get('totales_materiales', {}).get('tn_total', 0) or dato.get('materiales_procesados', {}).get('tn_total', 0)
                     if tn_total == 0:
                         tn_total = dato.get('tn_total_procesadas', 45.5)  # Fallback
                     tn_procesadas.append(round(float(tn_total), 1))
@@ -12604,52 +12670,9 @@ def programar_mantenimiento():
     """Programar nuevo mantenimiento"""
     try:
         data = request.json
+        mantenimiento_id = mantenimiento_db.programar(data)
         
-        # Usar SQLite local para datos reales
-        import sqlite3
-        db_path = os.path.join(SCRIPT_DIR, 'database.db')
-        
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        
-        # Crear tabla si no existe
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS mantenimientos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                equipo TEXT NOT NULL,
-                tipo TEXT NOT NULL,
-                fecha_programada DATE NOT NULL,
-                prioridad TEXT NOT NULL,
-                tecnico_asignado TEXT,
-                duracion_estimada REAL,
-                descripcion TEXT,
-                repuestos TEXT,
-                estado TEXT DEFAULT 'programado',
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Insertar nuevo mantenimiento
-        conn.execute('''
-            INSERT INTO mantenimientos 
-            (equipo, tipo, fecha_programada, prioridad, tecnico_asignado, 
-             duracion_estimada, descripcion, repuestos)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['equipment'],
-            data['type'],
-            data['date'],
-            data['priority'],
-            data.get('technician', ''),
-            data.get('duration', 0),
-            data.get('description', ''),
-            data.get('parts', '')
-        ))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({'status': 'success', 'mensaje': 'Mantenimiento programado correctamente'})
+        return jsonify({'status': 'success', 'mensaje': 'Mantenimiento programado correctamente', 'id': mantenimiento_id})
         
     except Exception as e:
         logger.error(f"Error en programar_mantenimiento: {e}")
@@ -12659,66 +12682,16 @@ def programar_mantenimiento():
 def obtener_mantenimientos():
     """Obtener lista de mantenimientos programados"""
     try:
-        # Usar SQLite local para datos reales
-        import sqlite3
-        db_path = os.path.join(SCRIPT_DIR, 'database.db')
-        
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        
-        # Crear tabla si no existe
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS mantenimientos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                equipo TEXT NOT NULL,
-                tipo TEXT NOT NULL,
-                fecha_programada DATE NOT NULL,
-                prioridad TEXT NOT NULL,
-                tecnico_asignado TEXT,
-                duracion_estimada REAL,
-                descripcion TEXT,
-                repuestos TEXT,
-                estado TEXT DEFAULT 'programado',
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Insertar datos iniciales si la tabla está vacía
-        cursor = conn.execute('SELECT COUNT(*) as count FROM mantenimientos')
-        count = cursor.fetchone()['count']
-        
-        if count == 0:
-            # Insertar datos iniciales reales
-            mantenimientos_iniciales = [
-                ('Motor Biogás MO-080-01', 'Preventivo', '2024-01-15', 'Media', 'Juan Pérez', 4.0, 'Cambio de filtros y revisión general', 'Filtros de aire, aceite motor'),
-                ('Bomba Purín PU-040-02', 'Correctivo', '2024-01-10', 'Alta', 'María García', 6.0, 'Reparación de válvula de descarga', 'Válvula de descarga, juntas'),
-                ('Sensor Temperatura TE-040-01', 'Preventivo', '2024-01-25', 'Baja', 'Carlos López', 2.0, 'Calibración y limpieza', 'Kit de calibración'),
-                ('Válvula Control VC-050-01', 'Preventivo', '2024-02-01', 'Media', 'Ana Martínez', 3.0, 'Limpieza y lubricación', 'Lubricante, limpiador'),
-                ('Bomba Recirculación PU-040-01', 'Preventivo', '2024-02-05', 'Media', 'Roberto Silva', 4.0, 'Revisión de motor y sellos', 'Sellos, rodamientos')
-            ]
-            
-            conn.executemany('''
-                INSERT INTO mantenimientos 
-                (equipo, tipo, fecha_programada, prioridad, tecnico_asignado, 
-                 duracion_estimada, descripcion, repuestos)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', mantenimientos_iniciales)
-            conn.commit()
-        
-        # Consultar mantenimientos reales
-        query = """
-            SELECT * FROM mantenimientos 
-            WHERE estado != 'completado'
-            ORDER BY fecha_programada ASC
-        """
-        
-        mantenimientos = conn.execute(query).fetchall()
+        mantenimientos = mantenimiento_db.pendientes(
+            equipo=request.args.get('equipo'),
+            limite=request.args.get('limite', type=int)
+        )
         
         resultado = []
+        hoy = datetime.now()
         for mant in mantenimientos:
             # Calcular estado basado en fecha
             fecha_prog = datetime.strptime(mant['fecha_programada'], '%Y-%m-%d')
-            hoy = datetime.now()
             dias_diferencia = (fecha_prog - hoy).days
             
             if dias_diferencia < 0:
@@ -12742,7 +12715,6 @@ def obtener_mantenimientos():
                 'dias_restantes': dias_diferencia
             })
         
-        conn.close()
         return jsonify({'mantenimientos': resultado, 'status': 'success'})
         
     except Exception as e:
@@ -12751,64 +12723,18 @@ def obtener_mantenimientos():
 
 @app.route('/historial_mantenimientos')
 def historial_mantenimientos():
-    """Historial de mantenimientos realizados"""
-    try:
-        # Usar SQLite local para datos reales
-        import sqlite3
-        db_path = os.path.join(SCRIPT_DIR, 'database.db')
-        
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        
-        # Crear tabla de historial si no existe
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS historial_mantenimientos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha_realizado DATE NOT NULL,
-                equipo TEXT NOT NULL,
-                tipo TEXT NOT NULL,
-                descripcion TEXT,
-                tecnico TEXT,
-                duracion_real REAL,
-                costo REAL,
-                estado TEXT DEFAULT 'completado',
-                observaciones TEXT,
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Insertar datos iniciales si la tabla está vacía
-        cursor = conn.execute('SELECT COUNT(*) as count FROM historial_mantenimientos')
-        count = cursor.fetchone()['count']
-        
-        if count == 0:
-            # Insertar datos iniciales reales
-            historial_inicial = [
-                ('2024-01-05', 'Motor Biogás MO-080-01', 'Preventivo', 'Mantenimiento programado mensual', 'Juan Pérez', 4.5, 2500.0, 'completado', 'Mantenimiento exitoso'),
-                ('2024-01-03', 'Bomba Purín PU-040-02', 'Correctivo', 'Reparación de motor', 'María García', 6.0, 3200.0, 'completado', 'Motor reparado correctamente'),
-                ('2024-01-01', 'Válvula Control VC-050-01', 'Preventivo', 'Limpieza y lubricación', 'Carlos López', 2.0, 800.0, 'completado', 'Válvula funcionando correctamente'),
-                ('2023-12-28', 'Sensor Temperatura TE-040-01', 'Preventivo', 'Calibración de sensores', 'Ana Martínez', 3.0, 1200.0, 'completado', 'Sensores calibrados'),
-                ('2023-12-25', 'Bomba Recirculación PU-040-01', 'Correctivo', 'Cambio de rodamientos', 'Roberto Silva', 5.0, 1800.0, 'completado', 'Rodamientos reemplazados')
-            ]
-            
-            conn.executemany('''
-                INSERT INTO historial_mantenimientos 
-                (fecha_realizado, equipo, tipo, descripcion, tecnico, duracion_real, costo, estado, observaciones)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', historial_inicial)
-            conn.commit()
-        
-        # Consultar historial real
-        query = """
-            SELECT * FROM historial_mantenimientos 
-            ORDER BY fecha_realizado DESC 
-            LIMIT 50
-        """
-        
-        historial = conn.execute(query).fetchall()
+    """Historial de mantenimientos realizados (paginado con ?pagina=&por_pagina=)"""
+    try:
+        pagina = mantenimiento_db.historial(
+            pagina=request.args.get('pagina', 1, type=int),
+            por_pagina=request.args.get('por_pagina', 50, type=int),
+            equipo=request.args.get('equipo'),
+            desde=request.args.get('desde'),
+            hasta=request.args.get('hasta')
+        )
         
         resultado = []
-        for item in historial:
+        for item in pagina['items']:
             resultado.append({
                 'fecha': item['fecha_realizado'],
                 'equipo': item['equipo'],
@@ -12820,8 +12746,14 @@ def historial_mantenimientos():
                 'estado': item['estado']
             })
         
-        conn.close()
-        return jsonify({'historial': resultado, 'status': 'success'})
+        return jsonify({
+            'historial': resultado,
+            'pagina': pagina['pagina'],
+            'por_pagina': pagina['por_pagina'],
+            'total': pagina['total'],
+            'paginas': pagina['paginas'],
+            'status': 'success'
+        })
         
     except Exception as e:
         logger.error(f"Error en historial_mantenimientos: {e}")
@@ -12834,42 +12766,9 @@ def completar_mantenimiento():
         data = request.json
         mantenimiento_id = data.get('id')
         
-        # Usar SQLite local para datos reales
-        import sqlite3
-        db_path = os.path.join(SCRIPT_DIR, 'database.db')
-        
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        
-        # Obtener datos del mantenimiento
-        mantenimiento = conn.execute('SELECT * FROM mantenimientos WHERE id = ?', (mantenimiento_id,)).fetchone()
-        
-        if not mantenimiento:
+        if not mantenimiento_db.completar(mantenimiento_id, data):
             return jsonify({'error': 'Mantenimiento no encontrado', 'status': 'error'}), 404
         
-        # Insertar en historial
-        conn.execute('''
-            INSERT INTO historial_mantenimientos 
-            (fecha_realizado, equipo, tipo, descripcion, tecnico, duracion_real, costo, estado, observaciones)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.now().strftime('%Y-%m-%d'),
-            mantenimiento['equipo'],
-            mantenimiento['tipo'],
-            mantenimiento['descripcion'],
-            mantenimiento['tecnico_asignado'],
-            data.get('duracion_real', mantenimiento['duracion_estimada']),
-            data.get('costo', 0),
-            'completado',
-            data.get('observaciones', 'Mantenimiento completado')
-        ))
-        
-        # Eliminar de mantenimientos programados
-        conn.execute('DELETE FROM mantenimientos WHERE id = ?', (mantenimiento_id,))
-        
-        conn.commit()
-        conn.close()
-        
         return jsonify({'status': 'success', 'mensaje': 'Mantenimiento completado correctamente'})
         
     except Exception as e:
@@ -13035,12 +12934,8 @@ def favicon():
 # =============================================================================
 
 def get_db_connection():
-    """Obtener conexión a la base de datos SQLite"""
-    import sqlite3
-    db_path = os.path.join(SCRIPT_DIR, 'database.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Obtener la conexión SQLite reutilizable del hilo actual (no cerrarla)"""
+    return mantenimiento_db.conexion()
 
 # =============================================================================
 # NOTA: Las rutas analíticas y de mantenimiento ya existen en el archivo
@@ -13051,55 +12946,21 @@ def calcular_mezcla_optimizacion_bayesiana(config: Dict[str, Any], stock_actual:
     """
     Calcula la mezcla usando OPTIMIZACIÓN BAYESIANA para optimización inteligente.
     Esta función respeta la configuración del Dashboard ML.
+
+    Proceso gaussiano + Expected Improvement sobre proporción sólidos/líquidos,
+    peso metano/kW y topes por material; arranca en caliente desde
+    HISTORIAL_BAYESIANO_FILE.
     """
     try:
         logger.info("🧠 Ejecutando OPTIMIZACIÓN BAYESIANA para optimización de mezcla")
-        
-        # Parámetros específicos para Optimización Bayesiana
-        parametros_bayesianos = {
-            'factor_agresividad': 3.8,
-            'porcentaje_iteracion': 0.94,
-            'tolerancia_kw': 60,
-            'max_iteraciones': 2,
-            'factor_seguridad_volumetrico': 1.06,
-            'prioridad_solidos': 0.90,
-            'optimizacion_bayesiana': True,
-            'acquisition_function': 'expected_improvement',
-            'kernel_type': 'matern',
-            'exploration_weight': 0.1,
-            'exploitation_weight': 0.9
-        }
-        
-        config_bayesiano = config.copy()
-        config_bayesiano.update(parametros_bayesianos)
-        
-        # Simular proceso de Optimización Bayesiana
-        logger.info("🧠 Inicializando proceso bayesiano...")
-        
-        # Usar la función base pero con parámetros optimizados para Bayesiana
-        resultado = calcular_mezcla_diaria(config_bayesiano, stock_actual)
-        
-        if resultado and 'totales' in resultado:
-            resultado['algoritmo_usado'] = 'optimizacion_bayesiana'
-            resultado['parametros_bayesianos'] = parametros_bayesianos
-            resultado['metodo_optimizacion'] = 'Bayesian Optimization'
-            resultado['kernel_utilizado'] = parametros_bayesianos['kernel_type']
-            resultado['acquisition_function'] = parametros_bayesianos['acquisition_function']
-            
-            # Agregar métricas específicas de Optimización Bayesiana
-            resultado['metricas_bayesianas'] = {
-                'iteraciones_realizadas': parametros_bayesianos['max_iteraciones'],
-                'exploration_exploitation_ratio': f"{parametros_bayesianos['exploration_weight']}:{parametros_bayesianos['exploitation_weight']}",
-                'confidence_level': 0.95,
-                'convergence_rate': 0.88,
-                'surrogate_model_accuracy': 0.92
-            }
-        
-        logger.info("🧠 Optimización Bayesiana completada exitosamente")
-        return resultado
-        
+        return calcular_mezcla_memoizada(
+            'optimizacion_bayesiana',
+            lambda cfg, stock: optimizar_mezcla_bayesiana(cfg, stock, matriz=obtener_matriz_materiales(),
+                                                          ruta_historial=HISTORIAL_BAYESIANO_FILE),
+            config, stock_actual
+        )
     except Exception as e:
-        logger.error(f"Error en optimización bayesiana: {e}")
+        logger.error(f"Error en optimización bayesiana: {e}", exc_info=True)
         return calcular_mezcla_diaria(config, stock_actual)
 
 # INICIALIZACIÓN FINAL
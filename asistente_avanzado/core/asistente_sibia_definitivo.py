@@ -14,13 +14,15 @@ import requests
 import numpy as np
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Union, Tuple
-import random
 import sys
 import os
 
 # Agregar el directorio padre al path para importar funciones del proyecto principal
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
+from optimizador_genetico import optimizar_mezcla_genetica
+from optimizador_bayesiano import minimizar_gp
+
 logger = logging.getLogger(__name__)
 
 # ============ CONFIGURACIÓN ============
@@ -73,70 +75,63 @@ class ModeloXGBoost:
         return recomendaciones or ["✅ Parámetros óptimos"]
 
 class AlgoritmoGenetico:
-    """Algoritmo Genético para optimización"""
+    """Algoritmo Genético para optimización (delegado al GA vectorizado del proyecto)"""
     def optimizar_mezcla(self, stock: Dict, objetivo_kw: float, restricciones: Dict) -> Dict:
-        materiales = list(stock.keys())
-        tamaño_pob = 30
-        generaciones = 50
-        
-        # Generar población
-        poblacion = []
-        for _ in range(tamaño_pob):
-            individuo = {mat: random.uniform(0, min(stock[mat], 50)) for mat in materiales}
-            total = sum(individuo.values())
-            if total > 0:
-                individuo = {mat: cant * 100 / total for mat, cant in individuo.items()}
-            poblacion.append(individuo)
-        
-        # Evolucionar
-        mejor_individuo = None
-        mejor_fitness = -float('inf')
-        
-        for _ in range(generaciones):
-            fitness_scores = []
-            for ind in poblacion:
-                kw = sum(ind.get(mat, 0) * restricciones.get('kw_tn', {}).get(mat, 0) for mat in materiales)
-                fitness = 1.0 / (1.0 + abs(kw - objetivo_kw))
-                fitness_scores.append(fitness)
-                if fitness > mejor_fitness:
-                    mejor_fitness = fitness
-                    mejor_individuo = ind.copy()
-            
-            # Nueva generación
-            nueva_pob = [mejor_individuo.copy()]
-            while len(nueva_pob) < tamaño_pob:
-                p1, p2 = random.sample(poblacion, 2)
-                hijo = {mat: p1[mat] if random.random() < 0.5 else p2.get(mat, p1[mat]) for mat in materiales}
-                if random.random() < 0.1:
-                    mat_mut = random.choice(materiales)
-                    hijo[mat_mut] = max(0, hijo[mat_mut] + random.gauss(0, hijo[mat_mut] * 0.1))
-                nueva_pob.append(hijo)
-            poblacion = nueva_pob
-        
-        kw_total = sum(mejor_individuo.get(mat, 0) * restricciones.get('kw_tn', {}).get(mat, 0) for mat in materiales)
+        kw_tn = restricciones.get('kw_tn', {})
+        # El stock puede venir como {material: tn} o con el formato de stock.json
+        stock_ga = {}
+        for mat, datos in stock.items():
+            datos = datos if isinstance(datos, dict) else {'total_tn': datos}
+            stock_ga[mat] = {**datos, 'kw_tn': datos.get('kw_tn') or kw_tn.get(mat, 0)}
+        config = {
+            'kw_objetivo': objetivo_kw,
+            'cantidad_materiales': restricciones.get('cantidad_materiales', 'todos'),
+            'parametros_geneticos_ga': {'tiempo_max_s': restricciones.get('tiempo_max_s', 1.0)},
+        }
+        
+        resultado = optimizar_mezcla_genetica(config, stock_ga)
+        mezcla = {}
+        for grupo in ('materiales_solidos', 'materiales_liquidos', 'materiales_purin'):
+            for mat, datos in resultado.get(grupo, {}).items():
+                mezcla[mat] = datos['cantidad_tn']
+        
+        kw_total = resultado['totales']['kw_total_generado']
         return {
-            'mezcla_optimizada': mejor_individuo,
+            'mezcla_optimizada': mezcla,
             'kw_total': round(kw_total, 2),
-            'fitness': round(mejor_fitness, 4),
-            'mejora_porcentual': round(((kw_total - objetivo_kw) / objetivo_kw * 100), 2) if objetivo_kw > 0 else 0
+            'fitness': round(1.0 / (1.0 + resultado['optimizacion'].get('mejor_costo', 0)), 4),
+            'mejora_porcentual': round(((kw_total - objetivo_kw) / objetivo_kw * 100), 2) if objetivo_kw > 0 else 0,
+            'generaciones': resultado['optimizacion'].get('generaciones', 0),
+            'convergencia': resultado['optimizacion'].get('convergencia', [])
         }
 
 class OptimizacionBayesiana:
-    """Optimización Bayesiana"""
-    def optimizar_parametros(self, actuales: Dict, rangos: Dict) -> Dict:
+    """Optimización Bayesiana (proceso gaussiano + Expected Improvement)"""
+    def optimizar_parametros(self, actuales: Dict, rangos: Dict, objetivo=None) -> Dict:
+        """
+        `objetivo(valores) -> costo` a minimizar; por defecto, distancia
+        normalizada al centro del rango operativo de cada parámetro.
+        """
+        nombres = list(rangos.keys())
+        minimos = np.array([rangos[p][0] for p in nombres], dtype=float)
+        anchos = np.array([rangos[p][1] - rangos[p][0] for p in nombres], dtype=float)
+        if objetivo is None:
+            objetivo = lambda valores: float(np.sum(((valores - minimos) / anchos - 0.5) ** 2))
+        
+        res = minimizar_gp(lambda U: np.array([objetivo(minimos + u * anchos) for u in U]), len(nombres),
+                           {'max_evaluaciones': 20, 'n_inicial': 5, 'tam_lote': 2})
         mejores = {}
         mejoras = {}
-        for param, (min_val, max_val) in rangos.items():
-            valor_actual = actuales.get(param, (min_val + max_val) / 2)
-            valor_optimo = (min_val + max_val) / 2 + random.gauss(0, (max_val - min_val) * 0.1)
-            valor_optimo = max(min_val, min(max_val, valor_optimo))
+        for param, valor_optimo in zip(nombres, (minimos + res['x'] * anchos).tolist()):
+            valor_actual = actuales.get(param, (rangos[param][0] + rangos[param][1]) / 2)
             mejores[param] = round(valor_optimo, 2)
             mejoras[param] = round(((valor_optimo - valor_actual) / valor_actual * 100), 2) if valor_actual != 0 else 0
         
         return {
             'parametros_optimizados': mejores,
             'mejoras_porcentuales': mejoras,
-            'mejora_global_estimada': round(np.mean([abs(m) for m in mejoras.values()]), 2)
+            'mejora_global_estimada': round(float(np.mean([abs(m) for m in mejoras.values()])), 2),
+            'evaluaciones': res['evaluaciones']
         }
 
 class SistemaCAIN:
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIBIA - Benchmark reproducible de todos los algoritmos de mezcla
+
+Corre cada punto de entrada de la mezcla diaria sobre un corpus fijo de
+escenarios (stock sintético con semilla + configuración) y mide por
+algoritmo y escenario:
+
+- tiempo por cálculo (mediana y p95 de --repeticiones, tras una corrida de
+  calentamiento; `lp_incremental` mide por eso el arranque en caliente). La
+  caché de mezclas de la aplicación se vacía antes de cada repetición, así
+  que los `app_*` miden el cálculo y no aciertos de caché
+- memoria: pico y bloques asignados (tracemalloc, en una corrida aparte)
+- error de kW respecto del objetivo y % de CH4
+- violaciones: stock excedido, capacidad diaria excedida, más materiales
+  que `cantidad_materiales` y metano por debajo del umbral
+
+El reporte JSON incluye la huella del corpus y las versiones del entorno.
+Con --baseline compara contra un reporte anterior del mismo corpus y marca
+regresiones (sale con código 1); --guardar-baseline lo deja como referencia.
+
+Los algoritmos de la aplicación y de Adán se importan si sus dependencias
+están instaladas; los que no se pueden cargar figuran como no disponibles.
+
+Uso:
+    python benchmark_algoritmos_mezcla.py [--repeticiones 5] [--algoritmo lp --algoritmo genetico]
+                                          [--salida reporte.json] [--baseline benchmark_mezcla_baseline.json]
+                                          [--guardar-baseline]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from benchmark_mezcla_lp import stock_sintetico
+from optimizador_bayesiano import optimizar_mezcla_bayesiana
+from optimizador_genetico import optimizar_mezcla_genetica
+from optimizador_lp_mezcla import optimizar_mezcla_lp
+from optimizador_pareto import optimizar_frente_pareto
+from resolucion_incremental import ResolutorIncremental
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DEFAULT = os.path.join(SCRIPT_DIR, 'benchmark_mezcla_baseline.json')
+GRUPOS = ('materiales_solidos', 'materiales_liquidos', 'materiales_purin')
+
+# Corpus fijo: (nombre, semilla del stock, factor de stock, configuración)
+CONFIG_BASE = {
+    'kw_objetivo': 28800.0, 'porcentaje_solidos': 40, 'porcentaje_liquidos': 40, 'porcentaje_purin': 20,
+    'cantidad_materiales': '5', 'objetivo_metano_diario': 65.0, 'semilla_mezcla': 42, 'modo_deterministico': True,
+}
+CORPUS = [
+    ('nominal', 42, 1.0, {}),
+    ('objetivo_bajo', 42, 1.0, {'kw_objetivo': 15000.0}),
+    ('objetivo_alto', 7, 1.0, {'kw_objetivo': 40000.0}),
+    ('todos_los_materiales', 42, 1.0, {'cantidad_materiales': 'todos'}),
+    ('sin_purin', 11, 1.0, {'porcentaje_solidos': 60, 'porcentaje_liquidos': 40, 'porcentaje_purin': 0}),
+    ('stock_escaso', 23, 0.15, {}),
+    ('metano_exigente', 42, 1.0, {'objetivo_metano_diario': 68.0}),
+    ('capacidad_limitada', 42, 1.0, {'capacidad_max_solidos_tn': 40, 'capacidad_max_liquidos_tn': 40}),
+]
+
+# Umbrales de regresión contra la baseline
+TOLERANCIA_TIEMPO = 0.25        # +25% de la mediana...
+TOLERANCIA_TIEMPO_MS = 2.0      # ...y al menos 2 ms más
+TOLERANCIA_ERROR_KW_PP = 0.5    # puntos porcentuales de error de kW
+TOLERANCIA_CH4_PP = 0.5         # puntos porcentuales de metano
+
+
+def construir_corpus(materiales_base: dict) -> list:
+    corpus = []
+    for nombre, semilla, factor, cambios in CORPUS:
+        stock = stock_sintetico(materiales_base, semilla)
+        for datos in stock.values():
+            datos['total_tn'] *= factor
+        corpus.append({'nombre': nombre, 'config': {**CONFIG_BASE, **cambios}, 'stock': stock})
+    return corpus
+
+
+def huella_corpus(corpus: list) -> str:
+    return hashlib.sha1(json.dumps(corpus, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+# ---------------------------------------------------------------------------
+# Adaptadores: cada algoritmo → (config, stock) → {kw, ch4, materiales: {nombre: (tipo, tn)}}
+# ---------------------------------------------------------------------------
+
+def _normalizar_sibia(resultado: dict) -> dict:
+    totales = resultado.get('totales', {})
+    materiales = {}
+    for grupo in GRUPOS:
+        tipo = grupo.replace('materiales_', '')
+        for nombre, datos in (resultado.get(grupo) or {}).items():
+            materiales[nombre] = (tipo, float(datos.get('cantidad_tn', datos.get('tn_usadas', 0)) or 0))
+    return {'kw': float(totales.get('kw_total_generado', 0) or 0),
+            'ch4': float(totales.get('porcentaje_metano', 0) or 0), 'materiales': materiales}
+
+
+def _normalizar_adan(resultado: dict) -> dict:
+    materiales = {}
+    for fila in resultado.get('receta', []):
+        tipo = {'solido': 'solidos', 'liquido': 'liquidos'}.get(fila.get('tipo'), 'purin')
+        materiales[fila['material']] = (tipo, float(fila.get('toneladas', 0) or 0))
+    resumen = resultado.get('resumen', {})
+    return {'kw': float(resumen.get('kwh_generado', 0) or 0),
+            'ch4': float(resumen.get('porcentaje_metano', 0) or 0), 'materiales': materiales}
+
+
+def _materiales_adan(materiales_base: dict, stock: dict) -> list:
+    """Lista de materiales en el formato de `adan_calculator.cargar_materiales_excel` con el stock del corpus."""
+    materiales = []
+    for idx, (nombre, data) in enumerate(materiales_base.items()):
+        if not isinstance(data, dict) or 'st' not in data:
+            continue
+        materiales.append({
+            'id': idx, 'nombre': nombre, 'tipo': data.get('tipo', 'solido'),
+            'st_pct': float(data.get('st', 0)) * 100, 'sv_pct': float(data.get('sv', 0)) * 100,
+            'svt_pct': float(data.get('st', 0)) * float(data.get('sv', 0)) * 100,
+            'carbohidratos': float(data.get('carbohidratos', 0)) * 100,
+            'lipidos': float(data.get('lipidos', 0)) * 100, 'proteinas': float(data.get('proteinas', 0)) * 100,
+            'm3_biogas_por_tn': float(data.get('m3_tnsv', 0)),
+            'stock_disponible': float(stock.get(nombre, {}).get('total_tn', 0)),
+            'densidad': float(data.get('densidad', 1.0)), 'kw_por_tn': float(data.get('kw/tn', 0)) * 1000,
+            'ch4_por_tn': float(data.get('ch4', 0)) * 1000,
+            'porcentaje_metano': float(data.get('porcentaje_metano', 65)),
+        })
+    return materiales
+
+
+def registrar_algoritmos(materiales_base: dict) -> tuple:
+    """
+    Algoritmos disponibles {nombre: función(config, stock) → normalizado}, no
+    disponibles {nombre: motivo} y preparación previa a cada corrida medida
+    {nombre: función()}.
+    """
+    algoritmos, no_disponibles, preparar = {}, {}, {}
+
+    def sibia(funcion):
+        return lambda config, stock: _normalizar_sibia(funcion(config, stock))
+
+    incremental = ResolutorIncremental()
+    algoritmos.update({
+        'lp': sibia(lambda c, s: optimizar_mezcla_lp(c, s, materiales_base)),
+        'lp_incremental': sibia(lambda c, s: incremental.resolver(c, s, materiales_base)),
+        'genetico': sibia(lambda c, s: optimizar_mezcla_genetica(c, s, materiales_base)),
+        'bayesiano': sibia(lambda c, s: optimizar_mezcla_bayesiana(c, s, materiales_base)),
+        'pareto': sibia(lambda c, s: optimizar_frente_pareto(c, s, materiales_base)),
+    })
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app_CORREGIDO_OK_FINAL as app
+        porcentajes = lambda c: (float(c['porcentaje_solidos']), float(c['porcentaje_liquidos']))
+        algoritmos.update({
+            'app_diaria': sibia(app.calcular_mezcla_diaria),
+            'app_genetico': sibia(app.calcular_mezcla_algoritmo_genetico),
+            'app_redes_neuronales': sibia(app.calcular_mezcla_redes_neuronales),
+            'app_bayesiana': sibia(app.calcular_mezcla_optimizacion_bayesiana),
+            'app_volumetrica': sibia(app.calcular_mezcla_volumetrica),
+            'app_volumetrica_simple': sibia(lambda c, s: app.calcular_mezcla_volumetrica_simple(
+                c, s, *porcentajes(c), float(c['porcentaje_purin']))),
+            'app_volumetrica_iterativa': sibia(lambda c, s: app.calcular_mezcla_volumetrica_iterativa(c, s, *porcentajes(c))),
+            'app_volumetrica_real': sibia(lambda c, s: app.calcular_mezcla_volumetrica_real(c, s, *porcentajes(c))),
+        })
+        # Los puntos de entrada de la app memoizan por huella (modo determinístico): sin vaciar la
+        # caché, las repeticiones medirían aciertos
+        preparar.update({nombre: app.cache_mezclas.invalidar for nombre in algoritmos if nombre.startswith('app_')})
+    except Exception as e:
+        no_disponibles['app_*'] = f"{type(e).__name__}: {e}"
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import adan_calculator as adan
+
+        def receta_adan(modo, modelos):
+            def calcular(config, stock):
+                return _normalizar_adan(adan.generar_receta_con_purin(
+                    config['kw_objetivo'], config['objetivo_metano_diario'], 0, _materiales_adan(materiales_base, stock),
+                    adan.MOTOR_CONFIG['consumo_l_s'], adan.MOTOR_CONFIG['potencia_kw'], modo,
+                    config['porcentaje_solidos'], config['porcentaje_liquidos'], config['porcentaje_purin'],
+                    False, 999 if config['cantidad_materiales'] == 'todos' else int(config['cantidad_materiales']),
+                    modelos))
+            return calcular
+
+        algoritmos.update({
+            'adan_energetico': receta_adan('energetico', []),
+            'adan_volumetrico': receta_adan('volumetrico', []),
+            'adan_random_forest': receta_adan('energetico', ['random_forest']),
+            'adan_bayesiana': receta_adan('energetico', ['optimizacion_bayesiana']),
+        })
+    except Exception as e:
+        no_disponibles['adan_*'] = f"{type(e).__name__}: {e}"
+    return algoritmos, no_disponibles, preparar
+
+
+# ---------------------------------------------------------------------------
+# Medición
+# ---------------------------------------------------------------------------
+
+def violaciones(normalizado: dict, escenario: dict) -> dict:
+    config, stock = escenario['config'], escenario['stock']
+    tn_por_tipo, cantidad_por_tipo = {}, {}
+    excedido = 0
+    for nombre, (tipo, tn) in normalizado['materiales'].items():
+        if tn <= 0:
+            continue
+        tn_por_tipo[tipo] = tn_por_tipo.get(tipo, 0.0) + tn
+        cantidad_por_tipo[tipo] = cantidad_por_tipo.get(tipo, 0) + 1
+        if tn > float(stock.get(nombre, {}).get('total_tn', 0)) + 1e-3:
+            excedido += 1
+    capacidad = sum(1 for tipo, tn in tn_por_tipo.items()
+                    if tn > float(config.get(f'capacidad_max_{tipo}_tn', np.inf)) + 1e-3)
+    limite = config.get('cantidad_materiales')
+    cantidad = 0
+    if str(limite).isdigit():
+        cantidad = sum(max(0, cantidad_por_tipo.get(t, 0) - int(limite)) for t in ('solidos', 'liquidos'))
+    metano = int(normalizado['materiales'] != {} and normalizado['ch4'] < float(config['objetivo_metano_diario']) - 0.05)
+    return {'stock': excedido, 'capacidad': capacidad, 'cantidad_materiales': cantidad, 'metano': metano,
+            'total': excedido + capacidad + cantidad + metano}
+
+
+def medir(funcion, escenario: dict, repeticiones: int, preparar=None) -> dict:
+    config, stock = escenario['config'], escenario['stock']
+    preparar = preparar or (lambda: None)
+    tiempos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        funcion(dict(config), stock)  # calentamiento: imports perezosos y cachés de la matriz
+        for _ in range(repeticiones):
+            preparar()
+            inicio = time.perf_counter()
+            normalizado = funcion(dict(config), stock)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+        tracemalloc.start()
+        antes = sum(s.count for s in tracemalloc.take_snapshot().statistics('filename'))
+        preparar()
+        funcion(dict(config), stock)
+        pico = tracemalloc.get_traced_memory()[1]
+        bloques = sum(s.count for s in tracemalloc.take_snapshot().statistics('filename')) - antes
+        tracemalloc.stop()
+
+    kw_objetivo = float(config['kw_objetivo'])
+    return {
+        'ms_mediana': round(float(np.median(tiempos)), 3),
+        'ms_p95': round(float(np.percentile(tiempos, 95)), 3),
+        'memoria_pico_kib': round(pico / 1024, 1),
+        'bloques_retenidos': int(bloques),
+        'kw': round(normalizado['kw'], 2),
+        'error_kw_pct': round(abs(normalizado['kw'] - kw_objetivo) / kw_objetivo * 100, 3),
+        'ch4': round(normalizado['ch4'], 3),
+        'tn_total': round(sum(tn for _, tn in normalizado['materiales'].values()), 3),
+        'violaciones': violaciones(normalizado, escenario),
+    }
+
+
+def resumir(por_escenario: dict) -> dict:
+    filas = [m for m in por_escenario.values() if 'error' not in m]
+    if not filas:
+        return {'escenarios_ok': 0}
+    return {
+        'escenarios_ok': len(filas),
+        'ms_mediana_promedio': round(float(np.mean([m['ms_mediana'] for m in filas])), 3),
+        'error_kw_pct_promedio': round(float(np.mean([m['error_kw_pct'] for m in filas])), 3),
+        'ch4_promedio': round(float(np.mean([m['ch4'] for m in filas])), 3),
+        'memoria_pico_kib_max': max(m['memoria_pico_kib'] for m in filas),
+        'violaciones_total': sum(m['violaciones']['total'] for m in filas),
+    }
+
+
+def comparar(reporte: dict, baseline: dict) -> list:
+    """Regresiones del reporte contra la baseline (mismo corpus, mismo algoritmo y escenario)."""
+    if baseline.get('corpus', {}).get('huella') != reporte['corpus']['huella']:
+        return [{'algoritmo': '*', 'escenario': '*', 'metrica': 'corpus',
+                 'detalle': 'la baseline corresponde a otro corpus; no es comparable'}]
+    regresiones = []
+    for algoritmo, escenarios in reporte['resultados'].items():
+        for escenario, actual in escenarios.items():
+            previo = baseline.get('resultados', {}).get(algoritmo, {}).get(escenario)
+            if not previo or 'error' in previo:
+                continue
+            if 'error' in actual:
+                regresiones.append({'algoritmo': algoritmo, 'escenario': escenario, 'metrica': 'error',
+                                    'detalle': actual['error']})
+                continue
+            chequeos = [
+                ('ms_mediana', actual['ms_mediana'] > previo['ms_mediana'] * (1 + TOLERANCIA_TIEMPO)
+                 and actual['ms_mediana'] - previo['ms_mediana'] > TOLERANCIA_TIEMPO_MS),
+                ('error_kw_pct', actual['error_kw_pct'] > previo['error_kw_pct'] + TOLERANCIA_ERROR_KW_PP),
+                ('ch4', actual['ch4'] < previo['ch4'] - TOLERANCIA_CH4_PP),
+                ('violaciones', actual['violaciones']['total'] > previo['violaciones']['total']),
+            ]
+            for metrica, empeoro in chequeos:
+                if empeoro:
+                    valor = actual['violaciones']['total'] if metrica == 'violaciones' else actual[metrica]
+                    anterior = previo['violaciones']['total'] if metrica == 'violaciones' else previo[metrica]
+                    regresiones.append({'algoritmo': algoritmo, 'escenario': escenario, 'metrica': metrica,
+                                        'baseline': anterior, 'actual': valor})
+    return regresiones
+
+
+def entorno() -> dict:
+    versiones = {'python': platform.python_version(), 'numpy': np.__version__, 'plataforma': platform.platform()}
+    for modulo in ('scipy', 'sklearn'):
+        try:
+            versiones[modulo] = __import__(modulo).__version__
+        except ImportError:
+            versiones[modulo] = None
+    return versiones
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark reproducible de los algoritmos de mezcla')
+    parser.add_argument('--materiales', default=os.path.join(SCRIPT_DIR, 'materiales_base_config.json'))
+    parser.add_argument('--algoritmo', action='append', help='Limitar a estos algoritmos (repetible)')
+    parser.add_argument('--escenario', action='append', help='Limitar a estos escenarios del corpus (repetible)')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--salida', default=os.path.join(tempfile.gettempdir(), 'benchmark_mezcla_reporte.json'))
+    parser.add_argument('--baseline', default=BASELINE_DEFAULT)
+    parser.add_argument('--guardar-baseline', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.materiales, 'r', encoding='utf-8') as f:
+        materiales_base = json.load(f)
+    corpus = construir_corpus(materiales_base)
+    huella = huella_corpus(corpus)
+    if args.escenario:
+        corpus = [e for e in corpus if e['nombre'] in args.escenario]
+    algoritmos, no_disponibles, preparar = registrar_algoritmos(materiales_base)
+    if args.algoritmo:
+        algoritmos = {n: f for n, f in algoritmos.items() if n in args.algoritmo}
+    for nombre, motivo in no_disponibles.items():
+        print(f"⚠️ {nombre} no disponible: {motivo}")
+    print(f"Corpus {huella}: {len(corpus)} escenarios × {len(algoritmos)} algoritmos, {args.repeticiones} repeticiones\n")
+
+    resultados = {}
+    for algoritmo, funcion in algoritmos.items():
+        resultados[algoritmo] = {}
+        for escenario in corpus:
+            try:
+                m = medir(funcion, escenario, args.repeticiones, preparar.get(algoritmo))
+                print(f"  {algoritmo:<26} {escenario['nombre']:<22} {m['ms_mediana']:9.2f} ms  "
+                      f"pico={m['memoria_pico_kib']:8.1f} KiB  error={m['error_kw_pct']:6.2f}%  "
+                      f"CH4={m['ch4']:5.1f}%  violaciones={m['violaciones']['total']}")
+            except Exception as e:
+                m = {'error': f"{type(e).__name__}: {e}"}
+                print(f"  {algoritmo:<26} {escenario['nombre']:<22} ERROR {m['error']}")
+            resultados[algoritmo][escenario['nombre']] = m
+
+    reporte = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'corpus': {'huella': huella, 'escenarios': [e['nombre'] for e in corpus], 'repeticiones': args.repeticiones},
+        'entorno': entorno(),
+        'no_disponibles': no_disponibles,
+        'resultados': resultados,
+        'resumen': {algoritmo: resumir(por_escenario) for algoritmo, por_escenario in resultados.items()},
+    }
+
+    print(f"\n{'algoritmo':<26} {'ms':>9} {'error kW':>9} {'CH4':>6} {'viol.':>6}")
+    for algoritmo, r in sorted(reporte['resumen'].items(), key=lambda x: x[1].get('ms_mediana_promedio', np.inf)):
+        if r['escenarios_ok']:
+            print(f"{algoritmo:<26} {r['ms_mediana_promedio']:9.2f} {r['error_kw_pct_promedio']:8.2f}% "
+                  f"{r['ch4_promedio']:5.1f}% {r['violaciones_total']:6d}")
+
+    regresiones = []
+    if os.path.exists(args.baseline) and not args.guardar_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regresiones = comparar(reporte, json.load(f))
+        reporte['regresiones'] = regresiones
+        print(f"\nBaseline {args.baseline}: {len(regresiones)} regresiones")
+        for r in regresiones:
+            print(f"  ❌ {r['algoritmo']} / {r['escenario']}: {r['metrica']} "
+                  f"{r.get('baseline', '')} → {r.get('actual', r.get('detalle', ''))}")
+
+    destino = args.baseline if args.guardar_baseline else args.salida
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    print(f"\nReporte guardado en {destino}")
+    return 1 if regresiones else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
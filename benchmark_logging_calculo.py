@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIBIA - Benchmark del costo de logging en el cálculo de mezcla
+
+Mide el mismo cálculo con tres configuraciones de `registro_calculo`:
+
+- apagado: 'sibia' en WARNING (sólo advertencias muestreadas)
+- resumen: 'sibia' en INFO (una línea de traza por cálculo, el default)
+- detalle: 'sibia' en DEBUG (todas las líneas por material/iteración, el
+  volumen que antes se emitía siempre)
+
+Los registros se escriben a un archivo temporal con el mismo formato que
+`app.log`, así el costo incluye formateo y E/S. Se miden las recetas de
+Adán (energética y volumétrica) y, si la aplicación importa, el greedy de
+`calcular_mezcla_diaria` sin caché.
+
+Uso:
+    python benchmark_logging_calculo.py [--repeticiones 50] [--kw 28800]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from registro_calculo import PREFIJO, configurar_niveles, traza
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODOS = (('apagado', 'WARNING'), ('resumen', 'INFO'), ('detalle', 'DEBUG'))
+
+
+def algoritmos(kw_objetivo: float) -> list:
+    from adan_calculator import cargar_materiales_excel, generar_receta_con_purin
+    materiales = cargar_materiales_excel(os.path.join(SCRIPT_DIR, 'materiales_base_config.json'))
+    lista = [
+        (f'adan_{modo}', lambda modo=modo: generar_receta_con_purin(
+            kw_objetivo, 65.0, 10.0, materiales, 3.5, 1400, modo, 60, 40, 0, True, 5, []))
+        for modo in ('energetico', 'volumetrico')
+    ]
+    try:
+        from app_CORREGIDO_OK_FINAL import _calcular_mezcla_diaria_sin_cache, cargar_configuracion, stock_ledger
+        config = {**cargar_configuracion(), 'kw_objetivo': kw_objetivo, 'habilitar_evolucion': False}
+        stock = stock_ledger.stock_actual().get('materiales', {})
+        lista.append(('app_diaria', lambda: _calcular_mezcla_diaria_sin_cache(dict(config), stock)))
+    except Exception as e:
+        print(f"Mezcla diaria de la aplicación no disponible ({e}); se miden sólo las recetas de Adán")
+    return lista
+
+
+def medir(funcion, repeticiones: int, archivo: str) -> dict:
+    funcion()  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        with traza('benchmark'):
+            funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        'ms_mediana': statistics.median(tiempos),
+        'ms_p95': sorted(tiempos)[max(0, int(len(tiempos) * 0.95) - 1)],
+        'bytes_por_calculo': os.path.getsize(archivo) / (repeticiones + 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Costo del logging en el cálculo de mezcla')
+    parser.add_argument('--repeticiones', type=int, default=50)
+    parser.add_argument('--kw', type=float, default=28800.0)
+    args = parser.parse_args()
+
+    raiz = logging.getLogger(PREFIJO)
+    raiz.propagate = False
+    formato = logging.Formatter('%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
+    lista = algoritmos(args.kw)
+
+    print(f"Objetivo {args.kw:.0f} kW, {args.repeticiones} repeticiones\n")
+    print(f"  {'algoritmo':<18}{'modo':<10}{'mediana ms':>12}{'p95 ms':>10}{'KB/cálculo':>12}{'vs apagado':>12}")
+    for nombre, funcion in lista:
+        base = None
+        for modo, nivel in MODOS:
+            with tempfile.NamedTemporaryFile('w', suffix='.log', delete=False) as tmp:
+                archivo = tmp.name
+            manejador = logging.FileHandler(archivo, encoding='utf-8')
+            manejador.setFormatter(formato)
+            raiz.addHandler(manejador)
+            configurar_niveles({PREFIJO: nivel})
+            try:
+                m = medir(funcion, args.repeticiones, archivo)
+            finally:
+                raiz.removeHandler(manejador)
+                manejador.close()
+                os.remove(archivo)
+            base = base or m['ms_mediana']
+            print(f"  {nombre:<18}{modo:<10}{m['ms_mediana']:12.3f}{m['ms_p95']:10.3f}"
+                  f"{m['bytes_por_calculo'] / 1024:12.2f}{m['ms_mediana'] / base:11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIBIA - Benchmark de la capa de datos de mantenimiento
+
+Genera N mantenimientos e historial sintéticos en una base temporal y mide
+el costo de las consultas que usan los endpoints del módulo, comparando la
+conexión reutilizable e indexada (MantenimientoDB) contra una base sin índices
+donde cada request abre una conexión y ejecuta CREATE TABLE, como hacía el
+código anterior.
+
+Uso:
+    python benchmark_mantenimiento.py [--filas 100000] [--repeticiones 200]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from mantenimiento_db import MantenimientoDB, MIGRACIONES
+
+EQUIPOS = [f"Equipo {i:03d}" for i in range(200)]
+TIPOS = ['Preventivo', 'Correctivo', 'Predictivo']
+PRIORIDADES = ['Baja', 'Media', 'Alta']
+
+
+def poblar(conn: sqlite3.Connection, filas: int, semilla: int = 42) -> None:
+    rnd = random.Random(semilla)
+    inicio = date(2020, 1, 1)
+    with conn:
+        conn.executemany(
+            '''INSERT INTO mantenimientos (equipo, tipo, fecha_programada, prioridad, tecnico_asignado,
+               duracion_estimada, descripcion, repuestos, estado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            ((rnd.choice(EQUIPOS), rnd.choice(TIPOS), (inicio + timedelta(days=rnd.randrange(2500))).isoformat(),
+              rnd.choice(PRIORIDADES), 'Técnico', rnd.uniform(1, 8), 'Sintético', '',
+              'completado' if rnd.random() < 0.9 else 'programado') for _ in range(filas)))
+        conn.executemany(
+            '''INSERT INTO historial_mantenimientos (fecha_realizado, equipo, tipo, descripcion, tecnico,
+               duracion_real, costo, estado, observaciones) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (((inicio + timedelta(days=rnd.randrange(2500))).isoformat(), rnd.choice(EQUIPOS), rnd.choice(TIPOS),
+              'Sintético', 'Técnico', rnd.uniform(1, 8), rnd.uniform(100, 5000), 'completado', '')
+             for _ in range(filas)))
+
+
+def medir(nombre: str, funcion, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+    print(f"  {nombre:<45} {ms:8.3f} ms/op")
+    return ms
+
+
+def consulta_legacy(db_path: str, query: str, params: tuple = ()) -> None:
+    """Réplica del patrón anterior: conexión nueva + DDL en cada request."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(MIGRACIONES[0])
+    conn.execute(query, params).fetchall()
+    conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=100_000)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        db = MantenimientoDB(db_path, datos_iniciales=False)
+
+        t0 = time.perf_counter()
+        poblar(db.conexion(), args.filas)
+        print(f"Poblado: {args.filas} mantenimientos + {args.filas} historial en {time.perf_counter() - t0:.2f}s")
+        legacy_conn = sqlite3.connect(legacy_path)
+        legacy_conn.executescript(MIGRACIONES[0])
+        poblar(legacy_conn, args.filas)
+        legacy_conn.close()
+
+        r = args.repeticiones
+        q_historial = 'SELECT * FROM historial_mantenimientos ORDER BY fecha_realizado DESC LIMIT 50'
+        q_equipo = 'SELECT * FROM historial_mantenimientos WHERE equipo = ? ORDER BY fecha_realizado DESC LIMIT 50'
+        q_pendientes = "SELECT * FROM mantenimientos WHERE estado != 'completado' ORDER BY fecha_programada ASC"
+
+        print("Patrón anterior (sin índices, conexión + DDL por request):")
+        legacy = medir('historial últimos 50', lambda: consulta_legacy(legacy_path, q_historial), r)
+        legacy_eq = medir('historial por equipo', lambda: consulta_legacy(legacy_path, q_equipo, ('Equipo 042',)), r)
+        medir('pendientes (todos)', lambda: consulta_legacy(legacy_path, q_pendientes), r)
+
+        print("MantenimientoDB (WAL, índices, conexión por hilo):")
+        nuevo = medir('historial página 1 (con total)', lambda: db.historial(pagina=1), r)
+        medir('historial página 500', lambda: db.historial(pagina=500), r)
+        nuevo_eq = medir('historial por equipo', lambda: db.historial(equipo='Equipo 042'), r)
+        medir('historial por rango de fechas', lambda: db.historial(desde='2023-01-01', hasta='2023-03-31'), r)
+        medir('pendientes (todos)', lambda: db.pendientes(), r)
+        medir('pendientes primeros 100', lambda: db.pendientes(limite=100), r)
+        medir('pendientes por equipo', lambda: db.pendientes(equipo='Equipo 042'), r)
+        print(f"Mejora historial: x{legacy / nuevo:.1f} | historial por equipo: x{legacy_eq / nuevo_eq:.1f}")
+        db.cerrar()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIBIA - Benchmark del optimizador LP de la mezcla diaria
+
+Compara `optimizar_mezcla_lp` contra el algoritmo greedy de
+`calcular_mezcla_diaria` sobre snapshots de `stock.json` y
+`materiales_base_config.json`: tiempo por cálculo, error de kW respecto del
+objetivo, metano resultante, toneladas y violaciones de stock.
+
+Si no hay `stock.json` se genera un stock sintético a partir de los
+materiales base (--semilla). El greedy se importa desde la aplicación; si
+sus dependencias no están instaladas se mide sólo el LP.
+
+Al final verifica que la re-resolución en caliente (`ResolutorIncremental`)
+dé lo mismo que en frío ante cambios de objetivo y de stock (--pasos-caliente);
+si difieren más que la tolerancia sale con código 1.
+
+Uso:
+    python benchmark_mezcla_lp.py [--stock stock.json] [--materiales materiales_base_config.json]
+                                  [--kw 28800 --kw 20000] [--repeticiones 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from optimizador_lp_mezcla import optimizar_mezcla_lp
+from resolucion_incremental import ResolutorIncremental
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def stock_sintetico(materiales_base: dict, semilla: int) -> dict:
+    rnd = random.Random(semilla)
+    stock = {}
+    for nombre, datos in materiales_base.items():
+        if not isinstance(datos, dict) or 'st' not in datos:
+            continue
+        stock[nombre] = {
+            'total_tn': rnd.uniform(20, 400),
+            'tipo': datos.get('tipo', 'solido'),
+            'st_porcentaje': float(datos.get('st', 0)) * 100,
+            'kw_tn': float(datos.get('kw/tn', 0) or 0) * 1000,
+        }
+    return stock
+
+
+def metricas(resultado: dict, stock: dict, kw_objetivo: float) -> dict:
+    totales = resultado.get('totales', {})
+    violaciones = 0
+    for grupo in ('materiales_solidos', 'materiales_liquidos', 'materiales_purin'):
+        for nombre, datos in resultado.get(grupo, {}).items():
+            if datos.get('cantidad_tn', 0) > float(stock.get(nombre, {}).get('total_tn', 0)) + 1e-6:
+                violaciones += 1
+    kw = float(totales.get('kw_total_generado', 0))
+    return {
+        'kw': kw,
+        'error_kw_pct': abs(kw - kw_objetivo) / kw_objetivo * 100 if kw_objetivo else 0.0,
+        'ch4': float(totales.get('porcentaje_metano', 0)),
+        'tn': float(totales.get('tn_total', 0)),
+        'violaciones_stock': violaciones,
+    }
+
+
+def medir(nombre: str, funcion, config: dict, stock: dict, repeticiones: int) -> None:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion(dict(config), stock)
+    ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+    m = metricas(resultado, stock, config['kw_objetivo'])
+    print(f"  {nombre:<10} {ms:9.2f} ms/op  kW={m['kw']:10.0f}  error={m['error_kw_pct']:6.2f}%  "
+          f"CH4={m['ch4']:5.1f}%  tn={m['tn']:8.1f}  violaciones={m['violaciones_stock']}")
+
+
+def verificar_incremental(config: dict, stock: dict, materiales_base: dict, pasos: int, semilla: int,
+                          tolerancia_kw: float = 1.0, tolerancia_tn: float = 0.01) -> bool:
+    """Caliente vs frío sobre una secuencia de cambios de objetivo y de stock."""
+    rnd = random.Random(semilla)
+    resolutor = ResolutorIncremental()
+    stock = {nombre: dict(datos) for nombre, datos in stock.items()}
+    ok = True
+    for paso in range(pasos):
+        config = {**config, 'kw_objetivo': config['kw_objetivo'] * rnd.uniform(0.9, 1.1)}
+        nombre = rnd.choice(sorted(stock))
+        stock[nombre]['total_tn'] = float(stock[nombre].get('total_tn', 0)) * rnd.uniform(0.7, 2.0)
+        caliente = resolutor.resolver(dict(config), stock, materiales_base)
+        frio = optimizar_mezcla_lp(dict(config), stock, materiales_base)
+        dif_kw = abs(caliente['totales']['kw_total_generado'] - frio['totales']['kw_total_generado'])
+        dif_tn = abs(caliente['totales']['tn_total'] - frio['totales']['tn_total'])
+        if dif_kw > tolerancia_kw or dif_tn > tolerancia_tn:
+            ok = False
+            print(f"  ❌ paso {paso}: caliente y frío difieren en {dif_kw:.2f} kW y {dif_tn:.3f} tn")
+    estadisticas = resolutor.estadisticas()
+    print(f"  caliente  {estadisticas['caliente']['resoluciones']} resoluciones, "
+          f"{estadisticas['caliente']['ms_promedio']:.2f} ms/op; frío {estadisticas['frio']['ms_promedio']:.2f} ms/op"
+          f"  → {'coinciden' if ok else 'NO coinciden'}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark LP vs greedy de la mezcla diaria')
+    parser.add_argument('--stock', default=os.path.join(SCRIPT_DIR, 'stock.json'))
+    parser.add_argument('--materiales', default=os.path.join(SCRIPT_DIR, 'materiales_base_config.json'))
+    parser.add_argument('--kw', type=float, action='append')
+    parser.add_argument('--cantidad-materiales', default='5')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--pasos-caliente', type=int, default=30)
+    args = parser.parse_args()
+
+    with open(args.materiales, 'r', encoding='utf-8') as f:
+        materiales_base = json.load(f)
+    if os.path.exists(args.stock):
+        with open(args.stock, 'r', encoding='utf-8') as f:
+            stock = json.load(f).get('materiales', {})
+        print(f"Stock: {args.stock} ({len(stock)} materiales)")
+    else:
+        stock = stock_sintetico(materiales_base, args.semilla)
+        print(f"Stock sintético (semilla {args.semilla}, {len(stock)} materiales)")
+
+    algoritmos = [('lp', lambda config, s: optimizar_mezcla_lp(config, s, materiales_base))]
+    try:
+        from app_CORREGIDO_OK_FINAL import calcular_mezcla_diaria
+        algoritmos.append(('greedy', calcular_mezcla_diaria))
+    except Exception as e:
+        print(f"Greedy no disponible ({e}); se mide sólo el LP")
+
+    for kw_objetivo in args.kw or [28800.0, 15000.0]:
+        config = {'kw_objetivo': kw_objetivo, 'cantidad_materiales': args.cantidad_materiales,
+                  'porcentaje_solidos': 40, 'porcentaje_liquidos': 40, 'porcentaje_purin': 20,
+                  'objetivo_metano_diario': 65.0}
+        print(f"\nObjetivo {kw_objetivo:.0f} kW ({args.repeticiones} repeticiones)")
+        for nombre, funcion in algoritmos:
+            medir(nombre, funcion, config, stock, args.repeticiones)
+
+    ok = True
+    if args.pasos_caliente > 0:
+        print(f"\nRe-resolución en caliente vs frío ({args.pasos_caliente} cambios de objetivo y stock)")
+        ok = verificar_incremental(config, stock, materiales_base, args.pasos_caliente, args.semilla)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
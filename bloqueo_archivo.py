@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BLOQUEOS DE ARCHIVO ENTRE PROCESOS
+==================================
+
+En producción la app corre con varios workers de gunicorn (procesos
+separados), así que un `threading.Lock` no alcanza para proteger los
+archivos JSON compartidos. Este módulo usa `fcntl.flock` sobre un archivo
+`<ruta>.lock` al lado del archivo protegido:
+
+    with bloqueo_archivo(ruta):          # exclusivo, espera a los demás
+        ...leer, fusionar y escribir ruta...
+
+    manejador = adquirir_bloqueo_exclusivo(ruta)   # sin esperar
+    if manejador is not None:
+        ...este proceso es el único que hace la tarea...
+
+Sin `fcntl` (Windows, desarrollo con un solo proceso) los bloqueos entre
+procesos se omiten y sólo queda la protección entre hilos.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+    FCNTL_DISPONIBLE = True
+except ImportError:
+    fcntl = None
+    FCNTL_DISPONIBLE = False
+
+# Un RLock por ruta ordena los hilos del proceso y permite anidar el bloqueo
+# en el mismo hilo (un segundo flock desde otro descriptor se bloquearía)
+_LOCKS_HILOS: Dict[str, threading.RLock] = {}
+_LOCKS_HILOS_GUARDA = threading.Lock()
+_TOMADOS = threading.local()
+
+
+def _ruta_lock(ruta: str) -> str:
+    return f"{os.path.abspath(ruta)}.lock"
+
+
+def _lock_hilos(ruta: str) -> threading.RLock:
+    with _LOCKS_HILOS_GUARDA:
+        return _LOCKS_HILOS.setdefault(_ruta_lock(ruta), threading.RLock())
+
+
+@contextmanager
+def bloqueo_archivo(ruta: str) -> Iterator[None]:
+    """Bloqueo exclusivo de `ruta` entre hilos y procesos mientras dura el bloque."""
+    clave = _ruta_lock(ruta)
+    with _lock_hilos(ruta):
+        tomados = _TOMADOS.__dict__.setdefault('rutas', set())
+        if not FCNTL_DISPONIBLE or clave in tomados:
+            yield
+            return
+        with open(clave, 'a+') as manejador:
+            fcntl.flock(manejador.fileno(), fcntl.LOCK_EX)
+            tomados.add(clave)
+            try:
+                yield
+            finally:
+                tomados.discard(clave)
+                fcntl.flock(manejador.fileno(), fcntl.LOCK_UN)
+
+
+def adquirir_bloqueo_exclusivo(ruta: str) -> Optional[IO]:
+    """
+    Intenta tomar sin esperar un bloqueo de `ruta` que dura mientras viva el
+    proceso. Devuelve el archivo abierto (hay que conservar la referencia) o
+    None si otro proceso ya lo tiene.
+    """
+    manejador = open(_ruta_lock(ruta), 'a+')
+    if not FCNTL_DISPONIBLE:
+        return manejador
+    try:
+        fcntl.flock(manejador.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        manejador.close()
+        return None
+    return manejador
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CACHÉ DETERMINÍSTICA DE MEZCLAS CALCULADAS
+==========================================
+
+Las mezclas se recalculan muchas veces por minuto con entradas idénticas
+(calculadora, dashboard, recomendaciones, planificación). Con el modo
+determinístico (semilla explícita) el resultado depende sólo de:
+
+    (configuración, stock, versión del catálogo de materiales, algoritmo, semilla)
+
+La huella es un hash del contenido canónico de esas entradas y los
+resultados se guardan en una LRU acotada. Un acierto devuelve una copia de
+la mezcla con `cache: {'hit': True, ...}` sin recalcular.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRADAS_DEFAULT = 256
+
+# Claves de configuración que no influyen en el cálculo de la mezcla
+CLAVES_CONFIG_IGNORADAS = frozenset({
+    'timestamp', 'fecha_actualizacion', 'ultima_actualizacion', 'ultima_modificacion',
+})
+
+# Campos del stock que intervienen en el cálculo
+CAMPOS_STOCK = ('total_tn', 'st_porcentaje', 'total_solido', 'kw_tn', 'ch4_porcentaje', 'tipo', 'densidad')
+
+
+def _canonico(valor: Any) -> Any:
+    """Redondea floats para que diferencias de representación no cambien la huella."""
+    if isinstance(valor, float):
+        return round(valor, 9)
+    if isinstance(valor, dict):
+        return {str(k): _canonico(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_canonico(v) for v in valor]
+    return valor
+
+
+def huella_mezcla(config: Dict[str, Any], stock_actual: Dict[str, Any], algoritmo: str,
+                  version_catalogo: str = '', semilla: Optional[int] = None,
+                  extra: Optional[Dict[str, Any]] = None) -> str:
+    """Hash SHA-1 del contenido que determina una mezcla."""
+    config_relevante = {k: v for k, v in config.items() if k not in CLAVES_CONFIG_IGNORADAS}
+    stock_relevante = {
+        mat: {campo: datos.get(campo) for campo in CAMPOS_STOCK if campo in datos}
+        for mat, datos in stock_actual.items() if isinstance(datos, dict)
+    }
+    contenido = {
+        'algoritmo': algoritmo,
+        'catalogo': version_catalogo,
+        'semilla': semilla,
+        'config': config_relevante,
+        'stock': stock_relevante,
+        'extra': extra or {},
+    }
+    texto = json.dumps(_canonico(contenido), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+class CacheMezclas:
+    """LRU acotada y thread-safe de resultados de mezcla por huella."""
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS_DEFAULT):
+        self.max_entradas = max_entradas
+        self._entradas: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, huella: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entrada = self._entradas.get(huella)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(huella)
+            self.aciertos += 1
+            entrada['aciertos'] += 1
+            resultado = copy.deepcopy(entrada['resultado'])
+            resultado['cache'] = {
+                'hit': True,
+                'huella': huella,
+                'calculado_en': entrada['calculado_en'],
+                'aciertos': entrada['aciertos'],
+            }
+            return resultado
+
+    def guardar(self, huella: str, resultado: Dict[str, Any], duracion_ms: float = 0.0) -> None:
+        with self._lock:
+            self._entradas[huella] = {
+                'resultado': copy.deepcopy(resultado),
+                'calculado_en': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'duracion_ms': duracion_ms,
+                'aciertos': 0,
+            }
+            self._entradas.move_to_end(huella)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def calcular(self, huella: str, funcion: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Devuelve el resultado cacheado o lo calcula con `funcion()` y lo guarda."""
+        resultado = self.obtener(huella)
+        if resultado is not None:
+            return resultado
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        if isinstance(resultado, dict) and resultado.get('totales'):
+            resultado.pop('cache', None)
+            self.guardar(huella, resultado, duracion_ms)
+            resultado['cache'] = {'hit': False, 'huella': huella, 'duracion_ms': round(duracion_ms, 3)}
+        return resultado
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / total, 4) if total else 0.0,
+                'ms_ahorrados': round(sum(e['duracion_ms'] * e['aciertos'] for e in self._entradas.values()), 3),
+            }
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EJECUTOR CONCURRENTE DE MODELOS CON PLAZOS
+==========================================
+
+Corre varias tareas independientes (estrategias `optimizar_con_*` o
+evaluaciones `evaluar_*` de Adán) en paralelo sobre un pool de hilos
+persistente:
+
+- plazo por modelo y presupuesto total: lo que no termina a tiempo se
+  informa como 'timeout' y la respuesta sale con los resultados parciales;
+  la latencia queda acotada por el modelo más lento o el presupuesto.
+- caché LRU por huella de entrada: un modelo que ya corrió con la misma
+  entrada no se vuelve a ejecutar. Un modelo que venció su plazo igual
+  guarda su resultado al terminar, para el próximo request.
+- desglose de latencias por modelo.
+
+El pool es de larga vida (no un `with ThreadPoolExecutor`) para que un
+modelo colgado no bloquee la salida del request.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS_DEFAULT = 6
+TIMEOUT_MODELO_MS_DEFAULT = 2000.0
+PRESUPUESTO_MS_DEFAULT = 3000.0
+MAX_ENTRADAS_DEFAULT = 256
+
+
+class EjecutorModelos:
+    """Pool de hilos + caché por huella + plazos por tarea."""
+
+    def __init__(self, max_workers: int = MAX_WORKERS_DEFAULT, timeout_ms: float = TIMEOUT_MODELO_MS_DEFAULT,
+                 presupuesto_ms: float = PRESUPUESTO_MS_DEFAULT, max_entradas: int = MAX_ENTRADAS_DEFAULT):
+        self.max_workers = max_workers
+        self.timeout_ms = timeout_ms
+        self.presupuesto_ms = presupuesto_ms
+        self.max_entradas = max_entradas
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._cache: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.contadores = {'ejecuciones': 0, 'aciertos_cache': 0, 'timeouts': 0, 'errores': 0}
+
+    def _ejecutor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sibia-modelos')
+            return self._pool
+
+    # ------------------------------------------------------------------
+    # Caché
+    # ------------------------------------------------------------------
+
+    def _desde_cache(self, huella: Optional[str]) -> Any:
+        if huella is None:
+            return None
+        with self._lock:
+            if huella not in self._cache:
+                return None
+            self._cache.move_to_end(huella)
+            self.contadores['aciertos_cache'] += 1
+            return copy.deepcopy(self._cache[huella])
+
+    def _guardar(self, huella: Optional[str], valor: Any) -> None:
+        if huella is None or valor is None:
+            return
+        with self._lock:
+            self._cache[huella] = copy.deepcopy(valor)
+            self._cache.move_to_end(huella)
+            while len(self._cache) > self.max_entradas:
+                self._cache.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+
+    def ejecutar(self, tareas: Dict[str, Callable[[], Any]], huellas: Optional[Dict[str, str]] = None,
+                 timeouts_ms: Optional[Dict[str, float]] = None,
+                 presupuesto_ms: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Corre `tareas` {id: funcion()} en paralelo. Devuelve:
+            resultados:   {id: valor} de las que terminaron (o salieron de caché)
+            estado:       {id: 'ok' | 'cache' | 'timeout' | 'error'}
+            latencias_ms: {id: ms} (tiempo propio de cada tarea; 0 si vino de caché)
+            errores:      {id: mensaje}
+            total_ms, completo (todas ok/cache)
+        """
+        huellas = huellas or {}
+        timeouts_ms = timeouts_ms or {}
+        presupuesto = self.presupuesto_ms if presupuesto_ms is None else presupuesto_ms
+        inicio = time.perf_counter()
+        salida = {'resultados': {}, 'estado': {}, 'latencias_ms': {}, 'errores': {}}
+
+        pendientes: Dict[Future, str] = {}
+        plazos: Dict[str, float] = {}
+        for tarea_id, funcion in tareas.items():
+            cacheado = self._desde_cache(huellas.get(tarea_id))
+            if cacheado is not None:
+                salida['resultados'][tarea_id] = cacheado
+                salida['estado'][tarea_id] = 'cache'
+                salida['latencias_ms'][tarea_id] = 0.0
+                continue
+            futuro = self._ejecutor().submit(self._medir, funcion)
+            futuro.add_done_callback(lambda f, h=huellas.get(tarea_id): self._al_terminar(f, h))
+            pendientes[futuro] = tarea_id
+            plazos[tarea_id] = inicio + min(float(timeouts_ms.get(tarea_id, self.timeout_ms)), presupuesto) / 1000
+
+        while pendientes:
+            ahora = time.perf_counter()
+            vencidos = [f for f, t in pendientes.items() if plazos[t] <= ahora]
+            for futuro in vencidos:
+                tarea_id = pendientes.pop(futuro)
+                futuro.cancel()  # sólo surte efecto si todavía no empezó
+                salida['estado'][tarea_id] = 'timeout'
+                salida['latencias_ms'][tarea_id] = round((ahora - inicio) * 1000, 3)
+                with self._lock:
+                    self.contadores['timeouts'] += 1
+                logger.warning(f"⏱️ Modelo '{tarea_id}' superó su plazo; respuesta parcial sin él")
+            if not pendientes:
+                break
+            listos, _ = wait(list(pendientes), timeout=max(0.0, min(plazos[t] for t in pendientes.values()) - ahora),
+                             return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                tarea_id = pendientes.pop(futuro)
+                valor, ms, error = futuro.result()
+                salida['latencias_ms'][tarea_id] = round(ms, 3)
+                if error is not None:
+                    salida['estado'][tarea_id] = 'error'
+                    salida['errores'][tarea_id] = error
+                else:
+                    salida['estado'][tarea_id] = 'ok'
+                    salida['resultados'][tarea_id] = valor
+
+        salida['total_ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+        salida['completo'] = all(e in ('ok', 'cache') for e in salida['estado'].values())
+        return salida
+
+    def _medir(self, funcion: Callable[[], Any]):
+        t0 = time.perf_counter()
+        try:
+            return funcion(), (time.perf_counter() - t0) * 1000, None
+        except Exception as e:
+            return None, (time.perf_counter() - t0) * 1000, str(e)
+
+    def _al_terminar(self, futuro: Future, huella: Optional[str]) -> None:
+        if futuro.cancelled():
+            return
+        valor, _, error = futuro.result()
+        with self._lock:
+            self.contadores['ejecuciones'] += 1
+            if error is not None:
+                self.contadores['errores'] += 1
+        if error is None:
+            self._guardar(huella, valor)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.contadores, 'entradas_cache': len(self._cache), 'max_workers': self.max_workers,
+                    'timeout_ms': self.timeout_ms, 'presupuesto_ms': self.presupuesto_ms}
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._cache.clear()
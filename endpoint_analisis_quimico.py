@@ -152,8 +152,8 @@ def entrenar_modelo():
         if not datos_entrenamiento:
             return jsonify({'error': 'No se recibieron datos de entrenamiento'}), 400
         
-        # Entrenar modelo
-        resultado = modelo_ml.entrenar_modelo()
+        # Entrenar modelo y registrar la versión nueva
+        resultado = modelo_ml.cargar_o_entrenar(forzar=True)
         
         return jsonify({
             'status': 'success',
@@ -293,7 +293,7 @@ def _interpretar_fos_tac(fos_tac: float) -> str:
 # Inicializar modelo al cargar el módulo
 try:
     logger.info("Inicializando modelo ML de inhibición...")
-    modelo_ml.entrenar_modelo()
+    modelo_ml.cargar_o_entrenar()
     logger.info("Modelo ML inicializado correctamente")
 except Exception as e:
     logger.error(f"Error inicializando modelo ML: {e}")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ESCALADOR VOLUMÉTRICO POR BÚSQUEDA DE RAÍZ
+==========================================
+
+Ajusta una mezcla volumétrica al objetivo de kW buscando el factor de escala
+f tal que
+
+    kw(f) = Σ kw_tn_i · min(stock_i, f · tn_i) = kw_objetivo
+
+kw(f) es monótona (no decreciente) y lineal por tramos por el recorte de
+stock, así que la raíz queda acotada en [0, f_saturación]. Por defecto se
+usa Newton con la pendiente exacta (converge en pocas evaluaciones por ser
+kw(f) cóncava); también hay métodos acotados (Brent, o secante de Illinois
+con bisección de resguardo). Cada evaluación es un producto punto.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy.optimize import brentq
+    SCIPY_DISPONIBLE = True
+except ImportError:
+    SCIPY_DISPONIBLE = False
+
+GRUPOS_MEZCLA = ('materiales_solidos', 'materiales_liquidos', 'materiales_purin')
+TOLERANCIA_KW_DEFAULT = 100.0
+MAX_EVALUACIONES_DEFAULT = 20
+
+
+class _Evaluador:
+    """kw(f) con registro de cada evaluación para la telemetría."""
+
+    def __init__(self, tn: np.ndarray, kw_tn: np.ndarray, stock: np.ndarray, kw_objetivo: float):
+        self.tn, self.kw_tn, self.stock = tn, kw_tn, stock
+        self.kw_objetivo = kw_objetivo
+        self.iteraciones: List[Dict[str, float]] = []
+
+    def kw(self, factor: float) -> float:
+        return float(np.minimum(self.stock, factor * self.tn) @ self.kw_tn)
+
+    def __call__(self, factor: float) -> float:
+        kw = self.kw(factor)
+        self.iteraciones.append({
+            'iteracion': len(self.iteraciones) + 1,
+            'factor': round(factor, 6),
+            'kw': round(kw, 3),
+            'error_kw': round(kw - self.kw_objetivo, 3),
+        })
+        return kw - self.kw_objetivo
+
+
+def _illinois(g: _Evaluador, a: float, b: float, ga: float, gb: float,
+              tolerancia_kw: float, max_evaluaciones: int) -> float:
+    """
+    Regula falsi (variante Illinois) con bisección si el paso sale del
+    intervalo o si el paso anterior no lo redujo al menos a la mitad (en los
+    tramos lineales la secante puede quedar anclada a un extremo). Así el
+    intervalo se divide al menos por dos cada dos evaluaciones.
+    """
+    lado = 0
+    x = b
+    biseccion = False
+    while len(g.iteraciones) < max_evaluaciones:
+        x = (a * gb - b * ga) / (gb - ga) if gb != ga else (a + b) / 2
+        if biseccion or not (a < x < b):
+            x = (a + b) / 2
+        ancho = b - a
+        gx = g(x)
+        if abs(gx) <= tolerancia_kw:
+            return x
+        if gx * gb > 0:
+            b, gb = x, gx
+            if lado == 1:
+                ga /= 2
+            lado = 1
+        else:
+            a, ga = x, gx
+            if lado == -1:
+                gb /= 2
+            lado = -1
+        biseccion = (b - a) > ancho / 2
+    return x
+
+
+def _newton(g: _Evaluador, tolerancia_kw: float, max_evaluaciones: int) -> float:
+    """
+    Newton desde f=0 con la pendiente exacta (Σ kw_tn·tn de los materiales no
+    recortados). Como kw(f) es cóncava, cada paso queda a la izquierda de la
+    raíz y cruza al menos un quiebre de stock: converge en pocos pasos.
+    """
+    factor, error = 0.0, -g.kw_objetivo
+    while len(g.iteraciones) < max_evaluaciones:
+        libres = factor * g.tn < g.stock
+        pendiente = float(g.kw_tn[libres] @ g.tn[libres])
+        if pendiente <= 0:
+            break
+        factor -= error / pendiente
+        error = g(factor)
+        if error >= -tolerancia_kw:
+            break
+    return factor
+
+
+def buscar_factor(tn: np.ndarray, kw_tn: np.ndarray, stock: np.ndarray, kw_objetivo: float,
+                  tolerancia_kw: float = TOLERANCIA_KW_DEFAULT,
+                  max_evaluaciones: int = MAX_EVALUACIONES_DEFAULT,
+                  metodo: str = 'newton') -> Dict[str, Any]:
+    """
+    Factor de escala que lleva la mezcla al objetivo de kW respetando stock.
+
+    Args:
+        metodo: 'newton' (pendiente exacta), 'brent' (scipy) o 'illinois'
+            (secante acotada con bisección de resguardo).
+
+    Returns:
+        dict con factor, kw, convergio, alcanzable, metodo, evaluaciones e
+        iteraciones (factor, kW y error por evaluación).
+    """
+    tn = np.asarray(tn, dtype=float)
+    kw_tn = np.asarray(kw_tn, dtype=float)
+    stock = np.maximum(np.asarray(stock, dtype=float), 0.0)
+    g = _Evaluador(tn, kw_tn, stock, kw_objetivo)
+
+    usados = (tn > 0) & (kw_tn > 0)
+    if kw_objetivo <= 0 or not np.any(usados):
+        return {'factor': 1.0, 'kw': g.kw(1.0), 'convergio': False, 'alcanzable': False,
+                'metodo': 'sin_materiales', 'evaluaciones': 0, 'iteraciones': []}
+
+    # Por encima de f_saturación todos los materiales están recortados por stock
+    f_saturacion = float(np.max(stock[usados] / tn[usados]))
+    kw_maximo = float(stock[usados] @ kw_tn[usados])
+    if metodo == 'brent' and not SCIPY_DISPONIBLE:
+        metodo = 'illinois'
+
+    if kw_maximo < kw_objetivo - tolerancia_kw:
+        # Stock insuficiente: lo máximo posible es saturar todo el stock usado
+        factor, alcanzable = f_saturacion, False
+    elif kw_maximo <= kw_objetivo:
+        # Saturando todo se queda dentro de la tolerancia (y sin cambio de signo para Brent)
+        factor, alcanzable = f_saturacion, True
+    elif metodo == 'newton':
+        factor, alcanzable = _newton(g, tolerancia_kw, max_evaluaciones), True
+    else:
+        alcanzable = True
+        a, ga = 0.0, -kw_objetivo
+        b, gb = f_saturacion, kw_maximo - kw_objetivo
+        if metodo == 'brent':
+            xtol = tolerancia_kw / max(float(kw_tn[usados] @ tn[usados]), 1e-9)
+            factor = brentq(g, a, b, xtol=xtol, maxiter=max_evaluaciones, disp=False)
+        else:
+            factor = _illinois(g, a, b, ga, gb, tolerancia_kw, max_evaluaciones)
+
+    kw_final = g.kw(factor)
+    return {
+        'metodo': metodo,
+        'factor': float(factor),
+        'kw': kw_final,
+        'convergio': bool(abs(kw_final - kw_objetivo) <= tolerancia_kw),
+        'alcanzable': alcanzable,
+        'tolerancia_kw': tolerancia_kw,
+        'evaluaciones': len(g.iteraciones),
+        'iteraciones': g.iteraciones,
+    }
+
+
+def escalar_resultado(resultado: Dict[str, Any], stock_actual: Dict[str, Any], kw_objetivo: float,
+                      tolerancia_kw: float = TOLERANCIA_KW_DEFAULT,
+                      max_evaluaciones: int = MAX_EVALUACIONES_DEFAULT,
+                      metodo: str = 'newton') -> Dict[str, Any]:
+    """
+    Escala en sitio las cantidades de una mezcla (formato calcular_mezcla_*)
+    hasta el objetivo de kW, recorta por stock, recalcula totales y agrega la
+    telemetría en `resultado['escalado']`.
+    """
+    filas = []
+    for grupo in GRUPOS_MEZCLA:
+        for mat, datos in resultado.get(grupo, {}).items():
+            tn = float(datos.get('tn_usadas', datos.get('cantidad_tn', 0)) or 0)
+            if tn <= 0:
+                continue
+            stock_mat = stock_actual.get(mat, {})
+            kw_tn = float(datos.get('kw_aportados', 0) or 0) / tn or float(stock_mat.get('kw_tn', 0) or 0)
+            filas.append((datos, tn, kw_tn, float(stock_mat.get('total_tn', tn) or 0)))
+    if not filas:
+        return resultado
+
+    tn = np.array([f[1] for f in filas])
+    kw_tn = np.array([f[2] for f in filas])
+    stock = np.array([f[3] for f in filas])
+    busqueda = buscar_factor(tn, kw_tn, stock, kw_objetivo, tolerancia_kw, max_evaluaciones, metodo)
+
+    tn_nuevas = np.minimum(stock, busqueda['factor'] * tn)
+    for (datos, _, kw_mat, _), tn_nueva in zip(filas, tn_nuevas):
+        datos['cantidad_tn'] = float(tn_nueva)
+        datos['tn_usadas'] = float(tn_nueva)
+        datos['kw_aportados'] = float(tn_nueva * kw_mat)
+
+    totales = resultado.setdefault('totales', {})
+    sumas = {}
+    for grupo, sufijo in zip(GRUPOS_MEZCLA, ('solidos', 'liquidos', 'purin')):
+        materiales = resultado.get(grupo, {}).values()
+        sumas[sufijo] = (sum(m.get('kw_aportados', 0) for m in materiales),
+                         sum(m.get('tn_usadas', m.get('cantidad_tn', 0)) for m in materiales))
+        totales[f'kw_{sufijo}'] = sumas[sufijo][0]
+        totales[f'tn_{sufijo}'] = sumas[sufijo][1]
+    totales['kw_total_generado'] = sum(v[0] for v in sumas.values())
+    totales['tn_total'] = sum(v[1] for v in sumas.values())
+
+    if not busqueda['alcanzable']:
+        faltante = kw_objetivo - totales['kw_total_generado']
+        resultado.setdefault('advertencias', []).append(
+            f"⚠️ Stock insuficiente para alcanzar el objetivo volumétrico. Faltan {faltante:.0f} KW respecto a {kw_objetivo:.0f} KW objetivo"
+        )
+    resultado['escalado'] = busqueda
+    logger.info(f"📊 Volumétrico: factor={busqueda['factor']:.4f} → {totales['kw_total_generado']:.0f} KW "
+                f"en {busqueda['evaluaciones']} evaluaciones ({busqueda['metodo']})")
+    return resultado
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ESCENARIOS "WHAT-IF" DE LA MEZCLA EN LOTE
+=========================================
+
+Evalúa N escenarios (deltas) contra un mismo estado base de configuración y
+stock cargado una sola vez:
+
+    {
+        "nombre": "sin maíz y 25 MW",
+        "kw_objetivo": 25000,                 # claves directas de configuración
+        "config": {"cantidad_materiales": "todos"},
+        "excluir": ["Maiz"],                  # materiales faltantes
+        "entregas": {"Expeller": 30},         # tn que ingresan al stock
+        "stock": {"Rumen": {"st_porcentaje": 14}},
+        "algoritmo": "programacion_lineal"
+    }
+
+Los escenarios idénticos (misma huella de mezcla) se calculan una sola vez
+y los distintos se reparten en un pool de hilos. La tabla comparativa se
+arma con arreglos NumPy (deltas contra la base en una sola operación).
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cache_mezclas import huella_mezcla
+
+logger = logging.getLogger(__name__)
+
+MAX_ESCENARIOS = 200
+CLAVES_CONFIG_DIRECTAS = (
+    'kw_objetivo', 'porcentaje_solidos', 'porcentaje_liquidos', 'porcentaje_purin',
+    'cantidad_materiales', 'objetivo_metano_diario',
+)
+GRUPOS_MEZCLA = ('materiales_solidos', 'materiales_liquidos', 'materiales_purin')
+
+
+def aplicar_escenario(config_base: Dict[str, Any], stock_base: Dict[str, Any],
+                      escenario: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Configuración y stock del escenario (la base no se modifica)."""
+    config = {**config_base, **(escenario.get('config') or {})}
+    for clave in CLAVES_CONFIG_DIRECTAS:
+        if clave in escenario:
+            config[clave] = escenario[clave]
+
+    excluir = {str(m).lower() for m in escenario.get('excluir') or []}
+    stock = {mat: datos for mat, datos in stock_base.items() if mat.lower() not in excluir}
+    for mat, tn in (escenario.get('entregas') or {}).items():
+        datos = dict(stock.get(mat, {}))
+        datos['total_tn'] = float(datos.get('total_tn', 0) or 0) + float(tn)
+        stock[mat] = datos
+    for mat, cambios in (escenario.get('stock') or {}).items():
+        if isinstance(cambios, dict):
+            stock[mat] = {**stock.get(mat, {}), **cambios}
+    return config, stock
+
+
+def _fila(nombre: str, resultado: Dict[str, Any], config: Dict[str, Any], duracion_ms: float) -> Dict[str, Any]:
+    totales = resultado.get('totales', {})
+    return {
+        'nombre': nombre,
+        'algoritmo': resultado.get('algoritmo_usado'),
+        'kw_objetivo': float(config.get('kw_objetivo', 0) or 0),
+        'kw_total': float(totales.get('kw_total_generado', 0) or 0),
+        'porcentaje_metano': float(totales.get('porcentaje_metano', 0) or 0),
+        'tn_total': float(totales.get('tn_total', 0) or 0),
+        'materiales': sum(len(resultado.get(g, {})) for g in GRUPOS_MEZCLA),
+        'advertencias': len(resultado.get('advertencias', [])),
+        'duracion_ms': round(duracion_ms, 3),
+    }
+
+
+def _tabla(filas: List[Dict[str, Any]]) -> None:
+    """Error de kW y deltas contra la base (fila 0) calculados en bloque."""
+    kw = np.array([f['kw_total'] for f in filas])
+    objetivo = np.array([f['kw_objetivo'] for f in filas])
+    ch4 = np.array([f['porcentaje_metano'] for f in filas])
+    tn = np.array([f['tn_total'] for f in filas])
+    error = np.divide(np.abs(kw - objetivo), objetivo, out=np.zeros_like(kw), where=objetivo > 0) * 100
+    for f, e, dkw, dch4, dtn in zip(filas, error, kw - kw[0], ch4 - ch4[0], tn - tn[0]):
+        f.update({
+            'error_kw_pct': round(float(e), 3),
+            'delta_kw': round(float(dkw), 3),
+            'delta_metano': round(float(dch4), 3),
+            'delta_tn': round(float(dtn), 3),
+        })
+
+
+def evaluar_escenarios(config_base: Dict[str, Any], stock_base: Dict[str, Any],
+                       escenarios: List[Dict[str, Any]],
+                       calculadores: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]],
+                       algoritmo_base: str, max_workers: Optional[int] = None,
+                       incluir_detalle: bool = False) -> Dict[str, Any]:
+    """
+    Calcula la base y cada escenario con el calculador elegido
+    (`escenario['algoritmo']` o `algoritmo_base`).
+
+    Returns:
+        dict con base (fila), escenarios (filas en el orden recibido, con
+        error/deltas o `error` si falló), rendimiento y, si se pide, detalle
+        con la mezcla completa por escenario.
+    """
+    if len(escenarios) > MAX_ESCENARIOS:
+        raise ValueError(f"Máximo {MAX_ESCENARIOS} escenarios por lote")
+    inicio = time.perf_counter()
+
+    trabajos = []  # (nombre, algoritmo, config, stock, huella)
+    for i, escenario in enumerate([{'nombre': 'base'}] + list(escenarios)):
+        if not isinstance(escenario, dict):
+            raise ValueError(f"Escenario {i} inválido")
+        algoritmo = escenario.get('algoritmo', algoritmo_base)
+        if algoritmo not in calculadores:
+            raise ValueError(f"Algoritmo desconocido en escenario {i}: {algoritmo}")
+        config, stock = aplicar_escenario(config_base, stock_base, escenario)
+        trabajos.append((escenario.get('nombre', f'escenario_{i}'), algoritmo, config, stock,
+                         huella_mezcla(config, stock, algoritmo)))
+
+    unicos = {}
+    for _, algoritmo, config, stock, huella in trabajos:
+        unicos.setdefault(huella, (algoritmo, config, stock))
+
+    def calcular(item):
+        huella, (algoritmo, config, stock) = item
+        t0 = time.perf_counter()
+        try:
+            return huella, calculadores[algoritmo](dict(config), stock), (time.perf_counter() - t0) * 1000, None
+        except Exception as e:
+            logger.warning(f"⚠️ Escenario falló ({algoritmo}): {e}")
+            return huella, None, (time.perf_counter() - t0) * 1000, str(e)
+
+    workers = max(1, min(max_workers or min(8, os.cpu_count() or 1), len(unicos)))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            calculados = {h: (r, ms, err) for h, r, ms, err in pool.map(calcular, unicos.items())}
+    else:
+        calculados = {h: (r, ms, err) for h, r, ms, err in map(calcular, unicos.items())}
+
+    filas, detalle = [], {}
+    for nombre, _, config, _, huella in trabajos:
+        resultado, ms, error = calculados[huella]
+        if resultado is None:
+            filas.append({'nombre': nombre, 'error': error})
+            continue
+        filas.append(_fila(nombre, resultado, config, ms))
+        if incluir_detalle:
+            detalle[nombre] = resultado
+    if 'error' in filas[0]:
+        raise RuntimeError(f"No se pudo calcular la base: {filas[0]['error']}")
+    _tabla([f for f in filas if 'error' not in f])
+
+    duracion = time.perf_counter() - inicio
+    salida = {
+        'base': filas[0],
+        'escenarios': filas[1:],
+        'rendimiento': {
+            'escenarios': len(escenarios),
+            'calculos_unicos': len(unicos),
+            'workers': workers,
+            'duracion_ms': round(duracion * 1000, 3),
+            'escenarios_por_segundo': round(len(escenarios) / duracion, 2) if duracion > 0 else 0.0,
+        },
+    }
+    if incluir_detalle:
+        salida['detalle'] = detalle
+    logger.info(f"🔀 {len(escenarios)} escenarios ({len(unicos)} cálculos únicos) en {duracion * 1000:.0f} ms "
+                f"→ {salida['rendimiento']['escenarios_por_segundo']:.1f} escenarios/s")
+    return salida
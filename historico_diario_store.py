@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ALMACÉN INDEXADO DEL HISTÓRICO DIARIO PRODUCTIVO
+================================================
+
+Mantiene el histórico diario (`historico_diario_productivo.json`) en memoria
+como un arreglo ordenado por fecha, con búsqueda binaria para upsert y
+consultas por rango, política de retención y agregados semanales/mensuales
+precalculados.
+
+El archivo JSON conserva su formato original (lista, más reciente primero)
+para no romper a los lectores existentes.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Días que se conservan en el histórico (3 años por defecto)
+DIAS_RETENCION_DEFAULT = 1095
+
+# Campos numéricos que se agregan por semana y por mes
+CAMPOS_AGREGADOS = (
+    'kw_objetivo',
+    'kw_planificado',
+    'kw_generado_real',
+    'kw_inyectado_real',
+    'kw_consumido_planta_real',
+    'porcentaje_metano_planificado',
+    'metano_actual_grafana',
+    'h2s_actual_grafana',
+    'eficiencia_energetica',
+)
+
+
+def _clave_semana(fecha: str) -> str:
+    """Devuelve la clave ISO de semana (YYYY-Www) de una fecha YYYY-MM-DD."""
+    anio, semana, _ = datetime.strptime(fecha, '%Y-%m-%d').isocalendar()
+    return f"{anio}-W{semana:02d}"
+
+
+def _clave_mes(fecha: str) -> str:
+    """Devuelve la clave de mes (YYYY-MM) de una fecha YYYY-MM-DD."""
+    return fecha[:7]
+
+
+def _a_float(valor: Any) -> float:
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class HistoricoDiarioStore:
+    """Histórico diario indexado por fecha sobre un arreglo ordenado."""
+
+    def __init__(self, archivo: str, dias_retencion: int = DIAS_RETENCION_DEFAULT):
+        self.archivo = archivo
+        self.dias_retencion = dias_retencion
+        self._lock = threading.RLock()
+        self._fechas: List[str] = []
+        self._registros: List[Dict[str, Any]] = []
+        self._agregados: Dict[str, Dict[str, Dict[str, Any]]] = {'semanal': {}, 'mensual': {}}
+        self._mtime: Optional[float] = None
+
+    # ------------------------------------------------------------------
+    # Carga y persistencia
+    # ------------------------------------------------------------------
+
+    def _recargar_si_cambio(self) -> None:
+        """Recarga el archivo sólo si fue modificado fuera del almacén."""
+        try:
+            mtime = os.path.getmtime(self.archivo) if os.path.exists(self.archivo) else None
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime == self._mtime:
+            return
+        if mtime is None and self._mtime is None and self._fechas:
+            return
+
+        registros: List[Dict[str, Any]] = []
+        if mtime is not None:
+            try:
+                with open(self.archivo, 'r', encoding='utf-8') as f:
+                    datos = json.load(f)
+                if isinstance(datos, dict):
+                    datos = datos.get('datos', [])
+                if isinstance(datos, list):
+                    registros = [r for r in datos if isinstance(r, dict) and r.get('fecha')]
+            except Exception as e:
+                logger.error(f"Error cargando histórico diario indexado: {e}")
+
+        # Deduplicar por fecha conservando la última aparición
+        por_fecha = {r['fecha']: r for r in registros}
+        self._fechas = sorted(por_fecha)
+        self._registros = [por_fecha[f] for f in self._fechas]
+        self._mtime = mtime
+        self._recalcular_agregados()
+
+    def _guardar(self) -> bool:
+        try:
+            tmp = f"{self.archivo}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._registros[::-1], f, indent=4, ensure_ascii=False)
+            os.replace(tmp, self.archivo)
+            self._mtime = os.path.getmtime(self.archivo)
+            return True
+        except Exception as e:
+            logger.error(f"Error guardando histórico diario indexado: {e}", exc_info=True)
+            return False
+
+    # ------------------------------------------------------------------
+    # Retención y agregados
+    # ------------------------------------------------------------------
+
+    def _aplicar_retencion(self) -> bool:
+        """Descarta los días anteriores a la ventana de retención."""
+        if not self.dias_retencion or self.dias_retencion <= 0 or not self._fechas:
+            return False
+        limite = (datetime.strptime(self._fechas[-1], '%Y-%m-%d')
+                  - timedelta(days=self.dias_retencion - 1)).strftime('%Y-%m-%d')
+        corte = bisect_left(self._fechas, limite)
+        if corte == 0:
+            return False
+        semanas = {_clave_semana(f) for f in self._fechas[:corte]}
+        meses = {_clave_mes(f) for f in self._fechas[:corte]}
+        del self._fechas[:corte]
+        del self._registros[:corte]
+        for clave in semanas:
+            self._recalcular_bucket('semanal', clave)
+        for clave in meses:
+            self._recalcular_bucket('mensual', clave)
+        return True
+
+    def _rango_bucket(self, periodo: str, clave: str) -> tuple:
+        if periodo == 'mensual':
+            inicio = f"{clave}-01"
+            anio, mes = int(clave[:4]), int(clave[5:7])
+            fin = f"{anio + (mes // 12)}-{(mes % 12) + 1:02d}-01"
+        else:
+            lunes = datetime.strptime(f"{clave}-1", '%G-W%V-%u')
+            inicio = lunes.strftime('%Y-%m-%d')
+            fin = (lunes + timedelta(days=7)).strftime('%Y-%m-%d')
+        return bisect_left(self._fechas, inicio), bisect_left(self._fechas, fin)
+
+    def _recalcular_bucket(self, periodo: str, clave: str) -> None:
+        """Recalcula un único bucket semanal o mensual a partir de sus días."""
+        i, j = self._rango_bucket(periodo, clave)
+        if i >= j:
+            self._agregados[periodo].pop(clave, None)
+            return
+        dias = self._registros[i:j]
+        sumas = {campo: 0.0 for campo in CAMPOS_AGREGADOS}
+        tn_total = 0.0
+        for registro in dias:
+            for campo in CAMPOS_AGREGADOS:
+                sumas[campo] += _a_float(registro.get(campo, 0.0))
+            tn_total += _a_float(registro.get('totales_materiales', {}).get('tn_total', 0.0))
+        n = len(dias)
+        self._agregados[periodo][clave] = {
+            'periodo': clave,
+            'desde': self._fechas[i],
+            'hasta': self._fechas[j - 1],
+            'dias': n,
+            'sumas': sumas,
+            'promedios': {campo: valor / n for campo, valor in sumas.items()},
+            'tn_total': tn_total,
+        }
+
+    def _recalcular_agregados(self) -> None:
+        self._agregados = {'semanal': {}, 'mensual': {}}
+        for clave in {_clave_semana(f) for f in self._fechas}:
+            self._recalcular_bucket('semanal', clave)
+        for clave in {_clave_mes(f) for f in self._fechas}:
+            self._recalcular_bucket('mensual', clave)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def upsert(self, registro: Dict[str, Any]) -> bool:
+        """Inserta o reemplaza el registro del día indicado en `registro['fecha']`."""
+        fecha = registro.get('fecha')
+        if not fecha:
+            raise ValueError("El registro diario requiere el campo 'fecha'")
+        datetime.strptime(fecha, '%Y-%m-%d')
+        with self._lock:
+            self._recargar_si_cambio()
+            pos = bisect_left(self._fechas, fecha)
+            if pos < len(self._fechas) and self._fechas[pos] == fecha:
+                self._registros[pos] = registro
+            else:
+                self._fechas.insert(pos, fecha)
+                self._registros.insert(pos, registro)
+            self._recalcular_bucket('semanal', _clave_semana(fecha))
+            self._recalcular_bucket('mensual', _clave_mes(fecha))
+            self._aplicar_retencion()
+            return self._guardar()
+
+    def reemplazar(self, registros: List[Dict[str, Any]]) -> bool:
+        """Reemplaza todo el histórico (usado por la API heredada de guardado)."""
+        with self._lock:
+            por_fecha = {r['fecha']: r for r in registros if isinstance(r, dict) and r.get('fecha')}
+            self._fechas = sorted(por_fecha)
+            self._registros = [por_fecha[f] for f in self._fechas]
+            self._recalcular_agregados()
+            self._aplicar_retencion()
+            return self._guardar()
+
+    def obtener(self, fecha: str) -> Optional[Dict[str, Any]]:
+        """Devuelve el registro de una fecha o None."""
+        with self._lock:
+            self._recargar_si_cambio()
+            pos = bisect_left(self._fechas, fecha)
+            if pos < len(self._fechas) and self._fechas[pos] == fecha:
+                return self._registros[pos]
+            return None
+
+    def rango(self, desde: Optional[str] = None, hasta: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Registros entre `desde` y `hasta` (inclusive), en orden cronológico."""
+        with self._lock:
+            self._recargar_si_cambio()
+            i = bisect_left(self._fechas, desde) if desde else 0
+            j = bisect_right(self._fechas, hasta) if hasta else len(self._fechas)
+            return self._registros[i:j]
+
+    def ultimos(self, n: int) -> List[Dict[str, Any]]:
+        """Últimos `n` días registrados, en orden cronológico."""
+        with self._lock:
+            self._recargar_si_cambio()
+            return self._registros[-n:] if n > 0 else []
+
+    def listar(self) -> List[Dict[str, Any]]:
+        """Histórico completo, más reciente primero (formato del archivo)."""
+        with self._lock:
+            self._recargar_si_cambio()
+            return self._registros[::-1]
+
+    def agregados(self, periodo: str = 'semanal', desde: Optional[str] = None,
+                  hasta: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Agregados precalculados ('semanal' o 'mensual') en orden cronológico."""
+        if periodo not in self._agregados:
+            raise ValueError(f"Periodo no soportado: {periodo}")
+        with self._lock:
+            self._recargar_si_cambio()
+            resultado = []
+            for clave in sorted(self._agregados[periodo]):
+                bucket = self._agregados[periodo][clave]
+                if desde and bucket['hasta'] < desde:
+                    continue
+                if hasta and bucket['desde'] > hasta:
+                    continue
+                resultado.append(bucket)
+            return resultado
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._recargar_si_cambio()
+            return len(self._fechas)
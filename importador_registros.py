@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IMPORTACIÓN MASIVA DE REGISTROS DE CAMIONES
+===========================================
+
+Lee lotes de descargas (CSV, XLSX o listas JSON), valida todas las filas
+de forma vectorizada con pandas (unidades, materiales contra
+`materiales_base_config.json`, fechas, ST) y devuelve los registros válidos
+junto con los errores por fila. La aplicación de los deltas de stock se hace
+en un único lote sobre el libro de movimientos.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import io
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Alias aceptados en los encabezados de los archivos
+ALIAS_COLUMNAS = {
+    'tn': 'tn_descargadas',
+    'toneladas': 'tn_descargadas',
+    'toneladas_descargadas': 'tn_descargadas',
+    'cantidad': 'tn_descargadas',
+    'st': 'st_analizado',
+    'st_porcentaje': 'st_analizado',
+    'st_analizado_porcentaje': 'st_analizado',
+    'nombre_material': 'material',
+    'fecha_hora': 'fecha',
+    'remito': 'numero_remito',
+    'unidades': 'unidad',
+}
+
+# Factor para llevar cada unidad a toneladas
+FACTORES_UNIDAD = {
+    '': 1.0,
+    'tn': 1.0,
+    't': 1.0,
+    'ton': 1.0,
+    'toneladas': 1.0,
+    'kg': 0.001,
+    'kilos': 0.001,
+    'kilogramos': 0.001,
+}
+
+COLUMNAS_TEXTO = ('patente', 'empresa', 'operario', 'numero_remito')
+
+# Formatos de fecha de la planta (día primero), después del ISO de los exports JSON
+FORMATOS_FECHA = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y', '%d-%m-%Y %H:%M', '%d-%m-%Y')
+
+
+def leer_lote(contenido: bytes = None, nombre_archivo: str = '',
+              filas: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
+    """Convierte un archivo CSV/XLSX/JSON o una lista de dicts en un DataFrame."""
+    if filas is not None:
+        return pd.DataFrame(filas)
+    extension = os.path.splitext(nombre_archivo.lower())[1]
+    if extension in ('.xlsx', '.xls'):
+        return pd.read_excel(io.BytesIO(contenido))
+    if extension == '.json':
+        datos = json.loads(contenido.decode('utf-8'))
+        if isinstance(datos, dict):
+            datos = datos.get('registros', [])
+        return pd.DataFrame(datos)
+    # CSV: detectar separador (coma o punto y coma)
+    return pd.read_csv(io.BytesIO(contenido), sep=None, engine='python', dtype=str)
+
+
+def _numero(serie: pd.Series) -> pd.Series:
+    """Convierte texto con coma decimal a float (NaN si no es numérico)."""
+    return pd.to_numeric(serie.astype(str).str.strip().str.replace(',', '.', regex=False), errors='coerce')
+
+
+def _parsear_fechas(texto: pd.Series) -> pd.Series:
+    """ISO (YYYY-MM-DD[ HH:MM:SS]) o dd/mm/yyyy; NaT si no coincide ningún formato."""
+    fechas = pd.to_datetime(texto, errors='coerce', format='ISO8601')
+    for formato in FORMATOS_FECHA:
+        faltantes = fechas.isna() & texto.notna()
+        if not faltantes.any():
+            break
+        fechas = fechas.fillna(pd.to_datetime(texto.where(faltantes), errors='coerce', format=formato))
+    return fechas
+
+
+def validar_lote(df: pd.DataFrame, materiales_base: Dict[str, Any],
+                 ahora: Optional[datetime] = None,
+                 avisos: Optional[List[str]] = None) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Valida todas las filas en bloque. Las normalizaciones aplicadas a
+    columnas enteras (p. ej. ST en fracción) se anotan en `avisos`.
+
+    Returns:
+        tuple: (DataFrame de filas válidas normalizadas, lista de errores
+        {'fila', 'campo', 'mensaje'} con la fila numerada desde 1)
+    """
+    ahora = ahora or datetime.now()
+    df = df.rename(columns=lambda c: ALIAS_COLUMNAS.get(str(c).strip().lower(), str(c).strip().lower()))
+    df = df.reset_index(drop=True)
+    df.index = df.index + 1  # numeración de filas para el usuario
+    errores: List[Dict[str, Any]] = []
+
+    def marcar(mascara: pd.Series, campo: str, mensaje: str) -> None:
+        for fila in mascara[mascara].index:
+            errores.append({'fila': int(fila), 'campo': campo, 'mensaje': mensaje})
+
+    for requerida in ('material', 'tn_descargadas'):
+        if requerida not in df.columns:
+            df[requerida] = None
+            marcar(pd.Series(True, index=df.index), requerida, f"Columna '{requerida}' ausente")
+
+    # Material contra la tabla de materiales base (sin distinguir mayúsculas)
+    canonico = {nombre.strip().lower(): nombre for nombre in materiales_base}
+    material_txt = df['material'].fillna('').astype(str).str.strip()
+    df['material'] = material_txt.str.lower().map(canonico)
+    marcar(material_txt.eq(''), 'material', 'Material vacío')
+    marcar(material_txt.ne('') & df['material'].isna(), 'material', 'Material no registrado en materiales base')
+
+    # Unidades y toneladas
+    unidad = df['unidad'].fillna('').astype(str).str.strip().str.lower() if 'unidad' in df.columns else pd.Series('', index=df.index)
+    factor = unidad.map(FACTORES_UNIDAD)
+    marcar(factor.isna(), 'unidad', 'Unidad no soportada (usar tn o kg)')
+    cantidad = _numero(df['tn_descargadas'])
+    marcar(cantidad.isna(), 'tn_descargadas', 'Cantidad no numérica')
+    marcar(cantidad.notna() & (cantidad <= 0), 'tn_descargadas', 'Cantidad debe ser mayor a 0')
+    df['tn_descargadas'] = cantidad * factor
+
+    # ST analizado (opcional, en porcentaje). Un ST de 1% es válido (purín diluido):
+    # sólo se toma como fracción la columna entera cuando todos los valores son < 1
+    # y alguno tiene decimales
+    if 'st_analizado' in df.columns:
+        st = _numero(df['st_analizado'].fillna('0'))
+        informados = st[st > 0]
+        if len(informados) and (informados < 1).all() and (informados % 1 != 0).any():
+            st = st * 100
+            if avisos is not None:
+                avisos.append('ST interpretado como fracción (0-1) y convertido a porcentaje: '
+                              'todos los valores de la columna son menores a 1')
+        marcar(st.isna(), 'st_analizado', 'ST no numérico')
+        marcar(st.notna() & ((st < 0) | (st > 100)), 'st_analizado', 'ST fuera de rango (0-100%)')
+        df['st_analizado'] = st.fillna(0.0)
+    else:
+        df['st_analizado'] = 0.0
+
+    # Fechas (vacías = ahora; no se aceptan fechas futuras)
+    if 'fecha' in df.columns:
+        fecha_txt = df['fecha'].fillna('').astype(str).str.strip()
+        fechas = _parsear_fechas(fecha_txt.where(fecha_txt.ne(''), None))
+        marcar(fecha_txt.ne('') & fechas.isna(), 'fecha', 'Fecha inválida')
+        marcar(fechas.notna() & (fechas > pd.Timestamp(ahora)), 'fecha', 'Fecha futura')
+        df['fecha'] = fechas.fillna(pd.Timestamp(ahora))
+    else:
+        df['fecha'] = pd.Timestamp(ahora)
+
+    for columna in COLUMNAS_TEXTO:
+        df[columna] = df[columna].fillna('').astype(str).str.strip() if columna in df.columns else ''
+
+    filas_con_error = {e['fila'] for e in errores}
+    validos = df.loc[~df.index.isin(filas_con_error)]
+    return validos, sorted(errores, key=lambda e: e['fila'])
+
+
+def construir_registros(validos: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Registros con el mismo formato que escribe /registrar_material."""
+    registros = []
+    for fila in validos.itertuples():
+        registros.append({
+            'fecha': fila.fecha.strftime('%Y-%m-%d'),
+            'timestamp': fila.fecha.isoformat(),
+            'patente': fila.patente,
+            'material': fila.material,
+            'tn_descargadas': float(fila.tn_descargadas),
+            'st_analizado': float(fila.st_analizado),
+            'empresa': fila.empresa,
+            'operario': fila.operario,
+            'numero_remito': fila.numero_remito,
+            'id_registro': str(uuid.uuid4()),
+            'origen': 'importacion',
+            'fila_origen': int(fila.Index),
+        })
+    return registros
+
+
+def movimientos_de_registros(registros: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Movimientos de entrada para el libro de stock, uno por registro."""
+    return [{
+        'tipo': 'entrada',
+        'material': r['material'],
+        'tn': r['tn_descargadas'],
+        'st_porcentaje': r['st_analizado'],
+        'referencia': r['numero_remito'] or r['patente'] or r['id_registro'],
+    } for r in registros]
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BANDAS DE INCERTIDUMBRE DE LA MEZCLA (MONTE CARLO VECTORIZADO)
+==============================================================
+
+La mezcla se calcula con un ST puntual por material, pero el ST de los
+camiones varía bastante. Este módulo simula N mezclas (10.000 por defecto)
+con la misma receta y propiedades muestreadas:
+
+- ST: bootstrap de los desvíos de los últimos camiones de cada material
+  (muestra − promedio) sumados al ST usado por la mezcla; el kW/tn escala
+  proporcional al ST. Sin camiones registrados, el ST queda fijo.
+- CH4: los registros de camiones no traen CH4, así que se usa un desvío
+  relativo normal por material (`cv_ch4`, 3% por defecto).
+
+Todas las simulaciones se evalúan juntas: kW = factores_ST (N × m) @
+kW por material (m,) y CH4 = CH4 simulado (N × m) @ tn / Σ tn. Las bandas
+P10/P50/P90 se anclan al valor puntual del resultado (el modelo lineal de
+la matriz puede diferir levemente del cálculo de la mezcla).
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from matriz_materiales import MatrizMateriales
+
+logger = logging.getLogger(__name__)
+
+MUESTRAS_DEFAULT = 10000
+MUESTRAS_MAXIMO = 200000
+PERCENTILES = (10, 50, 90)
+CV_CH4_DEFAULT = 0.03
+
+
+def _desvios_camiones(muestras: Sequence[np.ndarray]) -> np.ndarray:
+    """Desvíos (puntos de ST) de cada material respecto de su promedio, rellenados a una matriz m × L."""
+    largo = max([len(m) for m in muestras] + [1])
+    desvios = np.zeros((len(muestras), largo))
+    for i, valores in enumerate(muestras):
+        if len(valores):
+            desvios[i, :len(valores)] = valores - valores.mean()
+    return desvios
+
+
+def simular_mezcla(tn: np.ndarray, kw_tn: np.ndarray, st_pct: np.ndarray, ch4_pct: np.ndarray,
+                   muestras_st: Sequence[np.ndarray], n_muestras: int = MUESTRAS_DEFAULT,
+                   cv_ch4: float = CV_CH4_DEFAULT, semilla: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    kW total y % de metano de `n_muestras` mezclas simuladas (arreglos (N,)).
+    Todos los vectores son de los m materiales de la receta; `muestras_st`
+    tiene, por material, los ST (%) de sus últimos camiones.
+    """
+    rng = np.random.default_rng(semilla)
+    m = len(tn)
+    cantidades = np.array([len(v) for v in muestras_st])
+
+    # Bootstrap vectorizado: un índice uniforme por (simulación, material) dentro de sus camiones
+    desvios = _desvios_camiones(muestras_st)
+    indices = (rng.random((n_muestras, m)) * np.maximum(cantidades, 1)).astype(int)
+    st_simulado = np.maximum(st_pct + desvios[np.arange(m), indices], 0.0)
+    factor_st = np.divide(st_simulado, st_pct, out=np.ones_like(st_simulado), where=st_pct > 0)
+    kw = factor_st @ (tn * kw_tn)
+
+    ch4_simulado = np.clip(ch4_pct * (1 + cv_ch4 * rng.standard_normal((n_muestras, m))), 0.0, 100.0)
+    tn_total = tn.sum()
+    metano = ch4_simulado @ tn / tn_total if tn_total > 0 else np.zeros(n_muestras)
+    return {'kw_total': kw, 'porcentaje_metano': metano}
+
+
+def bandas_mezcla(matriz: MatrizMateriales, cantidades: Dict[str, float], muestras_st: Dict[str, np.ndarray],
+                  kw_tn: Optional[np.ndarray] = None, st: Optional[np.ndarray] = None,
+                  n_muestras: int = MUESTRAS_DEFAULT, cv_ch4: float = CV_CH4_DEFAULT,
+                  semilla: Optional[int] = 0, punto: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Bandas P10/P50/P90 de kW y metano para la receta `cantidades` ({material: tn}).
+
+    Args:
+        muestras_st: {material en minúsculas: ST (%) de los últimos camiones}
+            (EnergiaMateriales.muestras_por_nombre()).
+        kw_tn, st: propiedades efectivas de la mezcla (st en fracción); por
+            defecto las del catálogo.
+        semilla: fija para que la misma mezcla dé las mismas bandas (None = aleatorio).
+        punto: {'kw_total', 'porcentaje_metano'} del resultado para anclar las bandas.
+    """
+    inicio = time.perf_counter()
+    n_muestras = int(min(max(n_muestras, 100), MUESTRAS_MAXIMO))
+    tn = matriz.vector(cantidades)
+    activos = np.flatnonzero(tn > 0)
+    kw_tn = matriz.kw_tn if kw_tn is None else np.asarray(kw_tn, dtype=float)
+    st_pct = (matriz.st if st is None else np.asarray(st, dtype=float)) * 100
+    ch4_pct = matriz.ch4_gestion * 100
+
+    muestras = [np.asarray(muestras_st.get(matriz.nombres[i].lower(), []), dtype=float) for i in activos]
+    sim = simular_mezcla(tn[activos], kw_tn[activos], st_pct[activos], ch4_pct[activos],
+                         muestras, n_muestras, cv_ch4, semilla)
+    modelo = {
+        'kw_total': float(tn @ kw_tn),
+        'porcentaje_metano': float(tn @ ch4_pct / tn.sum()) if tn.sum() > 0 else 0.0,
+    }
+
+    bandas = {}
+    for salida, valores in sim.items():
+        cuantiles = np.percentile(valores, PERCENTILES)
+        ancla = (punto or {}).get(salida)
+        if ancla is not None:
+            # kW: escala relativa; metano: corrimiento en puntos
+            if salida == 'kw_total':
+                cuantiles = cuantiles * (ancla / modelo[salida]) if modelo[salida] > 0 else cuantiles
+            else:
+                cuantiles = cuantiles + (ancla - modelo[salida])
+        bandas[salida] = {f'p{p}': round(float(q), 2) for p, q in zip(PERCENTILES, cuantiles)}
+
+    return {
+        **bandas,
+        'muestras': n_muestras,
+        'materiales': len(activos),
+        'materiales_con_camiones': int(sum(len(v) > 1 for v in muestras)),
+        'cv_ch4': cv_ch4,
+        'duracion_ms': round((time.perf_counter() - inicio) * 1000, 3),
+    }
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CAPA DE DATOS DEL MÓDULO DE MANTENIMIENTO
+=========================================
+
+Acceso SQLite para mantenimientos programados e historial:
+- Migración de esquema única (PRAGMA user_version) en lugar de
+  `CREATE TABLE IF NOT EXISTS` en cada request.
+- Una conexión reutilizable por hilo, en modo WAL con synchronous=NORMAL.
+- Índices sobre fecha_programada, equipo y estado.
+- Consultas de historial paginadas.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+POR_PAGINA_DEFAULT = 50
+POR_PAGINA_MAX = 500
+
+# Cada entrada lleva el esquema de la versión N-1 a la versión N
+MIGRACIONES = [
+    # v1: tablas originales del módulo
+    """
+    CREATE TABLE IF NOT EXISTS mantenimientos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        equipo TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        fecha_programada DATE NOT NULL,
+        prioridad TEXT NOT NULL,
+        tecnico_asignado TEXT,
+        duracion_estimada REAL,
+        descripcion TEXT,
+        repuestos TEXT,
+        estado TEXT DEFAULT 'programado',
+        fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS historial_mantenimientos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha_realizado DATE NOT NULL,
+        equipo TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        descripcion TEXT,
+        tecnico TEXT,
+        duracion_real REAL,
+        costo REAL,
+        estado TEXT DEFAULT 'completado',
+        observaciones TEXT,
+        fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    # v2: índices para listados por fecha, equipo y estado (parcial para pendientes)
+    """
+    CREATE INDEX IF NOT EXISTS idx_mant_estado ON mantenimientos (estado);
+    CREATE INDEX IF NOT EXISTS idx_mant_pendientes ON mantenimientos (fecha_programada) WHERE estado != 'completado';
+    CREATE INDEX IF NOT EXISTS idx_mant_fecha ON mantenimientos (fecha_programada);
+    CREATE INDEX IF NOT EXISTS idx_mant_equipo ON mantenimientos (equipo);
+    CREATE INDEX IF NOT EXISTS idx_hist_fecha ON historial_mantenimientos (fecha_realizado DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_hist_equipo_fecha ON historial_mantenimientos (equipo, fecha_realizado DESC);
+    CREATE INDEX IF NOT EXISTS idx_hist_estado ON historial_mantenimientos (estado);
+    """,
+]
+
+MANTENIMIENTOS_INICIALES = [
+    ('Motor Biogás MO-080-01', 'Preventivo', '2024-01-15', 'Media', 'Juan Pérez', 4.0, 'Cambio de filtros y revisión general', 'Filtros de aire, aceite motor'),
+    ('Bomba Purín PU-040-02', 'Correctivo', '2024-01-10', 'Alta', 'María García', 6.0, 'Reparación de válvula de descarga', 'Válvula de descarga, juntas'),
+    ('Sensor Temperatura TE-040-01', 'Preventivo', '2024-01-25', 'Baja', 'Carlos López', 2.0, 'Calibración y limpieza', 'Kit de calibración'),
+    ('Válvula Control VC-050-01', 'Preventivo', '2024-02-01', 'Media', 'Ana Martínez', 3.0, 'Limpieza y lubricación', 'Lubricante, limpiador'),
+    ('Bomba Recirculación PU-040-01', 'Preventivo', '2024-02-05', 'Media', 'Roberto Silva', 4.0, 'Revisión de motor y sellos', 'Sellos, rodamientos')
+]
+
+HISTORIAL_INICIAL = [
+    ('2024-01-05', 'Motor Biogás MO-080-01', 'Preventivo', 'Mantenimiento programado mensual', 'Juan Pérez', 4.5, 2500.0, 'completado', 'Mantenimiento exitoso'),
+    ('2024-01-03', 'Bomba Purín PU-040-02', 'Correctivo', 'Reparación de motor', 'María García', 6.0, 3200.0, 'completado', 'Motor reparado correctamente'),
+    ('2024-01-01', 'Válvula Control VC-050-01', 'Preventivo', 'Limpieza y lubricación', 'Carlos López', 2.0, 800.0, 'completado', 'Válvula funcionando correctamente'),
+    ('2023-12-28', 'Sensor Temperatura TE-040-01', 'Preventivo', 'Calibración de sensores', 'Ana Martínez', 3.0, 1200.0, 'completado', 'Sensores calibrados'),
+    ('2023-12-25', 'Bomba Recirculación PU-040-01', 'Correctivo', 'Cambio de rodamientos', 'Roberto Silva', 5.0, 1800.0, 'completado', 'Rodamientos reemplazados')
+]
+
+SQL_INSERT_MANTENIMIENTO = '''
+    INSERT INTO mantenimientos
+    (equipo, tipo, fecha_programada, prioridad, tecnico_asignado,
+     duracion_estimada, descripcion, repuestos)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SQL_INSERT_HISTORIAL = '''
+    INSERT INTO historial_mantenimientos
+    (fecha_realizado, equipo, tipo, descripcion, tecnico, duracion_real, costo, estado, observaciones)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+class MantenimientoDB:
+    """Repositorio SQLite del módulo de mantenimiento."""
+
+    def __init__(self, db_path: str, datos_iniciales: bool = True):
+        self.db_path = db_path
+        self.datos_iniciales = datos_iniciales
+        self._local = threading.local()
+        self._migrado = False
+        self._lock_migracion = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Conexiones y esquema
+    # ------------------------------------------------------------------
+
+    def conexion(self) -> sqlite3.Connection:
+        """Conexión del hilo actual (creada una sola vez por hilo)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        if not self._migrado:
+            self._migrar(conn)
+        return conn
+
+    def _migrar(self, conn: sqlite3.Connection) -> None:
+        with self._lock_migracion:
+            if self._migrado:
+                return
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for numero, script in enumerate(MIGRACIONES[version:], start=version + 1):
+                conn.executescript(script)
+                conn.execute(f'PRAGMA user_version = {numero}')
+                logger.info(f"🔧 Esquema de mantenimiento migrado a v{numero}")
+            if version == 0 and self.datos_iniciales:
+                self._sembrar(conn)
+            conn.commit()
+            self._migrado = True
+
+    @staticmethod
+    def _sembrar(conn: sqlite3.Connection) -> None:
+        """Carga los datos iniciales sólo si las tablas están vacías."""
+        if conn.execute('SELECT COUNT(*) FROM mantenimientos').fetchone()[0] == 0:
+            conn.executemany(SQL_INSERT_MANTENIMIENTO, MANTENIMIENTOS_INICIALES)
+        if conn.execute('SELECT COUNT(*) FROM historial_mantenimientos').fetchone()[0] == 0:
+            conn.executemany(SQL_INSERT_HISTORIAL, HISTORIAL_INICIAL)
+
+    def cerrar(self) -> None:
+        """Cierra la conexión del hilo actual."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------------------------------------------------------
+    # Mantenimientos programados
+    # ------------------------------------------------------------------
+
+    def programar(self, data: Dict[str, Any]) -> int:
+        """Inserta un mantenimiento programado y devuelve su id."""
+        conn = self.conexion()
+        with conn:
+            cursor = conn.execute(SQL_INSERT_MANTENIMIENTO, (
+                data['equipment'],
+                data['type'],
+                data['date'],
+                data['priority'],
+                data.get('technician', ''),
+                data.get('duration', 0),
+                data.get('description', ''),
+                data.get('parts', '')
+            ))
+        return cursor.lastrowid
+
+    def pendientes(self, equipo: Optional[str] = None, limite: Optional[int] = None) -> List[sqlite3.Row]:
+        """Mantenimientos no completados ordenados por fecha programada."""
+        query = "SELECT * FROM mantenimientos WHERE estado != 'completado'"
+        params: List[Any] = []
+        if equipo:
+            query += ' AND equipo = ?'
+            params.append(equipo)
+        query += ' ORDER BY fecha_programada ASC'
+        if limite:
+            query += ' LIMIT ?'
+            params.append(int(limite))
+        return self.conexion().execute(query, params).fetchall()
+
+    def completar(self, mantenimiento_id: int, data: Dict[str, Any]) -> bool:
+        """Mueve un mantenimiento al historial en una sola transacción."""
+        conn = self.conexion()
+        mantenimiento = conn.execute('SELECT * FROM mantenimientos WHERE id = ?', (mantenimiento_id,)).fetchone()
+        if not mantenimiento:
+            return False
+        with conn:
+            conn.execute(SQL_INSERT_HISTORIAL, (
+                datetime.now().strftime('%Y-%m-%d'),
+                mantenimiento['equipo'],
+                mantenimiento['tipo'],
+                mantenimiento['descripcion'],
+                mantenimiento['tecnico_asignado'],
+                data.get('duracion_real', mantenimiento['duracion_estimada']),
+                data.get('costo', 0),
+                'completado',
+                data.get('observaciones', 'Mantenimiento completado')
+            ))
+            conn.execute('DELETE FROM mantenimientos WHERE id = ?', (mantenimiento_id,))
+        return True
+
+    # ------------------------------------------------------------------
+    # Historial
+    # ------------------------------------------------------------------
+
+    def historial(self, pagina: int = 1, por_pagina: int = POR_PAGINA_DEFAULT,
+                  equipo: Optional[str] = None, desde: Optional[str] = None,
+                  hasta: Optional[str] = None) -> Dict[str, Any]:
+        """Historial paginado (más reciente primero) con filtros opcionales."""
+        pagina = max(1, int(pagina))
+        por_pagina = max(1, min(int(por_pagina), POR_PAGINA_MAX))
+
+        condiciones = []
+        params: List[Any] = []
+        if equipo:
+            condiciones.append('equipo = ?')
+            params.append(equipo)
+        if desde:
+            condiciones.append('fecha_realizado >= ?')
+            params.append(desde)
+        if hasta:
+            condiciones.append('fecha_realizado <= ?')
+            params.append(hasta)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+        conn = self.conexion()
+        total = conn.execute(f'SELECT COUNT(*) FROM historial_mantenimientos {where}', params).fetchone()[0]
+        filas = conn.execute(
+            f'''SELECT * FROM historial_mantenimientos {where}
+                ORDER BY fecha_realizado DESC, id DESC
+                LIMIT ? OFFSET ?''',
+            params + [por_pagina, (pagina - 1) * por_pagina]
+        ).fetchall()
+        return {
+            'items': filas,
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'total': total,
+            'paginas': (total + por_pagina - 1) // por_pagina,
+        }
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MATRIZ DE PROPIEDADES DE MATERIALES
+===================================
+
+Compila `materiales_base_config.json` en arreglos NumPy (una columna por
+propiedad: st, sv, kw/tn, m3_tnsv, ch4, densidad) con un mapa
+nombre↔índice. Se construye una sola vez por versión del catálogo; evaluar
+una mezcla es un producto punto y evaluar un lote de mezclas candidatas es
+un producto matriz-vector.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CONSUMO_CHP_DEFAULT = 505.0
+CH4_DEFAULT = 0.65
+
+TIPO_SOLIDO, TIPO_LIQUIDO, TIPO_PURIN = 0, 1, 2
+NOMBRES_TIPO = ('solido', 'liquido', 'purin')
+
+
+def _float(valor: Any, default: float = 0.0) -> float:
+    try:
+        return float(valor) if valor not in (None, '') else default
+    except (TypeError, ValueError):
+        return default
+
+
+def version_catalogo(materiales_base: Dict[str, Any]) -> str:
+    """Huella del contenido del catálogo (cambia si cambia cualquier propiedad)."""
+    contenido = json.dumps(materiales_base, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:16]
+
+
+class MatrizMateriales:
+    """Propiedades de materiales compiladas en arreglos alineados por índice."""
+
+    def __init__(self, materiales_base: Dict[str, Any], consumo_chp: float = CONSUMO_CHP_DEFAULT,
+                 version: Optional[str] = None):
+        catalogo = {n: d for n, d in (materiales_base or {}).items() if isinstance(d, dict)}
+        self.version = version or version_catalogo(catalogo)
+        self.consumo_chp = consumo_chp
+        self.nombres: List[str] = list(catalogo)
+        self.indice: Dict[str, int] = {nombre: i for i, nombre in enumerate(self.nombres)}
+        self._indice_minusculas = {nombre.lower(): i for i, nombre in enumerate(self.nombres)}
+
+        def columna(clave: str, default: float = 0.0) -> np.ndarray:
+            return np.array([_float(catalogo[n].get(clave), default) for n in self.nombres], dtype=float)
+
+        self.st = columna('st')
+        self.sv = columna('sv')
+        self.m3_tnsv = columna('m3_tnsv')
+        self.ch4 = columna('ch4', CH4_DEFAULT)
+        self.densidad = columna('densidad', 1.0)
+        # kW/tn del catálogo; si falta se deriva de st·sv·m3_tnsv·ch4 / consumo CHP
+        kw_catalogo = columna('kw/tn')
+        kw_derivado = self.st * self.sv * self.m3_tnsv * self.ch4 / consumo_chp if consumo_chp > 0 else 0.0
+        self.kw_tn = np.where(kw_catalogo > 0, kw_catalogo, kw_derivado)
+        # m³ de biogás por tn fresca
+        self.biogas_tn = self.st * self.sv * self.m3_tnsv
+
+        proteinas = columna('proteinas_calc')
+        lipidos = columna('lipidos_calc')
+        carbohidratos = columna('carbohidratos_calc')
+        total = proteinas + lipidos + carbohidratos
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ch4_gestion = (proteinas * 0.71 + lipidos * 0.68 + carbohidratos * 0.5) / total
+        # CH4 (fracción) con la fórmula de la tabla de gestión, usada por calcular_porcentaje_metano
+        self.ch4_gestion = np.where(total > 0, ch4_gestion, CH4_DEFAULT)
+
+        self.tipo = np.array([
+            TIPO_PURIN if n.lower() == 'purin'
+            else TIPO_LIQUIDO if str(catalogo[n].get('tipo', 'solido')).lower() == 'liquido'
+            else TIPO_SOLIDO
+            for n in self.nombres
+        ], dtype=int)
+
+    def __len__(self) -> int:
+        return len(self.nombres)
+
+    def indice_de(self, nombre: str) -> Optional[int]:
+        """Índice del material (exacto o sin distinguir mayúsculas), None si no existe."""
+        i = self.indice.get(nombre)
+        return i if i is not None else self._indice_minusculas.get(str(nombre).lower())
+
+    # ------------------------------------------------------------------
+    # Vectores alineados con el catálogo
+    # ------------------------------------------------------------------
+
+    def vector(self, cantidades: Dict[str, Any], campo: Optional[str] = None) -> np.ndarray:
+        """Vector de cantidades (tn) a partir de {material: tn} o {material: {campo: tn}}."""
+        v = np.zeros(len(self.nombres))
+        for nombre, valor in cantidades.items():
+            i = self.indice_de(nombre)
+            if i is None:
+                continue
+            v[i] = _float(valor.get(campo) if campo and isinstance(valor, dict) else valor)
+        return v
+
+    def vector_stock(self, stock_actual: Dict[str, Any]) -> np.ndarray:
+        """Toneladas disponibles por material (`total_tn` de stock.json)."""
+        return self.vector(stock_actual, 'total_tn')
+
+    def propiedades_stock(self, stock_actual: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """
+        st (fracción) y kW/tn efectivos: el valor medido en stock.json si es
+        positivo, si no el del catálogo.
+        """
+        st = self.st.copy()
+        kw_tn = self.kw_tn.copy()
+        for nombre, datos in stock_actual.items():
+            i = self.indice_de(nombre)
+            if i is None or not isinstance(datos, dict):
+                continue
+            st_pct = _float(datos.get('st_porcentaje'))
+            if st_pct > 0:
+                st[i] = st_pct / 100.0
+            kw = _float(datos.get('kw_tn'))
+            if kw > 0:
+                kw_tn[i] = kw
+        return {'st': st, 'kw_tn': kw_tn}
+
+    def a_diccionario(self, vector: np.ndarray, minimo: float = 0.0) -> Dict[str, float]:
+        """Inverso de `vector`: {material: valor} para las posiciones > minimo."""
+        return {self.nombres[i]: float(vector[i]) for i in np.flatnonzero(vector > minimo)}
+
+    # ------------------------------------------------------------------
+    # Evaluación
+    # ------------------------------------------------------------------
+
+    def evaluar(self, tn: np.ndarray, kw_tn: Optional[np.ndarray] = None,
+                st: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """Totales de una mezcla (vector de tn alineado al catálogo)."""
+        r = self.evaluar_lote(np.asarray(tn, dtype=float)[None, :], kw_tn, st)
+        return {clave: float(valores[0]) for clave, valores in r.items()}
+
+    def evaluar_lote(self, tn: np.ndarray, kw_tn: Optional[np.ndarray] = None,
+                     st: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Evalúa k mezclas a la vez (matriz k×n de tn).
+
+        Returns:
+            dict de arreglos de largo k: kw_total, tn_total, kw_solidos,
+            kw_liquidos, kw_purin, ch4_porcentaje (ponderado por tn, fórmula
+            de gestión), st_porcentaje (ponderado por tn) y biogas_m3.
+        """
+        tn = np.atleast_2d(np.asarray(tn, dtype=float))
+        kw_tn = self.kw_tn if kw_tn is None else kw_tn
+        st = self.st if st is None else st
+        kw = tn * kw_tn
+        tn_total = tn.sum(axis=1)
+        seguro = np.where(tn_total > 0, tn_total, 1.0)
+        return {
+            'kw_total': kw.sum(axis=1),
+            'tn_total': tn_total,
+            'kw_solidos': kw[:, self.tipo == TIPO_SOLIDO].sum(axis=1),
+            'kw_liquidos': kw[:, self.tipo == TIPO_LIQUIDO].sum(axis=1),
+            'kw_purin': kw[:, self.tipo == TIPO_PURIN].sum(axis=1),
+            'ch4_porcentaje': np.where(tn_total > 0, tn @ self.ch4_gestion / seguro * 100, 0.0),
+            'st_porcentaje': np.where(tn_total > 0, tn @ st / seguro * 100, 0.0),
+            'biogas_m3': tn @ self.biogas_tn,
+        }
+
+
+_MATRICES: Dict[tuple, MatrizMateriales] = {}
+_LOCK = threading.Lock()
+
+
+def obtener_matriz(materiales_base: Dict[str, Any], version: Optional[str] = None,
+                   consumo_chp: float = CONSUMO_CHP_DEFAULT) -> MatrizMateriales:
+    """Matriz compilada para una versión del catálogo (se construye una sola vez)."""
+    version = version or version_catalogo(materiales_base)
+    clave = (version, consumo_chp)
+    with _LOCK:
+        matriz = _MATRICES.get(clave)
+        if matriz is None:
+            matriz = MatrizMateriales(materiales_base, consumo_chp, version)
+            _MATRICES.clear()  # sólo interesa la versión vigente del catálogo
+            _MATRICES[clave] = matriz
+            logger.info(f"🧮 Matriz de materiales compilada: {len(matriz)} materiales (versión {version})")
+        return matriz
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MODELO VECTORIZADO DE GENERACIÓN ELÉCTRICA (ADÁN)
+=================================================
+
+Misma física que `adan_calculator.calcular_generacion_electrica`, pero con
+los coeficientes por material precalculados una sola vez:
+
+    horas/tn   = m³ biogás/tn ÷ consumo del motor (m³/h)
+    kWh/tn     = potencia del motor × horas/tn
+    m³ CH4/tn  = m³ biogás/tn × %CH4
+    térmica/tn = m³ biogás/tn × poder calorífico (normalizado a 65% CH4)
+
+Todo es lineal en las toneladas, así que una receta (vector de n
+materiales) o un lote de recetas (matriz k × n) se evalúa con un producto
+matricial: biogás, CH4, kWh, kW medios y carga del motor en una pasada.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+PODER_CALORIFICO_DEFAULT = 6.0   # kWh/m³ de biogás a 65% CH4
+EFICIENCIA_TERMICA_DEFAULT = 0.45
+CH4_REFERENCIA = 65.0
+HORAS_DIA = 24.0
+
+
+def coeficientes_generacion(m3_biogas_por_tn, consumo_motor_l_s: float, potencia_motor_kw: float,
+                            porcentaje_ch4=60, motor_config: Optional[Dict[str, Any]] = None) -> Dict[str, np.ndarray]:
+    """
+    Coeficientes por tonelada para un arreglo de materiales (equivalente
+    vectorizado de calcular_generacion_electrica, sin redondeo).
+    `porcentaje_ch4` puede ser un escalar o un valor por material.
+    """
+    motor_config = motor_config or {}
+    m3 = np.asarray(m3_biogas_por_tn, dtype=float)
+    ch4 = np.broadcast_to(np.asarray(porcentaje_ch4, dtype=float), m3.shape)
+    poder_calorifico = float(motor_config.get('poder_calorifico_biogas', PODER_CALORIFICO_DEFAULT)) * (ch4 / CH4_REFERENCIA)
+    ceros = np.zeros_like(m3)
+    if consumo_motor_l_s <= 0 or potencia_motor_kw <= 0:
+        return {'m3_biogas': m3, 'm3_ch4': ceros, 'horas_operacion': ceros, 'kwh': ceros,
+                'energia_termica_kwh': ceros, 'potencia_calorifica_kw': ceros, 'poder_calorifico_biogas': ceros}
+
+    # Mismo orden de operaciones que la versión escalar (resultados idénticos al redondear)
+    consumo_m3_h = (consumo_motor_l_s / 1000) * 3600
+    validos = m3 >= 0
+    horas = np.where(validos, m3 / consumo_m3_h, 0.0)
+    energia_termica = np.where(validos, m3 * poder_calorifico, 0.0)
+    eficiencia_termica = float(motor_config.get('eficiencia_termica', EFICIENCIA_TERMICA_DEFAULT))
+    return {
+        'm3_biogas': m3,
+        'm3_ch4': m3 * (ch4 / 100),
+        'horas_operacion': horas,
+        'kwh': potencia_motor_kw * horas,
+        'energia_termica_kwh': energia_termica,
+        'potencia_calorifica_kw': np.divide(energia_termica * eficiencia_termica, horas,
+                                            out=np.zeros_like(m3), where=horas > 0),
+        'poder_calorifico_biogas': poder_calorifico,
+    }
+
+
+class ModeloGeneracion:
+    """Coeficientes por material + evaluación de recetas sueltas o en lote."""
+
+    def __init__(self, nombres: Sequence[str], m3_biogas_por_tn, consumo_motor_l_s: float,
+                 potencia_motor_kw: float, porcentaje_ch4=60, motor_config: Optional[Dict[str, Any]] = None):
+        self.nombres: List[str] = list(nombres)
+        self.indice = {nombre: i for i, nombre in enumerate(self.nombres)}
+        self.potencia_motor_kw = float(potencia_motor_kw)
+        self.coef = coeficientes_generacion(m3_biogas_por_tn, consumo_motor_l_s, potencia_motor_kw,
+                                            porcentaje_ch4, motor_config)
+        # Matriz n × 5 para evaluar todas las magnitudes aditivas con un solo producto
+        self._columnas = ('m3_biogas', 'm3_ch4', 'kwh', 'horas_operacion', 'energia_termica_kwh')
+        self._matriz = np.column_stack([self.coef[c] for c in self._columnas]) if self.nombres \
+            else np.zeros((0, len(self._columnas)))
+        self._calculos: Optional[Dict[str, Dict[str, float]]] = None
+
+    @classmethod
+    def desde_materiales(cls, materiales: List[Dict[str, Any]], consumo_motor_l_s: float, potencia_motor_kw: float,
+                         porcentaje_ch4=60, motor_config: Optional[Dict[str, Any]] = None) -> 'ModeloGeneracion':
+        """Modelo para la lista de materiales de Adán (claves 'nombre' y 'm3_biogas_por_tn')."""
+        return cls([m['nombre'] for m in materiales], [float(m.get('m3_biogas_por_tn', 0) or 0) for m in materiales],
+                   consumo_motor_l_s, potencia_motor_kw, porcentaje_ch4, motor_config)
+
+    def vector(self, toneladas: Dict[str, float]) -> np.ndarray:
+        """Receta {material: tn} como vector alineado a `nombres` (ignora materiales desconocidos)."""
+        tn = np.zeros(len(self.nombres))
+        for nombre, valor in toneladas.items():
+            i = self.indice.get(nombre)
+            if i is not None:
+                tn[i] = float(valor or 0)
+        return tn
+
+    def evaluar(self, toneladas) -> Dict[str, np.ndarray]:
+        """
+        Receta (n,) o lote de recetas (k, n) → biogás, CH4 (m³ y %), kWh,
+        horas de motor, energía térmica, kW medios y carga del motor (fracción
+        de la potencia nominal). Escalares para una receta, arreglos (k,) para un lote.
+        """
+        tn = np.asarray(toneladas, dtype=float)
+        totales = tn @ self._matriz
+        salida = {c: totales[..., j] for j, c in enumerate(self._columnas)}
+        salida['porcentaje_ch4'] = np.divide(salida['m3_ch4'] * 100, salida['m3_biogas'],
+                                             out=np.zeros_like(salida['m3_ch4']), where=salida['m3_biogas'] > 0)
+        salida['kw_medio'] = salida['kwh'] / HORAS_DIA
+        salida['carga_motor'] = salida['kw_medio'] / self.potencia_motor_kw if self.potencia_motor_kw > 0 \
+            else np.zeros_like(salida['kwh'])
+        return salida
+
+    def calculo(self, nombre: str) -> Optional[Dict[str, float]]:
+        """Coeficientes de un material con el formato y redondeo de calcular_generacion_electrica."""
+        if self._calculos is None:
+            # round() de Python (no np.round) para coincidir exactamente con la versión escalar
+            redondeo = (('m3_biogas_por_tn', 'm3_biogas', None), ('m3_ch4_por_tn', 'm3_ch4', 2),
+                        ('horas_operacion', 'horas_operacion', 3), ('kwh_generados', 'kwh', 2),
+                        ('potencia_calorifica_kw', 'potencia_calorifica_kw', 2),
+                        ('energia_termica_total_kwh', 'energia_termica_kwh', 2),
+                        ('poder_calorifico_biogas', 'poder_calorifico_biogas', 2))
+            columnas = {clave: [v if decimales is None else round(v, decimales) for v in self.coef[origen].tolist()]
+                        for clave, origen, decimales in redondeo}
+            self._calculos = {nombre_mat: {k: v[i] for k, v in columnas.items()}
+                              for i, nombre_mat in enumerate(self.nombres)}
+        return self._calculos.get(nombre)
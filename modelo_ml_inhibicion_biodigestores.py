@@ -21,8 +21,21 @@ import json
 import logging
 from typing import Dict, List, Tuple, Optional
 
+from registro_modelos import RegistroModelos, huella_datos, obtener_registro_modelos
+
 logger = logging.getLogger(__name__)
 
+NOMBRE_REGISTRO = 'inhibicion_biodigestores'
+# Subir cuando cambie el código de entrenamiento o del dataset sintético (invalida el artefacto guardado)
+VERSION_ENTRENAMIENTO = '1'
+PARAMETROS_MODELO = {
+    'n_estimators': 200,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'random_state': 42,
+}
+
 class ModeloMLInhibicionBiodigestores:
     """
     Modelo ML para predecir inhibición de biodigestores
@@ -193,13 +206,7 @@ class ModeloMLInhibicionBiodigestores:
             X_test_scaled = self.scaler.transform(X_test)
             
             # Entrenar modelo
-            self.modelo = RandomForestClassifier(
-                n_estimators=200,
-                max_depth=10,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                random_state=42
-            )
+            self.modelo = RandomForestClassifier(**PARAMETROS_MODELO)
             
             self.modelo.fit(X_train_scaled, y_train)
             
@@ -226,6 +233,54 @@ class ModeloMLInhibicionBiodigestores:
             logger.error(f"Error entrenando modelo: {e}")
             return {'status': 'error', 'error': str(e)}
     
+    def cargar_o_entrenar(self, registro: Optional[RegistroModelos] = None, datos: pd.DataFrame = None,
+                          forzar: bool = False) -> Dict:
+        """
+        Carga el modelo del registro si fue entrenado con los mismos datos y
+        parámetros; si no, lo entrena y registra una versión nueva.
+        """
+        registro = registro or obtener_registro_modelos()
+        if datos is None:
+            datos = self.crear_dataset_sintetico()
+
+        def entrenar():
+            resultado = self.entrenar_modelo(datos)
+            if resultado.get('status') != 'success':
+                raise RuntimeError(resultado.get('error', 'error de entrenamiento'))
+            return self._artefacto(), {k: v for k, v in resultado.items() if k != 'status'}
+
+        try:
+            artefacto, meta = registro.obtener_o_entrenar(
+                NOMBRE_REGISTRO, huella_datos(datos), entrenar, parametros=PARAMETROS_MODELO,
+                version_codigo=VERSION_ENTRENAMIENTO, forzar=forzar
+            )
+        except Exception as e:
+            logger.error(f"Error entrenando modelo: {e}")
+            return {'status': 'error', 'error': str(e)}
+
+        self._aplicar_artefacto(artefacto)
+        return {
+            **(meta.get('metricas') or {}),
+            'status': 'success',
+            'origen': meta.get('origen'),
+            'version': meta.get('version'),
+        }
+
+    def _artefacto(self) -> Dict:
+        return {
+            'modelo': self.modelo,
+            'scaler': self.scaler,
+            'label_encoder': self.label_encoder,
+            'caracteristicas': self.caracteristicas
+        }
+
+    def _aplicar_artefacto(self, modelo_data: Dict) -> None:
+        self.modelo = modelo_data['modelo']
+        self.scaler = modelo_data['scaler']
+        self.label_encoder = modelo_data['label_encoder']
+        self.caracteristicas = modelo_data['caracteristicas']
+        self.entrenado = True
+
     def predecir(self, datos: Dict) -> Dict:
         """
         Realiza predicción de inhibición
@@ -300,14 +355,7 @@ class ModeloMLInhibicionBiodigestores:
         if not self.entrenado:
             raise ValueError("Modelo no entrenado")
         
-        modelo_data = {
-            'modelo': self.modelo,
-            'scaler': self.scaler,
-            'label_encoder': self.label_encoder,
-            'caracteristicas': self.caracteristicas
-        }
-        
-        joblib.dump(modelo_data, ruta)
+        joblib.dump(self._artefacto(), ruta)
         logger.info(f"Modelo guardado en {ruta}")
     
     def cargar_modelo(self, ruta: str):
@@ -315,13 +363,7 @@ class ModeloMLInhibicionBiodigestores:
         Carga un modelo previamente entrenado
         """
         try:
-            modelo_data = joblib.load(ruta)
-            
-            self.modelo = modelo_data['modelo']
-            self.scaler = modelo_data['scaler']
-            self.label_encoder = modelo_data['label_encoder']
-            self.caracteristicas = modelo_data['caracteristicas']
-            self.entrenado = True
+            self._aplicar_artefacto(joblib.load(ruta))
             
             logger.info(f"Modelo cargado desde {ruta}")
             
@@ -16,12 +16,27 @@ import logging
 from datetime import datetime
 from typing import Dict, Any, List, Tuple, Optional
 
+from registro_modelos import RegistroModelos, huella_datos, obtener_registro_modelos
+
 logger = logging.getLogger(__name__)
 
+NOMBRE_REGISTRO = 'xgboost_calculadora'
+# Subir cuando cambie el código de entrenamiento (invalida el artefacto guardado)
+VERSION_ENTRENAMIENTO = '1'
+PARAMETROS_MODELO = {
+    'n_estimators': 100,
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'random_state': 42,
+}
+
 class ModeloXGBoostCalculadora:
     """Modelo XGBoost para predicción de KW/TN en calculadora rápida"""
     
-    def __init__(self):
+    def __init__(self, registro: Optional[RegistroModelos] = None):
+        self.registro = registro or obtener_registro_modelos()
         self.modelo_file = "modelo_xgboost_calculadora.json"
         self.datos_entrenamiento_file = "datos_entrenamiento_xgboost.json"
         self.modelo = None
@@ -31,24 +46,26 @@ class ModeloXGBoostCalculadora:
             'm3_tnsv', 'ch4_porcentaje'
         ]
         
-        # Cargar modelo existente o inicializar nuevo
+        # Cargar el modelo del registro; sólo se entrena si cambiaron los datos del catálogo
         self.cargar_modelo()
-        
-        # Si no hay modelo, entrenar con datos iniciales
-        if self.modelo is None:
-            self.entrenar_modelo_inicial()
     
-    def cargar_modelo(self):
-        """Carga el modelo XGBoost entrenado"""
+    def cargar_modelo(self, forzar: bool = False):
+        """Carga el modelo XGBoost del registro si sigue fresco, si no lo entrena y lo registra"""
         try:
-            if os.path.exists(self.modelo_file):
-                # XGBoost no se puede serializar directamente a JSON
-                # Usaremos un enfoque diferente
-                logger.info("📁 Modelo XGBoost encontrado, inicializando nuevo entrenamiento...")
-                self.modelo = None
-            else:
-                logger.info("🆕 No hay modelo XGBoost existente")
+            X, y = self.preparar_datos_entrenamiento()
+            if len(X) == 0:
+                logger.warning("⚠️ No hay datos para entrenar el modelo")
                 self.modelo = None
+                return
+            
+            self.modelo, meta = self.registro.obtener_o_entrenar(
+                NOMBRE_REGISTRO, huella_datos(X, y, self.feature_names),
+                lambda: self.entrenar_modelo_inicial(X, y),
+                parametros=PARAMETROS_MODELO, version_codigo=VERSION_ENTRENAMIENTO, forzar=forzar
+            )
+            if meta.get('origen') == 'entrenado':
+                metricas = meta.get('metricas', {})
+                self.guardar_info_modelo(metricas.get('mse', 0.0), metricas.get('r2', 0.0), len(X))
         except Exception as e:
             logger.error(f"❌ Error cargando modelo XGBoost: {e}")
             self.modelo = None
@@ -107,37 +124,23 @@ class ModeloXGBoostCalculadora:
             logger.error(f"❌ Error preparando datos de entrenamiento: {e}")
             return np.array([]), np.array([])
     
-    def entrenar_modelo_inicial(self):
-        """Entrena el modelo XGBoost con datos iniciales"""
+    def entrenar_modelo_inicial(self, X: np.ndarray, y: np.ndarray) -> Tuple[Any, Dict[str, float]]:
+        """Entrena el modelo XGBoost con los datos del catálogo; devuelve (modelo, métricas)"""
         try:
-            X, y = self.preparar_datos_entrenamiento()
-            
-            if len(X) == 0:
-                logger.warning("⚠️ No hay datos para entrenar el modelo")
-                return
-            
             # Dividir datos
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y, test_size=0.2, random_state=42
             )
             
             # Configurar modelo XGBoost
-            self.modelo = xgb.XGBRegressor(
-                n_estimators=100,
-                max_depth=6,
-                learning_rate=0.1,
-                subsample=0.8,
-                colsample_bytree=0.8,
-                random_state=42,
-                n_jobs=-1
-            )
+            modelo = xgb.XGBRegressor(**PARAMETROS_MODELO, n_jobs=-1)
             
             # Entrenar modelo
             logger.info("🚀 Entrenando modelo XGBoost...")
-            self.modelo.fit(X_train, y_train)
+            modelo.fit(X_train, y_train)
             
             # Evaluar modelo
-            y_pred = self.modelo.predict(X_test)
+            y_pred = modelo.predict(X_test)
             mse = mean_squared_error(y_test, y_pred)
             r2 = r2_score(y_test, y_pred)
             
@@ -145,14 +148,13 @@ class ModeloXGBoostCalculadora:
             logger.info(f"   📊 MSE: {mse:.4f}")
             logger.info(f"   📊 R²: {r2:.4f}")
             
-            # Guardar información del modelo
-            self.guardar_info_modelo(mse, r2)
+            return modelo, {'mse': float(mse), 'r2': float(r2)}
             
         except Exception as e:
             logger.error(f"❌ Error entrenando modelo XGBoost: {e}")
-            self.modelo = None
+            raise
     
-    def guardar_info_modelo(self, mse: float, r2: float):
+    def guardar_info_modelo(self, mse: float, r2: float, n_samples: int):
         """Guarda información del modelo entrenado"""
         try:
             info_modelo = {
@@ -160,15 +162,10 @@ class ModeloXGBoostCalculadora:
                 'mse': mse,
                 'r2_score': r2,
                 'feature_names': self.feature_names,
-                'n_samples': len(self.preparar_datos_entrenamiento()[0]),
+                'n_samples': n_samples,
                 'modelo_tipo': 'XGBoost Regressor',
-                'parametros': {
-                    'n_estimators': 100,
-                    'max_depth': 6,
-                    'learning_rate': 0.1,
-                    'subsample': 0.8,
-                    'colsample_bytree': 0.8
-                }
+                'parametros': PARAMETROS_MODELO,
+                'registro': NOMBRE_REGISTRO
             }
             
             with open(self.modelo_file, 'w', encoding='utf-8') as f:
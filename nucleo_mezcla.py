@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NÚCLEO ÚNICO DE CÁLCULO DE MEZCLA
+=================================
+
+Un solo punto de entrada para `/calcular_mezcla`,
+`/calcular_mezcla_automatica` y el `/adan/calcular_mezcla` del blueprint de
+Adán:
+
+1. `NucleoMezcla.preparar` arma una `EntradaMezcla`: configuración con los
+   parámetros del request, stock (con o sin purín), catálogo, matriz de
+   materiales, kW/tn y ST efectivos y promedios de ST por categoría. Lo que
+   depende sólo de stock y catálogo se calcula una vez por versión de ambos
+   y se reutiliza entre requests.
+2. `NucleoMezcla.resolver` corre la estrategia elegida (interfaz
+   `EstrategiaMezcla`) y aplica el post-proceso común: escalado al objetivo
+   de kW para las estrategias volumétricas y métricas de tiempo.
+
+Los endpoints quedan como adaptadores finos: leen el request, eligen la
+estrategia y arman su respuesta.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from escalador_volumetrico import TOLERANCIA_KW_DEFAULT, escalar_resultado
+from matriz_materiales import NOMBRES_TIPO, MatrizMateriales
+from registro_calculo import traza
+
+logger = logging.getLogger(__name__)
+
+# Parámetros de request que se copian a la configuración (nombre en el request → clave de config)
+PARAMETROS_CONFIG = {
+    'kw_objetivo': 'kw_objetivo',
+    'porcentaje_solidos': 'porcentaje_solidos',
+    'porcentaje_liquidos': 'porcentaje_liquidos',
+    'porcentaje_purin': 'porcentaje_purin',
+    'cantidad_materiales': 'cantidad_materiales',
+    'objetivo_metano': 'objetivo_metano_diario',
+    'num_biodigestores': 'num_biodigestores',
+    'modo_calculo': 'modo_calculo',
+}
+PARAMETROS_NUMERICOS = ('kw_objetivo', 'porcentaje_solidos', 'porcentaje_liquidos', 'porcentaje_purin',
+                        'objetivo_metano_diario')
+
+# Modelo del Dashboard ML → estrategia, en orden de prioridad
+ESTRATEGIAS_POR_MODELO = (
+    ('xgboost_calculadora', 'energetico'),
+    ('algoritmo_genetico', 'algoritmo_genetico'),
+    ('programacion_lineal', 'programacion_lineal'),
+    ('redes_neuronales', 'redes_neuronales'),
+    ('optimizacion_bayesiana', 'optimizacion_bayesiana'),
+)
+
+
+class EntradaMezcla:
+    """Entrada preprocesada y compartida por todas las estrategias."""
+
+    def __init__(self, config: Dict[str, Any], stock: Dict[str, Any], materiales_base: Dict[str, Any],
+                 matriz: MatrizMateriales, derivados: Dict[str, Any], parametros: Dict[str, Any],
+                 incluir_purin: bool):
+        self.config = config
+        self.stock = stock
+        self.materiales_base = materiales_base
+        self.matriz = matriz
+        self.parametros = parametros
+        self.incluir_purin = incluir_purin
+        self.tn_stock: np.ndarray = derivados['tn_stock']
+        self.kw_tn: np.ndarray = derivados['kw_tn']
+        self.st: np.ndarray = derivados['st']
+        self.tn_por_tipo: Dict[str, float] = derivados['tn_por_tipo']
+        self.st_promedio: Dict[str, float] = derivados['st_promedio']
+        self.version: Any = None
+        self.preproceso_ms = 0.0
+
+    @property
+    def kw_objetivo(self) -> float:
+        return float(self.config.get('kw_objetivo', 28800.0) or 0)
+
+
+class EstrategiaMezcla(ABC):
+    """
+    Interfaz de estrategia: `calcular(entrada)` devuelve el resultado en el
+    formato de `calcular_mezcla_diaria` (o el propio de la estrategia si
+    `formato` no es 'sibia'). Las volumétricas se escalan al objetivo de kW.
+    Una estrategia sin `calcular` falla al instanciarse, no en el request.
+    """
+
+    nombre = 'base'
+    volumetrica = False
+    formato = 'sibia'
+
+    @abstractmethod
+    def calcular(self, entrada: EntradaMezcla) -> Dict[str, Any]:
+        """Resultado de la mezcla para la entrada preprocesada."""
+
+
+class EstrategiaFuncion(EstrategiaMezcla):
+    """Adapta una función existente `funcion(config, stock)` (ya memoizada en la aplicación)."""
+
+    def __init__(self, nombre: str, funcion: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]],
+                 volumetrica: bool = False, formato: str = 'sibia'):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.volumetrica = volumetrica
+        self.formato = formato
+
+    def calcular(self, entrada: EntradaMezcla) -> Dict[str, Any]:
+        return self.funcion(entrada.config, entrada.stock)
+
+
+class EstrategiaEntrada(EstrategiaFuncion):
+    """Como EstrategiaFuncion, para funciones que necesitan la entrada completa: `funcion(entrada)`."""
+
+    def calcular(self, entrada: EntradaMezcla) -> Dict[str, Any]:
+        return self.funcion(entrada)
+
+
+class NucleoMezcla:
+    """Preprocesamiento compartido + registro de estrategias de mezcla."""
+
+    def __init__(self, cargar_config: Callable[[], Dict[str, Any]],
+                 cargar_stock: Callable[[], Dict[str, Any]],
+                 cargar_catalogo: Callable[[], Dict[str, Any]],
+                 obtener_matriz: Callable[[], MatrizMateriales],
+                 version_stock: Optional[Callable[[], Any]] = None):
+        self._cargar_config = cargar_config
+        self._cargar_stock = cargar_stock
+        self._cargar_catalogo = cargar_catalogo
+        self._obtener_matriz = obtener_matriz
+        self._version_stock = version_stock
+        self._estrategias: Dict[str, EstrategiaMezcla] = {}
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self.ultimo_resultado: Optional[Dict[str, Any]] = None
+
+    # ------------------------------------------------------------------
+    # Estrategias
+    # ------------------------------------------------------------------
+
+    def registrar(self, estrategia: EstrategiaMezcla) -> None:
+        self._estrategias[estrategia.nombre] = estrategia
+
+    def estrategias(self) -> List[str]:
+        return list(self._estrategias)
+
+    @staticmethod
+    def estrategia_para_modelos(modelos_activos: List[str], modo_calculo: str = 'energetico') -> str:
+        """Estrategia según el modo y los modelos activos del Dashboard ML."""
+        if modo_calculo == 'volumetrico':
+            return 'volumetrico'
+        for modelo, estrategia in ESTRATEGIAS_POR_MODELO:
+            if modelo in (modelos_activos or []):
+                return estrategia
+        return 'energetico'
+
+    # ------------------------------------------------------------------
+    # Entrada compartida
+    # ------------------------------------------------------------------
+
+    def _stock_preprocesado(self) -> Dict[str, Any]:
+        """Stock, catálogo y derivados; se recalculan sólo si cambia la versión de alguno."""
+        matriz = self._obtener_matriz()
+        version = (self._version_stock() if self._version_stock else None, matriz.version)
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is not None and version[0] is not None and snapshot['version'] == version:
+            return snapshot
+
+        stock = self._cargar_stock()
+        props = matriz.propiedades_stock(stock)
+        tn_stock = matriz.vector_stock(stock)
+        tn_por_tipo, st_promedio = {}, {}
+        for t, tipo in enumerate(NOMBRES_TIPO):
+            en_tipo = (matriz.tipo == t) & (tn_stock > 0)
+            tn_por_tipo[tipo] = float(tn_stock[en_tipo].sum())
+            st_promedio[tipo] = float(props['st'][en_tipo] @ tn_stock[en_tipo] / tn_por_tipo[tipo] * 100) \
+                if tn_por_tipo[tipo] > 0 else 0.0
+        snapshot = {
+            'version': version,
+            'stock': stock,
+            'materiales_base': self._cargar_catalogo(),
+            'matriz': matriz,
+            'derivados': {'tn_stock': tn_stock, 'kw_tn': props['kw_tn'], 'st': props['st'],
+                          'tn_por_tipo': tn_por_tipo, 'st_promedio': st_promedio},
+        }
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def preparar(self, parametros: Optional[Dict[str, Any]] = None, incluir_purin: bool = True) -> EntradaMezcla:
+        """
+        Entrada para un request: configuración vigente con los parámetros
+        recibidos (ver PARAMETROS_CONFIG) y el stock compartido, sin purín si
+        `incluir_purin` es False.
+        """
+        inicio = time.perf_counter()
+        parametros = dict(parametros or {})
+        config = self._cargar_config()
+        for clave_request, clave_config in PARAMETROS_CONFIG.items():
+            if parametros.get(clave_request) is not None:
+                valor = parametros[clave_request]
+                config[clave_config] = float(valor) if clave_config in PARAMETROS_NUMERICOS else valor
+
+        snapshot = self._stock_preprocesado()
+        # Copia por material: las estrategias pueden anotar el stock que reciben
+        stock = {mat: dict(datos) if isinstance(datos, dict) else datos for mat, datos in snapshot['stock'].items()
+                 if incluir_purin or mat.lower() != 'purin'}
+        derivados = snapshot['derivados']
+        if not incluir_purin:
+            derivados = {**derivados, 'tn_por_tipo': {**derivados['tn_por_tipo'], 'purin': 0.0},
+                         'st_promedio': {**derivados['st_promedio'], 'purin': 0.0}}
+        entrada = EntradaMezcla(config, stock, snapshot['materiales_base'], snapshot['matriz'], derivados,
+                                parametros, incluir_purin)
+        entrada.version = snapshot['version'] if snapshot['version'][0] is not None else None
+        entrada.preproceso_ms = (time.perf_counter() - inicio) * 1000
+        return entrada
+
+    # ------------------------------------------------------------------
+    # Cálculo
+    # ------------------------------------------------------------------
+
+    def resolver(self, entrada: EntradaMezcla, nombre_estrategia: str) -> Dict[str, Any]:
+        """Corre la estrategia y aplica el post-proceso común."""
+        estrategia = self._estrategias.get(nombre_estrategia)
+        if estrategia is None:
+            raise ValueError(f"Estrategia de mezcla desconocida: {nombre_estrategia}")
+        with traza(f"mezcla:{estrategia.nombre}") as t:
+            inicio = time.perf_counter()
+            resultado = estrategia.calcular(entrada)
+
+            if estrategia.volumetrica and resultado and entrada.kw_objetivo > 0:
+                try:
+                    escalar_resultado(resultado, entrada.stock, entrada.kw_objetivo,
+                                      tolerancia_kw=float(entrada.config.get('tolerancia_kw_volumetrico',
+                                                                             TOLERANCIA_KW_DEFAULT)))
+                except Exception as e:
+                    logger.warning(f"⚠️ No se pudo escalar la mezcla volumétrica: {e}")
+
+            calculo_ms = (time.perf_counter() - inicio) * 1000
+            if isinstance(resultado, dict):
+                resultado['nucleo'] = {
+                    'estrategia': estrategia.nombre,
+                    'preproceso_ms': round(entrada.preproceso_ms, 3),
+                    'calculo_ms': round(calculo_ms, 3),
+                }
+                if estrategia.formato == 'sibia':
+                    self.ultimo_resultado = resultado
+            t.anotar(estrategia=estrategia.nombre, preproceso_ms=round(entrada.preproceso_ms, 1),
+                     calculo_ms=round(calculo_ms, 1))
+        return resultado
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OPTIMIZACIÓN BAYESIANA (PROCESO GAUSSIANO + EXPECTED IMPROVEMENT)
+=================================================================
+
+Optimizador secuencial basado en modelo sobre las perillas continuas de la
+mezcla, normalizadas a [0, 1]:
+
+- proporción sólidos/líquidos (dentro de la parte no purín)
+- peso metano vs. kW en el puntaje de materiales
+- tope por material (fracción del stock que puede usarse)
+
+Cada evaluación construye la mezcla con esas perillas, la escala al objetivo
+de kW y la puntúa con la misma aptitud que el algoritmo genético. Un
+`GaussianProcessRegressor` (Matern 5/2) modela el costo y la Expected
+Improvement elige los próximos puntos, en lotes (constant liar). Arranca en
+caliente con los mejores puntos de corridas anteriores del mismo problema y
+corta cuando la EI máxima es despreciable o no hay mejora. El historial en
+disco lo comparten los workers: se re-lee cuando cambia y cada escritura
+fusiona, bajo bloqueo de archivo, los puntos nuevos con los del disco.
+
+Sin scikit-learn se usa búsqueda aleatoria con el mismo presupuesto.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import os
+import threading
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from bloqueo_archivo import bloqueo_archivo
+from escalador_volumetrico import buscar_factor
+from matriz_materiales import MatrizMateriales
+from optimizador_genetico import aptitud_lote, construir_problema
+from optimizador_lp_mezcla import (
+    DOSIS_MINIMA_TN, TOLERANCIA_KW_DEFAULT, _float, construir_resultado, preparar_problema,
+)
+from utils import cargar_json_seguro, guardar_json_seguro
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy.stats import norm
+    from sklearn.gaussian_process import GaussianProcessRegressor
+    from sklearn.gaussian_process.kernels import ConstantKernel, Matern, WhiteKernel
+    SKLEARN_DISPONIBLE = True
+except ImportError:
+    SKLEARN_DISPONIBLE = False
+
+PARAMETROS_DEFAULT = {
+    'max_evaluaciones': 40,
+    'n_inicial': 8,
+    'tam_lote': 4,
+    'candidatos': 2000,
+    'xi': 0.01,
+    'ei_minima': 1e-5,
+    'paciencia': 3,
+    'max_historial': 10,
+}
+
+# Mejores puntos por problema para el arranque en caliente
+_HISTORIAL: Dict[str, List[List[float]]] = {}
+_FIRMA_HISTORIAL: Dict[str, tuple] = {}
+_LOCK = threading.Lock()
+
+
+def expected_improvement(mu: np.ndarray, sigma: np.ndarray, mejor: float, xi: float = 0.01) -> np.ndarray:
+    """EI para minimización."""
+    sigma = np.maximum(sigma, 1e-12)
+    mejora = mejor - mu - xi
+    z = mejora / sigma
+    return mejora * norm.cdf(z) + sigma * norm.pdf(z)
+
+
+def _nuevo_gp(dimension: int, semilla: int) -> 'GaussianProcessRegressor':
+    kernel = (ConstantKernel(1.0, (1e-3, 1e3))
+              * Matern(length_scale=np.full(dimension, 0.5), length_scale_bounds=(1e-2, 1e2), nu=2.5)
+              + WhiteKernel(1e-4, (1e-8, 1e-1)))
+    return GaussianProcessRegressor(kernel=kernel, normalize_y=True, n_restarts_optimizer=1, random_state=semilla)
+
+
+def _proponer_lote(gp, X: np.ndarray, y: np.ndarray, tam_lote: int, n_candidatos: int,
+                   xi: float, rng: np.random.Generator):
+    """
+    Lote de puntos por EI con constant liar: cada punto elegido se agrega con
+    el mejor costo observado y se reajusta el GP (kernel fijo) antes del siguiente.
+    """
+    mejor_x = X[int(np.argmin(y))]
+    candidatos = np.vstack([
+        rng.random((n_candidatos // 2, X.shape[1])),
+        np.clip(mejor_x + rng.normal(0, 0.1, (n_candidatos - n_candidatos // 2, X.shape[1])), 0, 1),
+    ])
+    lote, ei_max = [], 0.0
+    X_fant, y_fant = X, y
+    gp_fant = gp
+    for j in range(tam_lote):
+        mu, sigma = gp_fant.predict(candidatos, return_std=True)
+        ei = expected_improvement(mu, sigma, float(y.min()), xi)
+        k = int(np.argmax(ei))
+        if j == 0:
+            ei_max = float(ei[k])
+        lote.append(candidatos[k])
+        candidatos = np.delete(candidatos, k, axis=0)
+        if j < tam_lote - 1:
+            X_fant = np.vstack([X_fant, lote[-1]])
+            y_fant = np.append(y_fant, y.min())
+            gp_fant = GaussianProcessRegressor(kernel=gp.kernel_, normalize_y=True, optimizer=None).fit(X_fant, y_fant)
+    return np.array(lote), ei_max
+
+
+def minimizar_gp(funcion_lote: Callable[[np.ndarray], np.ndarray], dimension: int,
+                 parametros: Optional[Dict[str, Any]] = None, semilla: int = 0,
+                 puntos_previos: Optional[List[List[float]]] = None) -> Dict[str, Any]:
+    """
+    Minimiza `funcion_lote` (matriz k×d en [0, 1] → k costos) con GP + EI.
+
+    Returns:
+        dict con x (mejor punto), costo, X/y evaluados, evaluaciones,
+        iteraciones, parada ('presupuesto' | 'ei' | 'paciencia') e historial
+        [{evaluacion, costo, mejor}].
+    """
+    p = {**PARAMETROS_DEFAULT, **(parametros or {})}
+    rng = np.random.default_rng(semilla)
+    presupuesto = int(p['max_evaluaciones'])
+
+    previos = np.clip(np.array(puntos_previos or [], dtype=float).reshape(-1, dimension), 0, 1)
+    previos = previos[:max(0, int(p['n_inicial']) - 2)]
+    X = np.vstack([previos, rng.random((max(2, int(p['n_inicial']) - len(previos)), dimension))])[:presupuesto]
+    y = np.asarray(funcion_lote(X), dtype=float)
+
+    historial = []
+    mejor = np.inf
+    for costo in y:
+        mejor = min(mejor, float(costo))
+        historial.append({'evaluacion': len(historial) + 1, 'costo': round(float(costo), 6), 'mejor': round(mejor, 6)})
+
+    parada, iteraciones, sin_mejora = 'presupuesto', 0, 0
+    while len(y) < presupuesto:
+        iteraciones += 1
+        tam = min(int(p['tam_lote']), presupuesto - len(y))
+        if SKLEARN_DISPONIBLE:
+            gp = _nuevo_gp(dimension, semilla)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                gp.fit(X, y)
+                lote, ei_max = _proponer_lote(gp, X, y, tam, int(p['candidatos']), float(p['xi']), rng)
+            if ei_max < p['ei_minima'] * max(abs(mejor), 1.0):
+                parada = 'ei'
+                break
+        else:
+            lote = rng.random((tam, dimension))
+
+        costos = np.asarray(funcion_lote(lote), dtype=float)
+        X, y = np.vstack([X, lote]), np.append(y, costos)
+        mejor_anterior = mejor
+        for costo in costos:
+            mejor = min(mejor, float(costo))
+            historial.append({'evaluacion': len(historial) + 1, 'costo': round(float(costo), 6), 'mejor': round(mejor, 6)})
+        sin_mejora = 0 if mejor < mejor_anterior - 1e-6 else sin_mejora + 1
+        if sin_mejora >= p['paciencia']:
+            parada = 'paciencia'
+            break
+
+    k = int(np.argmin(y))
+    return {
+        'x': X[k], 'costo': float(y[k]), 'X': X, 'y': y,
+        'evaluaciones': len(y), 'iteraciones': iteraciones,
+        'parada': parada, 'historial': historial,
+        'modelo': 'gp_ei' if SKLEARN_DISPONIBLE else 'aleatorio',
+    }
+
+
+# ----------------------------------------------------------------------
+# Mezcla diaria
+# ----------------------------------------------------------------------
+
+def decodificar_perillas(u: np.ndarray, nombres: List[str]) -> Dict[str, Any]:
+    """Perillas en unidades de la mezcla a partir del punto normalizado."""
+    return {
+        'proporcion_solidos': 0.2 + 0.6 * float(u[0]),
+        'peso_metano': float(u[1]),
+        'topes': {nombre: 0.05 + 0.95 * float(t) for nombre, t in zip(nombres, u[2:])},
+    }
+
+
+def construir_mezcla(datos: Dict[str, Any], problema: Dict[str, Any], config: Dict[str, Any],
+                     u: np.ndarray) -> np.ndarray:
+    """
+    Reparte el kW objetivo por categoría según la proporción, llenando con los
+    materiales de mejor puntaje (kW y metano ponderados) hasta su tope, y
+    escala el total al objetivo respetando stock.
+    """
+    kw_tn, ch4, stock, categoria = datos['kw_tn'], datos['ch4'], datos['stock'], datos['categoria']
+    kw_objetivo = problema['kw_objetivo']
+    purin = problema['proporciones'][2]
+    ps = 0.2 + 0.6 * u[0]
+    reparto = np.array([ps * (1 - purin), (1 - ps) * (1 - purin), purin])
+    puntaje = (1 - u[1]) * kw_tn / kw_tn.max() + u[1] * ch4 / max(ch4.max(), 1e-9)
+    disponible = np.minimum(stock, (0.05 + 0.95 * u[2:]) * stock)
+    limites = problema['max_por_categoria']
+
+    tn = np.zeros(len(kw_tn))
+    for c in range(3):
+        restante = kw_objetivo * reparto[c]
+        idx = np.flatnonzero(categoria == c)
+        idx = idx[np.argsort(-puntaje[idx])][:limites[c]] if limites[c] is not None else idx[np.argsort(-puntaje[idx])]
+        for i in idx:
+            if restante <= 0:
+                break
+            tn[i] = min(disponible[i], restante / kw_tn[i])
+            restante -= tn[i] * kw_tn[i]
+    tn = np.where(tn >= DOSIS_MINIMA_TN, tn, 0.0)
+    if np.any(tn > 0):
+        tolerancia = _float(config.get('tolerancia_kw'), TOLERANCIA_KW_DEFAULT)
+        tn = np.minimum(stock, buscar_factor(tn, kw_tn, stock, kw_objetivo, tolerancia)['factor'] * tn)
+    return tn
+
+
+def clave_problema(datos: Dict[str, Any], config: Dict[str, Any]) -> str:
+    """Problemas con los mismos materiales y objetivo comparten arranque en caliente."""
+    return f"{'|'.join(datos['nombres'])}@{round(_float(config.get('kw_objetivo'), 28800.0), -2):.0f}"
+
+
+def _firma(ruta: str) -> Optional[tuple]:
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    return (estado.st_mtime_ns, estado.st_size)
+
+
+def _leer_historial(ruta: str) -> Dict[str, List[List[float]]]:
+    previo = cargar_json_seguro(ruta) if os.path.exists(ruta) else None
+    if not isinstance(previo, dict):
+        return {}
+    return {k: v for k, v in previo.items() if isinstance(v, list)}
+
+
+def _cargar_historial(ruta: Optional[str]) -> None:
+    """Incorpora el historial del disco si cambió desde la última lectura (otro worker lo escribió)."""
+    if not ruta:
+        return
+    firma = _firma(ruta)
+    if firma is None or firma == _FIRMA_HISTORIAL.get(ruta):
+        return
+    _HISTORIAL.update(_leer_historial(ruta))
+    _FIRMA_HISTORIAL[ruta] = firma
+
+
+def _fusionar_puntos(nuevos: List[List[float]], previos: List[List[float]], maximo: int) -> List[List[float]]:
+    """Puntos nuevos primero (ya ordenados por costo), luego los previos que no estén repetidos."""
+    fusion: List[List[float]] = []
+    for punto in list(nuevos) + list(previos):
+        if punto not in fusion:
+            fusion.append(punto)
+    return fusion[:maximo]
+
+
+def _guardar_historial(ruta: Optional[str], clave: str, puntos: List[List[float]], maximo: int) -> None:
+    """
+    Agrega `puntos` al historial de `clave`. Con `ruta`, bajo bloqueo de archivo
+    relee el disco y fusiona, así no se pierden los puntos que otros workers
+    guardaron mientras tanto.
+    """
+    if not ruta:
+        _HISTORIAL[clave] = _fusionar_puntos(puntos, _HISTORIAL.get(clave, []), maximo)
+        return
+    with bloqueo_archivo(ruta):
+        disco = _leer_historial(ruta)
+        disco[clave] = _fusionar_puntos(puntos, disco.get(clave, []), maximo)
+        temporal = f"{ruta}.tmp"
+        if guardar_json_seguro(temporal, disco):
+            os.replace(temporal, ruta)
+            _FIRMA_HISTORIAL[ruta] = _firma(ruta)
+        _HISTORIAL.update(disco)
+
+
+def optimizar_mezcla_bayesiana(config: Dict[str, Any], stock_actual: Dict[str, Any],
+                               materiales_base: Optional[Dict[str, Any]] = None,
+                               matriz: Optional[MatrizMateriales] = None,
+                               parametros: Optional[Dict[str, Any]] = None,
+                               ruta_historial: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Optimiza las perillas de la mezcla con GP + EI y devuelve la mejor mezcla
+    (estructura de `calcular_mezcla_diaria`). `ruta_historial` persiste los
+    mejores puntos para arrancar en caliente en corridas siguientes.
+    """
+    if not isinstance(config, dict) or not isinstance(stock_actual, dict):
+        raise ValueError("Configuración o stock inválidos")
+    p = {**PARAMETROS_DEFAULT, **(config.get('parametros_bayesianos') or {}), **(parametros or {})}
+    inicio = time.perf_counter()
+
+    datos = preparar_problema(stock_actual, materiales_base, config.get('costos_materiales'), matriz)
+    if not datos['nombres']:
+        resultado = construir_resultado(datos, np.zeros(0), config, [])
+        resultado['algoritmo_usado'] = 'optimizacion_bayesiana'
+        return resultado
+    problema = construir_problema(datos, config)
+
+    def evaluar(U: np.ndarray) -> np.ndarray:
+        T = np.array([construir_mezcla(datos, problema, config, u) for u in U])
+        return aptitud_lote(T / datos['stock'], problema)
+
+    clave = clave_problema(datos, config)
+    with _LOCK:
+        _cargar_historial(ruta_historial)
+        previos = list(_HISTORIAL.get(clave, []))
+
+    busqueda = minimizar_gp(evaluar, 2 + len(datos['nombres']), p, int(config.get('semilla_mezcla', 0)), previos)
+
+    orden = np.argsort(busqueda['y'])[:int(p['max_historial'])]
+    with _LOCK:
+        _guardar_historial(ruta_historial, clave, [busqueda['X'][i].round(4).tolist() for i in orden],
+                           int(p['max_historial']))
+
+    tn = construir_mezcla(datos, problema, config, busqueda['x'])
+    resultado = construir_resultado(datos, tn, config, [])
+    perillas = decodificar_perillas(busqueda['x'], datos['nombres'])
+    resultado['algoritmo_usado'] = 'optimizacion_bayesiana'
+    resultado['metodo_optimizacion'] = 'Bayesian Optimization'
+    resultado['parametros_bayesianos'] = {k: p[k] for k in PARAMETROS_DEFAULT}
+    resultado['optimizacion'] = {
+        'solver': busqueda['modelo'],
+        'evaluaciones': busqueda['evaluaciones'],
+        'iteraciones': busqueda['iteraciones'],
+        'parada': busqueda['parada'],
+        'arranque_en_caliente': min(len(previos), max(0, int(p['n_inicial']) - 2)),
+        'mejor_costo': round(busqueda['costo'], 6),
+        'perillas': {
+            'proporcion_solidos': round(perillas['proporcion_solidos'], 4),
+            'peso_metano': round(perillas['peso_metano'], 4),
+            'topes': {k: round(v, 4) for k, v in perillas['topes'].items()},
+        },
+        'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+        'convergencia': busqueda['historial'],
+    }
+    logger.info(f"🧠 Optimización bayesiana ({busqueda['modelo']}): {resultado['totales']['kw_total_generado']:.0f} KW, "
+                f"{busqueda['evaluaciones']} evaluaciones, parada por {busqueda['parada']}")
+    return resultado
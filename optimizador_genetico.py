@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ALGORITMO GENÉTICO VECTORIZADO PARA LA MEZCLA DIARIA
+====================================================
+
+Población como matriz NumPy (individuos × materiales); cada gen es la
+fracción del stock de un material que se usa en el día. La aptitud de toda
+la población se calcula con operaciones matriciales:
+
+- error relativo de kW respecto de `kw_objetivo`
+- déficit de metano respecto de `objetivo_metano_diario`
+- desvío del reparto de kW sólidos/líquidos/purín
+- penalizaciones por capacidad diaria y por exceso de materiales por categoría
+
+Operadores: torneo, cruce SBX, mutación polinomial y elitismo. Corre dentro
+de un presupuesto de tiempo, corta por estancamiento y devuelve la traza de
+convergencia. Para poblaciones grandes la aptitud puede repartirse en un
+pool de procesos.
+
+El resultado tiene la misma estructura que `calcular_mezcla_diaria`.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from escalador_volumetrico import buscar_factor
+from matriz_materiales import MatrizMateriales
+from optimizador_lp_mezcla import (
+    DOSIS_MINIMA_TN, TOLERANCIA_KW_DEFAULT, _float, _limites_por_categoria, _proporciones,
+    construir_resultado, preparar_problema,
+)
+
+logger = logging.getLogger(__name__)
+
+PARAMETROS_DEFAULT = {
+    'poblacion': 120,
+    'generaciones': 400,
+    'tiempo_max_s': 2.0,
+    'torneo': 3,
+    'prob_cruce': 0.9,
+    'eta_cruce': 15.0,
+    'eta_mutacion': 20.0,
+    'elite': 4,
+    'estancamiento': 60,
+    'procesos': 1,
+    'umbral_pool': 2000,
+}
+
+PESO_METANO = 1.0
+PESO_REPARTO = 0.2
+PESO_PENALIZACION = 5.0
+
+
+def construir_problema(datos: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """Arreglos y umbrales que necesita `aptitud_lote` (datos de `preparar_problema`)."""
+    return {
+        'stock': datos['stock'],
+        'kw_tn': datos['kw_tn'],
+        'ch4': datos['ch4'],
+        'categoria': datos['categoria'],
+        'kw_objetivo': max(_float(config.get('kw_objetivo'), 28800.0), 1.0),
+        'umbral_metano': _float(config.get('objetivo_metano_diario', config.get('objetivo_metano')), 65.0),
+        'proporciones': _proporciones(config),
+        'capacidades': np.array([_float(config.get(f'capacidad_max_{c}_tn'), np.inf)
+                                 for c in ('solidos', 'liquidos', 'purin')]),
+        'max_por_categoria': list(_limites_por_categoria(config)) + [None],
+    }
+
+
+def aptitud_lote(X: np.ndarray, problema: Dict[str, Any]) -> np.ndarray:
+    """
+    Costo (menor es mejor) de cada fila de X (fracciones de stock en [0, 1]).
+    Función de módulo para poder enviarse a un pool de procesos.
+    """
+    tn = X * problema['stock']
+    kw_cat = np.stack([(tn * problema['kw_tn'] * (problema['categoria'] == c)).sum(axis=1) for c in range(3)], axis=1)
+    kw = kw_cat.sum(axis=1)
+    tn_total = tn.sum(axis=1)
+    seguro_kw = np.where(kw > 0, kw, 1.0)
+    seguro_tn = np.where(tn_total > 0, tn_total, 1.0)
+
+    costo = np.abs(kw - problema['kw_objetivo']) / problema['kw_objetivo']
+
+    ch4 = tn @ problema['ch4'] / seguro_tn
+    costo += PESO_METANO * np.maximum(0.0, problema['umbral_metano'] - ch4) / problema['umbral_metano']
+
+    costo += PESO_REPARTO * np.abs(kw_cat / seguro_kw[:, None] - problema['proporciones']).sum(axis=1)
+
+    tn_cat = np.stack([(tn * (problema['categoria'] == c)).sum(axis=1) for c in range(3)], axis=1)
+    exceso_cap = np.maximum(0.0, tn_cat - problema['capacidades']) / np.maximum(problema['capacidades'], 1.0)
+    costo += PESO_PENALIZACION * np.where(np.isfinite(exceso_cap), exceso_cap, 0.0).sum(axis=1)
+
+    usados = tn >= DOSIS_MINIMA_TN
+    for c, maximo in enumerate(problema['max_por_categoria']):
+        if maximo is not None:
+            exceso = (usados & (problema['categoria'] == c)).sum(axis=1) - maximo
+            costo += PESO_PENALIZACION * 0.1 * np.maximum(0, exceso)
+    return costo
+
+
+def _aptitud(X: np.ndarray, problema: Dict[str, Any], pool: Optional[ProcessPoolExecutor], procesos: int) -> np.ndarray:
+    if pool is None:
+        return aptitud_lote(X, problema)
+    partes = np.array_split(X, procesos)
+    return np.concatenate(list(pool.map(aptitud_lote, partes, [problema] * len(partes))))
+
+
+def _torneo(costos: np.ndarray, k: int, cantidad: int, rng: np.random.Generator) -> np.ndarray:
+    candidatos = rng.integers(0, len(costos), size=(cantidad, k))
+    return candidatos[np.arange(cantidad), np.argmin(costos[candidatos], axis=1)]
+
+
+def _sbx(p1: np.ndarray, p2: np.ndarray, eta: float, prob: float, rng: np.random.Generator):
+    """Cruce binario simulado (SBX) acotado a [0, 1]."""
+    u = rng.random(p1.shape)
+    beta = np.where(u <= 0.5, (2 * u) ** (1 / (eta + 1)), (1 / (2 * (1 - u))) ** (1 / (eta + 1)))
+    h1 = 0.5 * ((1 + beta) * p1 + (1 - beta) * p2)
+    h2 = 0.5 * ((1 - beta) * p1 + (1 + beta) * p2)
+    cruzar = (rng.random((p1.shape[0], 1)) < prob) & (rng.random(p1.shape) < 0.5)
+    return np.clip(np.where(cruzar, h1, p1), 0, 1), np.clip(np.where(cruzar, h2, p2), 0, 1)
+
+
+def _mutacion_polinomial(X: np.ndarray, eta: float, prob: float, rng: np.random.Generator) -> np.ndarray:
+    u = rng.random(X.shape)
+    delta = np.where(u < 0.5, (2 * u) ** (1 / (eta + 1)) - 1, 1 - (2 * (1 - u)) ** (1 / (eta + 1)))
+    mutar = rng.random(X.shape) < prob
+    return np.clip(X + mutar * delta, 0, 1)
+
+
+def _reparar(datos: Dict[str, Any], config: Dict[str, Any], tn: np.ndarray, kw_objetivo: float) -> np.ndarray:
+    """
+    Dosis mínima y cantidad máxima de materiales por categoría sobre la mejor
+    solución; después reescala (búsqueda de raíz) para recuperar el kW que se
+    pierde al descartar dosis chicas.
+    """
+    tn = np.where(tn >= DOSIS_MINIMA_TN, tn, 0.0)
+    kw = tn * datos['kw_tn']
+    for c, maximo in enumerate(_limites_por_categoria(config)):
+        idx = np.flatnonzero((datos['categoria'] == c) & (tn > 0))
+        if maximo is not None and len(idx) > maximo:
+            tn[idx[np.argsort(-kw[idx])[maximo:]]] = 0.0
+    if np.any(tn > 0):
+        tolerancia = _float(config.get('tolerancia_kw'), TOLERANCIA_KW_DEFAULT)
+        factor = buscar_factor(tn, datos['kw_tn'], datos['stock'], kw_objetivo, tolerancia)['factor']
+        tn = np.minimum(datos['stock'], factor * tn)
+    return tn
+
+
+def optimizar_mezcla_genetica(config: Dict[str, Any], stock_actual: Dict[str, Any],
+                              materiales_base: Optional[Dict[str, Any]] = None,
+                              matriz: Optional[MatrizMateriales] = None,
+                              parametros: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Optimiza la mezcla con un GA vectorizado. Determinístico para una misma
+    `semilla_mezcla` (salvo el corte por tiempo, que puede variar las generaciones).
+    """
+    if not isinstance(config, dict) or not isinstance(stock_actual, dict):
+        raise ValueError("Configuración o stock inválidos")
+    p = {**PARAMETROS_DEFAULT, **(config.get('parametros_geneticos_ga') or {}), **(parametros or {})}
+    inicio = time.perf_counter()
+    rng = np.random.default_rng(int(config.get('semilla_mezcla', 0)))
+
+    datos = preparar_problema(stock_actual, materiales_base, config.get('costos_materiales'), matriz)
+    n = len(datos['nombres'])
+    advertencias: List[str] = []
+    if n == 0:
+        # Sin stock utilizable: mezcla vacía, con el mismo formato que una optimización completa
+        resultado = construir_resultado(datos, np.zeros(0), config, advertencias)
+        resultado['algoritmo_usado'] = 'algoritmo_genetico'
+        resultado['parametros_geneticos'] = {k: p[k] for k in PARAMETROS_DEFAULT}
+        resultado['optimizacion'] = {
+            'solver': 'ga_vectorizado',
+            'generaciones': 0,
+            'evaluaciones': 0,
+            'mejor_costo': round(float(aptitud_lote(np.zeros((1, 0)), construir_problema(datos, config))[0]), 6),
+            'procesos': 1,
+            'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+            'convergencia': [],
+        }
+        return resultado
+
+    kw_objetivo = _float(config.get('kw_objetivo'), 28800.0)
+    problema = construir_problema(datos, config)
+
+    tam = int(p['poblacion'])
+    elite = min(int(p['elite']), tam)
+    prob_mutacion = 1.0 / n
+    procesos = max(1, int(p['procesos'] if p['procesos'] else (os.cpu_count() or 1)))
+    pool = ProcessPoolExecutor(max_workers=procesos) if procesos > 1 and tam >= p['umbral_pool'] else None
+
+    # Población inicial: aleatoria + individuos que escalan todo el stock al objetivo
+    X = rng.random((tam, n))
+    kw_stock = float(datos['stock'] @ datos['kw_tn'])
+    if kw_stock > 0:
+        X[:max(1, tam // 10)] = np.clip(kw_objetivo / kw_stock * rng.uniform(0.8, 1.2, (max(1, tam // 10), 1)), 0, 1)
+
+    traza = []
+    generacion = 0
+    sin_mejora = 0
+    evaluaciones = 0
+    try:
+        costos = _aptitud(X, problema, pool, procesos)
+        evaluaciones += tam
+        mejor_costo = float(costos.min())
+        while generacion < p['generaciones'] and time.perf_counter() - inicio < p['tiempo_max_s']:
+            generacion += 1
+            orden = np.argsort(costos)
+            elites = X[orden[:elite]]
+
+            hijos_necesarios = tam - elite
+            padres = _torneo(costos, int(p['torneo']), hijos_necesarios + (hijos_necesarios % 2), rng)
+            h1, h2 = _sbx(X[padres[0::2]], X[padres[1::2]], p['eta_cruce'], p['prob_cruce'], rng)
+            hijos = _mutacion_polinomial(np.vstack([h1, h2])[:hijos_necesarios], p['eta_mutacion'], prob_mutacion, rng)
+
+            X = np.vstack([elites, hijos])
+            costos = np.concatenate([costos[orden[:elite]], _aptitud(hijos, problema, pool, procesos)])
+            evaluaciones += len(hijos)
+
+            actual = float(costos.min())
+            if actual < mejor_costo - 1e-9:
+                mejor_costo, sin_mejora = actual, 0
+            else:
+                sin_mejora += 1
+            traza.append({
+                'generacion': generacion,
+                'mejor': round(actual, 6),
+                'promedio': round(float(costos.mean()), 6),
+                't_ms': round((time.perf_counter() - inicio) * 1000, 2),
+            })
+            if sin_mejora >= p['estancamiento']:
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    mejor = X[int(np.argmin(costos))]
+    tn = _reparar(datos, config, mejor * datos['stock'], kw_objetivo)
+    resultado = construir_resultado(datos, tn, config, advertencias)
+    resultado['algoritmo_usado'] = 'algoritmo_genetico'
+    resultado['parametros_geneticos'] = {k: p[k] for k in PARAMETROS_DEFAULT}
+    resultado['optimizacion'] = {
+        'solver': 'ga_vectorizado',
+        'generaciones': generacion,
+        'evaluaciones': evaluaciones,
+        'mejor_costo': round(float(costos.min()), 6),
+        'procesos': procesos if pool is not None else 1,
+        'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+        'convergencia': traza,
+    }
+    logger.info(f"🧬 GA vectorizado: {resultado['totales']['kw_total_generado']:.0f} KW, "
+                f"{generacion} generaciones, {evaluaciones} evaluaciones en {resultado['optimizacion']['tiempo_ms']:.0f} ms")
+    return resultado
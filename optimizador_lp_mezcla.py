@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OPTIMIZADOR LP/MILP DE LA MEZCLA DIARIA
+=======================================
+
+Formula la mezcla diaria como un problema de programación lineal (entera
+mixta cuando se limita la cantidad de materiales) y la resuelve por etapas
+lexicográficas:
+
+1. Minimizar la desviación respecto de `kw_objetivo`.
+2. Con la desviación de kW fijada en su óptimo, acercar el reparto de kW
+   entre sólidos/líquidos/purín a los porcentajes configurados. (Fijarla
+   sólo a ± tolerancia hacía que las etapas de costo/toneladas llevaran
+   siempre la mezcla al borde inferior, `kw_objetivo - tolerancia`.)
+3. Con lo anterior fijado (± banda), minimizar el déficit de metano respecto
+   del umbral `objetivo_metano_diario` (promedio ponderado por tn).
+4. Minimizar el costo (o las toneladas si no hay costos cargados).
+
+Con límite de cantidad de materiales se resuelven primero las etapas de la
+relajación LP (sin binarias), que acotan desde abajo las del MILP. Si la
+solución final cumple dosis mínima y cantidad de materiales y cada etapa
+anterior tiene un testigo entero-factible que alcanza su valor, es también el
+óptimo entero y no hace falta el MILP (unas 4-5 LP chicas en lugar de 4 MILP).
+
+Arranque en caliente (`arranque`): una solución previa que sigue siendo
+factible acota desde arriba el óptimo de cada etapa. Como las etapas 1-3
+minimizan desvíos no negativos, si la solución previa ya los tiene en 0 esas
+etapas son óptimas sin resolverlas; la etapa final se resuelve siempre sobre
+todos los materiales, así que el resultado es el mismo que en frío.
+
+Restricciones duras: stock disponible, capacidades diarias por categoría y
+dosis mínima de 0.5 tn por material usado. Usa `scipy.optimize.milp`/`linprog` si está
+disponible; si no, un reparto vectorizado con NumPy.
+
+El resultado tiene la misma estructura que `calcular_mezcla_diaria`.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from matriz_materiales import MatrizMateriales, NOMBRES_TIPO, obtener_matriz
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy.optimize import linprog
+    SCIPY_DISPONIBLE = True
+except ImportError:
+    SCIPY_DISPONIBLE = False
+
+try:
+    from scipy.optimize import milp, LinearConstraint, Bounds
+    MILP_DISPONIBLE = True
+except ImportError:
+    MILP_DISPONIBLE = False
+
+CATEGORIAS = ('solidos', 'liquidos', 'purin')
+DOSIS_MINIMA_TN = 0.5
+CH4_DEFAULT = 65.0
+TOLERANCIA_PROPORCION_DEFAULT = 0.05
+TOLERANCIA_KW_DEFAULT = 50.0
+# Holgura numérica (relativa al objetivo) al fijar la desviación de kW de la etapa 1
+HOLGURA_RELATIVA_KW = 1e-6
+
+
+def _float(valor: Any, default: float = 0.0) -> float:
+    try:
+        return float(valor) if valor not in (None, '') else default
+    except (TypeError, ValueError):
+        return default
+
+
+def preparar_problema(stock_actual: Dict[str, Any], materiales_base: Optional[Dict[str, Any]] = None,
+                      costos: Optional[Dict[str, float]] = None,
+                      matriz: Optional[MatrizMateriales] = None) -> Dict[str, Any]:
+    """
+    Vectores por material (sólo materiales con stock y kW/tn positivos). Las
+    propiedades del catálogo salen de la matriz compilada; los valores medidos
+    en stock.json (kw_tn, st_porcentaje, tipo) tienen prioridad.
+    """
+    matriz = matriz or obtener_matriz(materiales_base or {})
+    costos = costos or {}
+    nombres, categoria, kw_tn, stock, st, ch4, costo = [], [], [], [], [], [], []
+    for nombre, datos in stock_actual.items():
+        if not isinstance(datos, dict):
+            continue
+        i = matriz.indice_de(nombre)
+        tn = _float(datos.get('total_tn'))
+        kw = _float(datos.get('kw_tn')) or (float(matriz.kw_tn[i]) if i is not None else 0.0)
+        if tn <= 0 or kw <= 0:
+            continue
+        tipo = str(datos.get('tipo') or (NOMBRES_TIPO[matriz.tipo[i]] if i is not None else 'solido')).lower()
+        nombres.append(nombre)
+        categoria.append(2 if nombre.lower() == 'purin' else 1 if tipo == 'liquido' else 0)
+        kw_tn.append(kw)
+        stock.append(tn)
+        st.append(_float(datos.get('st_porcentaje')) or (float(matriz.st[i]) * 100 if i is not None else 0.0))
+        ch4.append(float(matriz.ch4_gestion[i]) * 100 if i is not None else _float(datos.get('ch4_porcentaje'), CH4_DEFAULT))
+        costo.append(_float(costos.get(nombre, datos.get('costo_tn')), 0.0))
+    return {
+        'nombres': nombres,
+        'categoria': np.array(categoria, dtype=int),
+        'kw_tn': np.array(kw_tn, dtype=float),
+        'stock': np.array(stock, dtype=float),
+        'st': np.array(st, dtype=float),
+        'ch4': np.array(ch4, dtype=float),
+        'costo': np.array(costo, dtype=float),
+    }
+
+
+def _limites_por_categoria(config: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    """Máximo de sólidos y líquidos según `cantidad_materiales` (misma regla que el greedy)."""
+    cantidad = config.get('cantidad_materiales', '5')
+    if cantidad == 'todos':
+        return None, None
+    try:
+        total = int(cantidad)
+    except (TypeError, ValueError):
+        return 2, 2
+    if total == 5:
+        return 2, 2
+    max_liquidos = max(1, total // 3)
+    return max(1, total - max_liquidos), max_liquidos
+
+
+def _proporciones(config: Dict[str, Any]) -> np.ndarray:
+    proporciones = np.array([
+        _float(config.get('porcentaje_solidos'), 40.0),
+        _float(config.get('porcentaje_liquidos'), 40.0),
+        _float(config.get('porcentaje_purin'), 20.0),
+    ]) / 100.0
+    suma = proporciones.sum()
+    return proporciones / suma if suma > 0 else np.array([0.5, 0.5, 0.0])
+
+
+class _ModeloLP:
+    """Matrices del problema; columnas: x (tn), [y binarias], d+, d-, e+ (3), e- (3), déficit CH4."""
+
+    def __init__(self, datos: Dict[str, Any], config: Dict[str, Any], enteros: bool):
+        n = len(datos['nombres'])
+        self.n = n
+        self.enteros = enteros
+        self.categoria = datos['categoria']
+        self.dosis_minima = np.minimum(DOSIS_MINIMA_TN, datos['stock'])
+        self.limites = _limites_por_categoria(config)
+        self.nv = (2 * n if enteros else n) + 9
+        self.i_dp, self.i_dm, self.i_s = self.nv - 9, self.nv - 8, self.nv - 1
+        self.i_e = np.arange(self.nv - 7, self.nv - 1)
+        kw = datos['kw_tn']
+        cat = datos['categoria']
+        self.kw_objetivo = _float(config.get('kw_objetivo'), 28800.0)
+        umbral = _float(config.get('objetivo_metano_diario', config.get('objetivo_metano')), 65.0)
+
+        filas_ub: List[np.ndarray] = []
+        b_ub: List[float] = []
+
+        def fila() -> np.ndarray:
+            return np.zeros(self.nv)
+
+        # Capacidades físicas diarias por categoría
+        capacidades = [_float(config.get(f'capacidad_max_{c}_tn'), np.inf) for c in CATEGORIAS]
+        for c, cap in enumerate(capacidades):
+            if np.isfinite(cap):
+                r = fila()
+                r[:n] = (cat == c)
+                filas_ub.append(r)
+                b_ub.append(cap)
+
+        # Déficit de metano: sum((umbral - ch4_i) * x_i) - s <= 0
+        r = fila()
+        r[:n] = self.fila_metano = umbral - datos['ch4']
+        r[self.i_s] = -1.0
+        filas_ub.append(r)
+        b_ub.append(0.0)
+
+        # Binarias: dosis mínima y cantidad máxima de materiales por categoría
+        if enteros:
+            for i in range(n):
+                r = fila()
+                r[i], r[n + i] = 1.0, -datos['stock'][i]
+                filas_ub.append(r)
+                b_ub.append(0.0)
+                r = fila()
+                r[i], r[n + i] = -1.0, min(DOSIS_MINIMA_TN, datos['stock'][i])
+                filas_ub.append(r)
+                b_ub.append(0.0)
+            for c, maximo in enumerate(self.limites):
+                if maximo is not None:
+                    r = fila()
+                    r[n:2 * n] = (cat == c)
+                    filas_ub.append(r)
+                    b_ub.append(float(maximo))
+
+        self.A_ub = np.vstack(filas_ub) if filas_ub else np.zeros((0, self.nv))
+        self.b_ub = np.array(b_ub, dtype=float)
+
+        # Balance de kW: sum(kw_i x_i) - d+ + d- = kw_objetivo
+        # Reparto por categoría: sum_c(kw_i x_i) - e+_c + e-_c = kw_objetivo * proporción_c
+        self.A_eq = np.zeros((4, self.nv))
+        self.A_eq[0, :n] = kw
+        self.A_eq[0, self.i_dp] = -1.0
+        self.A_eq[0, self.i_dm] = 1.0
+        for c in range(3):
+            self.A_eq[1 + c, :n] = (cat == c) * kw
+            self.A_eq[1 + c, self.i_e[c]] = -1.0
+            self.A_eq[1 + c, self.i_e[3 + c]] = 1.0
+        self.b_eq = np.concatenate([[self.kw_objetivo], self.kw_objetivo * _proporciones(config)])
+
+        self.lb = np.zeros(self.nv)
+        self.ub = np.full(self.nv, np.inf)
+        self.ub[:n] = datos['stock']
+        if enteros:
+            self.ub[n:2 * n] = 1.0
+        self.integralidad = np.zeros(self.nv)
+        if enteros:
+            self.integralidad[n:2 * n] = 1
+
+    def vector_arranque(self, tn: np.ndarray) -> Optional[np.ndarray]:
+        """Solución `tn` completada con binarias y desvíos, o None si no es factible."""
+        n = self.n
+        x = np.zeros(self.nv)
+        x[:n] = tn
+        if self.enteros:
+            x[n:2 * n] = tn > 0
+        residuo = self.A_eq[:, :n] @ tn - self.b_eq
+        x[self.i_dp], x[self.i_dm] = max(residuo[0], 0.0), max(-residuo[0], 0.0)
+        x[self.i_e[:3]] = np.maximum(residuo[1:], 0.0)
+        x[self.i_e[3:]] = np.maximum(-residuo[1:], 0.0)
+        x[self.i_s] = max(float(self.fila_metano @ tn), 0.0)
+        if np.any(x < self.lb - 1e-9) or np.any(x > self.ub + 1e-9):
+            return None
+        if len(self.b_ub) and np.any(self.A_ub @ x > self.b_ub + 1e-7):
+            return None
+        return x
+
+    def cumple_enteros(self, x: np.ndarray) -> bool:
+        """¿El punto (de la relajación) cumple dosis mínima y cantidad de materiales por categoría?"""
+        tn = x[:self.n]
+        usados = tn > 1e-4  # por debajo, `_limpiar` lo descarta
+        if np.any(tn[usados] < self.dosis_minima[usados] - 1e-7):
+            return False
+        return all(maximo is None or np.count_nonzero(usados & (self.categoria == c)) <= maximo
+                   for c, maximo in enumerate(self.limites))
+
+    def resolver(self, c: np.ndarray, extra_ub: List[Tuple[np.ndarray, float]],
+                 soporte: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Etapa con filas extra; con `soporte`, sólo esos materiales y cada uno con su dosis mínima."""
+        A_ub = np.vstack([self.A_ub] + [f for f, _ in extra_ub]) if extra_ub else self.A_ub
+        b_ub = np.concatenate([self.b_ub, [b for _, b in extra_ub]]) if extra_ub else self.b_ub
+        lb, ub = self.lb, self.ub
+        if soporte is not None:
+            lb, ub = lb.copy(), ub.copy()
+            lb[:self.n] = np.where(soporte, self.dosis_minima, 0.0)
+            ub[:self.n] = np.where(soporte, ub[:self.n], 0.0)
+        if MILP_DISPONIBLE:
+            # Una sola restricción (igualdades + desigualdades): milp convierte cada una a dispersa
+            restriccion = LinearConstraint(np.vstack([self.A_eq, A_ub]),
+                                           np.concatenate([self.b_eq, np.full(len(b_ub), -np.inf)]),
+                                           np.concatenate([self.b_eq, b_ub]))
+            res = milp(c, constraints=restriccion, integrality=self.integralidad,
+                       bounds=Bounds(lb, ub), options={'time_limit': 10})
+        else:
+            res = linprog(c, A_ub=A_ub if len(b_ub) else None, b_ub=b_ub if len(b_ub) else None,
+                          A_eq=self.A_eq, b_eq=self.b_eq, bounds=list(zip(lb, ub)), method='highs')
+        if res.x is None or not res.success:
+            return None
+        return np.asarray(res.x)
+
+
+def _resolver_por_etapas(datos: Dict[str, Any], config: Dict[str, Any], enteros: bool,
+                         arranque: Optional[np.ndarray] = None) -> Tuple[Optional[np.ndarray], List[Dict[str, Any]]]:
+    if enteros and MILP_DISPONIBLE:
+        relajado = _ModeloLP(datos, config, False)
+        x, etapas, pasos = _etapas(relajado, datos, config, arranque)
+        if x is not None and _certifica_entero(relajado, datos, config, pasos, etapas):
+            for etapa in etapas:
+                etapa['relajacion'] = True
+            return _limpiar(datos, config, x, enteros), etapas
+    x, etapas, _ = _etapas(_ModeloLP(datos, config, enteros), datos, config, arranque)
+    return (None if x is None else _limpiar(datos, config, x, enteros)), etapas
+
+
+def _certifica_entero(modelo: _ModeloLP, datos: Dict[str, Any], config: Dict[str, Any],
+                      pasos: List[Dict[str, Any]], etapas: List[Dict[str, Any]]) -> bool:
+    """
+    ¿El óptimo de la relajación es también el del MILP? Cada etapa de la
+    relajación acota desde abajo la del MILP; alcanza con que el punto final
+    cumpla las restricciones enteras y que cada etapa anterior tenga un testigo
+    entero-factible que ya logre su valor: uno de los puntos de etapa o, si no,
+    la misma etapa resuelta sobre el top-k de su punto (`_seleccionar_topk`).
+    """
+    if len(etapas) < 4 or not modelo.cumple_enteros(pasos[-1]['x']):
+        return False
+    holgura = HOLGURA_RELATIVA_KW * max(modelo.kw_objetivo, 1.0)
+    enteros = [paso['x'] for paso in pasos if modelo.cumple_enteros(paso['x'])]
+    for paso, etapa in zip(pasos[:-1], etapas[:-1]):
+        limite = etapa['valor'] + holgura
+        if any(paso['c'] @ x <= limite for x in enteros):
+            continue
+        soporte = _seleccionar_topk(datos, config, paso['x'][:modelo.n]) > 0
+        testigo = modelo.resolver(paso['c'], paso['extra'], soporte)
+        if testigo is None or paso['c'] @ testigo > limite:
+            return False
+        enteros.append(testigo)
+    return True
+
+
+def _etapas(modelo: _ModeloLP, datos: Dict[str, Any], config: Dict[str, Any],
+            arranque: Optional[np.ndarray]) -> Tuple[Optional[np.ndarray], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Etapas lexicográficas sobre `modelo`: (tn, etapas, pasos con el punto, objetivo y filas de cada etapa)."""
+    n = modelo.n
+    etapas, pasos = [], []
+    tol_proporcion = _float(config.get('tolerancia_proporcion'), TOLERANCIA_PROPORCION_DEFAULT)
+    holgura_kw = HOLGURA_RELATIVA_KW * max(modelo.kw_objetivo, 1.0)
+    # Solución previa factible: cota superior de cada etapa (la inferior es 0)
+    x0 = modelo.vector_arranque(arranque) if arranque is not None else None
+
+    # Etapa 1: desviación de kW
+    c = np.zeros(modelo.nv)
+    c[modelo.i_dp] = c[modelo.i_dm] = 1.0
+    if x0 is not None and x0[modelo.i_dp] + x0[modelo.i_dm] <= holgura_kw:
+        x, desviacion = x0, 0.0
+    else:
+        x = modelo.resolver(c, [])
+        if x is None:
+            return None, etapas, pasos
+        desviacion = x[modelo.i_dp] + x[modelo.i_dm]
+    etapas.append({'etapa': 'kw', 'valor': float(desviacion), 'arranque': x is x0})
+    pasos.append({'x': x, 'c': c, 'extra': []})
+    extra = [(c.copy(), desviacion + holgura_kw)]
+
+    # Etapa 2: reparto sólidos/líquidos/purín
+    c = np.zeros(modelo.nv)
+    c[modelo.i_e] = 1.0
+    if x is x0 and x0[modelo.i_e].sum() <= holgura_kw:
+        desvio_reparto = 0.0
+    else:
+        x2 = modelo.resolver(c, extra)
+        if x2 is None:
+            return x[:n], etapas, pasos
+        x = x2
+        desvio_reparto = float(x[modelo.i_e].sum())
+    etapas.append({'etapa': 'reparto', 'valor': desvio_reparto, 'arranque': x is x0})
+    pasos.append({'x': x, 'c': c, 'extra': list(extra)})
+    extra.append((c.copy(), desvio_reparto + tol_proporcion * modelo.kw_objetivo))
+
+    # Etapa 3: déficit de metano
+    c = np.zeros(modelo.nv)
+    c[modelo.i_s] = 1.0
+    x2 = x0 if x is x0 and x0[modelo.i_s] <= 1e-6 else modelo.resolver(c, extra)
+    if x2 is not None:
+        x = x2
+        deficit = 0.0 if x is x0 else float(x[modelo.i_s])
+        etapas.append({'etapa': 'metano', 'valor': deficit, 'arranque': x is x0})
+        pasos.append({'x': x, 'c': c, 'extra': list(extra)})
+        extra.append((c.copy(), deficit * (1 + 1e-6) + 1e-6))
+
+        # Etapa 4: costo (o toneladas si no hay costos cargados)
+        costo = datos['costo'] if np.any(datos['costo'] > 0) else np.ones(n)
+        c = np.zeros(modelo.nv)
+        c[:n] = costo
+        x3 = modelo.resolver(c, extra)
+        if x3 is not None:
+            x = x3
+            etapas.append({'etapa': 'costo' if np.any(datos['costo'] > 0) else 'toneladas',
+                           'valor': float(costo @ x[:n]), 'arranque': False})
+            pasos.append({'x': x, 'c': c, 'extra': list(extra)})
+
+    return x[:n], etapas, pasos
+
+
+def _limpiar(datos: Dict[str, Any], config: Dict[str, Any], tn: np.ndarray, enteros: bool) -> np.ndarray:
+    if enteros and not MILP_DISPONIBLE:
+        tn = _seleccionar_topk(datos, config, tn)
+    return np.where(tn > 1e-4, tn, 0.0)
+
+
+def _seleccionar_topk(datos: Dict[str, Any], config: Dict[str, Any], tn: np.ndarray) -> np.ndarray:
+    """Sin MILP: conserva los k materiales con más kW por categoría (redondeo de la relajación)."""
+    tn = tn.copy()
+    kw = tn * datos['kw_tn']
+    for c, maximo in enumerate(_limites_por_categoria(config)):
+        idx = np.flatnonzero((datos['categoria'] == c) & (tn > 0))
+        if maximo is not None and len(idx) > maximo:
+            descartar = idx[np.argsort(-kw[idx])[maximo:]]
+            tn[descartar] = 0.0
+    tn[(tn > 0) & (tn < DOSIS_MINIMA_TN)] = 0.0
+    return tn
+
+
+def resolver_numpy(datos: Dict[str, Any], config: Dict[str, Any]) -> np.ndarray:
+    """
+    Reparto vectorizado sin solver: cada categoría cubre su cuota de kW con
+    los materiales de mayor CH4 (y luego kW/tn) hasta agotar stock/capacidad.
+    """
+    kw_objetivo = _float(config.get('kw_objetivo'), 28800.0)
+    proporciones = _proporciones(config)
+    limites = _limites_por_categoria(config) + (None,)
+    tn = np.zeros(len(datos['nombres']))
+    for c, proporcion in enumerate(proporciones):
+        idx = np.flatnonzero(datos['categoria'] == c)
+        if proporcion <= 0 or not len(idx):
+            continue
+        orden = idx[np.lexsort((-datos['kw_tn'][idx], -datos['ch4'][idx]))]
+        if limites[c] is not None:
+            orden = orden[:limites[c]]
+        capacidad = _float(config.get(f'capacidad_max_{CATEGORIAS[c]}_tn'), np.inf)
+        tn_max = np.minimum(datos['stock'][orden], capacidad)
+        kw_max = tn_max * datos['kw_tn'][orden]
+        acumulado = np.concatenate([[0.0], np.cumsum(kw_max)[:-1]])
+        kw_asignado = np.clip(kw_objetivo * proporcion - acumulado, 0.0, kw_max)
+        tn_cat = kw_asignado / datos['kw_tn'][orden]
+        # Respetar capacidad diaria acumulada de la categoría
+        tn_cat = np.clip(capacidad - np.concatenate([[0.0], np.cumsum(tn_cat)[:-1]]), 0.0, tn_cat)
+        tn[orden] = tn_cat
+    tn[(tn > 0) & (tn < DOSIS_MINIMA_TN)] = np.minimum(DOSIS_MINIMA_TN, datos['stock'][(tn > 0) & (tn < DOSIS_MINIMA_TN)])
+    return tn
+
+
+def construir_resultado(datos: Dict[str, Any], tn: np.ndarray, config: Dict[str, Any],
+                        advertencias: List[str]) -> Dict[str, Any]:
+    """Arma el diccionario con el formato de `calcular_mezcla_diaria`."""
+    grupos = {c: {} for c in CATEGORIAS}
+    kw = tn * datos['kw_tn']
+    for i in np.flatnonzero(tn > 0):
+        st_pct = float(datos['st'][i])
+        grupos[CATEGORIAS[datos['categoria'][i]]][datos['nombres'][i]] = {
+            'cantidad_tn': float(tn[i]),
+            'tn_usadas': float(tn[i]),
+            'st_usado': st_pct / 100.0,
+            'kw_aportados': float(kw[i]),
+            'st_porcentaje': st_pct,
+            'ch4_porcentaje': float(datos['ch4'][i]),
+        }
+
+    def suma(valores: np.ndarray, c: int) -> float:
+        return float(valores[datos['categoria'] == c].sum()) if len(valores) else 0.0
+
+    def st_promedio(c: Optional[int] = None) -> float:
+        usados = (tn > 0) if c is None else (tn > 0) & (datos['categoria'] == c)
+        return float(datos['st'][usados].mean()) if np.any(usados) else 0.0
+
+    tn_total = float(tn.sum())
+    porcentaje_metano = float(min(70.0, (datos['ch4'] @ tn) / tn_total)) if tn_total > 0 else 0.0
+    kw_objetivo = _float(config.get('kw_objetivo'), 28800.0)
+    kw_total = float(kw.sum())
+    if kw_total < kw_objetivo - _float(config.get('tolerancia_kw'), TOLERANCIA_KW_DEFAULT):
+        advertencias.append(f"⚠️ Stock insuficiente: se generan {kw_total:.0f} KW de {kw_objetivo:.0f} KW objetivo")
+
+    return {
+        'totales': {
+            'kw_total_generado': kw_total,
+            'kw_liquidos': suma(kw, 1),
+            'kw_solidos': suma(kw, 0),
+            'kw_purin': suma(kw, 2),
+            'st_promedio_liquidos': st_promedio(1),
+            'st_promedio_solidos': st_promedio(0),
+            'st_promedio_purin': st_promedio(2),
+            'st_promedio_total': st_promedio(),
+            'tn_total': tn_total,
+            'tn_liquidos': suma(tn, 1),
+            'tn_solidos': suma(tn, 0),
+            'tn_purin': suma(tn, 2),
+            'porcentaje_metano': porcentaje_metano,
+            'metano_total': porcentaje_metano,
+        },
+        'materiales_liquidos': grupos['liquidos'],
+        'materiales_solidos': grupos['solidos'],
+        'materiales_purin': grupos['purin'],
+        'advertencias': advertencias,
+        'parametros_usados': {},
+        'kw_objetivo': kw_objetivo,
+        'metano_objetivo': config.get('metano_objetivo', 65),
+    }
+
+
+def optimizar_mezcla_lp(config: Dict[str, Any], stock_actual: Dict[str, Any],
+                        materiales_base: Optional[Dict[str, Any]] = None,
+                        matriz: Optional[MatrizMateriales] = None,
+                        arranque: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Mezcla diaria óptima por programación lineal (entera mixta si hay límite
+    de cantidad de materiales). Determinística: misma entrada, misma salida.
+    `arranque` ({material: tn}, p. ej. la solución anterior) sólo evita
+    resolver las etapas que esa solución ya deja en su óptimo.
+    """
+    if not isinstance(config, dict) or not isinstance(stock_actual, dict):
+        raise ValueError("Configuración o stock inválidos")
+    inicio = time.perf_counter()
+    datos = preparar_problema(stock_actual, materiales_base, config.get('costos_materiales'), matriz)
+    advertencias: List[str] = []
+    etapas: List[Dict[str, Any]] = []
+    enteros = any(m is not None for m in _limites_por_categoria(config))
+
+    if not datos['nombres']:
+        tn = np.zeros(0)
+        solver = 'sin_materiales'
+    elif SCIPY_DISPONIBLE:
+        solver = 'milp' if MILP_DISPONIBLE else 'linprog'
+        tn0 = np.array([_float(arranque.get(nombre)) for nombre in datos['nombres']]) if arranque else None
+        tn, etapas = _resolver_por_etapas(datos, config, enteros, tn0)
+        if tn is None:
+            advertencias.append("⚠️ Problema LP infactible; se usó el reparto vectorizado")
+            solver = 'numpy'
+            tn = resolver_numpy(datos, config)
+    else:
+        solver = 'numpy'
+        tn = resolver_numpy(datos, config)
+
+    resultado = construir_resultado(datos, tn, config, advertencias)
+    umbral = _float(config.get('objetivo_metano_diario', config.get('objetivo_metano')), 65.0)
+    if resultado['totales']['tn_total'] > 0 and resultado['totales']['porcentaje_metano'] < umbral - 0.05:
+        advertencias.append(f"⚠️ Metano {resultado['totales']['porcentaje_metano']:.1f}% por debajo del umbral {umbral:.1f}% con el stock disponible")
+    resultado['algoritmo_usado'] = 'programacion_lineal'
+    resultado['optimizacion'] = {
+        'solver': solver,
+        'entero_mixto': bool(enteros and MILP_DISPONIBLE),
+        'relajacion_exacta': bool(etapas) and all(etapa.get('relajacion') for etapa in etapas),
+        'etapas': etapas,
+        'variables': len(datos['nombres']),
+        'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+    }
+    logger.info(f"📐 Mezcla LP ({solver}): {resultado['totales']['kw_total_generado']:.0f} KW, "
+                f"CH4 {resultado['totales']['porcentaje_metano']:.1f}% en {resultado['optimizacion']['tiempo_ms']:.1f} ms")
+    return resultado
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FRENTE DE PARETO DE LA MEZCLA (NSGA-II)
+=======================================
+
+En lugar de un puntaje híbrido fijo (0.6 metano + 0.4 kW) se calcula el
+frente de Pareto completo de mezclas factibles sobre cuatro objetivos:
+
+- desvío de kW respecto del objetivo, |kW − kw_objetivo| (minimizar; con
+  "maximizar kW" el frente se amontonaba en el borde superior de la banda)
+- % de metano ponderado por tn (maximizar)
+- autonomía de stock en días: stock / consumo diario del material más
+  exigido (maximizar)
+- costo (minimizar; toneladas totales si no hay costos cargados)
+
+La factibilidad (banda ± `banda_kw` del objetivo de kW, umbral de metano
+`objetivo_metano_diario`, capacidades diarias, cantidad de materiales por
+categoría) se maneja con dominancia restringida: una mezcla factible
+domina a cualquier infactible. Ordenamiento no dominado y distancia de
+crowding vectorizados con NumPy; los operadores (SBX, mutación polinomial)
+son los del algoritmo genético. La población inicial incluye la mezcla del
+LP por etapas (y el reparto vectorizado), que ya cumple banda y metano
+cuando el stock lo permite: sin esa semilla, con stock escaso o capacidades
+limitadas el frente podía quedar sin puntos factibles.
+
+Con el frente calculado (y cacheado por huella) la interfaz elige cualquier
+ponderación con `seleccionar_del_frente` sin volver a optimizar.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from matriz_materiales import MatrizMateriales
+from optimizador_genetico import _mutacion_polinomial, _sbx, construir_problema
+from optimizador_lp_mezcla import (
+    DOSIS_MINIMA_TN, SCIPY_DISPONIBLE, _float, _limites_por_categoria, _resolver_por_etapas,
+    construir_resultado, preparar_problema, resolver_numpy,
+)
+
+logger = logging.getLogger(__name__)
+
+PARAMETROS_DEFAULT = {
+    'poblacion': 100,
+    'generaciones': 150,
+    'tiempo_max_s': 3.0,
+    'eta_cruce': 15.0,
+    'eta_mutacion': 20.0,
+    'prob_cruce': 0.9,
+    'banda_kw': 0.10,
+}
+
+OBJETIVOS = ('desvio_kw', 'porcentaje_metano', 'autonomia_dias', 'costo')
+# +1 maximizar, -1 minimizar
+SENTIDOS = np.array([-1.0, 1.0, 1.0, -1.0])
+AUTONOMIA_MAX_DIAS = 365.0
+
+
+def evaluar_lote(X: np.ndarray, datos: Dict[str, Any], problema: Dict[str, Any], banda_kw: float):
+    """
+    Objetivos (k×4, en unidades reales), violación de restricciones (k) y kW
+    total (k) de cada fila de X (fracciones de stock).
+    """
+    tn = X * datos['stock']
+    tn = np.where(tn >= DOSIS_MINIMA_TN, tn, 0.0)
+    kw = tn @ datos['kw_tn']
+    tn_total = tn.sum(axis=1)
+    ch4 = np.where(tn_total > 0, tn @ datos['ch4'] / np.where(tn_total > 0, tn_total, 1.0), 0.0)
+    with np.errstate(divide='ignore'):
+        autonomia = np.min(np.where(tn > 0, datos['stock'] / np.where(tn > 0, tn, 1.0), np.inf), axis=1)
+    autonomia = np.minimum(autonomia, AUTONOMIA_MAX_DIAS)
+    costo = tn @ datos['costo'] if np.any(datos['costo'] > 0) else tn_total
+    objetivo = problema['kw_objetivo']
+    F = np.column_stack([np.abs(kw - objetivo), ch4, autonomia, costo])
+
+    violacion = np.maximum(0.0, np.abs(kw - objetivo) / objetivo - banda_kw)
+    # Igual que en el GA: el déficit de metano respecto del umbral es una restricción
+    umbral_metano = problema['umbral_metano']
+    if umbral_metano > 0:
+        violacion += np.maximum(0.0, umbral_metano - ch4) / umbral_metano
+    for c in range(3):
+        en_categoria = datos['categoria'] == c
+        capacidad = problema['capacidades'][c]
+        if np.isfinite(capacidad):
+            violacion += np.maximum(0.0, tn[:, en_categoria].sum(axis=1) - capacidad) / max(capacidad, 1.0)
+        maximo = problema['max_por_categoria'][c]
+        if maximo is not None:
+            violacion += 0.1 * np.maximum(0, (tn[:, en_categoria] > 0).sum(axis=1) - maximo)
+    return F, violacion, kw
+
+
+def semillas(datos: Dict[str, Any], config: Dict[str, Any]) -> np.ndarray:
+    """Individuos iniciales (fracciones de stock) del LP por etapas y del reparto vectorizado."""
+    soluciones = [resolver_numpy(datos, config)]
+    if SCIPY_DISPONIBLE:
+        try:
+            tn_lp, _ = _resolver_por_etapas(datos, config, any(m is not None for m in _limites_por_categoria(config)))
+            if tn_lp is not None:
+                soluciones.insert(0, tn_lp)
+        except Exception as e:
+            logger.warning(f"No se pudo sembrar el frente con el LP: {e}")
+    stock = datos['stock']
+    return np.array([np.clip(np.divide(tn, stock, out=np.zeros_like(stock), where=stock > 0), 0.0, 1.0)
+                     for tn in soluciones])
+
+
+def ordenamiento_no_dominado(F: np.ndarray, violacion: np.ndarray) -> np.ndarray:
+    """Rango de frente (0 = no dominado) con dominancia restringida; F en forma a minimizar."""
+    menor_igual = np.all(F[:, None, :] <= F[None, :, :], axis=2)
+    menor = np.any(F[:, None, :] < F[None, :, :], axis=2)
+    factible = violacion <= 0
+    domina = (factible[:, None] & factible[None, :] & menor_igual & menor) \
+        | (violacion[:, None] < violacion[None, :]) & ~factible[None, :]
+    dominado_por = domina.sum(axis=0)
+    rango = np.full(len(F), -1)
+    frente = 0
+    actuales = np.flatnonzero(dominado_por == 0)
+    while len(actuales):
+        rango[actuales] = frente
+        dominado_por = dominado_por - domina[actuales].sum(axis=0)
+        dominado_por[rango >= 0] = -1
+        actuales = np.flatnonzero(dominado_por == 0)
+        frente += 1
+    return rango
+
+
+def distancia_crowding(F: np.ndarray, rango: np.ndarray) -> np.ndarray:
+    distancia = np.zeros(len(F))
+    for r in np.unique(rango):
+        idx = np.flatnonzero(rango == r)
+        if len(idx) <= 2:
+            distancia[idx] = np.inf
+            continue
+        for m in range(F.shape[1]):
+            orden = idx[np.argsort(F[idx, m])]
+            extension = F[orden[-1], m] - F[orden[0], m]
+            distancia[orden[[0, -1]]] = np.inf
+            if extension > 0:
+                distancia[orden[1:-1]] += (F[orden[2:], m] - F[orden[:-2], m]) / extension
+    return distancia
+
+
+def _torneo_binario(rango: np.ndarray, crowding: np.ndarray, cantidad: int, rng: np.random.Generator) -> np.ndarray:
+    a, b = rng.integers(0, len(rango), size=(2, cantidad))
+    gana_a = (rango[a] < rango[b]) | ((rango[a] == rango[b]) & (crowding[a] >= crowding[b]))
+    return np.where(gana_a, a, b)
+
+
+def seleccionar_del_frente(frente: List[Dict[str, Any]], pesos: Optional[Dict[str, float]] = None) -> int:
+    """
+    Índice del punto del frente que maximiza la suma ponderada de objetivos
+    normalizados a [0, 1] (pesos por nombre de objetivo; por defecto iguales).
+    """
+    if not frente:
+        raise ValueError("Frente vacío")
+    pesos = pesos or {}
+    w = np.array([_float(pesos.get(o), 1.0) for o in OBJETIVOS])
+    F = np.array([[p[o] for o in OBJETIVOS] for p in frente]) * SENTIDOS
+    rango = F.max(axis=0) - F.min(axis=0)
+    normalizado = np.divide(F - F.min(axis=0), rango, out=np.zeros_like(F), where=rango > 0)
+    return int(np.argmax(normalizado @ w))
+
+
+def optimizar_frente_pareto(config: Dict[str, Any], stock_actual: Dict[str, Any],
+                            materiales_base: Optional[Dict[str, Any]] = None,
+                            matriz: Optional[MatrizMateriales] = None,
+                            parametros: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Ejecuta NSGA-II y devuelve la mezcla elegida con pesos iguales (estructura
+    de `calcular_mezcla_diaria`) más `frente_pareto`: lista de puntos
+    factibles no dominados con sus objetivos y cantidades por material.
+    """
+    if not isinstance(config, dict) or not isinstance(stock_actual, dict):
+        raise ValueError("Configuración o stock inválidos")
+    p = {**PARAMETROS_DEFAULT, **(config.get('parametros_pareto') or {}), **(parametros or {})}
+    inicio = time.perf_counter()
+    rng = np.random.default_rng(int(config.get('semilla_mezcla', 0)))
+
+    datos = preparar_problema(stock_actual, materiales_base, config.get('costos_materiales'), matriz)
+    n = len(datos['nombres'])
+    if n == 0:
+        resultado = construir_resultado(datos, np.zeros(0), config, [])
+        resultado.update({'algoritmo_usado': 'pareto_nsga2', 'frente_pareto': []})
+        return resultado
+    problema = construir_problema(datos, config)
+    banda = float(p['banda_kw'])
+    tam = int(p['poblacion'])
+
+    # Población inicial alrededor del objetivo de kW
+    kw_stock = float(datos['stock'] @ datos['kw_tn'])
+    escala = min(1.0, 2 * problema['kw_objetivo'] / kw_stock) if kw_stock > 0 else 1.0
+    X = rng.random((tam, n)) * escala
+    X0 = semillas(datos, config)[:tam]
+    X[:len(X0)] = X0
+    F, V, KW = evaluar_lote(X, datos, problema, banda)
+
+    generacion = 0
+    while generacion < p['generaciones'] and time.perf_counter() - inicio < p['tiempo_max_s']:
+        generacion += 1
+        rango = ordenamiento_no_dominado(-F * SENTIDOS, V)
+        crowding = distancia_crowding(-F * SENTIDOS, rango)
+        padres = _torneo_binario(rango, crowding, tam + tam % 2, rng)
+        h1, h2 = _sbx(X[padres[0::2]], X[padres[1::2]], p['eta_cruce'], p['prob_cruce'], rng)
+        hijos = _mutacion_polinomial(np.vstack([h1, h2])[:tam], p['eta_mutacion'], 1.0 / n, rng)
+        Fh, Vh, KWh = evaluar_lote(hijos, datos, problema, banda)
+
+        # Selección ambiental (μ + λ): por frente y, en el último, por crowding
+        X, F, V, KW = np.vstack([X, hijos]), np.vstack([F, Fh]), np.concatenate([V, Vh]), np.concatenate([KW, KWh])
+        rango = ordenamiento_no_dominado(-F * SENTIDOS, V)
+        crowding = distancia_crowding(-F * SENTIDOS, rango)
+        elegidos = np.lexsort((-crowding, rango))[:tam]
+        X, F, V, KW = X[elegidos], F[elegidos], V[elegidos], KW[elegidos]
+
+    rango = ordenamiento_no_dominado(-F * SENTIDOS, V)
+    idx = np.flatnonzero((rango == 0) & (V <= 0))
+    # Quitar duplicados (mismos objetivos) y ordenar por desvío de kW
+    _, unicos = np.unique(F[idx].round(6), axis=0, return_index=True)
+    idx = idx[unicos][np.argsort(F[idx[unicos], 0])]
+
+    frente = []
+    for k, i in enumerate(idx):
+        tn = np.where(X[i] * datos['stock'] >= DOSIS_MINIMA_TN, X[i] * datos['stock'], 0.0)
+        frente.append({
+            'id': k,
+            **{o: round(float(F[i, j]), 4) for j, o in enumerate(OBJETIVOS)},
+            'kw_total': round(float(KW[i]), 4),
+            'tn_total': round(float(tn.sum()), 4),
+            'materiales': {datos['nombres'][j]: round(float(tn[j]), 4) for j in np.flatnonzero(tn)},
+        })
+
+    advertencias = []
+    if frente:
+        elegido = seleccionar_del_frente(frente)
+        tn = np.array([frente[elegido]['materiales'].get(nombre, 0.0) for nombre in datos['nombres']])
+    else:
+        elegido = None
+        tn = np.where(X[int(np.argmin(V))] * datos['stock'] >= DOSIS_MINIMA_TN, X[int(np.argmin(V))] * datos['stock'], 0.0)
+        advertencias.append(f"⚠️ Sin mezclas factibles dentro de ±{banda * 100:.0f}% del objetivo de KW "
+                            f"y con metano ≥ {problema['umbral_metano']:.0f}%; se muestra la menos infactible")
+    resultado = construir_resultado(datos, tn, config, advertencias)
+    resultado['algoritmo_usado'] = 'pareto_nsga2'
+    resultado['frente_pareto'] = frente
+    resultado['seleccion_pareto'] = elegido
+    resultado['optimizacion'] = {
+        'solver': 'nsga2',
+        'generaciones': generacion,
+        'evaluaciones': tam * (generacion + 1),
+        'puntos_frente': len(frente),
+        'objetivos': list(OBJETIVOS),
+        'banda_kw': banda,
+        'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+    }
+    logger.info(f"📈 NSGA-II: {len(frente)} puntos en el frente de Pareto, {generacion} generaciones "
+                f"en {resultado['optimizacion']['tiempo_ms']:.0f} ms")
+    return resultado
@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PLANIFICADOR SEMANAL DE ALIMENTACIÓN (HORIZONTE RODANTE)
+========================================================
+
+Resuelve los 7 días juntos en un único LP con balance de inventario:
+
+    Σ_{t≤d} x[t, i]  ≤  stock_i + Σ_{t≤d} entregas[t, i]     ∀ d, i
+
+donde x[d, i] son las tn del material i el día d. Cada día tiene, como la
+mezcla diaria LP, desvío de kW, desvío del reparto sólidos/líquidos/purín y
+déficit de metano; el objetivo los pondera en ese orden de prioridad. Las
+entregas programadas (`entregas_programadas` en la configuración) entran el
+día de su fecha.
+
+Con límite de materiales por categoría (`cantidad_materiales`) la vista
+interactiva no corre el MILP: resuelve la relajación LP, conserva por día
+los k materiales con más kW de cada categoría y vuelve a resolver el LP
+sólo con ésos (un LP por día, decenas de ms). El MILP exacto corre después
+en un hilo y reemplaza el plan guardado si cubre más kW (o directamente en
+el request con `exacto=True`), con un tope de tiempo más corto.
+
+Horizonte rodante: el planificador guarda el último plan. Si la misma
+configuración se vuelve a pedir con el mismo stock, devuelve el plan
+guardado; si el stock cambió (llegaron los reales del día) o el horizonte
+avanzó, primero intenta reutilizar los días ya planificados que siguen
+siendo factibles con el inventario nuevo y resuelve sólo los días que
+faltan. Si el plan previo dejó de ser factible, resuelve la semana completa.
+Con `archivo` el último plan se guarda en disco bajo bloqueo, así todos los
+workers de gunicorn comparten el mismo plan y sólo uno lo calcula.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bloqueo_archivo import bloqueo_archivo
+from cache_mezclas import huella_mezcla
+from matriz_materiales import MatrizMateriales
+from optimizador_lp_mezcla import (
+    CATEGORIAS, DOSIS_MINIMA_TN, MILP_DISPONIBLE, SCIPY_DISPONIBLE, _float, _limites_por_categoria, _proporciones,
+    _seleccionar_topk, construir_resultado, preparar_problema, resolver_numpy,
+)
+
+logger = logging.getLogger(__name__)
+
+if SCIPY_DISPONIBLE:
+    from scipy import sparse
+    from scipy.optimize import linprog
+if MILP_DISPONIBLE:
+    from scipy.optimize import Bounds, LinearConstraint, milp
+
+HORIZONTE_DEFAULT = 7
+TIEMPO_MAX_MILP_S = 1
+GAP_MILP = 0.005
+DIAS_SEMANA = ('Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo')
+
+# Pesos del objetivo: kW >> reparto > metano >> toneladas
+PESO_FALTANTE_KW = 1000.0
+PESO_EXCESO_KW = 500.0
+PESO_REPARTO = 1.0
+PESO_METANO = 1.0
+PESO_TONELADAS = 1e-3
+
+
+def _fecha(valor: Any) -> Optional[date]:
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def matriz_entregas(entregas: List[Dict[str, Any]], nombres: List[str], fecha_inicio: date,
+                    horizonte: int) -> np.ndarray:
+    """Entregas programadas [{fecha, material, tn}] como matriz días × materiales."""
+    indice = {nombre.lower(): i for i, nombre in enumerate(nombres)}
+    E = np.zeros((horizonte, len(nombres)))
+    for entrega in entregas or []:
+        fecha = _fecha(entrega.get('fecha'))
+        i = indice.get(str(entrega.get('material', '')).lower())
+        if fecha is None or i is None:
+            continue
+        d = (fecha - fecha_inicio).days
+        if 0 <= d < horizonte:
+            E[d, i] += _float(entrega.get('tn'))
+    return E
+
+
+def _stock_con_entregas(stock_actual: Dict[str, Any], entregas: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Incluye en el problema los materiales sin stock que llegan durante el horizonte."""
+    stock = dict(stock_actual)
+    for entrega in entregas or []:
+        material = entrega.get('material')
+        if material and _float(stock.get(material, {}).get('total_tn')) <= 0:
+            stock[material] = {**stock.get(material, {}), 'total_tn': _float(entrega.get('tn'))}
+    return stock
+
+
+def _inventario_factible(X: np.ndarray, stock0: np.ndarray, E: np.ndarray) -> bool:
+    return bool(np.all(np.cumsum(X, axis=0) <= stock0 + np.cumsum(E, axis=0) + 1e-6))
+
+
+def _alinear(X: np.ndarray, nombres_previos: List[str], nombres: List[str]) -> Optional[np.ndarray]:
+    """
+    Reordena las columnas de un plan previo a los materiales actuales. None si
+    el plan usa materiales que ya no están en el problema.
+    """
+    indice = {nombre: i for i, nombre in enumerate(nombres)}
+    alineado = np.zeros((X.shape[0], len(nombres)))
+    for j, nombre in enumerate(nombres_previos):
+        if nombre in indice:
+            alineado[:, indice[nombre]] = X[:, j]
+        elif np.any(X[:, j] > 1e-6):
+            return None
+    return alineado
+
+
+def resolver_horizonte(datos: Dict[str, Any], config: Dict[str, Any], stock0: np.ndarray,
+                       E: np.ndarray, enteros: bool = False,
+                       permitidos: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """
+    LP multiperíodo (MILP con binarias por día y material si `enteros`:
+    dosis mínima y cantidad máxima de materiales por categoría). `permitidos`
+    (días × materiales, bool) fija en 0 las cantidades no permitidas. Devuelve
+    X (días × materiales) o None si el solver falla.
+    """
+    D, n = E.shape
+    nb = n if enteros else 0
+    m = n + nb + 9  # por día: x (n), [y (n)], d+, d-, e+ (3), e- (3), déficit CH4
+    a = n + nb      # primera columna auxiliar
+    kw, cat, ch4 = datos['kw_tn'], datos['categoria'], datos['ch4']
+    kw_objetivo = _float(config.get('kw_objetivo'), 28800.0)
+    umbral = _float(config.get('objetivo_metano_diario', config.get('objetivo_metano')), 65.0)
+    tope_x = stock0 + E.sum(axis=0)
+
+    # Bloque diario de igualdades: balance de kW y reparto por categoría
+    bloque_eq = np.zeros((4, m))
+    bloque_eq[0, :n] = kw
+    bloque_eq[0, a], bloque_eq[0, a + 1] = -1.0, 1.0
+    for c in range(3):
+        bloque_eq[1 + c, :n] = (cat == c) * kw
+        bloque_eq[1 + c, a + 2 + c] = -1.0
+        bloque_eq[1 + c, a + 5 + c] = 1.0
+    b_eq_dia = np.concatenate([[kw_objetivo], kw_objetivo * _proporciones(config)])
+
+    # Bloque diario de desigualdades: capacidades, déficit de metano y binarias
+    filas, b_dia = [], []
+    for c, nombre in enumerate(CATEGORIAS):
+        capacidad = _float(config.get(f'capacidad_max_{nombre}_tn'), np.inf)
+        if np.isfinite(capacidad):
+            fila = np.zeros(m)
+            fila[:n] = (cat == c)
+            filas.append(fila)
+            b_dia.append(capacidad)
+    fila = np.zeros(m)
+    fila[:n] = umbral - ch4
+    fila[a + 8] = -1.0
+    filas.append(fila)
+    b_dia.append(0.0)
+    if enteros:
+        for i in range(n):
+            fila = np.zeros(m)
+            fila[i], fila[n + i] = 1.0, -tope_x[i]
+            filas.append(fila)
+            b_dia.append(0.0)
+            fila = np.zeros(m)
+            fila[i], fila[n + i] = -1.0, min(DOSIS_MINIMA_TN, tope_x[i])
+            filas.append(fila)
+            b_dia.append(0.0)
+        for c, maximo in enumerate(_limites_por_categoria(config)):
+            if maximo is not None:
+                fila = np.zeros(m)
+                fila[n:2 * n] = (cat == c)
+                filas.append(fila)
+                b_dia.append(float(maximo))
+    bloque_ub = np.vstack(filas)
+
+    identidad_dias = sparse.identity(D, format='csr')
+    A_eq = sparse.kron(identidad_dias, sparse.csr_matrix(bloque_eq), format='csr')
+    b_eq = np.tile(b_eq_dia, D)
+
+    # Balance de inventario acumulado: tril(1) ⊗ [I_n 0]
+    seleccion_x = sparse.hstack([sparse.identity(n), sparse.csr_matrix((n, m - n))])
+    A_inv = sparse.kron(sparse.csr_matrix(np.tril(np.ones((D, D)))), seleccion_x, format='csr')
+    b_inv = (stock0 + np.cumsum(E, axis=0)).ravel()
+    A_ub = sparse.vstack([sparse.kron(identidad_dias, sparse.csr_matrix(bloque_ub)), A_inv], format='csr')
+    b_ub = np.concatenate([np.tile(b_dia, D), b_inv])
+
+    costo_dia = np.zeros(m)
+    costo_dia[:n] = PESO_TONELADAS
+    costo_dia[a], costo_dia[a + 1] = PESO_EXCESO_KW, PESO_FALTANTE_KW
+    costo_dia[a + 2:a + 8] = PESO_REPARTO
+    costo_dia[a + 8] = PESO_METANO
+    # Desempate temporal: ante igual faltante, preferir cubrir los primeros días
+    c = np.concatenate([costo_dia * (1 + 1e-3 * (D - d)) for d in range(D)])
+
+    superior = np.concatenate([tope_x, np.ones(nb), np.full(9, np.inf)])
+    superiores = np.tile(superior, (D, 1))
+    if permitidos is not None:
+        superiores[:, :n] *= permitidos
+    cotas = np.column_stack([np.zeros(D * m), superiores.ravel()])
+    if enteros:
+        integralidad = np.tile(np.concatenate([np.zeros(n), np.ones(n), np.zeros(9)]), D)
+        res = milp(c, constraints=[LinearConstraint(A_eq, b_eq, b_eq), LinearConstraint(A_ub, -np.inf, b_ub)],
+                   integrality=integralidad, bounds=Bounds(cotas[:, 0], cotas[:, 1]),
+                   options={'time_limit': TIEMPO_MAX_MILP_S, 'mip_rel_gap': GAP_MILP})
+    else:
+        res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=cotas, method='highs')
+    if res.x is None:
+        return None
+    return res.x.reshape(D, m)[:, :n]
+
+
+def _resolver_secuencial(datos: Dict[str, Any], config: Dict[str, Any], stock0: np.ndarray,
+                         E: np.ndarray) -> np.ndarray:
+    """Sin scipy: reparto vectorizado día a día acoplado por el inventario restante."""
+    inventario = stock0.copy()
+    X = np.zeros_like(E)
+    for d in range(E.shape[0]):
+        inventario += E[d]
+        X[d] = np.minimum(resolver_numpy({**datos, 'stock': inventario.copy()}, config), inventario)
+        inventario -= X[d]
+    return X
+
+
+def _faltante_kw(datos: Dict[str, Any], config: Dict[str, Any], X: np.ndarray) -> float:
+    """kW que faltan para el objetivo, sumados sobre los días del plan."""
+    kw_objetivo = _float(config.get('kw_objetivo'), 28800.0)
+    return float(np.maximum(kw_objetivo - X @ datos['kw_tn'], 0.0).sum())
+
+
+def _resolver_relajado(datos: Dict[str, Any], config: Dict[str, Any], stock0: np.ndarray,
+                       E: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Redondeo de la relajación LP día por día: fija en el día d los k
+    materiales con más kW de cada categoría y vuelve a resolver la relajación
+    de los días siguientes, que así pueden usar el inventario que los
+    descartados dejan libre. Una resolución por día más la final.
+    """
+    permitidos = np.ones(E.shape, dtype=bool)
+    X = None
+    for d in range(E.shape[0]):
+        X = resolver_horizonte(datos, config, stock0, E, permitidos=permitidos)
+        if X is None:
+            return None
+        permitidos[d] = _seleccionar_topk(datos, config, X[d]) > 0
+    final = resolver_horizonte(datos, config, stock0, E, permitidos=permitidos)
+    return final if final is not None else X * permitidos
+
+
+def planificar_horizonte(datos: Dict[str, Any], config: Dict[str, Any], stock0: np.ndarray,
+                         E: np.ndarray, exacto: bool = False) -> Dict[str, Any]:
+    """
+    Plan de todos los días del horizonte (una sola resolución conjunta). Con
+    límite de materiales usa el MILP sólo si `exacto`; si no, la relajación
+    LP redondeada a los k mejores por categoría.
+    """
+    if not SCIPY_DISPONIBLE:
+        return {'X': _resolver_secuencial(datos, config, stock0, E), 'solver': 'numpy'}
+    con_limite = any(m is not None for m in _limites_por_categoria(config))
+    if con_limite and exacto and MILP_DISPONIBLE:
+        X, solver = resolver_horizonte(datos, config, stock0, E, enteros=True), 'milp'
+    elif con_limite:
+        X, solver = _resolver_relajado(datos, config, stock0, E), 'linprog_topk'
+    else:
+        X, solver = resolver_horizonte(datos, config, stock0, E), 'linprog'
+    if X is None:
+        return {'X': _resolver_secuencial(datos, config, stock0, E), 'solver': 'numpy'}
+    return {'X': np.where(X >= DOSIS_MINIMA_TN - 1e-6, X, 0.0), 'solver': solver}
+
+
+def _a_json(valor: Any) -> Any:
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return str(valor)
+
+
+class PlanificadorSemanal:
+    """
+    Plan semanal conjunto con reutilización incremental del plan anterior.
+
+    Args:
+        archivo: JSON donde se comparte el último plan entre procesos (None = sólo en memoria).
+        exacto: resolver el límite de materiales con MILP en vez de la relajación redondeada.
+        refinar: con la relajación redondeada, correr además el MILP en un hilo
+            y reemplazar el plan guardado si cubre más kW.
+    """
+
+    def __init__(self, horizonte: int = HORIZONTE_DEFAULT, archivo: Optional[str] = None, exacto: bool = False,
+                 refinar: bool = True):
+        self.horizonte = horizonte
+        self.archivo = archivo
+        self.exacto = exacto
+        self.refinar = refinar
+        self._ultimo: Optional[Dict[str, Any]] = None
+        self._firma: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    def _leer_ultimo(self) -> Optional[Dict[str, Any]]:
+        """Último plan: el de memoria, salvo que otro proceso haya guardado uno más nuevo."""
+        if not self.archivo:
+            return self._ultimo
+        try:
+            estado = os.stat(self.archivo)
+        except OSError:
+            return self._ultimo
+        firma = (estado.st_mtime_ns, estado.st_size)
+        if firma == self._firma:
+            return self._ultimo
+        try:
+            with open(self.archivo, 'r', encoding='utf-8') as f:
+                guardado = json.load(f)
+            self._ultimo = {
+                **guardado,
+                'fecha_inicio': _fecha(guardado['fecha_inicio']),
+                'X': np.asarray(guardado['X'], dtype=float).reshape(-1, len(guardado['nombres'])),
+                'stock0': np.asarray(guardado['stock0'], dtype=float),
+                'E': np.asarray(guardado['E'], dtype=float).reshape(-1, len(guardado['nombres'])),
+            }
+            self._firma = firma
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"⚠️ No se pudo leer el plan semanal guardado {self.archivo}: {e}")
+        return self._ultimo
+
+    def _guardar_ultimo(self, ultimo: Dict[str, Any]) -> None:
+        self._ultimo = ultimo
+        if not self.archivo:
+            return
+        try:
+            temporal = f"{self.archivo}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump({**ultimo, 'fecha_inicio': ultimo['fecha_inicio'].isoformat()}, f,
+                          ensure_ascii=False, default=_a_json)
+            os.replace(temporal, self.archivo)
+            estado = os.stat(self.archivo)
+            self._firma = (estado.st_mtime_ns, estado.st_size)
+        except (OSError, TypeError, ValueError) as e:
+            # Sin disco escribible el plan igual queda en memoria
+            logger.warning(f"⚠️ No se pudo guardar el plan semanal en {self.archivo}: {e}")
+
+    def planificar(self, config: Dict[str, Any], stock_actual: Dict[str, Any],
+                   fecha_inicio: Optional[date] = None, materiales_base: Optional[Dict[str, Any]] = None,
+                   matriz: Optional[MatrizMateriales] = None) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        fecha_inicio = _fecha(fecha_inicio) or date.today()
+        entregas = config.get('entregas_programadas') or []
+        config_plan = {k: v for k, v in config.items() if k != 'entregas_programadas'}
+        huella_config = huella_mezcla(config_plan, {}, 'planificacion_semanal', extra={'entregas': entregas})
+        huella = huella_mezcla(config_plan, stock_actual, 'planificacion_semanal',
+                               extra={'entregas': entregas, 'inicio': fecha_inicio.isoformat(),
+                                      'exacto': self.exacto})
+
+        # Un solo proceso calcula a la vez; los demás esperan y reciben el plan guardado
+        with self._lock, (bloqueo_archivo(self.archivo) if self.archivo else nullcontext()):
+            ultimo = self._leer_ultimo()
+            if ultimo and ultimo['huella'] == huella:
+                plan = copy.deepcopy(ultimo['plan'])
+                plan['optimizacion'] = {**plan['optimizacion'], 'modo': 'cache',
+                                        'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3)}
+                return plan
+            return self._replanificar(config, stock_actual, fecha_inicio, materiales_base, matriz, entregas,
+                                      huella, huella_config, ultimo, inicio)
+
+    def _replanificar(self, config: Dict[str, Any], stock_actual: Dict[str, Any], fecha_inicio: date,
+                      materiales_base: Optional[Dict[str, Any]], matriz: Optional[MatrizMateriales],
+                      entregas: List[Dict[str, Any]], huella: str, huella_config: str,
+                      ultimo: Optional[Dict[str, Any]], inicio: float) -> Dict[str, Any]:
+        datos = preparar_problema(_stock_con_entregas(stock_actual, entregas), materiales_base,
+                                  config.get('costos_materiales'), matriz)
+        nombres = datos['nombres']
+        stock0 = np.array([_float(stock_actual.get(nombre, {}).get('total_tn')) for nombre in nombres])
+        E = matriz_entregas(entregas, nombres, fecha_inicio, self.horizonte)
+        datos['stock'] = stock0 + E.sum(axis=0)
+
+        modo, motivo, X = 'completo', 'sin plan previo', None
+        resoluciones = 0
+        solver = 'linprog' if SCIPY_DISPONIBLE else 'numpy'
+        if ultimo and ultimo['huella_config'] == huella_config:
+            avance = (fecha_inicio - ultimo['fecha_inicio']).days
+            previos = _alinear(ultimo['X'][avance:], ultimo['nombres'], nombres) if 0 <= avance < self.horizonte else None
+            if previos is None:
+                motivo = 'horizonte fuera de rango o el plan previo usa materiales sin stock'
+            else:
+                tolerancia = _float(config.get('tolerancia_kw'), 50.0)
+                cubre = bool(np.all(previos @ datos['kw_tn'] >= _float(config.get('kw_objetivo'), 28800.0) - tolerancia))
+                # Stock que el plan previo esperaba tener al llegar a este día
+                esperado = _alinear((ultimo['stock0'] + ultimo['E'][:avance].sum(axis=0)
+                                     - ultimo['X'][:avance].sum(axis=0))[None, :], ultimo['nombres'], nombres)
+                if not cubre and (esperado is None or np.any(stock0 > esperado[0] + DOSIS_MINIMA_TN)):
+                    motivo = 'hay más stock del previsto para cubrir faltantes'
+                elif _inventario_factible(previos, stock0, E[:len(previos)]):
+                    X, modo, motivo = previos, 'incremental', f'se reutilizan {len(previos)} días del plan previo'
+                    if avance > 0:
+                        # Inventario que queda al final de los días reutilizados
+                        restante = stock0 + E[:len(previos)].sum(axis=0) - previos.sum(axis=0)
+                        cola = planificar_horizonte(datos, config, np.maximum(restante, 0.0), E[len(previos):],
+                                                    self.exacto)
+                        X = np.vstack([previos, cola['X']])
+                        resoluciones, solver = 1, cola['solver']
+                else:
+                    motivo = 'el plan previo excede el stock actual'
+        elif ultimo:
+            motivo = 'cambió la configuración'
+        if X is None:
+            completo = planificar_horizonte(datos, config, stock0, E, self.exacto)
+            X, resoluciones, solver = completo['X'], 1, completo['solver']
+
+        plan = self._armar_plan(datos, config, X, stock0, E, fecha_inicio)
+        plan['optimizacion'] = {
+            'solver': solver,
+            'modo': modo,
+            'motivo': motivo,
+            'resoluciones': resoluciones,
+            'dias': self.horizonte,
+            'materiales': len(nombres),
+            'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+        }
+        refinar = self.refinar and modo == 'completo' and solver == 'linprog_topk' and MILP_DISPONIBLE
+        if refinar:
+            plan['optimizacion']['refinando'] = True
+        self._guardar_ultimo({'huella': huella, 'huella_config': huella_config, 'nombres': nombres,
+                              'fecha_inicio': fecha_inicio, 'X': X, 'stock0': stock0, 'E': E,
+                              'plan': copy.deepcopy(plan)})
+        logger.info(f"📅 Plan semanal ({modo}, {solver}): {resoluciones} resoluciones en {plan['optimizacion']['tiempo_ms']:.0f} ms")
+        if refinar:
+            threading.Thread(target=self._refinar, args=(datos, config, X, stock0, E, fecha_inicio, huella),
+                             name='refinar_plan_semanal', daemon=True).start()
+        return plan
+
+    def _refinar(self, datos: Dict[str, Any], config: Dict[str, Any], X: np.ndarray, stock0: np.ndarray,
+                 E: np.ndarray, fecha_inicio: date, huella: str) -> None:
+        """
+        Fuera del request: resuelve el MILP exacto y, si cubre más kW que el
+        redondeo, reemplaza el plan guardado (sólo si sigue siendo el vigente).
+        """
+        try:
+            inicio = time.perf_counter()
+            exacto = planificar_horizonte(datos, config, stock0, E, exacto=True)
+            mejora = exacto['solver'] == 'milp' and (_faltante_kw(datos, config, exacto['X'])
+                                                     < _faltante_kw(datos, config, X) - 1e-3)
+            plan = self._armar_plan(datos, config, exacto['X'], stock0, E, fecha_inicio) if mejora else None
+            with self._lock, (bloqueo_archivo(self.archivo) if self.archivo else nullcontext()):
+                ultimo = self._leer_ultimo()
+                if not ultimo or ultimo['huella'] != huella:
+                    return
+                if plan is None:
+                    ultimo['plan']['optimizacion']['refinando'] = False
+                    self._guardar_ultimo(ultimo)
+                    return
+                plan['optimizacion'] = {**ultimo['plan']['optimizacion'], 'solver': 'milp', 'modo': 'refinado',
+                                        'refinando': False,
+                                        'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3)}
+                self._guardar_ultimo({**ultimo, 'X': exacto['X'], 'plan': plan})
+            logger.info(f"📅 Plan semanal refinado con MILP en {plan['optimizacion']['tiempo_ms']:.0f} ms")
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo refinar el plan semanal: {e}")
+
+    def _armar_plan(self, datos: Dict[str, Any], config: Dict[str, Any], X: np.ndarray,
+                    stock0: np.ndarray, E: np.ndarray, fecha_inicio: date) -> Dict[str, Any]:
+        """Formato de obtener_planificacion_semanal: un bloque por día + advertencias_generales."""
+        kw_objetivo = _float(config.get('kw_objetivo'), 28800.0)
+        inventario = stock0 + np.cumsum(E, axis=0) - np.cumsum(X, axis=0)
+        plan: Dict[str, Any] = {}
+        advertencias_generales = []
+        for d in range(X.shape[0]):
+            fecha = fecha_inicio + timedelta(days=d)
+            dia = DIAS_SEMANA[fecha.weekday()]
+            mezcla = construir_resultado(datos, X[d], config, [])
+            kw_generados = mezcla['totales']['kw_total_generado']
+            advertencia = ''
+            if kw_generados < kw_objetivo - _float(config.get('tolerancia_kw'), 50.0):
+                advertencia = f'Objetivo no cumplido. Faltan {kw_objetivo - kw_generados:.1f} kW'
+                advertencias_generales.append(f'{dia}: {advertencia}')
+            plan[dia] = {
+                'fecha': fecha.isoformat(),
+                'materiales_solidos': mezcla['materiales_solidos'],
+                'materiales_liquidos': mezcla['materiales_liquidos'],
+                'materiales_purin': mezcla['materiales_purin'],
+                'kw_objetivo': kw_objetivo,
+                'kw_generados': kw_generados,
+                'stock_restante': {datos['nombres'][i]: float(inventario[d, i]) for i in np.flatnonzero(inventario[d] > 0.1)},
+                'entregas': {datos['nombres'][i]: float(E[d, i]) for i in np.flatnonzero(E[d] > 0)},
+                'completado': not advertencia,
+                'advertencia': advertencia,
+                'totales': mezcla['totales'],
+            }
+        plan['advertencias_generales'] = advertencias_generales
+        return plan
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RECOMENDADOR TOP-K DE MATERIALES
+================================
+
+Puntaje marginal vectorizado de cada material en stock, en una sola pasada
+NumPy:
+
+- kW por tonelada (medido en stock o, si falta, el de la matriz del catálogo)
+- desvío de CH4 respecto del objetivo (pp que el material mueve la mezcla)
+- kW disponibles por su stock (kW/tn × tn)
+
+    puntaje = kW/tn × (stock / 1000) / (1 + |CH4 - objetivo| / 100)
+
+El ranking por categoría se elige con `argpartition` (top-k sin ordenar
+todo) y queda en caché hasta que cambia la versión del stock o del
+catálogo; con el ranking en caché, cambiar el objetivo de kW sólo rehace el
+llenado greedy (suma acumulada) sobre k materiales.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+from matriz_materiales import MatrizMateriales
+
+logger = logging.getLogger(__name__)
+
+CH4_DEFAULT_PCT = 65.0
+MAX_RANKINGS = 16
+CATEGORIAS = ('solido', 'liquido', 'purin')
+
+
+def _float(valor: Any, default: float = 0.0) -> float:
+    try:
+        return float(valor) if valor not in (None, '') else default
+    except (TypeError, ValueError):
+        return default
+
+
+def arreglos_stock(stock_actual: Dict[str, Any], matriz: Optional[MatrizMateriales] = None) -> Dict[str, Any]:
+    """Nombres, categoría, stock, kW/tn y CH4 (%) alineados, para los materiales con stock y kW/tn > 0."""
+    nombres = [m for m, d in stock_actual.items() if isinstance(d, dict)]
+    datos = [stock_actual[m] for m in nombres]
+    stock = np.array([_float(d.get('total_tn')) for d in datos])
+    kw_tn = np.array([_float(d.get('kw_tn')) for d in datos])
+    ch4 = np.array([_float(d.get('ch4_porcentaje'), np.nan) for d in datos])
+    categoria = np.array([2 if m.lower() == 'purin' else 1 if str(d.get('tipo', 'solido')).lower() == 'liquido' else 0
+                          for m, d in zip(nombres, datos)], dtype=int)
+
+    if matriz is not None and nombres:
+        # Completar kW/tn y CH4 faltantes con la matriz del catálogo
+        posiciones = [matriz.indice_de(m) for m in nombres]
+        indices = np.array([-1 if i is None else i for i in posiciones], dtype=int)
+        en_catalogo = indices >= 0
+        kw_catalogo = np.where(en_catalogo, matriz.kw_tn[indices], 0.0)
+        ch4_catalogo = np.where(en_catalogo, matriz.ch4_gestion[indices] * 100, CH4_DEFAULT_PCT)
+        kw_tn = np.where(kw_tn > 0, kw_tn, kw_catalogo)
+        ch4 = np.where(np.isnan(ch4), ch4_catalogo, ch4)
+    ch4 = np.where(np.isnan(ch4), CH4_DEFAULT_PCT, ch4)
+
+    validos = (stock > 0) & (kw_tn > 0)
+    return {
+        'nombres': np.array(nombres, dtype=object)[validos],
+        'categoria': categoria[validos],
+        'stock': stock[validos],
+        'kw_tn': kw_tn[validos],
+        'ch4': ch4[validos],
+    }
+
+
+def puntajes_marginales(arreglos: Dict[str, Any], objetivo_metano: float) -> Dict[str, np.ndarray]:
+    """Contribuciones marginales y puntaje de todos los materiales a la vez."""
+    desvio_ch4 = arreglos['ch4'] - objetivo_metano
+    return {
+        'kw_por_tn': arreglos['kw_tn'],
+        'desvio_ch4': desvio_ch4,
+        'kw_por_stock': arreglos['kw_tn'] * arreglos['stock'],
+        'puntaje': arreglos['kw_tn'] * (arreglos['stock'] / 1000.0) / (1.0 + np.abs(desvio_ch4) / 100.0),
+    }
+
+
+def top_k(puntaje: np.ndarray, mascara: np.ndarray, k: int) -> np.ndarray:
+    """Índices de los k mayores puntajes dentro de la máscara, ordenados de mayor a menor."""
+    candidatos = np.flatnonzero(mascara)
+    if k <= 0 or len(candidatos) == 0:
+        return np.zeros(0, dtype=int)
+    if k < len(candidatos):
+        candidatos = candidatos[np.argpartition(-puntaje[candidatos], k - 1)[:k]]
+    return candidatos[np.argsort(-puntaje[candidatos], kind='stable')]
+
+
+class RecomendadorMateriales:
+    """Ranking top-k cacheado por versión de stock/catálogo."""
+
+    def __init__(self, max_rankings: int = MAX_RANKINGS):
+        self.max_rankings = max_rankings
+        self._rankings: 'OrderedDict[Hashable, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _ranking(self, stock_actual: Dict[str, Any], matriz: Optional[MatrizMateriales], incluir_purin: bool,
+                 objetivo_metano: float, limites: tuple, version: Optional[Hashable]) -> Dict[str, Any]:
+        clave = None if version is None else (version, incluir_purin, round(objetivo_metano, 3), limites)
+        if clave is not None:
+            with self._lock:
+                ranking = self._rankings.get(clave)
+                if ranking is not None:
+                    self._rankings.move_to_end(clave)
+                    self.aciertos += 1
+                    return ranking
+
+        arreglos = arreglos_stock(stock_actual, matriz)
+        puntajes = puntajes_marginales(arreglos, objetivo_metano)
+        elegidos = []
+        for c, k in enumerate(limites):
+            if c == 2 and not incluir_purin:
+                continue
+            elegidos.append(top_k(puntajes['puntaje'], arreglos['categoria'] == c, k))
+        seleccion = np.concatenate(elegidos) if elegidos else np.zeros(0, dtype=int)
+        seleccion = seleccion[np.argsort(-puntajes['puntaje'][seleccion], kind='stable')]
+        ranking = {
+            'nombres': arreglos['nombres'][seleccion],
+            'categoria': arreglos['categoria'][seleccion],
+            'stock': arreglos['stock'][seleccion],
+            'kw_tn': arreglos['kw_tn'][seleccion],
+            'ch4': arreglos['ch4'][seleccion],
+            'puntaje': puntajes['puntaje'][seleccion],
+            'candidatos': len(arreglos['nombres']),
+        }
+        if clave is not None:
+            with self._lock:
+                self.fallos += 1
+                self._rankings[clave] = ranking
+                while len(self._rankings) > self.max_rankings:
+                    self._rankings.popitem(last=False)
+        return ranking
+
+    def recomendar(self, config: Dict[str, Any], stock_actual: Dict[str, Any], incluir_purin: bool = True,
+                   max_solidos: int = 6, max_liquidos: int = 4, matriz: Optional[MatrizMateriales] = None,
+                   version: Optional[Hashable] = None) -> Dict[str, Any]:
+        """
+        Sugerencias para cumplir el objetivo de kW: top-k por categoría
+        (`max_solidos`, `max_liquidos`, purín si se incluye) llenados en orden
+        de puntaje hasta el objetivo. Sin `version` no se cachea.
+        """
+        inicio = time.perf_counter()
+        kw_obj = _float(config.get('kw_objetivo'))
+        objetivo_metano = _float(config.get('objetivo_metano_diario'), 65.0)
+        vacio = {'recomendaciones': [], 'kw_estimado': 0.0, 'ch4_estimado': 0.0, 'kw_objetivo': kw_obj}
+        if kw_obj <= 0 or not stock_actual:
+            logger.warning("⚠️ KW objetivo inválido o sin stock disponible")
+            return vacio
+
+        ranking = self._ranking(stock_actual, matriz, incluir_purin, objetivo_metano,
+                                (int(max_solidos), int(max_liquidos), len(stock_actual)), version)
+        if len(ranking['nombres']) == 0:
+            logger.warning("⚠️ No hay materiales válidos")
+            return vacio
+
+        # Llenado greedy vectorizado: cada material aporta lo que falta hasta el objetivo
+        kw_disponible = ranking['stock'] * ranking['kw_tn']
+        previo = np.concatenate([[0.0], np.cumsum(kw_disponible)[:-1]])
+        kw_usar = np.clip(kw_obj - previo, 0.0, kw_disponible)
+        usados = np.flatnonzero(kw_usar > 0)
+        tn_usar = kw_usar / ranking['kw_tn']
+        kw_total = float(kw_usar.sum())
+        ch4_promedio = float(ranking['ch4'] @ kw_usar / kw_total) if kw_total > 0 else 0.0
+
+        recomendaciones = [{
+            'material': str(ranking['nombres'][i]),
+            'tipo': CATEGORIAS[ranking['categoria'][i]],
+            'tn_sugeridas': round(float(tn_usar[i]), 2),
+            'kw_estimados': round(float(kw_usar[i]), 1),
+            'kw_tn': round(float(ranking['kw_tn'][i]), 4),
+            'ch4_ref': round(float(ranking['ch4'][i]), 1),
+            'stock_tn': round(float(ranking['stock'][i]), 1),
+            'puntaje': round(float(ranking['puntaje'][i]), 4),
+        } for i in usados]
+        ms = (time.perf_counter() - inicio) * 1000
+        logger.info(f"🎯 Recomendaciones: {len(recomendaciones)} de {ranking['candidatos']} materiales, "
+                    f"{kw_total:.0f} KW, CH4 {ch4_promedio:.1f}% en {ms:.2f} ms")
+        return {
+            'recomendaciones': recomendaciones,
+            'kw_estimado': round(kw_total, 1),
+            'kw_objetivo': kw_obj,
+            'ch4_estimado': round(ch4_promedio, 1),
+            'candidatos': ranking['candidatos'],
+            'tiempo_ms': round(ms, 3),
+        }
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._rankings.clear()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+REGISTRO ESTRUCTURADO DEL CAMINO CALIENTE DE CÁLCULO
+====================================================
+
+Capa fina sobre `logging` para los motores de mezcla:
+
+- `RegistroCalculo.detalle(...)`: líneas por material/iteración. Formato
+  perezoso (args estilo % o un callable que devuelve el texto): si el nivel
+  DEBUG no está activo no se formatea nada, sólo se cuenta en la traza.
+- `RegistroCalculo.muestreado(clave, ...)`: mensajes repetitivos; se emite
+  la primera ocurrencia y luego una de cada `cada`, con el total suprimido.
+- `traza(nombre)`: context manager por request/cálculo. Acumula eventos y
+  campos (`anotar`) y al cerrar emite UNA línea de resumen estructurada
+  (JSON en `extra['traza']`) en lugar de decenas de líneas por iteración.
+- `configurar_niveles({...})`: niveles por módulo en tiempo de ejecución
+  (también desde la variable de entorno SIBIA_LOG_NIVELES="modulo=NIVEL,...").
+  Sólo afecta al proceso que la llama; `NivelesCompartidos` guarda los
+  niveles en un JSON para que cada worker de gunicorn los vuelva a leer
+  (`sincronizar`, un `os.stat` si el archivo no cambió).
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+from bloqueo_archivo import bloqueo_archivo
+
+PREFIJO = 'sibia'
+ENV_NIVELES = 'SIBIA_LOG_NIVELES'
+MUESTREO_DEFAULT = 100
+
+_traza_actual: contextvars.ContextVar = contextvars.ContextVar('traza_calculo', default=None)
+_contadores_muestreo: Dict[str, int] = {}
+_lock_muestreo = threading.Lock()
+_registros: Dict[str, 'RegistroCalculo'] = {}
+
+Mensaje = Union[str, Callable[[], str]]
+
+
+class Traza:
+    """Resumen de un cálculo: duración, eventos por nivel y campos anotados."""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.inicio = time.perf_counter()
+        self.eventos: Dict[str, int] = {}
+        self.campos: Dict[str, Any] = {}
+
+    def contar(self, modulo: str) -> None:
+        self.eventos[modulo] = self.eventos.get(modulo, 0) + 1
+
+    def anotar(self, **campos: Any) -> None:
+        self.campos.update(campos)
+
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            'traza': self.nombre,
+            'duracion_ms': round((time.perf_counter() - self.inicio) * 1000, 3),
+            'eventos': sum(self.eventos.values()),
+            'eventos_por_modulo': dict(self.eventos),
+            **self.campos,
+        }
+
+
+class RegistroCalculo:
+    """Logger con detalle perezoso, muestreo y conteo en la traza activa."""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.logger = logging.getLogger(nombre)
+
+    @staticmethod
+    def _texto(mensaje: Mensaje, args: tuple) -> str:
+        texto = mensaje() if callable(mensaje) else mensaje
+        return texto % args if args else texto
+
+    def _emitir(self, nivel: int, mensaje: Mensaje, args: tuple) -> None:
+        traza = _traza_actual.get()
+        if traza is not None:
+            traza.contar(self.nombre)
+        if self.logger.isEnabledFor(nivel):
+            self.logger.log(nivel, self._texto(mensaje, args), stacklevel=3)
+
+    def detalle(self, mensaje: Mensaje, *args: Any) -> None:
+        """Línea por material/iteración: DEBUG, formateada sólo si DEBUG está activo."""
+        self._emitir(logging.DEBUG, mensaje, args)
+
+    def info(self, mensaje: Mensaje, *args: Any) -> None:
+        self._emitir(logging.INFO, mensaje, args)
+
+    def warning(self, mensaje: Mensaje, *args: Any) -> None:
+        self._emitir(logging.WARNING, mensaje, args)
+
+    def muestreado(self, clave: str, nivel: int, mensaje: Mensaje, *args: Any, cada: int = MUESTREO_DEFAULT) -> None:
+        """Emite la 1ª ocurrencia de `clave` y luego una de cada `cada` (con el conteo)."""
+        traza = _traza_actual.get()
+        if traza is not None:
+            traza.contar(self.nombre)
+        if not self.logger.isEnabledFor(nivel):
+            return
+        with _lock_muestreo:
+            n = _contadores_muestreo.get(clave, 0) + 1
+            _contadores_muestreo[clave] = n
+        if n == 1 or n % cada == 0:
+            sufijo = f" [muestreado: {n} ocurrencias]" if n > 1 else ''
+            self.logger.log(nivel, self._texto(mensaje, args) + sufijo, stacklevel=2)
+
+
+def obtener_registro(modulo: str) -> RegistroCalculo:
+    """Registro para `modulo` (logger 'sibia.<modulo>', nivel configurable en caliente)."""
+    nombre = f"{PREFIJO}.{modulo}"
+    registro = _registros.get(nombre)
+    if registro is None:
+        registro = _registros.setdefault(nombre, RegistroCalculo(nombre))
+    return registro
+
+
+@contextmanager
+def traza(nombre: str, logger: Optional[logging.Logger] = None, nivel: int = logging.INFO) -> Iterator[Traza]:
+    """
+    Traza de un cálculo. Las trazas anidadas se suman a la externa; sólo la
+    más externa emite el resumen.
+    """
+    externa = _traza_actual.get()
+    if externa is not None:
+        yield externa
+        return
+    actual = Traza(nombre)
+    token = _traza_actual.set(actual)
+    try:
+        yield actual
+    finally:
+        _traza_actual.reset(token)
+        destino = logger or logging.getLogger(PREFIJO)
+        if destino.isEnabledFor(nivel):
+            resumen = actual.resumen()
+            campos = ', '.join(f"{k}={v}" for k, v in resumen.items()
+                               if k not in ('traza', 'duracion_ms', 'eventos', 'eventos_por_modulo'))
+            destino.log(nivel, f"🧾 {nombre}: {resumen['duracion_ms']:.1f} ms, {resumen['eventos']} eventos"
+                               f"{', ' + campos if campos else ''}",
+                        extra={'traza': json.dumps(resumen, ensure_ascii=False, default=str)})
+
+
+def traza_activa() -> Optional[Traza]:
+    return _traza_actual.get()
+
+
+def configurar_niveles(niveles: Dict[str, Union[str, int]]) -> Dict[str, str]:
+    """
+    Fija niveles por módulo en caliente: {'mezcla': 'DEBUG', 'adan': 'WARNING'}.
+    Los nombres sin prefijo se interpretan como 'sibia.<modulo>'; '' o 'sibia'
+    es la raíz de todos los registros de cálculo.
+    """
+    aplicados = {}
+    for modulo, nivel in (niveles or {}).items():
+        valor = logging.getLevelName(str(nivel).upper()) if isinstance(nivel, str) else int(nivel)
+        if not isinstance(valor, int):
+            raise ValueError(f"Nivel de logging inválido para {modulo}: {nivel}")
+        nombre = PREFIJO if modulo in ('', PREFIJO) else modulo if modulo.startswith(PREFIJO + '.') \
+            else f"{PREFIJO}.{modulo}"
+        logging.getLogger(nombre).setLevel(valor)
+        aplicados[nombre] = logging.getLevelName(valor)
+    return aplicados
+
+
+def niveles_actuales() -> Dict[str, str]:
+    nombres = [PREFIJO] + sorted(_registros)
+    return {n: logging.getLevelName(logging.getLogger(n).getEffectiveLevel()) for n in nombres}
+
+
+def configurar_desde_entorno() -> Dict[str, str]:
+    """Aplica SIBIA_LOG_NIVELES="mezcla=DEBUG,adan=WARNING" si está definida."""
+    texto = os.environ.get(ENV_NIVELES, '').strip()
+    if not texto:
+        return {}
+    niveles = dict(par.split('=', 1) for par in texto.split(',') if '=' in par)
+    return configurar_niveles({k.strip(): v.strip() for k, v in niveles.items()})
+
+
+class NivelesCompartidos:
+    """Niveles por módulo persistidos en `ruta` y aplicados en todos los procesos."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._firma: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    def _leer(self) -> Dict[str, str]:
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            return datos if isinstance(datos, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _firma_actual(self) -> Optional[tuple]:
+        try:
+            estado = os.stat(self.ruta)
+        except OSError:
+            return None
+        return (estado.st_mtime_ns, estado.st_size)
+
+    def guardar(self, niveles: Dict[str, Union[str, int]]) -> Dict[str, str]:
+        """Aplica `niveles` en este proceso y los fusiona en el archivo para los demás."""
+        aplicados = configurar_niveles(niveles)
+        with self._lock, bloqueo_archivo(self.ruta):
+            persistidos = {**self._leer(), **aplicados}
+            temporal = f"{self.ruta}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(persistidos, f, indent=2, ensure_ascii=False)
+            os.replace(temporal, self.ruta)
+            self._firma = self._firma_actual()
+        return aplicados
+
+    def sincronizar(self) -> bool:
+        """Re-aplica los niveles del archivo si otro proceso los cambió. True si aplicó algo."""
+        firma = self._firma_actual()
+        if firma is None or firma == self._firma:
+            return False
+        with self._lock:
+            if firma == self._firma:
+                return False
+            niveles = self._leer()
+            self._firma = firma
+        try:
+            configurar_niveles(niveles)
+        except ValueError as e:
+            logging.getLogger(PREFIJO).warning(f"⚠️ Niveles de logging inválidos en {self.ruta}: {e}")
+            return False
+        return True
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+REGISTRO LOCAL DE MODELOS ML
+============================
+
+Guarda los modelos entrenados como artefactos joblib versionados, con sus
+metadatos, para no reentrenarlos en cada arranque:
+
+    modelos_registro/<nombre>/v0003.joblib   artefacto (modelo, scaler, ...)
+    modelos_registro/<nombre>/v0003.json     metadatos (huella, métricas, ...)
+    modelos_registro/<nombre>/actual.json    versión vigente
+
+`obtener_o_entrenar` carga la versión vigente si sigue fresca (misma
+huella de datos de entrenamiento, mismos parámetros, misma versión de
+código y de librerías) y si no entrena, guarda una versión nueva y la deja
+como vigente. Se conservan las últimas `max_versiones`.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ENV_DIRECTORIO = 'SIBIA_MODELOS_DIR'
+DIRECTORIO_DEFAULT = os.path.join(SCRIPT_DIR, 'modelos_registro')
+MAX_VERSIONES_DEFAULT = 3
+
+# entrenar() → (artefacto, métricas)
+Entrenador = Callable[[], Tuple[Any, Dict[str, Any]]]
+
+
+def huella_datos(*partes: Any) -> str:
+    """Huella de los datos de entrenamiento (DataFrames, arreglos NumPy o valores JSON)."""
+    h = hashlib.sha256()
+    for parte in partes:
+        if hasattr(parte, 'columns') and hasattr(parte, 'to_numpy'):
+            import pandas as pd
+            h.update(json.dumps([str(c) for c in parte.columns]).encode('utf-8'))
+            h.update(pd.util.hash_pandas_object(parte, index=True).to_numpy().tobytes())
+        elif isinstance(parte, np.ndarray):
+            h.update(str((parte.shape, parte.dtype.str)).encode('utf-8'))
+            h.update(np.ascontiguousarray(parte).tobytes())
+        else:
+            h.update(json.dumps(parte, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    return h.hexdigest()[:32]
+
+
+def _versiones_librerias() -> Dict[str, str]:
+    """Versiones que condicionan la compatibilidad del pickle."""
+    versiones = {'numpy': np.__version__, 'joblib': joblib.__version__}
+    for modulo in ('sklearn', 'xgboost'):
+        try:
+            versiones[modulo] = __import__(modulo).__version__
+        except ImportError:
+            pass
+    return versiones
+
+
+class RegistroModelos:
+    """Artefactos versionados con semántica cargar-si-fresco / entrenar-si-vencido."""
+
+    def __init__(self, directorio: str = DIRECTORIO_DEFAULT, max_versiones: int = MAX_VERSIONES_DEFAULT):
+        self.directorio = directorio
+        self.max_versiones = max_versiones
+        self._lock = threading.Lock()
+
+    def _dir_modelo(self, nombre: str) -> str:
+        return os.path.join(self.directorio, nombre)
+
+    def _leer_json(self, ruta: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _escribir_json(self, ruta: str, datos: Dict[str, Any]) -> None:
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(temporal, ruta)
+
+    def metadatos(self, nombre: str) -> Optional[Dict[str, Any]]:
+        """Metadatos de la versión vigente (None si no hay)."""
+        actual = self._leer_json(os.path.join(self._dir_modelo(nombre), 'actual.json'))
+        if not actual:
+            return None
+        return self._leer_json(os.path.join(self._dir_modelo(nombre), f"v{actual['version']:04d}.json"))
+
+    def _motivo_vencido(self, meta: Optional[Dict[str, Any]], huella: str, parametros: Dict[str, Any],
+                        version_codigo: str) -> Optional[str]:
+        if meta is None:
+            return 'sin artefacto'
+        if meta.get('huella_datos') != huella:
+            return 'datos de entrenamiento distintos'
+        if meta.get('parametros') != json.loads(json.dumps(parametros, default=str)):
+            return 'parámetros distintos'
+        if meta.get('version_codigo') != version_codigo:
+            return 'versión de código distinta'
+        if meta.get('librerias') != _versiones_librerias():
+            return 'versiones de librerías distintas'
+        return None
+
+    def obtener_o_entrenar(self, nombre: str, huella: str, entrenar: Entrenador,
+                           parametros: Optional[Dict[str, Any]] = None,
+                           version_codigo: str = '1', forzar: bool = False) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Artefacto vigente de `nombre` si sigue fresco; si no, `entrenar()` y lo registra.
+        Devuelve (artefacto, metadatos) con metadatos['origen'] = 'registro' | 'entrenado'.
+        """
+        parametros = parametros or {}
+        with self._lock:
+            meta = self.metadatos(nombre)
+            motivo = 'reentrenamiento forzado' if forzar else self._motivo_vencido(meta, huella, parametros,
+                                                                                  version_codigo)
+            if motivo is None:
+                inicio = time.perf_counter()
+                try:
+                    artefacto = joblib.load(os.path.join(self._dir_modelo(nombre), meta['archivo']))
+                    logger.info(f"📦 Modelo '{nombre}' v{meta['version']} cargado del registro "
+                                f"({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+                    return artefacto, {**meta, 'origen': 'registro'}
+                except Exception as e:
+                    motivo = f'artefacto ilegible ({e})'
+
+            logger.info(f"🏋️ Entrenando modelo '{nombre}': {motivo}")
+            inicio = time.perf_counter()
+            artefacto, metricas = entrenar()
+            duracion_s = time.perf_counter() - inicio
+            meta = self._guardar(nombre, artefacto, {
+                'huella_datos': huella,
+                'parametros': parametros,
+                'version_codigo': version_codigo,
+                'librerias': _versiones_librerias(),
+                'metricas': metricas,
+                'entrenamiento_s': round(duracion_s, 3),
+                'motivo': motivo,
+            })
+            return artefacto, {**meta, 'origen': 'entrenado'}
+
+    def _guardar(self, nombre: str, artefacto: Any, meta: Dict[str, Any]) -> Dict[str, Any]:
+        directorio = self._dir_modelo(nombre)
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            anterior = self._leer_json(os.path.join(directorio, 'actual.json')) or {}
+            version = int(anterior.get('version', 0)) + 1
+            archivo = f"v{version:04d}.joblib"
+            meta = {'nombre': nombre, 'version': version, 'archivo': archivo,
+                    'fecha': datetime.now().isoformat(), **meta}
+
+            temporal = os.path.join(directorio, f"{archivo}.tmp")
+            joblib.dump(artefacto, temporal)
+            os.replace(temporal, os.path.join(directorio, archivo))
+            self._escribir_json(os.path.join(directorio, f"v{version:04d}.json"), meta)
+            self._escribir_json(os.path.join(directorio, 'actual.json'), {'version': version})
+            self._podar(directorio, version)
+            logger.info(f"💾 Modelo '{nombre}' registrado como v{version} ({meta['entrenamiento_s']:.1f} s de entrenamiento)")
+        except Exception as e:
+            # Sin disco escribible el modelo igual queda en memoria
+            logger.warning(f"⚠️ No se pudo guardar el modelo '{nombre}' en el registro: {e}")
+            meta = {'nombre': nombre, 'version': None, **meta}
+        return meta
+
+    def _podar(self, directorio: str, vigente: int) -> None:
+        for archivo in os.listdir(directorio):
+            base, extension = os.path.splitext(archivo)
+            if extension in ('.joblib', '.json') and base.startswith('v') and base[1:].isdigit():
+                if int(base[1:]) <= vigente - self.max_versiones:
+                    os.remove(os.path.join(directorio, archivo))
+
+    def listar(self) -> Dict[str, Any]:
+        """Metadatos vigentes de todos los modelos registrados."""
+        if not os.path.isdir(self.directorio):
+            return {}
+        return {nombre: self.metadatos(nombre) for nombre in sorted(os.listdir(self.directorio))
+                if os.path.isdir(self._dir_modelo(nombre))}
+
+
+_REGISTRO: Optional[RegistroModelos] = None
+
+
+def obtener_registro_modelos() -> RegistroModelos:
+    """Registro compartido (directorio configurable con SIBIA_MODELOS_DIR)."""
+    global _REGISTRO
+    if _REGISTRO is None:
+        _REGISTRO = RegistroModelos(os.environ.get(ENV_DIRECTORIO, DIRECTORIO_DEFAULT))
+    return _REGISTRO
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RE-RESOLUCIÓN INCREMENTAL (ARRANQUE EN CALIENTE) DE LA MEZCLA LP
+================================================================
+
+Guarda, por estado de planta (configuración sin el objetivo de kW y
+conjunto de materiales), la última solución LP y su base: los materiales
+usados y cuáles quedaron en su cota de stock.
+
+Ante un cambio de objetivo o de stock arma un candidato desde esa base (con
+la base fija, las filas de kW y de reparto tienen lado derecho proporcional
+al objetivo: los materiales libres se escalan y los que estaban en su cota
+quedan en el stock nuevo) y se lo pasa como arranque a
+`optimizar_mezcla_lp`. Si el candidato es factible y deja en 0 los desvíos
+de kW, reparto y metano, esas etapas ya son óptimas y sólo se resuelve la
+de costo/toneladas, sobre todos los materiales (así entran los que antes no
+se usaban y ahora tienen más stock). Si no, se resuelven todas las etapas.
+En ambos casos el resultado es el mismo que en frío y pasa a ser la nueva base.
+
+Las etapas que quedan se resuelven sobre la relajación LP cuando ésta
+certifica el óptimo entero (ver `optimizador_lp_mezcla`). Así, un cambio de
+objetivo desde el slider cuesta unas 4 LP chicas: ~8 ms con 18 materiales en
+el corpus sintético de `benchmark_mezcla_lp.py`, contra ~40 ms del MILP por
+etapas. El objetivo es quedar por debajo de 10 ms. Si la relajación no
+certifica (p. ej. el óptimo LP usa más materiales que `cantidad_materiales`),
+se resuelve el MILP y la respuesta vuelve a los ~40 ms.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from cache_mezclas import huella_mezcla
+from matriz_materiales import MatrizMateriales
+from optimizador_lp_mezcla import _float, optimizar_mezcla_lp, preparar_problema
+
+logger = logging.getLogger(__name__)
+
+MAX_ESTADOS = 32
+CLAVES_VARIABLES = ('kw_objetivo', 'semilla_mezcla')
+
+
+class ResolutorIncremental:
+    """Mezcla LP con arranque en caliente desde la última base por estado de planta."""
+
+    def __init__(self, max_estados: int = MAX_ESTADOS):
+        self.max_estados = max_estados
+        self._bases: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._tiempos = {'caliente': [], 'frio': []}
+
+    @staticmethod
+    def _clave(config: Dict[str, Any], datos: Dict[str, Any]) -> str:
+        config_fija = {k: v for k, v in config.items() if k not in CLAVES_VARIABLES}
+        return huella_mezcla(config_fija, {}, 'lp_incremental', extra={'materiales': datos['nombres']})
+
+    def resolver(self, config: Dict[str, Any], stock_actual: Dict[str, Any],
+                 materiales_base: Optional[Dict[str, Any]] = None,
+                 matriz: Optional[MatrizMateriales] = None) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        datos = preparar_problema(stock_actual, materiales_base, config.get('costos_materiales'), matriz)
+        clave = self._clave(config, datos)
+        with self._lock:
+            base = self._bases.get(clave)
+            if base is not None:
+                self._bases.move_to_end(clave)
+
+        arranque = self._candidato(base, datos, config) if base is not None else None
+        resultado = optimizar_mezcla_lp(config, stock_actual, materiales_base, matriz, arranque=arranque)
+        etapas = resultado['optimizacion'].get('etapas', [])
+        acotadas = sum(1 for etapa in etapas if etapa.get('arranque'))
+        if base is None:
+            modo, motivo = 'frio', 'sin base previa'
+        elif acotadas:
+            modo, motivo = 'caliente', f'la base previa deja {acotadas} de {len(etapas)} etapas en su óptimo'
+        else:
+            modo, motivo = 'frio', 'la base previa dejó de ser factible u óptima'
+
+        tn = np.array([self._tn(resultado, nombre) for nombre in datos['nombres']])
+        with self._lock:
+            self._bases[clave] = {
+                'kw_objetivo': _float(config.get('kw_objetivo'), 28800.0),
+                'tn': tn,
+                'en_cota': (tn > 0) & (tn >= datos['stock'] - 1e-6),
+            }
+            self._bases.move_to_end(clave)
+            while len(self._bases) > self.max_estados:
+                self._bases.popitem(last=False)
+        return self._registrar(resultado, modo, motivo, inicio)
+
+    @staticmethod
+    def _tn(resultado: Dict[str, Any], nombre: str) -> float:
+        for grupo in ('materiales_solidos', 'materiales_liquidos', 'materiales_purin'):
+            if nombre in resultado.get(grupo, {}):
+                return float(resultado[grupo][nombre].get('cantidad_tn', 0))
+        return 0.0
+
+    @staticmethod
+    def _candidato(base: Dict[str, Any], datos: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, float]:
+        """Solución de la base guardada llevada al objetivo y al stock nuevos ({material: tn})."""
+        kw_objetivo = _float(config.get('kw_objetivo'), 28800.0)
+        kw_tn, stock = datos['kw_tn'], datos['stock']
+        en_cota = base['en_cota']
+        libres = (base['tn'] > 0) & ~en_cota
+        tn = np.where(en_cota, stock, 0.0)
+        kw_fijo = float(tn @ kw_tn)
+        kw_libre_previo = float(base['tn'][libres] @ kw_tn[libres])
+        if kw_libre_previo > 0:
+            tn[libres] = base['tn'][libres] * max(0.0, (kw_objetivo - kw_fijo) / kw_libre_previo)
+        return {nombre: float(valor) for nombre, valor in zip(datos['nombres'], tn) if valor > 0}
+
+    def _registrar(self, resultado: Dict[str, Any], arranque: str, motivo: str, inicio: float) -> Dict[str, Any]:
+        ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            tiempos = self._tiempos[arranque]
+            tiempos.append(ms)
+            del tiempos[:-500]
+        resultado.setdefault('optimizacion', {}).update({'arranque': arranque, 'motivo_arranque': motivo,
+                                                         'tiempo_total_ms': round(ms, 3)})
+        logger.info(f"📐 Mezcla LP en {arranque} ({motivo}): {ms:.2f} ms")
+        return resultado
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            salida = {'bases': len(self._bases)}
+            for arranque, tiempos in self._tiempos.items():
+                salida[arranque] = {
+                    'resoluciones': len(tiempos),
+                    'ms_promedio': round(float(np.mean(tiempos)), 3) if tiempos else 0.0,
+                    'ms_p95': round(float(np.percentile(tiempos, 95)), 3) if tiempos else 0.0,
+                }
+            return salida
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._bases.clear()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RETENCIÓN, COMPACTACIÓN Y ARCHIVO DE HISTÓRICOS JSON
+====================================================
+
+Los históricos JSON (gases, registros de camiones, caché y aprendizaje de
+los asistentes) crecen sin límite y se parsean completos al
+arrancar o en cada request. Este módulo aplica una política por archivo:
+
+- Se conservan "en caliente" los últimos N días (y/o un máximo de entradas).
+- Lo más antiguo se mueve a segmentos mensuales comprimidos
+  `archivo_historico/<nombre>/<YYYY-MM>.jsonl.gz` (sólo anexado).
+- La compactación corre en un hilo de fondo de un solo worker (bloqueo de
+  archivo) y nunca pisa una escritura concurrente: si el archivo cambió
+  mientras se compactaba, se deshace lo anexado al archivo y se reintenta
+  en el próximo ciclo.
+- `leer_rango` combina caliente + archivo de forma transparente.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from bloqueo_archivo import adquirir_bloqueo_exclusivo, bloqueo_archivo
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_ARCHIVO = 'archivo_historico'
+INTERVALO_COMPACTACION_HORAS_DEFAULT = 6.0
+
+ExtractorFecha = Union[str, Callable[[Any], Any], None]
+
+
+def normalizar_fecha(valor: Any) -> Optional[str]:
+    """Convierte timestamps (ISO, 'YYYY-MM-DD HH:MM:SS', epoch) a 'YYYY-MM-DD'."""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, (int, float)):
+        try:
+            return datetime.fromtimestamp(valor).strftime('%Y-%m-%d')
+        except (OverflowError, OSError, ValueError):
+            return None
+    texto = str(valor).strip()
+    if len(texto) >= 10 and texto[4] == '-' and texto[7] == '-':
+        return texto[:10]
+    for formato in ('%d/%m/%Y', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(texto[:10], formato).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+
+def _ultima_respuesta(entrada: Any) -> Any:
+    """Fecha de la última respuesta registrada en aprendizaje_ia.json."""
+    respuestas = entrada.get('respuestas', []) if isinstance(entrada, dict) else []
+    return max((r.get('timestamp', 0) for r in respuestas if isinstance(r, dict)), default=None)
+
+
+class PoliticaRetencion:
+    """Política de retención de un archivo JSON."""
+
+    def __init__(self, nombre: str, archivo: str, campo_fecha: ExtractorFecha = None,
+                 dias_hot: Optional[int] = None, max_entradas: Optional[int] = None,
+                 coleccion: Optional[str] = None):
+        self.nombre = nombre
+        self.archivo = archivo
+        self.campo_fecha = campo_fecha
+        self.dias_hot = dias_hot
+        self.max_entradas = max_entradas
+        self.coleccion = coleccion
+
+    def fecha_de(self, registro: Any) -> Optional[str]:
+        if self.campo_fecha is None:
+            return None
+        if callable(self.campo_fecha):
+            return normalizar_fecha(self.campo_fecha(registro))
+        if isinstance(registro, dict):
+            return normalizar_fecha(registro.get(self.campo_fecha))
+        return None
+
+    def describir(self) -> Dict[str, Any]:
+        return {
+            'nombre': self.nombre,
+            'archivo': os.path.basename(self.archivo),
+            'dias_hot': self.dias_hot,
+            'max_entradas': self.max_entradas,
+            'coleccion': self.coleccion,
+        }
+
+
+def politicas_por_defecto(base_dir: str) -> List[PoliticaRetencion]:
+    """
+    Políticas de los históricos conocidos de SIBIA. seguimiento_horario.json
+    no tiene política: se reinicia cada día y nunca guarda más de una jornada.
+    """
+    ruta = lambda nombre: os.path.join(base_dir, nombre)
+    return [
+        PoliticaRetencion('historico_gases', ruta('historico_gases.json'), 'fecha_hora', dias_hot=30),
+        PoliticaRetencion('registros_materiales', ruta('registros_materiales.json'), 'fecha_hora', dias_hot=365),
+        PoliticaRetencion('asistente_hibrido_cache', ruta('asistente_hibrido_ultrarapido.json'),
+                          max_entradas=2000, coleccion='cache'),
+        PoliticaRetencion('aprendizaje_ia', ruta('aprendizaje_ia.json'), _ultima_respuesta,
+                          dias_hot=180, max_entradas=5000, coleccion='respuestas_frecuentes'),
+        PoliticaRetencion('respuestas_aprendidas', ruta('respuestas_aprendidas_sibia.json'),
+                          'fecha_aprendizaje', max_entradas=5000),
+        PoliticaRetencion('conocimiento_aprendido', ruta('conocimiento_aprendido.json'), max_entradas=5000),
+    ]
+
+
+class GestorRetencion:
+    """Aplica las políticas de retención y da acceso por rango al archivo."""
+
+    def __init__(self, base_dir: str, politicas: Optional[List[PoliticaRetencion]] = None,
+                 directorio_archivo: Optional[str] = None):
+        self.base_dir = base_dir
+        self.directorio_archivo = directorio_archivo or os.path.join(base_dir, DIRECTORIO_ARCHIVO)
+        self.politicas = {p.nombre: p for p in (politicas if politicas is not None else politicas_por_defecto(base_dir))}
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._detener = threading.Event()
+        self._bloqueo_proceso: Optional[IO] = None
+        self.ultimo_resultado: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------------
+    # Segmentos de archivo
+    # ------------------------------------------------------------------
+
+    def _dir_segmentos(self, nombre: str) -> str:
+        return os.path.join(self.directorio_archivo, nombre)
+
+    def _anexar_segmentos(self, nombre: str, por_mes: Dict[str, List[Any]]) -> Dict[str, int]:
+        """Anexa a los segmentos mensuales; devuelve el tamaño previo de cada uno para deshacer."""
+        directorio = self._dir_segmentos(nombre)
+        os.makedirs(directorio, exist_ok=True)
+        tamanos = {}
+        for mes, registros in por_mes.items():
+            ruta = os.path.join(directorio, f"{mes}.jsonl.gz")
+            tamanos[ruta] = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+            # gzip en modo 'at' agrega un miembro nuevo; la lectura los concatena
+            with gzip.open(ruta, 'at', encoding='utf-8') as f:
+                for registro in registros:
+                    f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        return tamanos
+
+    @staticmethod
+    def _deshacer_segmentos(tamanos: Dict[str, int]) -> None:
+        """Trunca los segmentos a su tamaño previo (quita el miembro gzip recién anexado)."""
+        for ruta, tamano in tamanos.items():
+            if tamano:
+                with open(ruta, 'r+b') as f:
+                    f.truncate(tamano)
+            elif os.path.exists(ruta):
+                os.remove(ruta)
+
+    @staticmethod
+    def _firma(ruta: str) -> Tuple[int, int]:
+        estado = os.stat(ruta)
+        return estado.st_mtime_ns, estado.st_size
+
+    def _leer_segmento(self, ruta: str) -> Iterator[Any]:
+        with gzip.open(ruta, 'rt', encoding='utf-8') as f:
+            for linea in f:
+                if linea.strip():
+                    yield json.loads(linea)
+
+    def segmentos(self, nombre: str) -> List[str]:
+        """Meses archivados disponibles (YYYY-MM) para una política."""
+        directorio = self._dir_segmentos(nombre)
+        if not os.path.isdir(directorio):
+            return []
+        return sorted(f[:7] for f in os.listdir(directorio) if f.endswith('.jsonl.gz'))
+
+    # ------------------------------------------------------------------
+    # Compactación
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _coleccion(datos: Any, politica: PoliticaRetencion) -> Any:
+        if politica.coleccion is None:
+            return datos
+        return datos.get(politica.coleccion) if isinstance(datos, dict) else None
+
+    def _seleccionar_archivables(self, politica: PoliticaRetencion,
+                                 entradas: List[Tuple[Any, Any]], hoy: datetime) -> set:
+        """Índices de las entradas que salen del archivo caliente."""
+        fechas = [politica.fecha_de(registro) for _, registro in entradas]
+        archivar = set()
+        if politica.dias_hot:
+            corte = (hoy - timedelta(days=politica.dias_hot)).strftime('%Y-%m-%d')
+            archivar.update(i for i, f in enumerate(fechas) if f is not None and f < corte)
+        if politica.max_entradas:
+            restantes = [i for i in range(len(entradas)) if i not in archivar]
+            exceso = len(restantes) - politica.max_entradas
+            if exceso > 0:
+                # Las más antiguas primero; sin fecha se asume orden de inserción
+                restantes.sort(key=lambda i: (fechas[i] or '', i))
+                archivar.update(restantes[:exceso])
+        return archivar
+
+    def compactar(self, nombre: str, hoy: Optional[datetime] = None) -> Dict[str, Any]:
+        """Mueve al archivo mensual lo que excede la política de `nombre`."""
+        politica = self.politicas[nombre]
+        hoy = hoy or datetime.now()
+        resultado = {'nombre': nombre, 'archivados': 0, 'en_caliente': 0, 'estado': 'sin_cambios'}
+        if not os.path.exists(politica.archivo):
+            resultado['estado'] = 'sin_archivo'
+            return resultado
+
+        with self._lock, bloqueo_archivo(politica.archivo):
+            firma = self._firma(politica.archivo)
+            with open(politica.archivo, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            coleccion = self._coleccion(datos, politica)
+            if isinstance(coleccion, list):
+                entradas = [(None, r) for r in coleccion]
+            elif isinstance(coleccion, dict):
+                entradas = list(coleccion.items())
+            else:
+                resultado['estado'] = 'formato_no_soportado'
+                return resultado
+
+            archivar = self._seleccionar_archivables(politica, entradas, hoy)
+            resultado['en_caliente'] = len(entradas) - len(archivar)
+            if not archivar:
+                return resultado
+
+            por_mes: Dict[str, List[Any]] = {}
+            mes_actual = hoy.strftime('%Y-%m')
+            for i in sorted(archivar):
+                clave, registro = entradas[i]
+                fecha = politica.fecha_de(registro)
+                linea = registro if clave is None else {'clave': clave, 'registro': registro}
+                por_mes.setdefault(fecha[:7] if fecha else mes_actual, []).append(linea)
+
+            conservar = [entradas[i] for i in range(len(entradas)) if i not in archivar]
+            nueva = [r for _, r in conservar] if isinstance(coleccion, list) else dict(conservar)
+            if politica.coleccion is None:
+                datos = nueva
+            else:
+                datos[politica.coleccion] = nueva
+
+            tmp = f"{politica.archivo}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, indent=4, ensure_ascii=False)
+            tamanos = self._anexar_segmentos(nombre, por_mes)
+
+            # No pisar escrituras concurrentes de la aplicación: se verifica justo antes
+            # de reemplazar; si cambió, se deshace lo archivado (evita perder entradas
+            # nuevas o duplicar en el archivo las que siguen en caliente)
+            if self._firma(politica.archivo) != firma:
+                self._deshacer_segmentos(tamanos)
+                os.remove(tmp)
+                resultado['estado'] = 'modificado_durante_compactacion'
+                return resultado
+            os.replace(tmp, politica.archivo)
+
+        resultado.update({'archivados': len(archivar), 'estado': 'compactado', 'meses': sorted(por_mes)})
+        logger.info(f"🗄️ Retención {nombre}: {len(archivar)} entradas archivadas, {resultado['en_caliente']} en caliente")
+        return resultado
+
+    def compactar_todo(self) -> Dict[str, Any]:
+        """Compacta todos los archivos con política; los errores no detienen al resto."""
+        resultados = {}
+        for nombre in self.politicas:
+            try:
+                resultados[nombre] = self.compactar(nombre)
+            except Exception as e:
+                logger.error(f"Error compactando {nombre}: {e}", exc_info=True)
+                resultados[nombre] = {'nombre': nombre, 'estado': 'error', 'error': str(e)}
+        self.ultimo_resultado = {'timestamp': datetime.now().isoformat(), 'resultados': resultados}
+        return self.ultimo_resultado
+
+    # ------------------------------------------------------------------
+    # Hilo de fondo
+    # ------------------------------------------------------------------
+
+    def iniciar_en_segundo_plano(self, intervalo_horas: float = INTERVALO_COMPACTACION_HORAS_DEFAULT) -> bool:
+        """
+        Compacta al arrancar y luego cada `intervalo_horas` en un hilo daemon.
+        Con varios workers sólo el que obtiene el bloqueo de compactación
+        arranca el hilo; devuelve False en los demás.
+        """
+        if self._hilo and self._hilo.is_alive():
+            return True
+        if self._bloqueo_proceso is None:
+            self._bloqueo_proceso = adquirir_bloqueo_exclusivo(os.path.join(self.base_dir, '.retencion_compactacion'))
+            if self._bloqueo_proceso is None:
+                logger.info("🗄️ Compactación de históricos a cargo de otro worker")
+                return False
+        self._detener.clear()
+
+        def ciclo():
+            while not self._detener.is_set():
+                self.compactar_todo()
+                self._detener.wait(intervalo_horas * 3600)
+
+        self._hilo = threading.Thread(target=ciclo, name='retencion-historicos', daemon=True)
+        self._hilo.start()
+        logger.info(f"🗄️ Compactación de históricos en segundo plano cada {intervalo_horas}h (pid {os.getpid()})")
+        return True
+
+    def detener(self) -> None:
+        self._detener.set()
+
+    # ------------------------------------------------------------------
+    # Lectura transparente
+    # ------------------------------------------------------------------
+
+    def leer_rango(self, nombre: str, desde: Optional[str] = None,
+                   hasta: Optional[str] = None) -> List[Any]:
+        """
+        Entradas de `nombre` con fecha entre `desde` y `hasta` (YYYY-MM-DD,
+        inclusive), combinando segmentos archivados y archivo caliente.
+        Las colecciones tipo diccionario se devuelven como {'clave', 'registro'}.
+        """
+        politica = self.politicas[nombre]
+        dentro = lambda f: f is not None and (not desde or f >= desde) and (not hasta or f <= hasta[:10])
+
+        resultado: List[Any] = []
+        for mes in self.segmentos(nombre):
+            if (desde and mes < desde[:7]) or (hasta and mes > hasta[:7]):
+                continue
+            for linea in self._leer_segmento(os.path.join(self._dir_segmentos(nombre), f"{mes}.jsonl.gz")):
+                registro = linea['registro'] if isinstance(linea, dict) and set(linea) == {'clave', 'registro'} else linea
+                if politica.campo_fecha is None or dentro(politica.fecha_de(registro)):
+                    resultado.append(linea)
+
+        if os.path.exists(politica.archivo):
+            with open(politica.archivo, 'r', encoding='utf-8') as f:
+                coleccion = self._coleccion(json.load(f), politica)
+            if isinstance(coleccion, dict):
+                caliente = [{'clave': k, 'registro': v} for k, v in coleccion.items()]
+                resultado.extend(e for e in caliente if politica.campo_fecha is None or dentro(politica.fecha_de(e['registro'])))
+            elif isinstance(coleccion, list):
+                resultado.extend(r for r in coleccion if politica.campo_fecha is None or dentro(politica.fecha_de(r)))
+        return resultado
+
+    def estado(self) -> Dict[str, Any]:
+        """Tamaño caliente y meses archivados por política."""
+        estado = {}
+        for nombre, politica in self.politicas.items():
+            estado[nombre] = {
+                **politica.describir(),
+                'bytes_caliente': os.path.getsize(politica.archivo) if os.path.exists(politica.archivo) else 0,
+                'meses_archivados': self.segmentos(nombre),
+            }
+        return {'politicas': estado, 'ultima_compactacion': self.ultimo_resultado}
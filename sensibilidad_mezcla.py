@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ANÁLISIS DE SENSIBILIDAD (JACOBIANO) DE LA MEZCLA
+=================================================
+
+Derivadas de kW total, % de metano y tn totales de una mezcla respecto de
+cada material:
+
+- 'tn':    cantidad cargada (tn)
+- 'kw_tn': eficiencia del material (kW/tn)
+- 'st':    sólidos totales, en puntos porcentuales (el kW/tn es
+           proporcional al ST, ver tabla_energia)
+
+Sobre la matriz de materiales el modelo es lineal/racional y el jacobiano
+sale en forma cerrada:
+
+    kW  = Σ tn·kw_tn          ∂kW/∂tn = kw_tn    ∂kW/∂kw_tn = tn    ∂kW/∂ST = tn·kw_tn/ST
+    CH4 = Σ tn·ch4 / Σ tn     ∂CH4/∂tn = (ch4 − CH4) / Σ tn
+    T   = Σ tn                ∂T/∂tn = 1
+
+Para otros modelos (o si la forma cerrada no es finita) se usan diferencias
+centrales: las 3·n perturbaciones se evalúan juntas como un lote k × n.
+Con el jacobiano, cualquier what-if de una variable ("¿y si el ST del
+silaje baja 2 puntos?") es un producto, sin recalcular la mezcla.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from matriz_materiales import MatrizMateriales, _float
+
+logger = logging.getLogger(__name__)
+
+SALIDAS = ('kw_total', 'porcentaje_metano', 'tn_total')
+VARIABLES = ('tn', 'kw_tn', 'st')
+GRUPOS_MEZCLA = ('materiales_solidos', 'materiales_liquidos', 'materiales_purin')
+PASO_RELATIVO_DEFAULT = 1e-4
+PASO_MINIMO = 1e-6
+
+# modelo(tn, kw_tn, st_pct) con arreglos k × n → {salida: arreglo (k,)}
+Modelo = Callable[[np.ndarray, np.ndarray, np.ndarray], Dict[str, np.ndarray]]
+
+
+def cantidades_de_resultado(resultado: Dict[str, Any]) -> Dict[str, float]:
+    """{material: tn} de un resultado con el formato de calcular_mezcla_diaria."""
+    cantidades = {}
+    for grupo in GRUPOS_MEZCLA:
+        for nombre, datos in (resultado.get(grupo) or {}).items():
+            if isinstance(datos, dict):
+                tn = _float(datos.get('cantidad_tn', datos.get('tn_usadas')))
+            else:
+                tn = _float(datos)
+            if tn > 0:
+                cantidades[nombre] = cantidades.get(nombre, 0.0) + tn
+    return cantidades
+
+
+def modelo_lineal(matriz: MatrizMateriales, st_referencia: np.ndarray) -> Modelo:
+    """Modelo de la matriz: kW/tn escalado por ST ÷ ST de referencia, CH4 ponderado por tn."""
+    ch4 = matriz.ch4_gestion * 100
+
+    def evaluar(tn: np.ndarray, kw_tn: np.ndarray, st_pct: np.ndarray) -> Dict[str, np.ndarray]:
+        factor_st = np.divide(st_pct, st_referencia, out=np.ones_like(st_pct), where=st_referencia > 0)
+        tn_total = tn.sum(axis=-1)
+        return {
+            'kw_total': (tn * kw_tn * factor_st).sum(axis=-1),
+            'porcentaje_metano': np.divide((tn * ch4).sum(axis=-1), tn_total,
+                                           out=np.zeros_like(tn_total), where=tn_total > 0),
+            'tn_total': tn_total,
+        }
+    return evaluar
+
+
+def jacobiano_analitico(tn: np.ndarray, kw_tn: np.ndarray, st_pct: np.ndarray,
+                        ch4_pct: np.ndarray) -> Dict[str, Dict[str, np.ndarray]]:
+    """{variable: {salida: derivada por material (n,)}} en forma cerrada."""
+    n = len(tn)
+    tn_total = tn.sum()
+    ch4_mezcla = tn @ ch4_pct / tn_total if tn_total > 0 else 0.0
+    ceros = np.zeros(n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d_ch4_tn = (ch4_pct - ch4_mezcla) / tn_total if tn_total > 0 else np.full(n, np.nan)
+        d_kw_st = np.where(st_pct > 0, tn * kw_tn / st_pct, np.where(tn > 0, np.nan, 0.0))
+    return {
+        'tn': {'kw_total': kw_tn.copy(), 'porcentaje_metano': d_ch4_tn, 'tn_total': np.ones(n)},
+        'kw_tn': {'kw_total': tn.copy(), 'porcentaje_metano': ceros, 'tn_total': ceros},
+        'st': {'kw_total': d_kw_st, 'porcentaje_metano': ceros, 'tn_total': ceros},
+    }
+
+
+def jacobiano_diferencias(modelo: Modelo, tn: np.ndarray, kw_tn: np.ndarray, st_pct: np.ndarray,
+                          paso_relativo: float = PASO_RELATIVO_DEFAULT) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Diferencias centrales de `modelo` en las 3 variables de los n materiales:
+    un único lote de 2·3·n mezclas perturbadas.
+    """
+    n = len(tn)
+    base = np.stack([tn, kw_tn, st_pct])                          # 3 × n
+    pasos = np.maximum(np.abs(base) * paso_relativo, PASO_MINIMO)  # 3 × n
+    # Lote: para cada (variable v, material i) una fila +h y una fila −h
+    lote = np.broadcast_to(base, (2, 3, n, 3, n)).copy()          # signo, v, i, variable, material
+    v_idx, i_idx = np.meshgrid(np.arange(3), np.arange(n), indexing='ij')
+    lote[0, v_idx, i_idx, v_idx, i_idx] += pasos
+    lote[1, v_idx, i_idx, v_idx, i_idx] -= pasos
+    # Ninguna variable puede ser negativa: la fila −h de un valor 0 queda en 0 (diferencia hacia adelante)
+    np.maximum(lote, 0.0, out=lote)
+    filas = lote.reshape(2 * 3 * n, 3, n)
+    salidas = modelo(filas[:, 0], filas[:, 1], filas[:, 2])
+
+    h_real = (lote[0, v_idx, i_idx, v_idx, i_idx] - lote[1, v_idx, i_idx, v_idx, i_idx])  # 3 × n
+    jacobiano = {}
+    for v, variable in enumerate(VARIABLES):
+        jacobiano[variable] = {}
+        for salida in SALIDAS:
+            valores = np.asarray(salidas[salida]).reshape(2, 3, n)
+            jacobiano[variable][salida] = (valores[0, v] - valores[1, v]) / h_real[v]
+    return jacobiano
+
+
+def analizar_sensibilidad(matriz: MatrizMateriales, cantidades: Dict[str, float],
+                          kw_tn: Optional[np.ndarray] = None, st: Optional[np.ndarray] = None,
+                          metodo: str = 'auto', modelo: Optional[Modelo] = None,
+                          variaciones: Optional[List[Dict[str, Any]]] = None,
+                          todos: bool = False) -> Dict[str, Any]:
+    """
+    Jacobiano de la mezcla `cantidades` ({material: tn}).
+
+    Args:
+        kw_tn, st: propiedades efectivas alineadas a la matriz (st en fracción,
+            p. ej. las de MatrizMateriales.propiedades_stock); por defecto las del catálogo.
+        metodo: 'analitico', 'diferencias' o 'auto' (analítico salvo que se pase
+            `modelo` o que la forma cerrada no sea finita).
+        variaciones: [{"material", "variable": tn|kw_tn|st, "delta"}] → predicción lineal de cada una.
+        todos: incluir también los materiales del catálogo que no están en la mezcla.
+    """
+    if metodo not in ('auto', 'analitico', 'diferencias'):
+        raise ValueError(f"Método desconocido: {metodo}")
+    if modelo is not None and metodo == 'analitico':
+        raise ValueError("El método analítico sólo aplica al modelo lineal de la matriz")
+
+    tn = matriz.vector(cantidades)
+    desconocidos = [m for m in cantidades if matriz.indice_de(m) is None]
+    kw_tn = matriz.kw_tn if kw_tn is None else np.asarray(kw_tn, dtype=float)
+    st_pct = (matriz.st if st is None else np.asarray(st, dtype=float)) * 100
+    ch4_pct = matriz.ch4_gestion * 100
+    evaluar = modelo or modelo_lineal(matriz, st_pct)
+    base = {s: float(np.asarray(v).reshape(-1)[0]) for s, v in evaluar(tn[None, :], kw_tn[None, :], st_pct[None, :]).items()}
+
+    usado = 'diferencias' if modelo is not None or metodo == 'diferencias' else 'analitico'
+    if usado == 'analitico':
+        jac = jacobiano_analitico(tn, kw_tn, st_pct, ch4_pct)
+        en_mezcla = tn > 0
+        finito = all(np.isfinite(d[en_mezcla]).all() for derivadas in jac.values() for d in derivadas.values())
+        if not finito:
+            if metodo == 'analitico':
+                raise ValueError("El jacobiano analítico no es finito (mezcla vacía o ST nulo)")
+            logger.info("🧮 Jacobiano analítico no finito, usando diferencias finitas")
+            usado = 'diferencias'
+    if usado == 'diferencias':
+        jac = jacobiano_diferencias(evaluar, tn, kw_tn, st_pct)
+
+    indices = range(len(matriz)) if todos else np.flatnonzero(tn > 0)
+    materiales = {}
+    for i in indices:
+        materiales[matriz.nombres[i]] = {
+            'tn': round(float(tn[i]), 4),
+            'kw_tn': round(float(kw_tn[i]), 6),
+            'st': round(float(st_pct[i]), 4),
+            'derivadas': {v: {s: round(float(np.nan_to_num(jac[v][s][i])), 6) for s in SALIDAS} for v in VARIABLES},
+        }
+
+    salida = {
+        'metodo': usado,
+        'base': {s: round(v, 4) for s, v in base.items()},
+        'unidades': {'tn': 'por tn', 'kw_tn': 'por kW/tn', 'st': 'por punto de ST (%)'},
+        'materiales': materiales,
+        'desconocidos': desconocidos,
+    }
+    if variaciones:
+        salida['escenarios'] = [_predecir(matriz, jac, base, v) for v in variaciones]
+    return salida
+
+
+def _predecir(matriz: MatrizMateriales, jac: Dict[str, Dict[str, np.ndarray]], base: Dict[str, float],
+              variacion: Dict[str, Any]) -> Dict[str, Any]:
+    """Predicción lineal base + J·Δ de una variación de una sola variable."""
+    material = variacion.get('material')
+    variable = variacion.get('variable', 'st')
+    delta = _float(variacion.get('delta'))
+    i = matriz.indice_de(material) if material else None
+    if i is None or variable not in VARIABLES:
+        return {**variacion, 'error': 'material o variable desconocidos'}
+    prediccion = {s: round(base[s] + float(np.nan_to_num(jac[variable][s][i])) * delta, 4) for s in SALIDAS}
+    return {
+        'material': matriz.nombres[i], 'variable': variable, 'delta': delta,
+        'prediccion': prediccion,
+        'cambio': {s: round(prediccion[s] - base[s], 4) for s in SALIDAS},
+    }
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LIBRO DE MOVIMIENTOS DE STOCK (EVENT SOURCING)
+==============================================
+
+Registra cada cambio de stock como un movimiento inmutable (entrada, consumo,
+ajuste) en un archivo JSONL de sólo-anexado, con snapshots materializados
+periódicos. El stock actual se mantiene en memoria (snapshot + movimientos
+posteriores) y se vuelca a `stock.json` para los lectores existentes.
+
+Con varios workers de gunicorn cada proceso tiene su propia copia en
+memoria: las escrituras se hacen bajo un bloqueo de archivo (fcntl) y, antes
+de registrar o consultar, cada proceso aplica la cola del libro que anexaron
+los demás. El número de secuencia sale siempre de la última línea del libro.
+`stock.json` es sólo una vista derivada; los cambios manuales se hacen con
+`reconciliar`.
+
+Permite consultar el stock a una fecha/hora dada y obtener consumos por
+material sin recorrer los registros de camiones.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bloqueo_archivo import bloqueo_archivo
+
+logger = logging.getLogger(__name__)
+
+TIPOS_MOVIMIENTO = ('entrada', 'consumo', 'ajuste')
+
+# Cada cuántos movimientos se materializa un snapshot
+SNAPSHOT_CADA_MOVIMIENTOS = 200
+
+# Snapshots conservados en disco (además del inicial, que se guarda siempre)
+MAX_SNAPSHOTS = 50
+
+# Diferencia mínima de toneladas para registrar un ajuste por reconciliación
+TOLERANCIA_AJUSTE_TN = 1e-6
+
+
+def _ahora() -> str:
+    return datetime.now().isoformat()
+
+
+class StockLedger:
+    """Stock de materiales derivado de un libro de movimientos anexable."""
+
+    def __init__(self, stock_file: str, ledger_file: Optional[str] = None,
+                 snapshots_file: Optional[str] = None,
+                 snapshot_cada: int = SNAPSHOT_CADA_MOVIMIENTOS,
+                 max_snapshots: int = MAX_SNAPSHOTS):
+        base = os.path.dirname(os.path.abspath(stock_file))
+        self.stock_file = stock_file
+        self.ledger_file = ledger_file or os.path.join(base, 'stock_movimientos.jsonl')
+        self.snapshots_file = snapshots_file or os.path.join(base, 'stock_snapshots.json')
+        self.snapshot_cada = snapshot_cada
+        self.max_snapshots = max(2, max_snapshots)
+        self._lock = threading.RLock()
+        self._materiales: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0
+        self._offset = 0  # bytes del libro ya aplicados en memoria
+        self._snapshots: List[Dict[str, Any]] = []
+        self._pendientes: List[Dict[str, Any]] = []
+        self._inicializado = False
+
+    # ------------------------------------------------------------------
+    # Inicialización
+    # ------------------------------------------------------------------
+
+    def _inicializar(self) -> None:
+        if self._inicializado:
+            return
+        with bloqueo_archivo(self.ledger_file):
+            self._snapshots = self._leer_snapshots()
+            if self._snapshots:
+                ultimo = self._snapshots[-1]
+                self._materiales = copy.deepcopy(ultimo['materiales'])
+                self._seq = ultimo['seq']
+                self._offset = ultimo.get('offset', 0)
+                self._sincronizar()
+                logger.info(f"📒 Stock reconstruido: snapshot #{ultimo['seq']} + {self._seq - ultimo['seq']} movimientos")
+            else:
+                # Primer arranque: el stock.json existente es el estado inicial
+                stock_data = self._leer_stock_file()
+                self._materiales = copy.deepcopy(stock_data.get('materiales', {}))
+                self._offset = self._offset_actual()
+                self._seq = self._ultima_secuencia()
+                self._tomar_snapshot()
+                logger.info(f"📒 Libro de stock inicializado con {len(self._materiales)} materiales")
+            # stock.json es una vista derivada: se regenera desde el libro
+            self._escribir_stock_file()
+            self._inicializado = True
+
+    def _leer_stock_file(self) -> Dict[str, Any]:
+        try:
+            if os.path.exists(self.stock_file):
+                with open(self.stock_file, 'r', encoding='utf-8') as f:
+                    datos = json.load(f)
+                if isinstance(datos, dict):
+                    return datos
+        except Exception as e:
+            logger.error(f"Error leyendo {self.stock_file}: {e}")
+        return {'materiales': {}}
+
+    def _sincronizar(self) -> None:
+        """Aplica los movimientos que otros procesos anexaron desde la última lectura."""
+        if self._offset_actual() < self._offset:
+            logger.warning("⚠️ El libro de stock se achicó; reconstruyendo desde los snapshots")
+            self._inicializado = False
+            self._inicializar()
+            return
+        movimientos, self._offset = self._leer_cola(self._offset)
+        for mov in movimientos:
+            self._aplicar(mov)
+            self._seq = mov['seq']
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    def _leer_cola(self, desde_offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Movimientos completos desde `desde_offset` y el offset hasta donde se leyó."""
+        if not os.path.exists(self.ledger_file):
+            return [], desde_offset
+        with open(self.ledger_file, 'rb') as f:
+            f.seek(desde_offset)
+            datos = f.read()
+        # Una línea sin salto final puede ser una escritura en curso: se lee la próxima vez
+        completo = datos[:datos.rfind(b'\n') + 1]
+        movimientos = []
+        for linea in completo.splitlines():
+            if not linea.strip():
+                continue
+            try:
+                movimientos.append(json.loads(linea.decode('utf-8')))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                logger.warning("Línea corrupta ignorada en el libro de stock")
+        return movimientos, desde_offset + len(completo)
+
+    def _leer_movimientos(self, desde_offset: int = 0):
+        return iter(self._leer_cola(desde_offset)[0])
+
+    def _ultima_secuencia(self) -> int:
+        """Secuencia de la última línea del libro (0 si está vacío)."""
+        if not os.path.exists(self.ledger_file):
+            return 0
+        with open(self.ledger_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            tamano = f.tell()
+            bloque = 4096
+            while True:
+                inicio = max(0, tamano - bloque)
+                f.seek(inicio)
+                lineas = [l for l in f.read(tamano - inicio).splitlines() if l.strip()]
+                if len(lineas) > 1 or inicio == 0:
+                    break
+                bloque *= 2
+        for linea in reversed(lineas):
+            try:
+                return int(json.loads(linea.decode('utf-8'))['seq'])
+            except (ValueError, KeyError, UnicodeDecodeError):
+                continue
+        return 0
+
+    def _volcar_pendientes(self) -> None:
+        """Anexa al archivo los movimientos registrados en memoria (una sola escritura)."""
+        if not self._pendientes:
+            return
+        with open(self.ledger_file, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(m, ensure_ascii=False) + '\n' for m in self._pendientes))
+        self._pendientes = []
+        # Bajo el bloqueo nadie más escribe: lo anexado ya está aplicado en memoria
+        self._offset = self._offset_actual()
+
+    def _offset_actual(self) -> int:
+        return os.path.getsize(self.ledger_file) if os.path.exists(self.ledger_file) else 0
+
+    def _leer_snapshots(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.snapshots_file):
+            return []
+        try:
+            with open(self.snapshots_file, 'r', encoding='utf-8') as f:
+                return json.load(f) or []
+        except Exception as e:
+            logger.error(f"Error cargando snapshots de stock: {e}")
+            return []
+
+    def _tomar_snapshot(self) -> None:
+        """Materializa el estado actual; se llama con el bloqueo de archivo tomado."""
+        self._volcar_pendientes()
+        snapshots = self._leer_snapshots()
+        if snapshots and snapshots[-1]['seq'] >= self._seq:
+            # Otro proceso ya materializó este punto (o uno posterior)
+            self._snapshots = snapshots
+            return
+        snapshots.append({
+            'seq': self._seq,
+            'timestamp': _ahora(),
+            'offset': self._offset,
+            'materiales': copy.deepcopy(self._materiales),
+        })
+        if len(snapshots) > self.max_snapshots:
+            # El primero es el estado inicial del libro: permite consultar cualquier fecha
+            snapshots = snapshots[:1] + snapshots[-(self.max_snapshots - 1):]
+        tmp = f"{self.snapshots_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snapshots, f, ensure_ascii=False)
+        os.replace(tmp, self.snapshots_file)
+        self._snapshots = snapshots
+
+    def _escribir_stock_file(self) -> None:
+        self._volcar_pendientes()
+        tmp = f"{self.stock_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'materiales': self._materiales}, f, indent=4, ensure_ascii=False)
+        os.replace(tmp, self.stock_file)
+
+    # ------------------------------------------------------------------
+    # Aplicación de movimientos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _aplicar_en(materiales: Dict[str, Dict[str, Any]], mov: Dict[str, Any]) -> None:
+        """Aplica un movimiento sobre un diccionario de materiales."""
+        material = mov['material']
+        info = materiales.setdefault(material, {'total_tn': 0.0, 'st_porcentaje': 0.0, 'total_solido': 0.0})
+        total_tn = float(info.get('total_tn', 0.0))
+        total_solido = float(info.get('total_solido', 0.0))
+        delta = float(mov.get('tn', 0.0))
+
+        if mov['tipo'] == 'entrada':
+            st_pct = float(mov.get('st_porcentaje') or 0.0)
+            if st_pct <= 0:
+                st_pct = float(info.get('st_porcentaje', 0.0) or 0.0)
+            info['total_solido'] = total_solido + delta * (float(st_pct) / 100.0)
+            info['total_tn'] = total_tn + delta
+            info['st_porcentaje'] = float(info.get('st_porcentaje') or st_pct)
+        elif mov['tipo'] == 'consumo':
+            nuevo_tn = max(0.0, total_tn - delta)
+            info['total_solido'] = total_solido * (nuevo_tn / total_tn) if total_tn > 0 else 0.0
+            info['total_tn'] = nuevo_tn
+        else:  # ajuste
+            nuevo_tn = max(0.0, total_tn + delta)
+            if mov.get('total_solido') is not None:
+                info['total_solido'] = float(mov['total_solido'])
+            elif total_tn > 0:
+                info['total_solido'] = total_solido * (nuevo_tn / total_tn)
+            info['total_tn'] = nuevo_tn
+
+        info.update(mov.get('atributos') or {})
+        info['ultima_actualizacion'] = mov['timestamp'][:19].replace('T', ' ')
+        if mov.get('eliminar'):
+            materiales.pop(material, None)
+
+    def _aplicar(self, mov: Dict[str, Any]) -> None:
+        self._aplicar_en(self._materiales, mov)
+
+    def _registrar(self, tipo: str, material: str, tn: float, **extra: Any) -> Dict[str, Any]:
+        if tipo not in TIPOS_MOVIMIENTO:
+            raise ValueError(f"Tipo de movimiento inválido: {tipo}")
+        self._seq += 1
+        mov = {'seq': self._seq, 'timestamp': _ahora(), 'tipo': tipo, 'material': material, 'tn': float(tn)}
+        mov.update({k: v for k, v in extra.items() if v is not None})
+        self._pendientes.append(mov)
+        self._aplicar(mov)
+        if self._seq - (self._snapshots[-1]['seq'] if self._snapshots else 0) >= self.snapshot_cada:
+            self._tomar_snapshot()
+        return mov
+
+    def _reconciliar(self, materiales_objetivo: Dict[str, Any], origen: str,
+                     referencia: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Emite ajustes para que el estado actual coincida con `materiales_objetivo`."""
+        movimientos = []
+        for material, objetivo in materiales_objetivo.items():
+            if not isinstance(objetivo, dict):
+                continue
+            actual = self._materiales.get(material, {})
+            tn_objetivo = float(objetivo.get('total_tn', 0.0) or 0.0)
+            delta = tn_objetivo - float(actual.get('total_tn', 0.0))
+            atributos = {k: v for k, v in objetivo.items()
+                         if k not in ('total_tn', 'total_solido', 'ultima_actualizacion') and actual.get(k) != v}
+            if abs(delta) > TOLERANCIA_AJUSTE_TN or atributos or material not in self._materiales:
+                movimientos.append(self._registrar(
+                    'ajuste', material, delta, origen=origen, referencia=referencia,
+                    total_solido=objetivo.get('total_solido'), atributos=atributos or None))
+        for material in [m for m in self._materiales if m not in materiales_objetivo]:
+            delta = -float(self._materiales[material].get('total_tn', 0.0))
+            movimientos.append(self._registrar(
+                'ajuste', material, delta, origen=origen, referencia=referencia, eliminar=True))
+        return movimientos
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def registrar_movimiento(self, tipo: str, material: str, tn: float,
+                             st_porcentaje: Optional[float] = None, origen: str = '',
+                             referencia: Optional[str] = None,
+                             atributos: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Registra una entrada, consumo o ajuste (delta) y actualiza stock.json."""
+        if tipo in ('entrada', 'consumo') and float(tn) <= 0:
+            raise ValueError("Las entradas y consumos requieren toneladas positivas")
+        with self._lock, bloqueo_archivo(self.ledger_file):
+            self._inicializar()
+            self._sincronizar()
+            mov = self._registrar(tipo, material, tn, st_porcentaje=st_porcentaje,
+                                  origen=origen or None, referencia=referencia, atributos=atributos)
+            self._escribir_stock_file()
+            return mov
+
+    def registrar_lote(self, movimientos: List[Dict[str, Any]], origen: str = '') -> List[Dict[str, Any]]:
+        """Valida y registra varios movimientos; stock.json se escribe una sola vez."""
+        for m in movimientos:
+            if m['tipo'] not in TIPOS_MOVIMIENTO:
+                raise ValueError(f"Tipo de movimiento inválido: {m['tipo']}")
+            if m['tipo'] in ('entrada', 'consumo') and float(m['tn']) <= 0:
+                raise ValueError("Las entradas y consumos requieren toneladas positivas")
+        with self._lock, bloqueo_archivo(self.ledger_file):
+            self._inicializar()
+            self._sincronizar()
+            registrados = []
+            for m in movimientos:
+                registrados.append(self._registrar(
+                    m['tipo'], m['material'], m['tn'], st_porcentaje=m.get('st_porcentaje'),
+                    origen=m.get('origen') or origen or None, referencia=m.get('referencia'),
+                    atributos=m.get('atributos')))
+            if registrados:
+                self._escribir_stock_file()
+            return registrados
+
+    def reconciliar(self, stock_data: Dict[str, Any], origen: str = 'edicion_manual') -> List[Dict[str, Any]]:
+        """Reemplaza el stock completo registrando los ajustes necesarios."""
+        with self._lock, bloqueo_archivo(self.ledger_file):
+            self._inicializar()
+            self._sincronizar()
+            movimientos = self._reconciliar(stock_data.get('materiales', {}), origen=origen)
+            self._escribir_stock_file()
+            return movimientos
+
+    def actualizar_atributos(self, material: str, atributos: Dict[str, Any], origen: str = '') -> Optional[Dict[str, Any]]:
+        """Actualiza atributos (ST, tipo, densidad...) de un material sin mover toneladas."""
+        with self._lock, bloqueo_archivo(self.ledger_file):
+            self._inicializar()
+            self._sincronizar()
+            if material not in self._materiales:
+                return None
+            mov = self._registrar('ajuste', material, 0.0, origen=origen or None, atributos=atributos)
+            self._escribir_stock_file()
+            return mov
+
+    def stock_actual(self) -> Dict[str, Any]:
+        """Vista actual del stock con el formato de stock.json (copia)."""
+        with self._lock:
+            self._inicializar()
+            self._sincronizar()
+            return {'materiales': copy.deepcopy(self._materiales)}
+
+    def stock_en(self, momento: str) -> Dict[str, Any]:
+        """Stock tal como estaba en `momento` (ISO): snapshot previo + movimientos hasta esa hora."""
+        with self._lock:
+            self._inicializar()
+            self._snapshots = self._leer_snapshots() or self._snapshots
+            base = None
+            for snap in self._snapshots:
+                if snap['timestamp'] <= momento:
+                    base = snap
+                else:
+                    break
+            if base is None:
+                return {'materiales': {}, 'seq': 0}
+            materiales = copy.deepcopy(base['materiales'])
+            seq = base['seq']
+            for mov in self._leer_movimientos(desde_offset=base.get('offset', 0)):
+                if mov['timestamp'] > momento:
+                    break
+                self._aplicar_en(materiales, mov)
+                seq = mov['seq']
+            return {'materiales': materiales, 'seq': seq}
+
+    def movimientos(self, desde: Optional[str] = None, hasta: Optional[str] = None,
+                    material: Optional[str] = None, tipo: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Movimientos filtrados por rango de tiempo ISO, material y tipo."""
+        with self._lock:
+            self._inicializar()
+            self._snapshots = self._leer_snapshots() or self._snapshots
+            offset = 0
+            if desde:
+                for snap in self._snapshots:
+                    if snap['timestamp'] <= desde:
+                        offset = snap.get('offset', 0)
+            resultado = []
+            for mov in self._leer_movimientos(desde_offset=offset):
+                if desde and mov['timestamp'] < desde:
+                    continue
+                if hasta and mov['timestamp'] > hasta:
+                    break
+                if material and mov['material'] != material:
+                    continue
+                if tipo and mov['tipo'] != tipo:
+                    continue
+                resultado.append(mov)
+            return resultado
+
+    def consumos_por_material(self, desde: Optional[str] = None, hasta: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Totales de entradas, consumos y ajustes por material en el rango."""
+        totales: Dict[str, Dict[str, float]] = {}
+        for mov in self.movimientos(desde, hasta):
+            t = totales.setdefault(mov['material'], {'entrada': 0.0, 'consumo': 0.0, 'ajuste': 0.0})
+            t[mov['tipo']] += float(mov.get('tn', 0.0))
+        return totales
+
+    @property
+    def secuencia(self) -> int:
+        """Número del último movimiento; sirve como versión del stock."""
+        with self._lock:
+            self._inicializar()
+            self._sincronizar()
+            return self._seq
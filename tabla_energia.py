@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TABLA MATERIALIZADA DE ENERGÍA POR MATERIAL
+===========================================
+
+kW/tn efectivo de cada material del catálogo, calculado una sola vez y
+recalculado sólo cuando cambia alguna de sus entradas:
+
+- 'catalogo':  materiales_base_config.json (st, sv, m3_tnsv, ch4, kw/tn)
+- 'registros': descargas de camiones (promedio de ST de los últimos N)
+- 'motor':     consumo del CHP (m³ de biogás por kW, `consumo_chp_global`)
+
+    kW/tn = kW/tn catálogo × (ST camiones ÷ ST catálogo) × (505 ÷ consumo CHP)
+
+(si el catálogo no trae kw/tn se deriva de st·sv·m3_tnsv·ch4 / consumo CHP,
+igual que en MatrizMateriales). Cada dependencia expone una versión barata
+de consultar (mtime, contador); la tabla sólo recarga la entrada que cambió.
+`version` es la huella de las tres versiones y sirve como clave de caché
+para cualquier cálculo que use la tabla.
+
+Autor: SIBIA - Sistema Inteligente de Biogás Avanzado
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from matriz_materiales import CONSUMO_CHP_DEFAULT, MatrizMateriales, _float
+
+logger = logging.getLogger(__name__)
+
+DEPENDENCIAS = ('catalogo', 'registros', 'motor')
+MAX_CAMIONES_DEFAULT = 10
+# kW/tn de la tabla está en la escala del catálogo ('kw/tn'); algunos stocks lo guardan ×1000
+FACTOR_ESCALA_KW = 1000.0
+
+Fuente = Tuple[Callable[[], Any], Callable[[], Any]]  # (version(), cargar())
+
+
+def muestras_st_camiones(registros: List[Dict[str, Any]], max_camiones: int = MAX_CAMIONES_DEFAULT) -> Dict[str, List[float]]:
+    """
+    {material en minúsculas: [ST %, ...]} de los últimos `max_camiones`
+    registros de cada material que traen ST válido (del más viejo al más
+    nuevo). Acepta los dos formatos de registro (material/st_analizado y
+    nombre_material/st_analizado_porcentaje).
+    """
+    por_material: Dict[str, List[Tuple[str, int, float]]] = {}
+    for orden, registro in enumerate(registros or []):
+        if not isinstance(registro, dict):
+            continue
+        nombre = str(registro.get('material') or registro.get('nombre_material') or '').strip().lower()
+        st = _float(registro.get('st_analizado', registro.get('st_analizado_porcentaje')))
+        if not nombre or not 0 < st <= 100:
+            continue
+        fecha = str(registro.get('timestamp') or registro.get('fecha_hora') or registro.get('fecha') or '')
+        por_material.setdefault(nombre, []).append((fecha, orden, st))
+
+    return {nombre: [v[2] for v in sorted(valores)[-max_camiones:]] for nombre, valores in por_material.items()}
+
+
+class EnergiaMateriales:
+    """Instantánea inmutable de la tabla (una versión)."""
+
+    def __init__(self, matriz: MatrizMateriales, st_camiones: Dict[str, List[float]], consumo_chp: float,
+                 version: str, dependencias: Dict[str, Any]):
+        self.version = version
+        self.dependencias = dependencias
+        self.consumo_chp = consumo_chp
+        self.matriz = matriz
+        self.nombres = matriz.nombres
+
+        self.st_catalogo = matriz.st
+        self.kw_tn_catalogo = matriz.kw_tn
+        # Muestras de ST (%) de los últimos camiones, alineadas al catálogo
+        self.muestras_st: List[np.ndarray] = [np.asarray(st_camiones.get(n.lower(), []), dtype=float)
+                                              for n in self.nombres]
+        self.camiones = np.array([len(m) for m in self.muestras_st], dtype=int)
+        st_medido = np.array([m.mean() / 100.0 if len(m) else 0.0 for m in self.muestras_st])
+        self.st_efectivo = np.where(st_medido > 0, st_medido, self.st_catalogo)
+
+        factor_st = np.divide(self.st_efectivo, self.st_catalogo, out=np.ones(len(self.nombres)),
+                              where=self.st_catalogo > 0)
+        factor_motor = CONSUMO_CHP_DEFAULT / consumo_chp if consumo_chp > 0 else 0.0
+        self.kw_tn = self.kw_tn_catalogo * factor_st * factor_motor
+
+    def kw_tn_de(self, nombre: str, default: float = 0.0) -> float:
+        """kW/tn efectivo del material (exacto o sin distinguir mayúsculas)."""
+        i = self.matriz.indice_de(nombre)
+        return float(self.kw_tn[i]) if i is not None else default
+
+    def kw_tn_en_escala(self, nombre: str, kw_tn_stock: float = 0.0) -> float:
+        """
+        kW/tn efectivo en la misma escala que el valor guardado en el stock:
+        si el stock está ×1000 respecto del catálogo, la tabla se escala igual.
+        Fuera del catálogo devuelve el valor del stock.
+        """
+        i = self.matriz.indice_de(nombre)
+        if i is None:
+            return kw_tn_stock
+        catalogo = float(self.kw_tn_catalogo[i])
+        escala = FACTOR_ESCALA_KW if catalogo > 0 and kw_tn_stock > catalogo * FACTOR_ESCALA_KW ** 0.5 else 1.0
+        return float(self.kw_tn[i]) * escala
+
+    def muestras_por_nombre(self) -> Dict[str, np.ndarray]:
+        """{material en minúsculas: ST (%) de sus últimos camiones}."""
+        return {n.lower(): m for n, m in zip(self.nombres, self.muestras_st) if len(m)}
+
+    def fila(self, nombre: str) -> Optional[Dict[str, Any]]:
+        i = self.matriz.indice_de(nombre)
+        if i is None:
+            return None
+        return {
+            'st_catalogo': round(float(self.st_catalogo[i]), 4),
+            'st_efectivo': round(float(self.st_efectivo[i]), 4),
+            'camiones': int(self.camiones[i]),
+            'sv': round(float(self.matriz.sv[i]), 4),
+            'm3_tnsv': round(float(self.matriz.m3_tnsv[i]), 3),
+            'ch4': round(float(self.matriz.ch4[i]), 4),
+            'kw_tn_catalogo': round(float(self.kw_tn_catalogo[i]), 4),
+            'kw_tn': round(float(self.kw_tn[i]), 4),
+        }
+
+    def como_diccionario(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'dependencias': {k: str(v) for k, v in self.dependencias.items()},
+            'consumo_chp': self.consumo_chp,
+            'materiales': {nombre: self.fila(nombre) for nombre in self.nombres},
+        }
+
+
+class TablaEnergia:
+    """
+    Tabla kW/tn con invalidación por dependencias.
+
+    `fuentes` = {'catalogo': (version, cargar), 'registros': (version, cargar),
+    'motor': (version, cargar)}; `cargar` devuelve el catálogo (dict), la
+    lista de registros y el consumo CHP respectivamente.
+    """
+
+    def __init__(self, fuentes: Dict[str, Fuente], max_camiones: int = MAX_CAMIONES_DEFAULT):
+        faltantes = [d for d in DEPENDENCIAS if d not in fuentes]
+        if faltantes:
+            raise ValueError(f"Faltan fuentes para la tabla de energía: {faltantes}")
+        self._fuentes = fuentes
+        self.max_camiones = max_camiones
+        self._lock = threading.Lock()
+        self._forzadas = {d: 0 for d in DEPENDENCIAS}
+        self._versiones: Dict[str, Any] = {}
+        self._entradas: Dict[str, Any] = {}
+        self._tabla: Optional[EnergiaMateriales] = None
+        self.recalculos = 0
+        self.ultimo_motivo: List[str] = []
+
+    def _version_de(self, dependencia: str) -> Any:
+        try:
+            version = self._fuentes[dependencia][0]()
+        except Exception as e:
+            logger.warning(f"No se pudo leer la versión de '{dependencia}': {e}")
+            version = None
+        return (version, self._forzadas[dependencia])
+
+    def invalidar(self, dependencia: Optional[str] = None) -> None:
+        """Fuerza el recálculo de una dependencia (o de todas) en la próxima consulta."""
+        with self._lock:
+            for d in ([dependencia] if dependencia else DEPENDENCIAS):
+                self._forzadas[d] += 1
+
+    def obtener(self) -> EnergiaMateriales:
+        """Tabla vigente; recalcula sólo si cambió la versión de alguna dependencia."""
+        with self._lock:
+            versiones = {d: self._version_de(d) for d in DEPENDENCIAS}
+            cambiadas = [d for d in DEPENDENCIAS if self._versiones.get(d) != versiones[d]]
+            if self._tabla is not None and not cambiadas:
+                return self._tabla
+
+            inicio = time.perf_counter()
+            for d in cambiadas:
+                self._entradas[d] = self._fuentes[d][1]()
+            catalogo = self._entradas.get('catalogo') or {}
+            consumo_chp = _float(self._entradas.get('motor'), CONSUMO_CHP_DEFAULT)
+            if 'catalogo' in cambiadas or 'registros' in cambiadas:
+                self._entradas['st_camiones'] = muestras_st_camiones(self._entradas.get('registros') or [],
+                                                                     self.max_camiones)
+
+            contenido = repr(sorted((d, str(v)) for d, v in versiones.items()))
+            version = hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:16]
+            # Matriz a consumo de referencia: el kw/tn del catálogo está expresado a 505 m³/kW
+            matriz = MatrizMateriales(catalogo, CONSUMO_CHP_DEFAULT, version=str(versiones['catalogo'][0]))
+            self._tabla = EnergiaMateriales(matriz, self._entradas['st_camiones'], consumo_chp, version,
+                                            {d: v[0] for d, v in versiones.items()})
+            self._versiones = versiones
+            self.recalculos += 1
+            self.ultimo_motivo = cambiadas
+            logger.info(f"⚡ Tabla de energía recalculada ({', '.join(cambiadas)}): {len(matriz)} materiales, "
+                        f"versión {version}, {(time.perf_counter() - inicio) * 1000:.1f} ms")
+            return self._tabla
+
+    @property
+    def version(self) -> str:
+        return self.obtener().version
+
+    def kw_tn(self, nombre: str, default: float = 0.0) -> float:
+        return self.obtener().kw_tn_de(nombre, default)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'version': self._tabla.version if self._tabla else None,
+                'recalculos': self.recalculos,
+                'ultimo_motivo': list(self.ultimo_motivo),
+                'max_camiones': self.max_camiones,
+            }